@@ -85,6 +85,17 @@ def get_current_user(
         raise credentials_exception
     return user
 
+def get_user_from_token(db: Session, token: str) -> Optional[User]:
+    """Active user of an access token, or None (for clients that cannot send headers)"""
+    try:
+        token_data = verify_token(token, credentials_exception)
+    except HTTPException:
+        return None
+    user = get_user(db, email=token_data.email)
+    if user is None or not user.is_active:
+        return None
+    return user
+
 def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
     """Get current active user"""
     if not current_user.is_active:
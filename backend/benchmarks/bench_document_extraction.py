@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Benchmark page-parallel document extraction (extraction.extract_document)
+
+Generates a synthetic multi-page PDF with Flate-compressed content streams,
+then extracts it serially (no process pool) and across process pools of
+increasing size, checking every run produces the same merged data. A copy
+with the page tree packed into a compressed object stream (as PDF 1.5+
+writers produce) must extract identically.
+
+Pool sizes above the CPUs available to this process cannot speed anything
+up and are reported as such.
+
+Usage:
+    python benchmarks/bench_document_extraction.py --pages 500 --processes 2,4
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from extraction import PDF_MIME_TYPE, extract_document
+from worker import cpu_pool
+
+WORDS = "facture client montant total livraison contrat paiement échéance service remise".split()
+
+def page_stream(rng: random.Random, page: int, lines: int) -> bytes:
+    """Content stream of one page: text lines with amounts, dates and emails"""
+    operations = ["BT /F1 10 Tf 50 780 Td 12 TL"]
+    for line in range(lines):
+        words = " ".join(rng.choice(WORDS) for _ in range(12))
+        if line % 5 == 0:
+            words += f" {rng.randint(1, 999)},{rng.randint(0, 99):02d} EUR"
+        if line % 17 == 0:
+            words += f" 2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} client{page}@example.com"
+        if line % 7 == 3:
+            # Some writers emit hex strings; they must read the same as literals
+            operations.append(f"<{words.encode('latin-1').hex()}> '")
+        else:
+            operations.append(f"({words}) '")
+    operations.append("ET")
+    return "\n".join(operations).encode("latin-1")
+
+def write_pdf(path: str, pages: int, lines: int, seed: int = 42, object_streams: bool = False):
+    """Write a PDF with the given page count (catalog, page tree, one stream per page)
+
+    With `object_streams`, the catalog, page tree and page dictionaries are
+    packed into one Flate-compressed /ObjStm object.
+    """
+    rng = random.Random(seed)
+    objects = {
+        1: b"<< /Type /Catalog /Pages 2 0 R >>",
+        3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"
+    }
+    kids = []
+    for page in range(pages):
+        page_id, content_id = 4 + 2 * page, 5 + 2 * page
+        kids.append(f"{page_id} 0 R")
+        stream = zlib.compress(page_stream(rng, page, lines))
+        objects[page_id] = (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>"
+        ).encode()
+        objects[content_id] = (
+            f"<< /Length {len(stream)} /Filter /FlateDecode >>\nstream\n".encode() + stream + b"\nendstream"
+        )
+    objects[2] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {pages} >>".encode()
+
+    if object_streams:
+        packed = [number for number in sorted(objects) if not objects[number].startswith(b"<< /Length")]
+        header, body = [], b""
+        for number in packed:
+            header.append(f"{number} {len(body)}")
+            body += objects.pop(number) + b"\n"
+        header = " ".join(header).encode() + b"\n"
+        stream = zlib.compress(header + body)
+        objects[len(packed) + 2 * pages + 10] = (
+            f"<< /Type /ObjStm /N {len(packed)} /First {len(header)} /Length {len(stream)} /Filter /FlateDecode >>\nstream\n".encode()
+            + stream + b"\nendstream"
+        )
+
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.4\n")
+        offsets = {}
+        for number in sorted(objects):
+            offsets[number] = f.tell()
+            f.write(f"{number} 0 obj\n".encode() + objects[number] + b"\nendobj\n")
+        xref = f.tell()
+        f.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode())
+        for number in sorted(objects):
+            f.write(f"{offsets[number]:010d} 00000 n \n".encode())
+        f.write(f"trailer\n<< /Size {max(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
+
+def comparable(extraction: dict) -> dict:
+    """Extracted fields that must match between runs (mock analysis fields are random)"""
+    data = extraction["extracted_data"]
+    return {key: data.get(key) for key in ("pages", "words", "amounts", "total_amount", "dates", "emails")}
+
+def timed_extract(path: str, repeat: int):
+    """Best wall time over `repeat` extractions, and the last result"""
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = extract_document(path, PDF_MIME_TYPE)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--lines", type=int, default=60, help="Text lines per page")
+    parser.add_argument("--processes", default="2,4", help="Process pool sizes to compare against serial")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.pdf")
+        write_pdf(path, args.pages, args.lines)
+        cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()
+        print(f"{args.pages} pages, {os.path.getsize(path) / 2**20:.1f}MB, {cpus} usable CPUs")
+
+        serial, expected = timed_extract(path, args.repeat)
+        assert expected["extracted_data"]["pages"] == args.pages
+
+        packed_path = os.path.join(tmp, "bench-objstm.pdf")
+        write_pdf(packed_path, args.pages, args.lines, object_streams=True)
+        packed = extract_document(packed_path, PDF_MIME_TYPE)
+        assert comparable(packed) == comparable(expected), "object stream PDF extracts differently"
+
+        print(f"{'mode':>12} {'seconds':>8} {'pages/s':>8} {'speedup':>8}")
+        print(f"{'serial':>12} {serial:>8.3f} {args.pages / serial:>8.0f} {1.0:>7.2f}x")
+
+        for processes in (int(value) for value in args.processes.split(",")):
+            with cpu_pool(processes) as pool:
+                # Start the spawned workers before timing
+                list(pool.map(abs, range(processes)))
+                elapsed, result = timed_extract(path, args.repeat)
+            assert comparable(result) == comparable(expected), "parallel extraction differs from serial"
+            label = f"{processes} procs"
+            note = f"  (only {cpus} CPU{'s' if cpus > 1 else ''}: no speedup possible)" if processes > cpus else ""
+            print(f"{label:>12} {elapsed:>8.3f} {args.pages / elapsed:>8.0f} {serial / elapsed:>7.2f}x{note}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Benchmark memory use of streamed document uploads (POST /documents/upload)
+
+Sends generated multipart bodies of increasing size through the ASGI app
+in-process and samples the process RSS while each upload runs. With the
+streaming upload path, peak RSS growth stays flat as the upload grows.
+
+Usage:
+    python benchmarks/bench_document_upload.py --sizes 64,256,1024
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import threading
+import time
+from datetime import timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from auth import create_access_token
+from database import SessionLocal, init_db
+from models import Subscription, SubscriptionPlan, User
+from server import app
+from storage import collect_blob_garbage
+
+BENCH_EMAIL = "bench.upload@example.com"
+BOUNDARY = "benchboundary7MA4YWxkTrZu0gW"
+BLOCK = os.urandom(64 * 1024)
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+def rss_bytes() -> int:
+    """Current resident set size of this process"""
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * PAGE_SIZE
+
+class RssSampler(threading.Thread):
+    """Record the peak RSS while an upload runs"""
+
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.peak = rss_bytes()
+        self.running = True
+
+    def run(self):
+        while self.running:
+            self.peak = max(self.peak, rss_bytes())
+            time.sleep(0.01)
+
+    def stop(self) -> int:
+        self.running = False
+        self.join()
+        return self.peak
+
+def multipart_body(size: int):
+    """Multipart parts for a generated PDF upload of the given size"""
+    head = (
+        f"--{BOUNDARY}\r\n"
+        'Content-Disposition: form-data; name="file"; filename="bench.pdf"\r\n'
+        "Content-Type: application/pdf\r\n\r\n"
+    ).encode()
+    tail = f"\r\n--{BOUNDARY}--\r\n".encode()
+
+    async def stream():
+        yield head
+        remaining = size
+        while remaining > 0:
+            block = BLOCK[:remaining]
+            remaining -= len(block)
+            yield block
+        yield tail
+
+    return stream(), len(head) + size + len(tail)
+
+def bench_user_token() -> str:
+    """Create the enterprise benchmark user and return an access token"""
+    db = SessionLocal()
+    try:
+        user = db.query(User).filter(User.email == BENCH_EMAIL).first()
+        if not user:
+            user = User(name="Bench", email=BENCH_EMAIL, hashed_password="!")
+            db.add(user)
+            db.commit()
+            db.add(Subscription(user_id=user.id, plan=SubscriptionPlan.ENTERPRISE))
+            db.commit()
+        return create_access_token({"sub": user.email})
+    finally:
+        db.close()
+
+async def upload(client: httpx.AsyncClient, token: str, size: int):
+    """Upload one generated file and delete it afterwards"""
+    body, length = multipart_body(size)
+    response = await client.post("/api/documents/upload", content=body, headers={
+        "Authorization": f"Bearer {token}",
+        "Content-Type": f"multipart/form-data; boundary={BOUNDARY}",
+        "Content-Length": str(length)
+    })
+    response.raise_for_status()
+    document_id = response.json()["upload_id"]
+    await client.delete(f"/api/documents/{document_id}", headers={"Authorization": f"Bearer {token}"})
+
+    db = SessionLocal()
+    try:
+        collect_blob_garbage(db, timedelta(0))
+    finally:
+        db.close()
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="64,256,1024", help="Upload sizes in MB")
+    args = parser.parse_args()
+
+    init_db()
+    token = bench_user_token()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # Warm up imports and connection pools before measuring
+        await upload(client, token, 1024 * 1024)
+
+        print(f"{'size':>8} {'seconds':>8} {'MB/s':>8} {'rss before':>11} {'peak rss':>9} {'growth':>8}")
+        for size_mb in (int(value) for value in args.sizes.split(",")):
+            before = rss_bytes()
+            sampler = RssSampler()
+            sampler.start()
+            start = time.perf_counter()
+            await upload(client, token, size_mb * 1024 * 1024)
+            elapsed = time.perf_counter() - start
+            peak = sampler.stop()
+            print(
+                f"{size_mb:>6}MB {elapsed:>8.1f} {size_mb / elapsed:>8.0f} "
+                f"{before / 2**20:>9.0f}MB {peak / 2**20:>7.0f}MB {(peak - before) / 2**20:>6.1f}MB"
+            )
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Benchmark the bulk lead import pipeline (POST /leads/import)
+
+Generates a synthetic CSV, queues the import job and runs it in-process
+through the job queue (claim_job + execute_job) inside the worker's
+process pool, reporting
+end-to-end rows per second (parse, validate, score and insert).
+
+Usage:
+    DATABASE_URL=postgresql://... python benchmarks/bench_lead_import.py --rows 1000000
+"""
+
+import argparse
+import csv
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import SessionLocal, init_db
+from models import Job, User
+from jobs import claim_job, execute_job
+from lead_import import IMPORT_DIR, LEAD_IMPORT_JOB, enqueue_lead_import
+from worker import WORKER_PROCESSES, cpu_pool
+
+BENCH_EMAIL = "bench.import@example.com"
+SOURCES = ["referral", "linkedin", "website", "email campaign", "cold call", ""]
+
+def write_csv(path: str, rows: int):
+    """Write a synthetic lead CSV"""
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["name", "email", "company", "phone", "source"])
+        for i in range(rows):
+            writer.writerow([
+                f"Contact {i}",
+                f"contact{i}@{'gmail.com' if i % 3 == 0 else f'company{i % 5000}.fr'}",
+                f"Company {i % 5000}" if i % 4 else "",
+                f"+33 6 {i % 100000000:08d}" if i % 2 else "",
+                SOURCES[i % len(SOURCES)],
+            ])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    init_db()
+    os.makedirs(IMPORT_DIR, exist_ok=True)
+    path = os.path.join(IMPORT_DIR, "bench_leads.csv")
+    write_csv(path, args.rows)
+    size_mb = os.path.getsize(path) / 1024 / 1024
+
+    db = SessionLocal()
+    try:
+        user = db.query(User).filter(User.email == BENCH_EMAIL).first()
+        if not user:
+            user = User(name="Bench", email=BENCH_EMAIL, hashed_password="!")
+            db.add(user)
+            db.commit()
+        job = enqueue_lead_import(db, user.id, path, "csv", "bench.csv")
+
+        with cpu_pool():
+            start = time.perf_counter()
+            claimed = claim_job(db, "bench", [LEAD_IMPORT_JOB])
+            if claimed:
+                execute_job(db, claimed, "bench")
+            elapsed = time.perf_counter() - start
+
+        db.expire_all()
+        job = db.get(Job, job.id)
+        print(f"rows: {args.rows} ({size_mb:.1f} MB), processes: {WORKER_PROCESSES}")
+        print(f"status: {job.status.value}, imported: {(job.result or {}).get('imported')}")
+        print(f"elapsed: {elapsed:.1f}s, {args.rows / elapsed:,.0f} rows/s")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Benchmark fuzzy lead lookup and tag/custom field filtering on GET /leads
+
+Seeds a synthetic lead table server-side (generate_series) for a benchmark
+user, then times the queries built by search.filter_leads.
+
+Usage:
+    DATABASE_URL=postgresql://... python benchmarks/bench_lead_lookup.py --leads 5000000
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from database import SessionLocal, engine, init_db
+from models import Lead, User
+from search import filter_leads
+
+BENCH_EMAIL = "bench.lookup@example.com"
+
+def seed_leads(db, owner_id: int, count: int):
+    """Insert synthetic leads with tags and custom fields in a single statement"""
+    existing = db.query(Lead).filter(Lead.owner_id == owner_id).count()
+    if existing >= count:
+        return
+    print(f"Seeding {count - existing} leads...")
+    db.execute(text("""
+        INSERT INTO leads (name, email, company, phone, owner_id, source, status, score,
+                           tags, custom_fields, created_at, updated_at)
+        SELECT 'Contact ' || i,
+               'contact' || i || '@company' || (i % 50000) || '.com',
+               (ARRAY['Acme', 'Globex', 'Initech', 'Umbrella', 'Hooli', 'Stark'])[1 + i % 6]
+                   || ' ' || (i % 50000) || ' SAS',
+               '+33 1 ' || lpad((i % 100000000)::text, 8, '0'),
+               :owner_id,
+               (ARRAY['referral', 'linkedin', 'website', 'email campaign'])[1 + i % 4],
+               'COLD',
+               i % 100,
+               json_build_array('segment-' || (i % 20), 'tier-' || (i % 3)),
+               json_build_object('industry', (ARRAY['saas', 'retail', 'finance'])[1 + i % 3],
+                                 'region', 'r' || (i % 12)),
+               now(), now()
+        FROM generate_series(:start, :stop) AS i
+    """), {"owner_id": owner_id, "start": existing + 1, "stop": count})
+    db.commit()
+    db.execute(text("ANALYZE leads"))
+    db.commit()
+
+def time_query(db, owner_id: int, runs: int, **filters):
+    """Run a filtered lead query several times and return latencies in ms"""
+    latencies = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        query = db.query(Lead).filter(Lead.owner_id == owner_id)
+        filter_leads(query, db, **filters).limit(100).all()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--leads", type=int, default=5_000_000)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    if engine.dialect.name != "postgresql":
+        print("This benchmark requires a PostgreSQL DATABASE_URL")
+        sys.exit(1)
+
+    init_db()
+    db = SessionLocal()
+    try:
+        user = db.query(User).filter(User.email == BENCH_EMAIL).first()
+        if not user:
+            user = User(name="Bench", email=BENCH_EMAIL, hashed_password="!")
+            db.add(user)
+            db.commit()
+        seed_leads(db, user.id, args.leads)
+
+        cases = {
+            "fuzzy company": {"q": "Initec 4213"},
+            "fuzzy email": {"q": "contact1234@compa"},
+            "tags": {"tags": ["segment-7", "tier-2"]},
+            "custom fields": {"custom_fields": {"industry": "finance", "region": "r4"}},
+            "fuzzy + tags": {"q": "Globex 1201", "tags": ["tier-1"]},
+        }
+        print(f"{'case':<16}{'p50 ms':>10}{'p95 ms':>10}")
+        for name, filters in cases.items():
+            latencies = sorted(time_query(db, user.id, args.runs, **filters))
+            p95 = latencies[int(len(latencies) * 0.95) - 1]
+            print(f"{name:<16}{statistics.median(latencies):>10.1f}{p95:>10.1f}")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Benchmark vectorized lead scoring (scoring.score_lead_frame) against the
+original per-dict implementation
+
+The reference functions below are the per-lead scoring code that
+scoring.py replaced; both paths are checked to agree before timing.
+Values are compared against the prior lead value model, which reproduces
+the original multipliers without the random factor, and insights are
+derived, on the computed score.
+The single-lead helpers in utils (used by POST /leads) are timed against
+the reference functions on the first --single leads.
+
+Usage:
+    python benchmarks/bench_lead_scoring.py --leads 100000 --repeat 5
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+import scoring
+from utils import calculate_lead_score, generate_ai_insights, predict_lead_value
+
+def reference_score(lead_data):
+    """Original per-dict calculate_lead_score"""
+    score = 0
+    if lead_data.get('company'):
+        score += 20
+    email = lead_data.get('email', '')
+    if email:
+        domain = email.split('@')[1] if '@' in email else ''
+        if domain in ['gmail.com', 'yahoo.com', 'outlook.com']:
+            score += 10
+        else:
+            score += 25
+    if lead_data.get('phone'):
+        score += 15
+    source = (lead_data.get('source') or '').lower()
+    source_scores = {'referral': 30, 'linkedin': 25, 'website': 20, 'email campaign': 15, 'cold call': 10}
+    score += source_scores.get(source, 10)
+    if lead_data.get('last_activity'):
+        last_activity = datetime.fromisoformat(lead_data['last_activity'].replace('Z', '+00:00'))
+        days_since_activity = (datetime.utcnow() - last_activity).days
+        if days_since_activity <= 7:
+            score += 20
+        elif days_since_activity <= 30:
+            score += 10
+    return min(score, 100)
+
+def reference_value(lead_data):
+    """Original per-dict predict_lead_value without the random factor"""
+    base_value = 1000.0
+    if lead_data.get('company'):
+        base_value *= 1.5
+    source = (lead_data.get('source') or '').lower()
+    source_multipliers = {'referral': 2.0, 'linkedin': 1.5, 'website': 1.3, 'email campaign': 1.2, 'cold call': 1.0}
+    base_value *= source_multipliers.get(source, 1.0)
+    base_value *= (lead_data.get('score', 50) / 100)
+    return round(base_value, 2)
+
+def reference_insights(lead_data):
+    """Original per-dict generate_ai_insights"""
+    insights = []
+    score = lead_data.get('score', 0)
+    if score >= 80:
+        insights.append("Forte probabilité de conversion (85%)")
+    elif score >= 60:
+        insights.append("Probabilité modérée de conversion (60%)")
+    else:
+        insights.append("Nécessite du nurturing avant conversion")
+    if lead_data.get('company'):
+        insights.append("Prospect d'entreprise - potentiel élevé")
+    source = (lead_data.get('source') or '').lower()
+    if source == 'referral':
+        insights.append("Recommandé par un client - très qualifié")
+    elif source == 'linkedin':
+        insights.append("Contact professionnel actif")
+    elif source == 'website':
+        insights.append("Intérêt démontré par visite du site")
+    if lead_data.get('last_activity'):
+        last_activity = datetime.fromisoformat(lead_data['last_activity'].replace('Z', '+00:00'))
+        days_since_activity = (datetime.utcnow() - last_activity).days
+        if days_since_activity <= 3:
+            insights.append("Activité récente - contacter rapidement")
+        elif days_since_activity <= 7:
+            insights.append("Activité cette semaine - bon timing")
+        elif days_since_activity > 30:
+            insights.append("Inactif depuis longtemps - relance nécessaire")
+    return insights
+
+def make_leads(count):
+    """Generate synthetic lead dicts"""
+    rng = random.Random(42)
+    now = datetime.utcnow()
+    sources = ['referral', 'LinkedIn', 'website', 'email campaign', 'cold call', 'salon', None]
+    leads = []
+    for i in range(count):
+        lead = {
+            'name': f'Contact {i}',
+            'email': f'contact{i}@' + rng.choice(['gmail.com', 'yahoo.com', f'corp{i % 100}.fr']),
+            'company': rng.choice(['Acme', 'Globex', None]),
+            'phone': rng.choice(['+33 6 12 34 56 78', None]),
+            'source': rng.choice(sources),
+            'score': rng.randint(0, 100),
+        }
+        if rng.random() < 0.8:
+            lead['last_activity'] = (now - timedelta(days=rng.uniform(0, 90))).isoformat()
+        leads.append(lead)
+    return leads
+
+def best_of(repeat, fn):
+    """Result of fn and its fastest wall time over `repeat` runs"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--leads", type=int, default=100_000)
+    parser.add_argument("--single", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per path; the fastest is reported")
+    args = parser.parse_args()
+
+    leads = make_leads(args.leads)
+    frame = pd.DataFrame(leads)
+
+    def reference_batch():
+        expected = []
+        for l in leads:
+            score = reference_score(l)
+            expected.append((score, reference_value({**l, 'score': score}), reference_insights({**l, 'score': score})))
+        return expected
+
+    now = datetime.utcnow()
+    expected, scalar_elapsed = best_of(args.repeat, reference_batch)
+    scored, vector_elapsed = best_of(args.repeat, lambda: scoring.score_lead_frame(frame, now))
+
+    mismatches = sum(
+        1 for (score, value, insights), s, v, f in zip(expected, scored['score'], scored['predicted_value'], scored['insight_flags'])
+        if (score, insights) != (s, scoring.insight_messages(f)) or abs(value - v) > 0.01
+    )
+
+    print(f"leads: {args.leads}, mismatches: {mismatches}")
+    print(f"per-dict:   {scalar_elapsed * 1000:8.1f} ms")
+    print(f"vectorized: {vector_elapsed * 1000:8.1f} ms")
+    print(f"speedup:    {scalar_elapsed / vector_elapsed:8.1f}x")
+
+    singles = leads[:args.single]
+    start = time.perf_counter()
+    for l in singles:
+        score = reference_score(l)
+        reference_value({**l, 'score': score})
+        reference_insights({**l, 'score': score})
+    reference_elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    results = []
+    for l in singles:
+        score = calculate_lead_score(l)
+        results.append((score, predict_lead_value({**l, 'score': score}), generate_ai_insights({**l, 'score': score})))
+    single_elapsed = time.perf_counter() - start
+
+    single_mismatches = sum(
+        1 for (score, value, insights), (s, v, i) in zip(expected, results)
+        if (score, insights) != (s, i) or abs(value - v) > 0.01
+    )
+    print(f"single leads: {len(singles)}, mismatches: {single_mismatches}")
+    print(f"per-dict:   {reference_elapsed / len(singles) * 1e6:8.1f} us/lead")
+    print(f"helpers:    {single_elapsed / len(singles) * 1e6:8.1f} us/lead")
+
+if __name__ == "__main__":
+    main()
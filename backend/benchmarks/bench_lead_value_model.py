@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Benchmark lead value model loading and scoring latency
+
+Reports the one-off coefficient file load, single-lead prediction latency
+(through utils.predict_lead_value, as used by POST /leads) and batch
+throughput (through scoring.score_lead_frame, as used by imports).
+
+Usage:
+    python benchmarks/bench_lead_value_model.py --model lead_value_model.json
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+from lead_value_model import LEAD_VALUE_MODEL_PATH, load_lead_value_model
+from scoring import score_lead_frame
+from utils import predict_lead_value
+
+SOURCES = ['referral', 'linkedin', 'website', 'email campaign', 'cold call', None]
+
+def make_leads(count):
+    """Generate synthetic lead dicts"""
+    return [
+        {
+            'email': f'contact{i}@' + ('gmail.com' if i % 3 == 0 else f'corp{i % 100}.fr'),
+            'company': f'Company {i}' if i % 2 else None,
+            'phone': '+33 6 12 34 56 78' if i % 4 else None,
+            'source': SOURCES[i % len(SOURCES)],
+            'score': i % 101
+        }
+        for i in range(count)
+    ]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=LEAD_VALUE_MODEL_PATH)
+    parser.add_argument("--single", type=int, default=2000)
+    parser.add_argument("--batch", type=int, default=100_000)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    model = load_lead_value_model(args.model)
+    load_ms = (time.perf_counter() - start) * 1000
+    print(f"model: {'trained' if model.metadata.get('trained') else 'prior'} ({args.model}), load {load_ms:.2f} ms")
+
+    latencies = []
+    for lead in make_leads(args.single):
+        start = time.perf_counter()
+        predict_lead_value(lead)
+        latencies.append((time.perf_counter() - start) * 1_000_000)
+    latencies.sort()
+    print(f"single lead: p50 {statistics.median(latencies):.0f} us, p99 {latencies[int(len(latencies) * 0.99)]:.0f} us")
+
+    frame = pd.DataFrame(make_leads(args.batch))
+    start = time.perf_counter()
+    score_lead_frame(frame)
+    elapsed = time.perf_counter() - start
+    print(f"batch of {args.batch}: {elapsed * 1000:.1f} ms ({args.batch / elapsed:,.0f} leads/s)")
+
+if __name__ == "__main__":
+    main()
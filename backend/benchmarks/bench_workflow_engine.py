@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Benchmark concurrent workflow executions (workflow_engine.execute_workflow)
+
+Runs many executions of a fan-out/fan-in workflow at once against the local
+mock AI provider and reports executions per second and latency
+percentiles: first the engine alone (execute_plan), then full executions
+recorded in the database, each with its own session. Every run is repeated
+with steps forced sequential (one at a time) for comparison, and the
+workflow's execution counter is checked for lost updates.
+
+Usage:
+    DATABASE_URL=postgresql://... python benchmarks/bench_workflow_engine.py --executions 1000
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from database import SessionLocal, init_db
+from models import User, Workflow, WorkflowExecution
+from workflow_engine import WORKFLOW_MAX_PARALLEL_STEPS, MockAIProvider, compile_workflow, execute_plan, execute_workflow
+
+BENCH_EMAIL = "bench.workflows@example.com"
+
+# trigger -> three independent AI steps -> AI summary -> notification
+BENCH_STEPS = [
+    {"id": "trigger", "name": "Réception lead", "type": "trigger"},
+    {"id": "enrich", "name": "Enrichissement", "type": "ai_analysis", "depends_on": ["trigger"]},
+    {"id": "sentiment", "name": "Analyse sentiment", "type": "sentiment", "depends_on": ["trigger"]},
+    {"id": "segment", "name": "Segmentation", "type": "segmentation", "depends_on": ["trigger"]},
+    {"id": "summary", "name": "Synthèse", "type": "ai_response", "depends_on": ["enrich", "sentiment", "segment"]},
+    {"id": "notify", "name": "Notification", "type": "notification", "depends_on": ["summary"]}
+]
+
+def bench_workflow() -> int:
+    """Create the benchmark user and workflow, returning the workflow id"""
+    db = SessionLocal()
+    try:
+        user = db.query(User).filter(User.email == BENCH_EMAIL).first()
+        if not user:
+            user = User(name="Bench", email=BENCH_EMAIL, hashed_password="!")
+            db.add(user)
+            db.commit()
+        workflow = Workflow(name="Bench DAG", owner_id=user.id, ai_model="GPT-4", steps=BENCH_STEPS, executions=0)
+        db.add(workflow)
+        db.commit()
+        return workflow.id
+    finally:
+        db.close()
+
+async def run_plan(index: int, provider: MockAIProvider, max_parallel: int) -> float:
+    """Run the compiled plan once without the database, returning its latency"""
+    start = time.perf_counter()
+    result = await execute_plan(compile_workflow(BENCH_STEPS), {"lead": index}, provider, "GPT-4", max_parallel)
+    assert result.status == "completed", result.error
+    return time.perf_counter() - start
+
+async def run_recorded(workflow_id: int, index: int, provider: MockAIProvider, max_parallel: int) -> float:
+    """Execute the workflow once in its own session, returning its latency"""
+    start = time.perf_counter()
+    db = SessionLocal()
+    try:
+        workflow = db.get(Workflow, workflow_id)
+        execution = await execute_workflow(db, workflow, {"lead": index}, provider, max_parallel)
+        assert execution.status == "completed", execution.error_message
+    finally:
+        db.close()
+    return time.perf_counter() - start
+
+async def run_batch(runs):
+    """Start all runs at once and wait for them"""
+    start = time.perf_counter()
+    latencies = await asyncio.gather(*runs)
+    return time.perf_counter() - start, np.array(latencies)
+
+def report(label: str, executions: int, elapsed: float, latencies):
+    print(
+        f"{label:>20} {elapsed:>8.2f} {executions / elapsed:>8.0f} "
+        f"{np.percentile(latencies, 50):>7.3f}s {np.percentile(latencies, 95):>7.3f}s {np.percentile(latencies, 99):>7.3f}s"
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--executions", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.05, help="Mock AI provider latency in seconds")
+    args = parser.parse_args()
+
+    init_db()
+    provider = MockAIProvider(latency=args.latency)
+
+    print(f"{args.executions} concurrent executions, {len(BENCH_STEPS)} steps, mock AI latency {args.latency * 1000:.0f}ms")
+    print(f"{'run':>20} {'seconds':>8} {'exec/s':>8} {'p50':>8} {'p95':>8} {'p99':>8}")
+    modes = (("parallel", WORKFLOW_MAX_PARALLEL_STEPS), ("sequential", 1))
+    for label, max_parallel in modes:
+        elapsed, latencies = asyncio.run(run_batch(
+            run_plan(i, provider, max_parallel) for i in range(args.executions)
+        ))
+        report(f"engine {label}", args.executions, elapsed, latencies)
+
+    for label, max_parallel in modes:
+        workflow_id = bench_workflow()
+        elapsed, latencies = asyncio.run(run_batch(
+            run_recorded(workflow_id, i, provider, max_parallel) for i in range(args.executions)
+        ))
+        report(f"recorded {label}", args.executions, elapsed, latencies)
+
+        db = SessionLocal()
+        try:
+            workflow = db.get(Workflow, workflow_id)
+            recorded = db.query(WorkflowExecution).filter(
+                WorkflowExecution.workflow_id == workflow_id,
+                WorkflowExecution.status == "completed"
+            ).count()
+            assert workflow.executions == args.executions == recorded, (workflow.executions, recorded)
+        finally:
+            db.close()
+
+if __name__ == "__main__":
+    main()
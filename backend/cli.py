@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Command line entry points for LeZelote-IA background services
+"""
+
+import json
+import math
+import os
+import time
+import typer
+from database import SessionLocal, init_db
+
+app = typer.Typer(help="LeZelote-IA background services")
+
+@app.callback()
+def main():
+    """LeZelote-IA background services"""
+
+@app.command("rescore-leads")
+def rescore_leads_command(
+    interval: int = typer.Option(0, help="Repeat every N seconds (0 runs once)"),
+    batch_size: int = typer.Option(5000, help="Leads updated per UPDATE batch"),
+    full: bool = typer.Option(False, help="Re-score every lead with activity, not only changed buckets")
+):
+    """Re-score leads whose activity bucket changed since the last run
+
+    Runs in this process; the scheduler already queues a run for the
+    workers every LEAD_RESCORE_INTERVAL seconds.
+    """
+    from lead_rescoring import rescore_leads
+
+    init_db()
+    while True:
+        db = SessionLocal()
+        try:
+            job = rescore_leads(db, batch_size=batch_size, full=full)
+            full = False
+            typer.echo(f"Re-scored {job.result['updated']} leads (as of {job.payload['as_of']})")
+        finally:
+            db.close()
+
+        if not interval:
+            break
+        time.sleep(interval)
+
+@app.command("train-lead-model")
+def train_lead_model_command(
+    alpha: float = typer.Option(1.0, help="Ridge penalty towards the prior coefficients"),
+    min_samples: int = typer.Option(50, help="Minimum leads with a deal value required to save"),
+    output: str = typer.Option(None, help="Coefficient file (defaults to LEAD_VALUE_MODEL_PATH)")
+):
+    """Retrain the lead value model from leads with a recorded deal value"""
+    from lead_value_model import LEAD_VALUE_MODEL_PATH, fit_lead_value_model_from_db
+
+    db = SessionLocal()
+    try:
+        model = fit_lead_value_model_from_db(db, alpha=alpha)
+    finally:
+        db.close()
+
+    samples = model.metadata["samples"]
+    if samples < min_samples:
+        typer.echo(f"Only {samples} leads with a deal value; model not saved")
+        raise typer.Exit(code=1)
+
+    path = output or LEAD_VALUE_MODEL_PATH
+    model.save(path)
+    typer.echo(f"Trained on {samples} leads (log RMSE {model.metadata['log_rmse']:.3f}), saved to {path}")
+    for name, weight in model.coefficients.items():
+        typer.echo(f"  {name:<22} x{math.exp(weight):.3f}")
+
+@app.command("backfill-lead-hashes")
+def backfill_lead_hashes_command(
+    batch_size: int = typer.Option(5000, help="Leads updated per batch")
+):
+    """Set dedupe hashes on leads created before deduplication"""
+    from dedupe import backfill_dedupe_hashes
+
+    init_db()
+    db = SessionLocal()
+    try:
+        updated, skipped = backfill_dedupe_hashes(db, batch_size=batch_size)
+    finally:
+        db.close()
+    typer.echo(f"Hashed {updated} leads, {skipped} left unhashed as duplicates")
+
+@app.command("find-duplicates")
+def find_duplicates_command(
+    workers: int = typer.Option(os.cpu_count() or 1, help="Worker processes"),
+    threshold: float = typer.Option(0.8, help="Minimum estimated name/company similarity"),
+    output: str = typer.Option(None, help="Write clusters as JSON lines to this file")
+):
+    """Scan all leads for fuzzy duplicates (blocking + MinHash)"""
+    from dedupe import find_duplicate_leads
+
+    db = SessionLocal()
+    out = open(output, "w") if output else None
+    clusters = 0
+    leads = 0
+    try:
+        for cluster in find_duplicate_leads(db, workers=workers, threshold=threshold):
+            clusters += 1
+            leads += len(cluster["lead_ids"])
+            line = json.dumps(cluster)
+            if out:
+                out.write(line + "\n")
+            else:
+                typer.echo(line)
+    finally:
+        db.close()
+        if out:
+            out.close()
+    typer.echo(f"Found {clusters} duplicate clusters covering {leads} leads", err=True)
+
+@app.command("gc-blobs")
+def gc_blobs_command(
+    grace_minutes: int = typer.Option(60, help="Keep unreferenced blobs at least this long")
+):
+    """Delete stored document blobs no document references any more"""
+    from datetime import timedelta
+    from storage import collect_blob_garbage
+
+    init_db()
+    db = SessionLocal()
+    try:
+        deleted = collect_blob_garbage(db, timedelta(minutes=grace_minutes))
+    finally:
+        db.close()
+    typer.echo(f"Deleted {deleted} unreferenced blobs")
+
+@app.command("gc-uploads")
+def gc_uploads_command(
+    ttl_hours: int = typer.Option(24, help="Delete upload sessions idle for longer than this")
+):
+    """Delete abandoned resumable upload sessions and their partial files"""
+    from datetime import timedelta
+    from upload_sessions import collect_abandoned_uploads
+
+    init_db()
+    db = SessionLocal()
+    try:
+        deleted = collect_abandoned_uploads(db, timedelta(hours=ttl_hours))
+    finally:
+        db.close()
+    typer.echo(f"Deleted {deleted} abandoned upload sessions")
+
+@app.command("worker")
+def worker_command(
+    concurrency: int = typer.Option(4, help="Jobs handled concurrently"),
+    processes: int = typer.Option(os.cpu_count() or 1, help="Processes for CPU-heavy job steps"),
+    poll_interval: float = typer.Option(1.0, help="Seconds between polls of an empty queue"),
+    types: str = typer.Option(None, help="Comma-separated job types to serve (default: all)"),
+    replicas: int = typer.Option(1, help="Independent worker processes to run on this machine")
+):
+    """Run background job queue consumers"""
+    from worker import run_worker, run_worker_replicas
+
+    init_db()
+    options = dict(
+        concurrency=concurrency,
+        processes=processes,
+        poll_interval=poll_interval,
+        job_types=types.split(",") if types else None
+    )
+    if replicas > 1:
+        run_worker_replicas(replicas, **options)
+    else:
+        run_worker(**options)
+
+@app.command("scheduler")
+def scheduler_command(
+    standby_interval: float = typer.Option(5.0, help="Seconds between leadership attempts while on standby")
+):
+    """Enqueue workflow runs from cron and interval triggers, and periodic jobs such as lead re-scoring (one leader at a time)"""
+    from scheduler import run_scheduler
+
+    init_db()
+    run_scheduler(standby_interval=standby_interval)
+
+@app.command("run-workflow")
+def run_workflow_command(
+    workflow_id: int = typer.Argument(..., help="Workflow to execute"),
+    input_json: str = typer.Option("{}", "--input", help="Execution input as a JSON object")
+):
+    """Execute a workflow once and print the recorded execution"""
+    import asyncio
+    from models import Workflow
+    from workflow_engine import execute_workflow
+
+    init_db()
+    db = SessionLocal()
+    try:
+        workflow = db.get(Workflow, workflow_id)
+        if not workflow:
+            raise typer.BadParameter(f"Workflow {workflow_id} not found")
+        execution = asyncio.run(execute_workflow(db, workflow, json.loads(input_json)))
+        typer.echo(json.dumps({
+            "execution_id": execution.id,
+            "status": execution.status,
+            "duration": execution.duration,
+            "tokens_used": execution.tokens_used,
+            "error_message": execution.error_message,
+            "output_data": execution.output_data
+        }, indent=2, ensure_ascii=False, default=str))
+    finally:
+        db.close()
+
+@app.command("purge-extraction-cache")
+def purge_extraction_cache_command():
+    """Delete cached document extractions from previous extractor versions"""
+    from document_processing import purge_stale_extractions
+
+    init_db()
+    db = SessionLocal()
+    try:
+        deleted = purge_stale_extractions(db)
+    finally:
+        db.close()
+    typer.echo(f"Deleted {deleted} stale cached extractions")
+
+@app.command("purge-step-cache")
+def purge_step_cache_command(
+    max_entries: int = typer.Option(None, help="Entries to keep (defaults to STEP_CACHE_MAX_ENTRIES)")
+):
+    """Delete expired memoized step results and evict the least recently used beyond the size bound"""
+    from step_cache import STEP_CACHE_MAX_ENTRIES, purge_step_cache
+
+    init_db()
+    db = SessionLocal()
+    try:
+        deleted = purge_step_cache(db, max_entries if max_entries is not None else STEP_CACHE_MAX_ENTRIES)
+    finally:
+        db.close()
+    typer.echo(f"Deleted {deleted} memoized step results")
+
+@app.command("compact-executions")
+def compact_executions_command(
+    days: int = typer.Option(None, help="Compact executions finished more than N days ago (defaults to EXECUTION_RETENTION_DAYS)"),
+    batch_size: int = typer.Option(500, help="Executions compacted per commit")
+):
+    """Move input/output data of old workflow executions to compressed cold storage"""
+    from datetime import timedelta
+    from execution_history import EXECUTION_RETENTION_DAYS, compact_executions
+
+    init_db()
+    db = SessionLocal()
+    try:
+        job = compact_executions(db, timedelta(days=days if days is not None else EXECUTION_RETENTION_DAYS), batch_size)
+        typer.echo(f"Compacted {job.result['compacted']} executions (finished before {job.payload['cutoff']})")
+    finally:
+        db.close()
+
+@app.command("purge-usage-ledger")
+def purge_usage_ledger_command(
+    days: int = typer.Option(None, help="Delete ledger entries older than N days (defaults to USAGE_LEDGER_RETENTION_DAYS)")
+):
+    """Delete old per-call usage ledger entries; daily rollups are kept"""
+    from datetime import timedelta
+    from usage import USAGE_LEDGER_RETENTION_DAYS, purge_usage_ledger
+
+    init_db()
+    db = SessionLocal()
+    try:
+        deleted = purge_usage_ledger(db, timedelta(days=days if days is not None else USAGE_LEDGER_RETENTION_DAYS))
+    finally:
+        db.close()
+    typer.echo(f"Deleted {deleted} usage ledger entries")
+
+if __name__ == "__main__":
+    app()
@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine
+from sqlalchemy import Enum, create_engine, inspect
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
@@ -36,7 +36,39 @@ def init_db():
     """Initialize database tables"""
     # Import all models to register them with Base
     from models import Base as ModelsBase
+    from search import create_search_indexes
     ModelsBase.metadata.create_all(bind=engine)
+    upgrade_schema(ModelsBase.metadata)
+    create_search_indexes(engine)
+
+def upgrade_schema(metadata, bind=None):
+    """Add the columns and indexes create_all skips on tables that already exist
+
+    create_all only creates missing tables, so tables from an earlier
+    release get their new columns and indexes here. Columns are added as
+    nullable (existing rows have no value for them). Safe to run on every start.
+    """
+    bind = bind or engine
+    inspector = inspect(bind)
+    tables = set(inspector.get_table_names())
+    quote = bind.dialect.identifier_preparer.quote
+    with bind.begin() as conn:
+        for table in metadata.sorted_tables:
+            if table.name not in tables:
+                continue
+            columns = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in columns:
+                    continue
+                if isinstance(column.type, Enum):
+                    column.type.create(conn, checkfirst=True)
+                conn.exec_driver_sql(
+                    f"ALTER TABLE {quote(table.name)} ADD COLUMN {quote(column.name)} {column.type.compile(dialect=bind.dialect)}"
+                )
+            indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in indexes:
+                    index.create(conn)
 
 # Database health check
 def check_db_health():
@@ -0,0 +1,300 @@
+import hashlib
+import multiprocessing
+import re
+import unicodedata
+import zlib
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+import numpy as np
+from sqlalchemy import func, text
+from sqlalchemy.orm import Session
+from models import Lead
+from scoring import FREE_EMAIL_DOMAINS
+
+# Upsert behaviour when a lead with the same dedupe hash already exists:
+# incoming values replace these columns...
+LEAD_UPSERT_REPLACE = [
+    'name', 'email', 'status', 'score', 'predicted_value', 'ai_insights', 'last_activity', 'updated_at'
+]
+# ...while these keep the stored value when the incoming one is empty
+LEAD_UPSERT_COALESCE = ['company', 'phone', 'source']
+
+# Fuzzy duplicate detection
+MINHASH_PERMUTATIONS = 64
+LSH_BANDS = 16
+SHINGLE_SIZE = 3
+DUPLICATE_THRESHOLD = 0.8
+FINDER_TASK_ROWS = 20000
+FINDER_COLUMNS = [Lead.id, Lead.owner_id, Lead.name, Lead.company, Lead.email, Lead.phone]
+
+COMPANY_SUFFIXES = {'sa', 'sas', 'sasu', 'sarl', 'eurl', 'inc', 'ltd', 'llc', 'gmbh', 'corp', 'co'}
+
+# MinHash permutations h(x) = (a * x + b) mod p; a < 2^31 keeps a * x within uint64
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_permutation_rng = np.random.default_rng(20240101)
+_PERM_A = _permutation_rng.integers(1, 1 << 31, size=MINHASH_PERMUTATIONS, dtype=np.uint64)
+_PERM_B = _permutation_rng.integers(0, 1 << 61, size=MINHASH_PERMUTATIONS, dtype=np.uint64)
+
+def normalize_email(email: Optional[str]) -> str:
+    """Normalize an email for identity: lowercase, trimmed, without a +tag"""
+    email = (email or '').strip().lower()
+    local, at, domain = email.partition('@')
+    if not at:
+        return email
+    return f"{local.split('+', 1)[0]}@{domain}"
+
+def normalize_phone(phone: Optional[str]) -> str:
+    """Normalize a phone number to its trailing nine digits (drops country prefixes)"""
+    digits = re.sub(r'\D', '', phone or '')
+    return digits[-9:] if len(digits) >= 6 else ''
+
+def lead_dedupe_hash(email: Optional[str], phone: Optional[str] = None) -> Optional[str]:
+    """Hash identifying a lead within an owner: normalized email, else normalized phone"""
+    email = normalize_email(email)
+    if email:
+        key = f"email:{email}"
+    else:
+        phone = normalize_phone(phone)
+        if not phone:
+            return None
+        key = f"phone:{phone}"
+    return hashlib.sha256(key.encode()).hexdigest()
+
+def find_lead_by_hash(db: Session, owner_id: int, dedupe_hash: str, exclude_id: Optional[int] = None) -> Optional[Lead]:
+    """Get the owner's lead with the given dedupe hash"""
+    query = db.query(Lead).filter(Lead.owner_id == owner_id, Lead.dedupe_hash == dedupe_hash)
+    if exclude_id is not None:
+        query = query.filter(Lead.id != exclude_id)
+    return query.first()
+
+def lead_upsert_statement(db: Session):
+    """INSERT INTO leads ... ON CONFLICT (owner_id, dedupe_hash) DO UPDATE"""
+    if db.get_bind().dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+
+    stmt = insert(Lead)
+    columns = Lead.__table__.c
+    set_ = {column: stmt.excluded[column] for column in LEAD_UPSERT_REPLACE}
+    set_.update({
+        column: func.coalesce(stmt.excluded[column], columns[column])
+        for column in LEAD_UPSERT_COALESCE
+    })
+    return stmt.on_conflict_do_update(index_elements=['owner_id', 'dedupe_hash'], set_=set_)
+
+def lead_upsert_sql(columns: Sequence[str], source_table: str) -> str:
+    """Postgres INSERT ... SELECT upsert from a staging table (used after COPY)"""
+    assignments = [f"{column} = EXCLUDED.{column}" for column in LEAD_UPSERT_REPLACE]
+    assignments += [f"{column} = COALESCE(EXCLUDED.{column}, leads.{column})" for column in LEAD_UPSERT_COALESCE]
+    column_list = ', '.join(columns)
+    return (
+        f"INSERT INTO leads ({column_list}) SELECT {column_list} FROM {source_table} "
+        f"ON CONFLICT (owner_id, dedupe_hash) DO UPDATE SET {', '.join(assignments)}"
+    )
+
+def upsert_lead(db: Session, values: Dict[str, Any]) -> int:
+    """Insert a lead or merge it into the owner's existing lead, returning its id"""
+    values = {**values, 'dedupe_hash': lead_dedupe_hash(values.get('email'), values.get('phone'))}
+    return db.execute(lead_upsert_statement(db).returning(Lead.id), values).scalar_one()
+
+def dedupe_lead_rows(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Set dedupe hashes on a batch of lead rows and collapse in-batch duplicates
+
+    A single upsert statement cannot touch the same row twice, so later rows
+    win over earlier ones with the same owner and hash.
+    """
+    unique = {}
+    for row in rows:
+        row['dedupe_hash'] = lead_dedupe_hash(row.get('email'), row.get('phone'))
+        key = (row['owner_id'], row['dedupe_hash'] or id(row))
+        unique.pop(key, None)
+        unique[key] = row
+    return list(unique.values())
+
+def count_existing_hashes(db: Session, owner_id: int, hashes: List[str]) -> int:
+    """Count how many of the given dedupe hashes the owner already has"""
+    hashes = [h for h in hashes if h]
+    if not hashes:
+        return 0
+    return db.query(func.count(Lead.id)).filter(
+        Lead.owner_id == owner_id,
+        Lead.dedupe_hash.in_(hashes)
+    ).scalar()
+
+def backfill_dedupe_hashes(db: Session, batch_size: int = 5000) -> Tuple[int, int]:
+    """Fill dedupe_hash on leads created before the column existed
+
+    The lowest id of each duplicate group gets the hash; the others are left
+    NULL (and counted as skipped) for the duplicate finder to report.
+    """
+    statement = text(
+        "UPDATE leads SET dedupe_hash = :hash WHERE id = :id AND NOT EXISTS ("
+        "SELECT 1 FROM leads other WHERE other.owner_id = :owner_id AND other.dedupe_hash = :hash)"
+    )
+    last_id = 0
+    updated = 0
+    skipped = 0
+    while True:
+        rows = db.query(Lead.id, Lead.owner_id, Lead.email, Lead.phone).filter(
+            Lead.dedupe_hash.is_(None),
+            Lead.id > last_id
+        ).order_by(Lead.id).limit(batch_size).all()
+        if not rows:
+            break
+
+        params = []
+        for row in rows:
+            dedupe_hash = lead_dedupe_hash(row.email, row.phone)
+            if dedupe_hash:
+                params.append({"id": row.id, "owner_id": row.owner_id, "hash": dedupe_hash})
+        if params:
+            result = db.execute(statement, params)
+            updated += result.rowcount
+            skipped += len(params) - result.rowcount
+        db.commit()
+        last_id = rows[-1].id
+    return updated, skipped
+
+def normalize_text(value: Optional[str]) -> str:
+    """Lowercase, strip accents and punctuation, collapse whitespace"""
+    value = unicodedata.normalize('NFKD', value or '')
+    value = ''.join(char for char in value if not unicodedata.combining(char)).lower()
+    return ' '.join(re.sub(r'[^a-z0-9]+', ' ', value).split())
+
+def normalize_company(company: Optional[str]) -> str:
+    """Normalize a company name and drop legal-form suffixes"""
+    return ' '.join(token for token in normalize_text(company).split() if token not in COMPANY_SUFFIXES)
+
+def minhash_signature(value: str) -> Optional[np.ndarray]:
+    """MinHash signature of a string's character shingles"""
+    padded = f" {value} "
+    shingles = {padded[i:i + SHINGLE_SIZE] for i in range(max(len(padded) - SHINGLE_SIZE + 1, 0))}
+    if not value or not shingles:
+        return None
+    hashes = np.fromiter((zlib.crc32(shingle.encode()) for shingle in shingles), dtype=np.uint64, count=len(shingles))
+    permuted = (_PERM_A[:, None] * hashes[None, :] + _PERM_B[:, None]) % _MERSENNE_PRIME
+    return permuted.min(axis=1)
+
+def blocking_keys(name: str, company: str, email: Optional[str], phone: Optional[str]) -> List[str]:
+    """Keys grouping leads that could plausibly be the same person"""
+    keys = []
+    domain = normalize_email(email).partition('@')[2]
+    if domain and domain not in FREE_EMAIL_DOMAINS:
+        keys.append(f"d:{domain}")
+    phone = normalize_phone(phone)
+    if phone:
+        keys.append(f"p:{phone}")
+    if company:
+        keys.append(f"c:{company}")
+    tokens = name.split()
+    if tokens:
+        keys.append(f"n:{max(tokens, key=len)[:4]}")
+    return keys
+
+class _DisjointSet:
+    """Union-find over lead ids"""
+
+    def __init__(self):
+        self.parent = {}
+
+    def find(self, item):
+        self.parent.setdefault(item, item)
+        while self.parent[item] != item:
+            self.parent[item] = self.parent[self.parent[item]]
+            item = self.parent[item]
+        return item
+
+    def union(self, a, b):
+        self.parent[self.find(a)] = self.find(b)
+
+def _owner_duplicate_clusters(rows: List[Tuple], threshold: float) -> List[List[int]]:
+    """Cluster one owner's leads by MinHash similarity of name and company"""
+    signatures = {}
+    blocks = defaultdict(list)
+    for lead_id, _, name, company, email, phone in rows:
+        name = normalize_text(name)
+        company = normalize_company(company)
+        signature = minhash_signature(f"{name} {company}".strip())
+        if signature is None:
+            continue
+        signatures[lead_id] = signature
+        for key in blocking_keys(name, company, email, phone):
+            blocks[key].append(lead_id)
+
+    rows_per_band = MINHASH_PERMUTATIONS // LSH_BANDS
+    clusters = _DisjointSet()
+    compared = set()
+    for members in blocks.values():
+        if len(members) < 2:
+            continue
+        # LSH banding: only leads sharing a whole band are compared
+        buckets = defaultdict(list)
+        for lead_id in members:
+            signature = signatures[lead_id]
+            for band in range(LSH_BANDS):
+                buckets[(band, signature[band * rows_per_band:(band + 1) * rows_per_band].tobytes())].append(lead_id)
+
+        for bucket in buckets.values():
+            for i, a in enumerate(bucket):
+                for b in bucket[i + 1:]:
+                    pair = (a, b) if a < b else (b, a)
+                    if pair in compared:
+                        continue
+                    compared.add(pair)
+                    if np.mean(signatures[a] == signatures[b]) >= threshold:
+                        clusters.union(a, b)
+
+    groups = defaultdict(list)
+    for lead_id in clusters.parent:
+        groups[clusters.find(lead_id)].append(lead_id)
+    return [sorted(group) for group in groups.values() if len(group) > 1]
+
+def find_duplicate_clusters(rows: List[Tuple], threshold: float = DUPLICATE_THRESHOLD) -> List[Dict[str, Any]]:
+    """Find duplicate clusters in rows covering whole owners (runs in a finder worker process)"""
+    by_owner = defaultdict(list)
+    for row in rows:
+        by_owner[row[1]].append(row)
+    return [
+        {"owner_id": owner_id, "lead_ids": cluster}
+        for owner_id, owner_rows in by_owner.items()
+        for cluster in _owner_duplicate_clusters(owner_rows, threshold)
+    ]
+
+def _iter_owner_tasks(db: Session, task_rows: int) -> Iterator[List[Tuple]]:
+    """Stream the leads table ordered by owner, grouped into tasks of whole owners"""
+    task = []
+    current_owner = None
+    query = db.query(*FINDER_COLUMNS).order_by(Lead.owner_id, Lead.id)
+    for row in query.yield_per(task_rows):
+        if row.owner_id != current_owner and len(task) >= task_rows:
+            yield task
+            task = []
+        current_owner = row.owner_id
+        task.append(tuple(row))
+    if task:
+        yield task
+
+def find_duplicate_leads(
+    db: Session,
+    workers: int = 1,
+    threshold: float = DUPLICATE_THRESHOLD,
+    task_rows: int = FINDER_TASK_ROWS
+) -> Iterator[Dict[str, Any]]:
+    """Scan all leads for fuzzy duplicates across a process pool
+
+    Leads are blocked per owner by email domain, phone, company and name
+    prefix; within a block, MinHash LSH proposes candidate pairs whose
+    estimated Jaccard similarity of name and company shingles must reach
+    the threshold. At most two tasks per worker are in flight.
+    """
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        pending = deque()
+        for task in _iter_owner_tasks(db, task_rows):
+            pending.append(executor.submit(find_duplicate_clusters, task, threshold))
+            if len(pending) >= workers * 2:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
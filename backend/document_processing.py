@@ -0,0 +1,147 @@
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from models import Document, DocumentStatus, ExtractionCache, Job
+from jobs import create_batch_job, create_job, job_handler
+from extraction import extract_document
+from storage import get_blob_store
+from utils import log_analytics
+
+DOCUMENT_PROCESS_JOB = "document_process"
+DOCUMENT_BATCH_JOB = "document_batch"
+
+# Bump whenever extract_document's output changes; cached results of other versions are ignored
+EXTRACTOR_VERSION = "3"
+
+@contextmanager
+def document_file(document: Document) -> Iterator[Optional[str]]:
+    """Local path of a document's bytes (blob store, or the legacy upload path)"""
+    store = get_blob_store()
+    if document.content_hash and store.exists(document.content_hash):
+        with store.local_path(document.content_hash) as path:
+            yield path
+    else:
+        yield document.file_path
+
+def get_cached_extraction(db: Session, content_hash: str, document_type: str) -> Optional[Dict[str, Any]]:
+    """Look up a stored extraction for these bytes and type, counting the hit"""
+    entry = db.query(ExtractionCache).filter(
+        ExtractionCache.content_hash == content_hash,
+        ExtractionCache.document_type == document_type,
+        ExtractionCache.extractor_version == EXTRACTOR_VERSION
+    ).first()
+    if not entry:
+        return None
+
+    db.query(ExtractionCache).filter(ExtractionCache.id == entry.id).update(
+        {ExtractionCache.hits: ExtractionCache.hits + 1, ExtractionCache.last_hit_at: datetime.utcnow()},
+        synchronize_session=False
+    )
+    return {"extracted_data": entry.extracted_data, "confidence": entry.confidence}
+
+def store_extraction(db: Session, content_hash: str, document_type: str, extraction: Dict[str, Any]):
+    """Cache an extraction result (first writer wins when workers race)"""
+    if db.get_bind().dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+
+    db.execute(insert(ExtractionCache).values(
+        content_hash=content_hash,
+        document_type=document_type,
+        extractor_version=EXTRACTOR_VERSION,
+        extracted_data=extraction["extracted_data"],
+        confidence=extraction["confidence"],
+        hits=0
+    ).on_conflict_do_nothing(index_elements=['content_hash', 'document_type', 'extractor_version']))
+
+def extraction_cache_stats(db: Session) -> List[Dict[str, Any]]:
+    """Entries, hits and hit rate per extractor version
+
+    Every entry stands for one miss (the extraction that created it), so
+    hit rate = hits / (hits + entries).
+    """
+    rows = db.query(
+        ExtractionCache.extractor_version,
+        func.count(ExtractionCache.id),
+        func.coalesce(func.sum(ExtractionCache.hits), 0)
+    ).group_by(ExtractionCache.extractor_version).all()
+    return [
+        {
+            "extractor_version": version,
+            "current": version == EXTRACTOR_VERSION,
+            "entries": entries,
+            "hits": int(hits),
+            "misses": entries,
+            "hit_rate": round(int(hits) / (int(hits) + entries), 4) if entries else 0.0
+        }
+        for version, entries, hits in rows
+    ]
+
+def purge_stale_extractions(db: Session) -> int:
+    """Delete cached extractions made by other extractor versions"""
+    deleted = db.query(ExtractionCache).filter(
+        ExtractionCache.extractor_version != EXTRACTOR_VERSION
+    ).delete(synchronize_session=False)
+    db.commit()
+    return deleted
+
+def enqueue_document_processing(db: Session, document: Document) -> Job:
+    """Queue a document for background processing"""
+    document.status = DocumentStatus.PROCESSING
+    document.error_message = None
+    db.commit()
+    return create_job(db, document.owner_id, DOCUMENT_PROCESS_JOB, {"document_id": document.id})
+
+def enqueue_document_batch(db: Session, user_id: int, document_ids: List[int]) -> Job:
+    """Queue many documents as one batch job with a child job per document"""
+    for start in range(0, len(document_ids), 1000):
+        db.query(Document).filter(Document.id.in_(document_ids[start:start + 1000])).update(
+            {Document.status: DocumentStatus.PROCESSING, Document.error_message: None},
+            synchronize_session=False
+        )
+    return create_batch_job(
+        db, user_id, DOCUMENT_BATCH_JOB, DOCUMENT_PROCESS_JOB,
+        [{"document_id": document_id} for document_id in document_ids],
+        {"document_count": len(document_ids)}
+    )
+
+def mark_document_failed(db: Session, job: Job, error: str):
+    """Record a document's final processing failure"""
+    document = db.get(Document, job.payload["document_id"])
+    if document:
+        document.status = DocumentStatus.FAILED
+        document.error_message = error
+        db.commit()
+
+@job_handler(DOCUMENT_PROCESS_JOB, on_failure=mark_document_failed)
+def process_document_job(db: Session, job: Job) -> Dict[str, Any]:
+    """Queue handler: extract a document's data and mark it processed"""
+    document = db.get(Document, job.payload["document_id"])
+    if not document:
+        return {"skipped": "document deleted"}
+
+    # Identical bytes of the same type are only extracted once per extractor version
+    extraction = None
+    if document.content_hash:
+        extraction = get_cached_extraction(db, document.content_hash, document.type)
+    cache_hit = extraction is not None
+
+    if not cache_hit:
+        with document_file(document) as path:
+            # Pages/sheets fan out across the worker's process pool
+            extraction = extract_document(path, document.type)
+        if document.content_hash:
+            store_extraction(db, document.content_hash, document.type, extraction)
+
+    document.extracted_data = extraction["extracted_data"]
+    document.confidence = extraction["confidence"]
+    document.status = DocumentStatus.PROCESSED
+    document.processed_at = datetime.utcnow()
+    document.error_message = None
+    db.commit()
+
+    log_analytics(db, document.owner_id, "document_processed", 1.0, {"document_id": document.id, "cache_hit": cache_hit})
+    return {"document_id": document.id, "confidence": document.confidence, "cache_hit": cache_hit}
@@ -0,0 +1,231 @@
+import asyncio
+import json
+import os
+import queue
+import select
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Optional
+from database import engine
+
+# NOTIFY channel carrying execution events between processes (Postgres only)
+EXECUTION_EVENTS_CHANNEL = "workflow_execution_events"
+
+# Events buffered per subscriber; a slow client loses the oldest ones
+EXECUTION_EVENT_BUFFER = int(os.getenv("EXECUTION_EVENT_BUFFER", "256"))
+
+# Seconds between keepalives on an idle stream
+EXECUTION_EVENT_KEEPALIVE = 15.0
+
+# A step's per-call tokens events are merged and published at most this often
+EXECUTION_TOKENS_EVENT_INTERVAL = float(os.getenv("EXECUTION_TOKENS_EVENT_INTERVAL", "0.5"))
+
+FINISHED_EVENT = "execution_finished"
+
+def _uses_notify() -> bool:
+    return engine.dialect.name == 'postgresql'
+
+class Subscription:
+    """One client's bounded buffer of an execution's events
+
+    The buffer lives on the subscriber's event loop and is only touched
+    from it; publishers hand events over with call_soon_threadsafe.
+    """
+
+    def __init__(self, broker: "ExecutionEventBroker", execution_id: int, maxsize: int = EXECUTION_EVENT_BUFFER):
+        self.broker = broker
+        self.execution_id = execution_id
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self.dropped = 0
+
+    def offer(self, event: Dict[str, Any]):
+        """Buffer an event, dropping the oldest one when full"""
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+    async def events(self, keepalive: float = EXECUTION_EVENT_KEEPALIVE) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """Buffered events as they arrive, None after `keepalive` idle seconds
+
+        Ends after the execution's finished event. Lost events are
+        reported by an `events_dropped` event, after which a client should
+        refetch the execution for its current state.
+        """
+        while True:
+            try:
+                event = await asyncio.wait_for(self.queue.get(), keepalive)
+            except asyncio.TimeoutError:
+                yield None
+                continue
+            if self.dropped:
+                yield {"type": "events_dropped", "execution_id": self.execution_id, "count": self.dropped}
+                self.dropped = 0
+            yield event
+            if event["type"] == FINISHED_EVENT:
+                return
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+class ExecutionEventBroker:
+    """In-process pub/sub of execution events, fed by NOTIFY on Postgres"""
+
+    def __init__(self):
+        self.subscribers = defaultdict(set)
+        self.lock = threading.Lock()
+        self.listener: Optional[threading.Thread] = None
+
+    def subscribe(self, execution_id: int) -> Subscription:
+        """Start buffering an execution's events (call from the subscriber's event loop)"""
+        subscription = Subscription(self, execution_id)
+        with self.lock:
+            self.subscribers[execution_id].add(subscription)
+            if _uses_notify() and self.listener is None:
+                self.listener = threading.Thread(target=self._listen, name="execution-events", daemon=True)
+                self.listener.start()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self.lock:
+            subscribers = self.subscribers.get(subscription.execution_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self.subscribers[subscription.execution_id]
+
+    def dispatch(self, event: Dict[str, Any]):
+        """Hand an event to this process's subscribers of its execution"""
+        with self.lock:
+            subscribers = list(self.subscribers.get(event.get("execution_id"), ()))
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.offer, event)
+            except RuntimeError:
+                # The subscriber's loop is closed; it will not read again
+                self.unsubscribe(subscription)
+
+    def _listen(self):
+        """LISTEN for events published by any process and dispatch them locally"""
+        while True:
+            connection = None
+            try:
+                connection = engine.raw_connection()
+                dbapi_connection = connection.driver_connection
+                dbapi_connection.autocommit = True
+                with dbapi_connection.cursor() as cursor:
+                    cursor.execute(f"LISTEN {EXECUTION_EVENTS_CHANNEL}")
+                while True:
+                    if not select.select([dbapi_connection], [], [], 5.0)[0]:
+                        continue
+                    dbapi_connection.poll()
+                    while dbapi_connection.notifies:
+                        notify = dbapi_connection.notifies.pop(0)
+                        self.dispatch(json.loads(notify.payload))
+            except Exception as e:
+                print(f"Execution event listener error: {e}")
+                time.sleep(1.0)
+            finally:
+                if connection is not None:
+                    try:
+                        connection.invalidate()
+                    except Exception:
+                        pass
+
+broker = ExecutionEventBroker()
+
+class ExecutionEventPublisher:
+    """Publishes execution events in order from one background thread
+
+    On Postgres events go out as NOTIFY on a dedicated autocommit
+    connection, so publishing never commits, or waits on, a caller's
+    session; elsewhere they are dispatched to this process's broker.
+    `tokens` events of a step are merged and sent at most every
+    `interval` seconds; the step's step_finished event carries its final
+    count and supersedes them.
+    """
+
+    def __init__(self, interval: float = EXECUTION_TOKENS_EVENT_INTERVAL):
+        self.interval = interval
+        self.queue: queue.Queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.thread: Optional[threading.Thread] = None
+        self.connection = None
+
+    def publish(self, event: Dict[str, Any]):
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="execution-event-publisher", daemon=True)
+                self.thread.start()
+        self.queue.put(event)
+
+    def _run(self):
+        tokens: Dict[tuple, Dict[str, Any]] = {}
+        deadline = 0.0
+        while True:
+            try:
+                event = self.queue.get(timeout=max(0.0, deadline - time.monotonic()) if tokens else None)
+            except queue.Empty:
+                event = None
+
+            if event is not None and event["type"] == "tokens":
+                key = (event["execution_id"], event.get("step_id"))
+                if key in tokens:
+                    event = {**event, "tokens": tokens[key]["tokens"] + event["tokens"]}
+                elif not tokens:
+                    deadline = time.monotonic() + self.interval
+                tokens[key] = event
+            elif event is not None:
+                # Merged tokens of the execution go out first, except those the finished step supersedes
+                for key in [key for key in tokens if key[0] == event["execution_id"]]:
+                    merged = tokens.pop(key)
+                    if not (event["type"] == "step_finished" and key[1] == event.get("step_id")):
+                        self._send(merged)
+                self._send(event)
+
+            if tokens and time.monotonic() >= deadline:
+                for merged in tokens.values():
+                    self._send(merged)
+                tokens.clear()
+
+    def _send(self, event: Dict[str, Any]):
+        if not _uses_notify():
+            broker.dispatch(event)
+            return
+        payload = json.dumps(event, default=str)
+        for _ in range(2):
+            try:
+                if self.connection is None:
+                    self.connection = engine.raw_connection()
+                    self.connection.driver_connection.autocommit = True
+                with self.connection.driver_connection.cursor() as cursor:
+                    cursor.execute("SELECT pg_notify(%s, %s)", (EXECUTION_EVENTS_CHANNEL, payload))
+                return
+            except Exception as e:
+                print(f"Execution event publish error: {e}")
+                try:
+                    self.connection.invalidate()
+                except Exception:
+                    pass
+                self.connection = None
+
+publisher = ExecutionEventPublisher()
+
+def publish_execution_event(execution_id: int, event_type: str, fields: Optional[Dict[str, Any]] = None):
+    """Publish an execution event to subscribers in every process
+
+    Returns right away: the event is sent by the publisher thread (see
+    ExecutionEventPublisher), in publishing order.
+    """
+    event = {"type": event_type, "execution_id": execution_id, "at": datetime.utcnow().isoformat(), **(fields or {})}
+    if event.get("error"):
+        # NOTIFY payloads are limited to 8000 bytes
+        event["error"] = str(event["error"])[:1000]
+    publisher.publish(event)
+
+def sse_message(event: Dict[str, Any]) -> str:
+    """Format an event as a server-sent events message"""
+    return f"event: {event['type']}\ndata: {json.dumps(event, default=str, ensure_ascii=False)}\n\n"
@@ -0,0 +1,251 @@
+import base64
+import gzip
+import hashlib
+import json
+import os
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import and_, case, func, null, or_, select
+from sqlalchemy.orm import Session, load_only
+from models import Job, Workflow, WorkflowExecution, WorkflowStepCheckpoint
+from jobs import complete_job, create_job, fail_job, start_job, update_job_progress
+from storage import INCOMING_DIR, acquire_blob, archive_key, get_blob_store, hold_blobs, release_blob
+from workflow_engine import EXECUTION_FINISHED
+
+EXECUTION_COMPACTION_JOB = "execution_compaction"
+
+# Finished executions older than this have their input/output moved to cold storage
+EXECUTION_RETENTION_DAYS = int(os.getenv("EXECUTION_RETENTION_DAYS", "30"))
+EXECUTION_COMPACTION_BATCH_SIZE = 500
+
+# Columns of an execution listing; input/output blobs are left out
+EXECUTION_SUMMARY_COLUMNS = [
+    WorkflowExecution.id, WorkflowExecution.workflow_id, WorkflowExecution.status,
+    WorkflowExecution.started_at, WorkflowExecution.completed_at, WorkflowExecution.duration,
+    WorkflowExecution.tokens_used, WorkflowExecution.ai_model_used, WorkflowExecution.error_message,
+    WorkflowExecution.cache_hits, WorkflowExecution.cache_misses, WorkflowExecution.archived_at
+]
+
+def encode_execution_cursor(started_at: datetime, execution_id: int) -> str:
+    """Encode the position of the last listed execution as an opaque cursor"""
+    raw = json.dumps([started_at.isoformat(), execution_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+def decode_execution_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Decode a cursor produced by encode_execution_cursor"""
+    try:
+        started_at, execution_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(started_at), int(execution_id)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid execution cursor")
+
+def list_executions(
+    db: Session,
+    workflow_id: int,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    status: Optional[str] = None
+) -> Tuple[List[WorkflowExecution], Optional[str]]:
+    """A page of a workflow's executions, newest first, and the cursor of the next page
+
+    Pages are keyset-paginated on (started_at, id), which the
+    (workflow_id, started_at, id) index serves directly at any depth.
+    """
+    query = db.query(WorkflowExecution).options(load_only(*EXECUTION_SUMMARY_COLUMNS)).filter(
+        WorkflowExecution.workflow_id == workflow_id
+    )
+    if status:
+        query = query.filter(WorkflowExecution.status == status)
+    if cursor:
+        started_at, execution_id = decode_execution_cursor(cursor)
+        query = query.filter(or_(
+            WorkflowExecution.started_at < started_at,
+            and_(WorkflowExecution.started_at == started_at, WorkflowExecution.id < execution_id)
+        ))
+    rows = query.order_by(WorkflowExecution.started_at.desc(), WorkflowExecution.id.desc()).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_execution_cursor(rows[-1].started_at, rows[-1].id)
+    return rows, next_cursor
+
+def recent_executions(db: Session, owner_id: int, limit: int = 5) -> List[WorkflowExecution]:
+    """Latest executions across a user's workflows"""
+    return db.query(WorkflowExecution).options(load_only(*EXECUTION_SUMMARY_COLUMNS)).join(Workflow).filter(
+        Workflow.owner_id == owner_id
+    ).order_by(WorkflowExecution.started_at.desc(), WorkflowExecution.id.desc()).limit(limit).all()
+
+def _duration_percentiles(db: Session, conditions: list, quantiles: Tuple[float, ...]) -> List[Optional[float]]:
+    """Duration percentiles of the matching finished executions, computed by the database"""
+    conditions = conditions + [WorkflowExecution.duration.isnot(None)]
+    if db.get_bind().dialect.name == 'postgresql':
+        row = db.query(*[
+            func.percentile_cont(q).within_group(WorkflowExecution.duration.asc()) for q in quantiles
+        ]).filter(*conditions).one()
+        return [round(value, 4) if value is not None else None for value in row]
+
+    # No percentile aggregate elsewhere: nearest rank, read through ORDER BY ... OFFSET
+    count = db.query(func.count(WorkflowExecution.id)).filter(*conditions).scalar()
+    values = []
+    for q in quantiles:
+        if not count:
+            values.append(None)
+            continue
+        value = db.query(WorkflowExecution.duration).filter(*conditions).order_by(
+            WorkflowExecution.duration
+        ).offset(int(q * (count - 1))).limit(1).scalar()
+        values.append(round(value, 4))
+    return values
+
+def execution_stats(
+    db: Session,
+    workflow_id: Optional[int] = None,
+    owner_id: Optional[int] = None,
+    since: Optional[datetime] = None
+) -> Dict[str, Any]:
+    """Counts, success rate, duration percentiles and tokens of executions, aggregated in SQL"""
+    conditions = []
+    if workflow_id is not None:
+        conditions.append(WorkflowExecution.workflow_id == workflow_id)
+    if owner_id is not None:
+        conditions.append(WorkflowExecution.workflow_id.in_(select(Workflow.id).where(Workflow.owner_id == owner_id)))
+    if since is not None:
+        conditions.append(WorkflowExecution.started_at >= since)
+
+    total, completed, failed, tokens, cache_hits = db.query(
+        func.count(WorkflowExecution.id),
+        func.sum(case((WorkflowExecution.status == "completed", 1), else_=0)),
+        func.sum(case((WorkflowExecution.status == "failed", 1), else_=0)),
+        func.coalesce(func.sum(WorkflowExecution.tokens_used), 0),
+        func.coalesce(func.sum(WorkflowExecution.cache_hits), 0)
+    ).filter(*conditions).one()
+    completed, failed = int(completed or 0), int(failed or 0)
+
+    finished = conditions + [WorkflowExecution.status.in_(EXECUTION_FINISHED)]
+    p50, p95 = _duration_percentiles(db, finished, (0.5, 0.95))
+    return {
+        "executions": total,
+        "completed": completed,
+        "failed": failed,
+        "in_progress": total - completed - failed,
+        "success_rate": round(100.0 * completed / (completed + failed), 1) if completed + failed else 0.0,
+        "duration_p50_seconds": p50,
+        "duration_p95_seconds": p95,
+        "tokens_used": int(tokens),
+        "avg_tokens": round(int(tokens) / total, 1) if total else 0.0,
+        "cache_hits": int(cache_hits)
+    }
+
+def archive_execution_data(db: Session, rows: List[Tuple[int, Any, Any]]) -> Dict[int, str]:
+    """Store executions' input/output as gzipped JSON in the blob store, returning keys by execution id
+
+    `rows` are (execution id, input_data, output_data). Like store_upload,
+    the bytes are put first (hold_blobs commits) so no blob row is locked
+    during the transfer; each archive then takes a reference on its blob
+    row (not committed here). delete_workflow_executions releases it and
+    collect_blob_garbage removes archives nothing references.
+    """
+    archives = {}
+    for execution_id, input_data, output_data in rows:
+        data = gzip.compress(json.dumps(
+            {"input_data": input_data, "output_data": output_data}, default=str, ensure_ascii=False
+        ).encode("utf-8"))
+        archives[execution_id] = (hashlib.sha256(data).hexdigest(), data)
+
+    hold_blobs(db, {sha256 for sha256, _ in archives.values()})
+    store = get_blob_store()
+    os.makedirs(INCOMING_DIR, exist_ok=True)
+    for sha256, data in archives.values():
+        path = os.path.join(INCOMING_DIR, f"{uuid.uuid4()}.json.gz")
+        with open(path, "wb") as f:
+            f.write(data)
+        # Identical data shares one blob; put_file consumes the local copy either way
+        store.put_file(archive_key(sha256), path)
+    for sha256, data in archives.values():
+        acquire_blob(db, sha256, len(data), "application/gzip")
+    return {execution_id: archive_key(sha256) for execution_id, (sha256, _) in archives.items()}
+
+def load_execution_data(execution: WorkflowExecution) -> Tuple[Any, Any]:
+    """Input and output data of an execution, read back from cold storage if compacted"""
+    if not execution.archive_key:
+        return execution.input_data, execution.output_data
+    with get_blob_store().open(execution.archive_key) as f:
+        data = json.loads(gzip.decompress(f.read()))
+    return data.get("input_data"), data.get("output_data")
+
+def compact_executions(
+    db: Session,
+    older_than: timedelta = timedelta(days=EXECUTION_RETENTION_DAYS),
+    batch_size: int = EXECUTION_COMPACTION_BATCH_SIZE
+) -> Job:
+    """Move input/output data of old finished executions to compressed cold storage
+
+    Rows keep their summary columns, so listings and stats are unchanged;
+    step checkpoints, only needed while an execution runs, are deleted.
+    """
+    cutoff = datetime.utcnow() - older_than
+    job = create_job(db, None, EXECUTION_COMPACTION_JOB, {"cutoff": cutoff.isoformat()})
+    start_job(db, job)
+
+    try:
+        last_id = 0
+        compacted = 0
+        while True:
+            rows = db.query(
+                WorkflowExecution.id, WorkflowExecution.input_data, WorkflowExecution.output_data
+            ).filter(
+                WorkflowExecution.status.in_(EXECUTION_FINISHED),
+                WorkflowExecution.completed_at < cutoff,
+                WorkflowExecution.archive_key.is_(None),
+                WorkflowExecution.id > last_id
+            ).order_by(WorkflowExecution.id).limit(batch_size).all()
+
+            if not rows:
+                break
+
+            keys = archive_execution_data(db, rows)
+            now = datetime.utcnow()
+            for execution_id, key in keys.items():
+                db.query(WorkflowExecution).filter(WorkflowExecution.id == execution_id).update({
+                    WorkflowExecution.input_data: null(),
+                    WorkflowExecution.output_data: null(),
+                    WorkflowExecution.archive_key: key,
+                    WorkflowExecution.archived_at: now
+                }, synchronize_session=False)
+            ids = [row.id for row in rows]
+            db.query(WorkflowStepCheckpoint).filter(
+                WorkflowStepCheckpoint.execution_id.in_(ids)
+            ).delete(synchronize_session=False)
+            compacted += len(rows)
+            last_id = ids[-1]
+            # Commits the batch together with its progress
+            update_job_progress(db, job, compacted)
+
+        complete_job(db, job, {"compacted": compacted})
+    except Exception as e:
+        db.rollback()
+        fail_job(db, job, str(e))
+        raise
+
+    return job
+
+def delete_workflow_executions(db: Session, workflow_id: int) -> int:
+    """Delete a workflow's executions and step checkpoints, releasing their archived data
+
+    Nothing is committed, so the caller can delete the workflow in the
+    same transaction.
+    """
+    for (key,) in db.query(WorkflowExecution.archive_key).filter(
+        WorkflowExecution.workflow_id == workflow_id,
+        WorkflowExecution.archive_key.isnot(None)
+    ).all():
+        release_blob(db, key.split(".", 1)[0])
+    execution_ids = select(WorkflowExecution.id).where(WorkflowExecution.workflow_id == workflow_id)
+    db.query(WorkflowStepCheckpoint).filter(
+        WorkflowStepCheckpoint.execution_id.in_(execution_ids)
+    ).delete(synchronize_session=False)
+    return db.query(WorkflowExecution).filter(
+        WorkflowExecution.workflow_id == workflow_id
+    ).delete(synchronize_session=False)
@@ -0,0 +1,350 @@
+import bisect
+import mmap
+import os
+import re
+import zlib
+import zipfile
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from xml.etree.ElementTree import iterparse
+from utils import analyze_document_content, calculate_confidence_score
+from worker import map_cpu_bound
+
+# Pages (or sheets) handed to one worker process at a time
+PAGES_PER_TASK = 20
+
+# Cap on list-valued fields merged into extracted_data
+MAX_EXTRACTED_VALUES = 50
+
+# Spreadsheet cells analyzed at a time, so a sheet's text is never held whole
+XLSX_CELLS_PER_BATCH = 10000
+
+PDF_MIME_TYPE = 'application/pdf'
+XLSX_MIME_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+_OBJECT_RE = re.compile(rb"(\d+)\s+(\d+)\s+obj\b")
+_REFERENCE_RE = re.compile(rb"(\d+)\s+\d+\s+R")
+_PDF_STRING_RE = re.compile(rb"\((?:[^()\\]|\\.)*\)|<[0-9A-Fa-f\s]*>", re.DOTALL)
+_PDF_ESCAPE_RE = re.compile(rb"\\([nrtbf()\\]|[0-7]{1,3})")
+_PDF_ESCAPES = {b"n": b"\n", b"r": b"\r", b"t": b"\t", b"b": b"\b", b"f": b"\f"}
+
+_AMOUNT_RE = re.compile(r"(\d{1,3}(?:[ .,]\d{3})*[.,]\d{2})\s?(?:€|EUR|\$|USD)")
+_DATE_RE = re.compile(r"\b(\d{4}-\d{2}-\d{2}|\d{2}/\d{2}/\d{4})\b")
+_EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+")
+
+@contextmanager
+def mapped_file(path: str) -> Iterator[Optional[mmap.mmap]]:
+    """Memory-map a file read-only (None for empty files)"""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield None
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            yield mm
+
+def _object_offsets(mm: mmap.mmap) -> Dict[int, int]:
+    """Byte offset of every 'N 0 obj' header, scanning the mapping in place"""
+    return {int(match.group(1)): match.end() for match in _OBJECT_RE.finditer(mm)}
+
+def _object_body(mm: mmap.mmap, offset: int) -> bytes:
+    """Bytes of one PDF object, up to its endobj"""
+    end = mm.find(b"endobj", offset)
+    return mm[offset:end if end != -1 else len(mm)]
+
+def _dictionary_value(body: bytes, key: bytes) -> Optional[bytes]:
+    """Raw value following a key in a PDF dictionary (up to the next key)"""
+    match = re.search(rb"/" + key + rb"\s*(\[[^\]]*\]|[^/>]+)", body)
+    return match.group(1) if match else None
+
+def _object_stream_members(mm: mmap.mmap, offsets: Dict[int, int]) -> Dict[int, bytes]:
+    """Bodies of the objects packed into compressed object streams (/Type /ObjStm)
+
+    PDF 1.5+ writers usually store page and catalog dictionaries this way.
+    Streams themselves (page contents) are never packed, so their offsets
+    stay in `offsets`.
+    """
+    members = {}
+    starts = sorted(offsets.values())
+    for match in re.finditer(rb"/Type\s*/ObjStm\b", mm):
+        # The object whose header precedes the match holds it
+        index = bisect.bisect_right(starts, match.start()) - 1
+        if index < 0:
+            continue
+        obj = _object_body(mm, starts[index])
+        if match.start() >= starts[index] + len(obj):
+            continue
+        count = re.search(rb"/N\s+(\d+)", obj)
+        first = re.search(rb"/First\s+(\d+)", obj)
+        if not count or not first:
+            continue
+        data = _stream_data(obj)
+        first = int(first.group(1))
+        numbers = [int(value) for value in data[:first].split()[:2 * int(count.group(1))]]
+        pairs = list(zip(numbers[0::2], numbers[1::2]))
+        for position, (number, offset) in enumerate(pairs):
+            end = first + pairs[position + 1][1] if position + 1 < len(pairs) else len(data)
+            members.setdefault(number, data[first + offset:end])
+    return members
+
+def plan_pdf_pages(mm: mmap.mmap) -> List[List[int]]:
+    """Content stream offsets of each page, in page order
+
+    Follows the catalog's /Pages tree; falls back to file order of /Page
+    objects for files without a readable catalog. Dictionaries packed in
+    object streams are read from their decoded streams. Cross-reference
+    streams are not consulted: objects are located by scanning for their
+    'N 0 obj' headers.
+    """
+    offsets = _object_offsets(mm)
+    members = _object_stream_members(mm, offsets) if mm.find(b"/ObjStm") != -1 else {}
+    bodies = {}
+
+    def body(number: int) -> bytes:
+        if number not in bodies:
+            bodies[number] = _object_body(mm, offsets[number]) if number in offsets else members.get(number, b"")
+        return bodies[number]
+
+    def content_offsets(page: bytes) -> List[int]:
+        contents = _dictionary_value(page, b"Contents") or b""
+        return [offsets[int(ref)] for ref in _REFERENCE_RE.findall(contents) if int(ref) in offsets]
+
+    pages = []
+
+    def walk(number: int, depth: int = 0):
+        node = body(number)
+        if depth > 32:
+            return
+        if re.search(rb"/Type\s*/Pages\b", node):
+            for kid in _REFERENCE_RE.findall(_dictionary_value(node, b"Kids") or b""):
+                walk(int(kid), depth + 1)
+        elif re.search(rb"/Type\s*/Page\b", node):
+            pages.append(content_offsets(node))
+
+    catalog = re.search(rb"/Type\s*/Catalog\b", mm)
+    if catalog:
+        root = _dictionary_value(mm[catalog.start():mm.find(b"endobj", catalog.start())], b"Pages") or b""
+    else:
+        root = next((
+            _dictionary_value(member, b"Pages") or b"" for member in members.values()
+            if re.search(rb"/Type\s*/Catalog\b", member)
+        ), b"")
+    refs = _REFERENCE_RE.findall(root)
+    if refs:
+        walk(int(refs[0]))
+    if not pages:
+        numbers = sorted(offsets, key=offsets.get) + sorted(set(members) - set(offsets))
+        for number in numbers:
+            node = body(number)
+            if re.search(rb"/Type\s*/Page\b", node):
+                pages.append(content_offsets(node))
+    return pages
+
+def _stream_data(obj: bytes) -> bytes:
+    """Decoded data of a PDF stream object (Flate or uncompressed)"""
+    start = obj.find(b"stream")
+    if start == -1:
+        return b""
+    start += len(b"stream")
+    if obj[start:start + 2] == b"\r\n":
+        start += 2
+    elif obj[start:start + 1] in (b"\n", b"\r"):
+        start += 1
+    end = obj.rfind(b"endstream")
+    data = obj[start:end if end != -1 else len(obj)]
+    if b"/FlateDecode" in obj[:start]:
+        try:
+            data = zlib.decompress(data)
+        except zlib.error:
+            return b""
+    return data
+
+def _unescape_pdf_string(value: bytes) -> bytes:
+    """Resolve backslash escapes in a PDF literal string"""
+    def replace(match):
+        escape = match.group(1)
+        if escape[:1].isdigit():
+            return bytes([int(escape, 8) & 0xFF])
+        return _PDF_ESCAPES.get(escape, escape)
+    return _PDF_ESCAPE_RE.sub(replace, value)
+
+def _decode_pdf_string(operand: bytes) -> bytes:
+    """Bytes of a literal (...) or hex <...> string operand"""
+    if operand[:1] == b"<":
+        digits = re.sub(rb"\s", b"", operand[1:-1])
+        return bytes.fromhex((digits + b"0" * (len(digits) % 2)).decode("ascii"))
+    return _unescape_pdf_string(operand[1:-1])
+
+def page_text(content: bytes) -> str:
+    """Text shown by a page content stream's string operands
+
+    Strings are read as single-byte text: two-byte strings of CID
+    (Type0) fonts are not mapped through the font's ToUnicode table,
+    so scanned or CJK documents yield little usable text.
+    """
+    return " ".join(
+        _decode_pdf_string(match).decode("latin-1")
+        for match in _PDF_STRING_RE.findall(content)
+    )
+
+def analyze_text(text: str) -> Dict[str, Any]:
+    """Words, amounts, dates and emails found in a page or sheet's text
+
+    Lists are capped at MAX_EXTRACTED_VALUES (dates and emails keep the
+    first distinct values in sorted order), so merging parts gives the same
+    result as analyzing their text at once; `total_amount` covers every amount.
+    """
+    amounts = [
+        float(amount.replace(" ", "").replace(".", "").replace(",", ".")) if "," in amount[-3:]
+        else float(amount.replace(" ", "").replace(",", ""))
+        for amount in _AMOUNT_RE.findall(text)
+    ]
+    return {
+        "words": len(text.split()),
+        "amounts": amounts[:MAX_EXTRACTED_VALUES],
+        "total_amount": sum(amounts),
+        "dates": sorted(set(_DATE_RE.findall(text)))[:MAX_EXTRACTED_VALUES],
+        "emails": sorted(set(_EMAIL_RE.findall(text)))[:MAX_EXTRACTED_VALUES],
+        "preview": text[:500]
+    }
+
+def combine_analyses(first: Dict[str, Any], second: Dict[str, Any]) -> Dict[str, Any]:
+    """Fold the analysis of following text into an earlier one, keeping lists capped"""
+    return {
+        "words": first["words"] + second["words"],
+        "amounts": (first["amounts"] + second["amounts"])[:MAX_EXTRACTED_VALUES],
+        "total_amount": first["total_amount"] + second["total_amount"],
+        "dates": sorted(set(first["dates"]) | set(second["dates"]))[:MAX_EXTRACTED_VALUES],
+        "emails": sorted(set(first["emails"]) | set(second["emails"]))[:MAX_EXTRACTED_VALUES],
+        "preview": first["preview"]
+    }
+
+def extract_pdf_pages(path: str, pages: List[Tuple[int, List[int]]]) -> List[Dict[str, Any]]:
+    """Extract a run of PDF pages (runs in a worker process, mapping the file itself)"""
+    results = []
+    with mapped_file(path) as mm:
+        for page_number, content_offsets in pages:
+            text = " ".join(page_text(_stream_data(_object_body(mm, offset))) for offset in content_offsets)
+            results.append({"page": page_number, **analyze_text(text)})
+    return results
+
+def plan_xlsx_sheets(path: str) -> List[str]:
+    """Worksheet entries of an XLSX archive (read through the zip's central directory)"""
+    with zipfile.ZipFile(path) as archive:
+        return sorted(
+            (name for name in archive.namelist() if re.match(r"xl/worksheets/sheet\d+\.xml$", name)),
+            key=lambda name: int(re.search(r"(\d+)\.xml$", name).group(1))
+        )
+
+def extract_xlsx_sheets(path: str, sheets: List[Tuple[int, str]]) -> List[Dict[str, Any]]:
+    """Extract worksheets of an XLSX file (runs in a worker process)
+
+    Text cells are analyzed XLSX_CELLS_PER_BATCH at a time and folded into
+    the sheet's analysis, so memory does not grow with the sheet.
+    """
+    results = []
+    with zipfile.ZipFile(path) as archive:
+        shared = _shared_strings(archive)
+        for sheet_number, name in sheets:
+            rows = 0
+            numeric_total = 0.0
+            values = []
+            analysis = None
+            with archive.open(name) as sheet:
+                for _, element in iterparse(sheet):
+                    if len(values) >= XLSX_CELLS_PER_BATCH:
+                        batch = analyze_text(" ".join(values))
+                        analysis = combine_analyses(analysis, batch) if analysis else batch
+                        values = []
+                    tag = element.tag.rsplit("}", 1)[-1]
+                    if tag == "row":
+                        rows += 1
+                        element.clear()
+                    elif tag == "c":
+                        cell_type = element.get("t")
+                        if cell_type == "inlineStr":
+                            values.append("".join(t.text or "" for t in element.iter() if t.tag.endswith("}t")))
+                            continue
+                        value = next((child.text for child in element if child.tag.endswith("}v")), None)
+                        if value is None:
+                            continue
+                        if cell_type == "s":
+                            values.append(shared[int(value)] if int(value) < len(shared) else "")
+                        elif cell_type in (None, "n"):
+                            numeric_total += float(value)
+                        else:
+                            values.append(value)
+            if values or not analysis:
+                batch = analyze_text(" ".join(values))
+                analysis = combine_analyses(analysis, batch) if analysis else batch
+            results.append({"sheet": sheet_number, "rows": rows, "numeric_total": round(numeric_total, 2), **analysis})
+    return results
+
+def _shared_strings(archive: zipfile.ZipFile) -> List[str]:
+    """The workbook's shared string table"""
+    if "xl/sharedStrings.xml" not in archive.namelist():
+        return []
+    strings = []
+    with archive.open("xl/sharedStrings.xml") as table:
+        for _, element in iterparse(table):
+            if element.tag.endswith("}si"):
+                strings.append("".join(text.text or "" for text in element.iter() if text.tag.endswith("}t")))
+                element.clear()
+    return strings
+
+def _tasks(items: List[Any]) -> List[List[Tuple[int, Any]]]:
+    """Number items from 1 and group them into PAGES_PER_TASK runs"""
+    numbered = list(enumerate(items, start=1))
+    return [numbered[i:i + PAGES_PER_TASK] for i in range(0, len(numbered), PAGES_PER_TASK)]
+
+def merge_parts(parts: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Merge per-page or per-sheet results into document-level fields"""
+    amounts = [amount for part in parts for amount in part["amounts"]]
+    return {
+        "words": sum(part["words"] for part in parts),
+        "amounts": amounts[:MAX_EXTRACTED_VALUES],
+        "total_amount": round(sum(part["total_amount"] for part in parts), 2),
+        "dates": sorted({date for part in parts for date in part["dates"]})[:MAX_EXTRACTED_VALUES],
+        "emails": sorted({email for part in parts for email in part["emails"]})[:MAX_EXTRACTED_VALUES]
+    }
+
+def extract_document(file_path: Optional[str], document_type: str) -> Dict[str, Any]:
+    """Extract a document's data, fanning pages or sheets out across the CPU pool
+
+    Files are never read whole into Python bytes: PDFs are memory-mapped,
+    planning scans the mapping for page boundaries and each worker process
+    maps the file again to extract its run of pages; XLSX sheets are
+    streamed out of the archive one member at a time.
+    """
+    parts = []
+    extracted_data = {}
+    if file_path and os.path.exists(file_path):
+        with mapped_file(file_path) as mm:
+            if mm is None:
+                plan = []
+            elif document_type == PDF_MIME_TYPE:
+                plan = plan_pdf_pages(mm)
+            elif document_type == XLSX_MIME_TYPE:
+                plan = plan_xlsx_sheets(file_path)
+            else:
+                plan = []
+
+        if plan:
+            worker_fn = extract_pdf_pages if document_type == PDF_MIME_TYPE else extract_xlsx_sheets
+            for task_parts in map_cpu_bound(worker_fn, [(file_path, task) for task in _tasks(plan)]):
+                parts.extend(task_parts)
+            if document_type == PDF_MIME_TYPE:
+                extracted_data = {"pages": len(parts), **merge_parts(parts)}
+            else:
+                extracted_data = {
+                    "sheets": len(parts),
+                    "rows": sum(part["rows"] for part in parts),
+                    "numeric_total": round(sum(part["numeric_total"] for part in parts), 2),
+                    **merge_parts(parts)
+                }
+
+    preview = " ".join(part["preview"] for part in parts[:3])
+    extracted_data.update(analyze_document_content(preview, document_type))
+    return {
+        "extracted_data": extracted_data,
+        "confidence": calculate_confidence_score(extracted_data)
+    }
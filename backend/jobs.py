@@ -0,0 +1,648 @@
+import os
+import random
+import threading
+from collections import defaultdict, deque
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+import numpy as np
+from sqlalchemy import and_, case, func, insert, select, update
+from sqlalchemy.orm import Session, aliased
+from models import Job, JobStatus
+from quotas import TenantPolicy, tenant_policies
+
+# Retry policy: exponential backoff with jitter, capped
+JOB_MAX_ATTEMPTS = 3
+JOB_RETRY_BASE_DELAY = 5
+JOB_RETRY_MAX_DELAY = 15 * 60
+
+# Running jobs whose worker stopped heartbeating for this long are requeued
+JOB_LEASE_TIMEOUT = timedelta(seconds=int(os.getenv("JOB_LEASE_SECONDS", "300")))
+JOB_HEARTBEAT_INTERVAL = JOB_LEASE_TIMEOUT.total_seconds() / 5
+
+# Queue handlers: job type -> fn(db, job) returning the job result
+JOB_HANDLERS: Dict[str, Callable[[Session, Job], Optional[Dict[str, Any]]]] = {}
+# Called once a job has failed for good: fn(db, job, error)
+JOB_FAILURE_HANDLERS: Dict[str, Callable[[Session, Job, str], None]] = {}
+# Job types whose running jobs count against their owner's execution concurrency quota
+JOB_QUOTA_TYPES = set()
+
+# Claims retried when the chosen tenant's job was taken by another worker
+JOB_CLAIM_ATTEMPTS = 5
+# Advisory lock namespace serializing a tenant's quota checks (Postgres)
+JOB_QUOTA_LOCK = 4903
+
+def job_handler(
+    job_type: str,
+    on_failure: Optional[Callable[[Session, Job, str], None]] = None,
+    quota: bool = False
+):
+    """Register a function as the queue handler for a job type"""
+    def register(fn):
+        JOB_HANDLERS[job_type] = fn
+        if on_failure:
+            JOB_FAILURE_HANDLERS[job_type] = on_failure
+        if quota:
+            JOB_QUOTA_TYPES.add(job_type)
+        return fn
+    return register
+
+def create_job(
+    db: Session,
+    user_id: Optional[int],
+    job_type: str,
+    payload: Optional[Dict[str, Any]] = None,
+    total: Optional[int] = None,
+    max_attempts: int = JOB_MAX_ATTEMPTS,
+    key: Optional[str] = None
+) -> Job:
+    """Create a queued background job"""
+    job = Job(
+        user_id=user_id,
+        type=job_type,
+        key=key,
+        status=JobStatus.QUEUED,
+        payload=payload or {},
+        total=total,
+        max_attempts=max_attempts,
+        run_at=datetime.utcnow()
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+def create_job_once(
+    db: Session,
+    user_id: Optional[int],
+    job_type: str,
+    key: str,
+    payload: Optional[Dict[str, Any]] = None,
+    max_attempts: int = JOB_MAX_ATTEMPTS
+) -> Job:
+    """Queue a job for `key` unless one is already queued or running, returning whichever exists
+
+    INSERT ... ON CONFLICT DO NOTHING against the partial unique index on
+    active (type, key), then a re-select: concurrent callers cannot both
+    insert, and all of them get the same job back.
+    """
+    if db.get_bind().dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as upsert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as upsert
+
+    active = and_(Job.key.isnot(None), Job.status.in_([JobStatus.QUEUED, JobStatus.RUNNING]))
+    db.execute(upsert(Job).values(
+        user_id=user_id,
+        type=job_type,
+        key=key,
+        status=JobStatus.QUEUED,
+        payload=payload or {},
+        progress=0,
+        attempts=0,
+        max_attempts=max_attempts,
+        run_at=datetime.utcnow()
+    ).on_conflict_do_nothing(index_elements=["type", "key"], index_where=active))
+    db.commit()
+    return db.query(Job).filter(Job.type == job_type, Job.key == key, active).order_by(Job.id.desc()).first()
+
+def start_job(db: Session, job: Job):
+    """Mark a job as running"""
+    job.status = JobStatus.RUNNING
+    job.started_at = datetime.utcnow()
+    job.attempts = (job.attempts or 0) + 1
+    db.commit()
+
+def update_job_progress(db: Session, job: Job, progress: int, total: Optional[int] = None):
+    """Record how many units of work a running job has finished"""
+    job.progress = progress
+    if total is not None:
+        job.total = total
+    if job.locked_by:
+        job.locked_at = datetime.utcnow()
+    db.commit()
+
+def heartbeat_job(db: Session, job_id: int, worker_id: str) -> bool:
+    """Extend a running job's lease; False if the worker no longer holds it"""
+    extended = db.query(Job).filter(
+        Job.id == job_id,
+        Job.status == JobStatus.RUNNING,
+        Job.locked_by == worker_id
+    ).update({Job.locked_at: datetime.utcnow()}, synchronize_session=False)
+    db.commit()
+    return bool(extended)
+
+def _finish_job(db: Session, job: Job, worker_id: Optional[str], values: Dict[Any, Any]) -> bool:
+    """Move a job out of running, only while `worker_id` still holds its lease
+
+    A single conditional UPDATE, so a worker whose lease expired and whose
+    job was requeued (and maybe claimed again) cannot overwrite the new
+    attempt's state or count the job twice towards its batch. Jobs run
+    outside the queue (worker_id None) are finished unconditionally.
+    """
+    parent_id = job.parent_id
+    db.flush()
+    query = db.query(Job).filter(Job.id == job.id, Job.status == JobStatus.RUNNING)
+    if worker_id is not None:
+        query = query.filter(Job.locked_by == worker_id)
+    finished = query.update({**values, Job.locked_by: None}, synchronize_session=False)
+    if finished and parent_id:
+        _advance_batch_job(db, parent_id)
+    db.commit()
+    return bool(finished)
+
+def complete_job(db: Session, job: Job, result: Optional[Dict[str, Any]] = None, worker_id: Optional[str] = None) -> bool:
+    """Mark a job as completed with its result; False if the worker lost the job"""
+    return _finish_job(db, job, worker_id, {
+        Job.status: JobStatus.COMPLETED,
+        Job.result: result or {},
+        Job.completed_at: datetime.utcnow()
+    })
+
+def fail_job(db: Session, job: Job, error: str, worker_id: Optional[str] = None) -> bool:
+    """Mark a job as failed; False if the worker lost the job"""
+    return _finish_job(db, job, worker_id, {
+        Job.status: JobStatus.FAILED,
+        Job.error_message: error,
+        Job.completed_at: datetime.utcnow()
+    })
+
+def create_batch_job(
+    db: Session,
+    user_id: Optional[int],
+    batch_type: str,
+    child_type: str,
+    child_payloads: List[Dict[str, Any]],
+    payload: Optional[Dict[str, Any]] = None
+) -> Job:
+    """Create a batch job fanning out into one queued child job per payload
+
+    The batch itself is never claimed: it runs while its children are
+    processed by any number of workers, and completes with a summary once
+    the last child finishes. Children are inserted in bulk, in the same
+    transaction as the batch.
+    """
+    now = datetime.utcnow()
+    batch = Job(
+        user_id=user_id,
+        type=batch_type,
+        status=JobStatus.RUNNING,
+        payload=payload or {},
+        progress=0,
+        total=len(child_payloads),
+        attempts=1,
+        run_at=now,
+        started_at=now
+    )
+    db.add(batch)
+    db.flush()
+    if child_payloads:
+        db.execute(insert(Job), [
+            {
+                "user_id": user_id,
+                "parent_id": batch.id,
+                "type": child_type,
+                "status": JobStatus.QUEUED,
+                "payload": child_payload,
+                "progress": 0,
+                "attempts": 0,
+                "max_attempts": JOB_MAX_ATTEMPTS,
+                "run_at": now
+            }
+            for child_payload in child_payloads
+        ])
+    db.commit()
+    db.refresh(batch)
+    return batch
+
+def _advance_batch_job(db: Session, batch_id: int):
+    """Count a finished child towards its batch, completing the batch after the last one"""
+    db.flush()
+    progress, total = db.execute(
+        update(Job).where(Job.id == batch_id).values(progress=Job.progress + 1).returning(Job.progress, Job.total)
+    ).one()
+    if progress < total:
+        return
+
+    counts = dict(db.query(Job.status, func.count(Job.id)).filter(Job.parent_id == batch_id).group_by(Job.status).all())
+    batch = db.get(Job, batch_id)
+    now = datetime.utcnow()
+    elapsed = max((now - batch.started_at).total_seconds(), 1e-6)
+    batch.status = JobStatus.COMPLETED
+    batch.completed_at = now
+    batch.result = {
+        "total": total,
+        "completed": counts.get(JobStatus.COMPLETED, 0),
+        "failed": counts.get(JobStatus.FAILED, 0),
+        "elapsed_seconds": round(elapsed, 3),
+        "per_second": round(total / elapsed, 2)
+    }
+
+def latest_job_for_key(db: Session, job_type: str, key: str) -> Optional[Job]:
+    """Most recent job of a type doing the work identified by key"""
+    return db.query(Job).filter(Job.type == job_type, Job.key == key).order_by(Job.id.desc()).first()
+
+def get_user_job(db: Session, job_id: int, user_id: int) -> Optional[Job]:
+    """Get a job owned by the given user"""
+    return db.query(Job).filter(Job.id == job_id, Job.user_id == user_id).first()
+
+def retry_delay(attempts: int) -> float:
+    """Backoff in seconds before the next attempt of a job that failed `attempts` times"""
+    delay = min(JOB_RETRY_BASE_DELAY * 2 ** max(attempts - 1, 0), JOB_RETRY_MAX_DELAY)
+    return delay * random.uniform(0.8, 1.2)
+
+def retry_or_fail_job(db: Session, job: Job, error: str, worker_id: Optional[str] = None) -> bool:
+    """Requeue a failed attempt with backoff, or fail the job once attempts run out
+
+    Like complete_job, only applies while `worker_id` still holds the job.
+    Returns True only when this call requeued the job.
+    """
+    if (job.attempts or 0) < (job.max_attempts or JOB_MAX_ATTEMPTS):
+        query = db.query(Job).filter(Job.id == job.id, Job.status == JobStatus.RUNNING)
+        if worker_id is not None:
+            query = query.filter(Job.locked_by == worker_id)
+        requeued = query.update({
+            Job.status: JobStatus.QUEUED,
+            Job.error_message: error,
+            Job.run_at: datetime.utcnow() + timedelta(seconds=retry_delay(job.attempts or 1)),
+            Job.locked_by: None
+        }, synchronize_session=False)
+        db.commit()
+        db.expire(job)
+        return requeued == 1
+
+    if fail_job(db, job, error, worker_id):
+        on_failure = JOB_FAILURE_HANDLERS.get(job.type)
+        if on_failure:
+            on_failure(db, job, error)
+    return False
+
+class DeficitRoundRobin:
+    """Weighted deficit round-robin over the tenants (job owners) with startable jobs
+
+    Each turn credits a tenant its weight; it is served while it holds a
+    whole unit of credit, then the turn passes on. Tenants that drop out
+    (nothing startable) lose their credit, so idle time never turns into
+    a burst. One instance is shared by a worker's consumer threads.
+    """
+
+    def __init__(self):
+        self.ring = deque()
+        self.deficits: Dict[Optional[int], float] = {}
+        self.lock = threading.Lock()
+
+    def next_tenant(self, weights: Dict[Optional[int], float]) -> Optional[int]:
+        """Tenant to serve next among those with startable jobs, by weight"""
+        with self.lock:
+            if any(tenant not in weights for tenant in self.ring):
+                self.ring = deque(tenant for tenant in self.ring if tenant in weights)
+                self.deficits = {tenant: self.deficits[tenant] for tenant in self.ring}
+            for tenant in weights:
+                if tenant not in self.deficits:
+                    self.ring.append(tenant)
+                    self.deficits[tenant] = 0.0
+            if not self.ring:
+                return None
+
+            while self.deficits[self.ring[0]] < 1:
+                self.ring.rotate(-1)
+                self.deficits[self.ring[0]] += max(weights[self.ring[0]], 0.01)
+            tenant = self.ring[0]
+            self.deficits[tenant] -= 1
+            return tenant
+
+    def refund(self, tenant: Optional[int]):
+        """Return the credit of a turn that claimed nothing"""
+        with self.lock:
+            if tenant in self.deficits:
+                self.deficits[tenant] += 1
+
+# Scheduler used by claim_job unless one is passed
+fair_scheduler = DeficitRoundRobin()
+
+def _quota_usage(db: Session, user_ids: List[int]) -> Dict[int, int]:
+    """Running quota-limited jobs per user"""
+    if not user_ids or not JOB_QUOTA_TYPES:
+        return {}
+    return dict(db.query(Job.user_id, func.count(Job.id)).filter(
+        Job.status == JobStatus.RUNNING,
+        Job.type.in_(JOB_QUOTA_TYPES),
+        Job.user_id.in_(user_ids)
+    ).group_by(Job.user_id).all())
+
+def _at_quota(policy: TenantPolicy, running: int) -> bool:
+    return policy.max_concurrent_executions is not None and running >= policy.max_concurrent_executions
+
+def _claim_tenant_job(
+    db: Session,
+    worker_id: str,
+    user_id: Optional[int],
+    job_types: List[str],
+    policy: TenantPolicy,
+    now: datetime
+) -> Optional[Job]:
+    """Claim a tenant's oldest ready job, unless starting it would exceed the tenant's quota"""
+    owner = Job.user_id == user_id if user_id is not None else Job.user_id.is_(None)
+    query = db.query(Job).filter(
+        Job.status == JobStatus.QUEUED,
+        Job.run_at <= now,
+        Job.type.in_(job_types),
+        owner
+    ).order_by(Job.run_at, Job.id)
+    limited = user_id is not None and policy.max_concurrent_executions is not None
+
+    if db.get_bind().dialect.name == 'postgresql':
+        if limited and JOB_QUOTA_TYPES.intersection(job_types):
+            # Held until commit, so concurrent claims for this tenant see each other
+            db.execute(select(func.pg_advisory_xact_lock(JOB_QUOTA_LOCK, user_id)))
+        job = query.with_for_update(skip_locked=True).first()
+        if not job:
+            db.commit()
+            return None
+        if limited and job.type in JOB_QUOTA_TYPES and _at_quota(policy, _quota_usage(db, [user_id]).get(user_id, 0)):
+            db.rollback()
+            return None
+        job.status = JobStatus.RUNNING
+        job.attempts = (job.attempts or 0) + 1
+        job.started_at = now
+        job.locked_by = worker_id
+        job.locked_at = now
+        db.commit()
+        return job
+
+    candidate = query.with_entities(Job.id, Job.type).first()
+    if not candidate:
+        return None
+    conditions = [Job.id == candidate.id, Job.status == JobStatus.QUEUED]
+    if limited and candidate.type in JOB_QUOTA_TYPES:
+        # Checked by the UPDATE itself, so the check and the claim are one atomic statement
+        running = aliased(Job)
+        conditions.append(select(func.count(running.id)).where(
+            running.user_id == user_id,
+            running.status == JobStatus.RUNNING,
+            running.type.in_(JOB_QUOTA_TYPES)
+        ).scalar_subquery() < policy.max_concurrent_executions)
+    claimed = db.query(Job).filter(*conditions).update({
+        Job.status: JobStatus.RUNNING,
+        Job.attempts: func.coalesce(Job.attempts, 0) + 1,
+        Job.started_at: now,
+        Job.locked_by: worker_id,
+        Job.locked_at: now
+    }, synchronize_session=False)
+    db.commit()
+    return db.get(Job, candidate.id) if claimed else None
+
+def claim_job(
+    db: Session,
+    worker_id: str,
+    job_types: Optional[List[str]] = None,
+    scheduler: Optional[DeficitRoundRobin] = None
+) -> Optional[Job]:
+    """Atomically claim the next runnable queued job
+
+    Tenants (job owners) take turns by weighted deficit round-robin, with
+    weights from their subscription plan, so one tenant's backlog cannot
+    starve the others; within a tenant jobs run in order. Quota-limited
+    job types are skipped while their owner is at its concurrency quota.
+
+    Postgres uses SELECT ... FOR UPDATE SKIP LOCKED so concurrent workers
+    never block on or double-claim a row; elsewhere a conditional UPDATE on
+    the status acts as compare-and-swap.
+    """
+    job_types = job_types if job_types is not None else list(JOB_HANDLERS)
+    scheduler = scheduler or fair_scheduler
+    for _ in range(JOB_CLAIM_ATTEMPTS):
+        now = datetime.utcnow()
+        ready = db.query(Job.user_id, Job.type).filter(
+            Job.status == JobStatus.QUEUED,
+            Job.run_at <= now,
+            Job.type.in_(job_types)
+        ).distinct().all()
+        if not ready:
+            db.commit()
+            return None
+
+        policies = tenant_policies(db, {user_id for user_id, _ in ready})
+        running = _quota_usage(db, list({
+            user_id for user_id, job_type in ready if user_id is not None and job_type in JOB_QUOTA_TYPES
+        }))
+        startable = defaultdict(list)
+        for user_id, job_type in ready:
+            if job_type in JOB_QUOTA_TYPES and user_id is not None and _at_quota(policies[user_id], running.get(user_id, 0)):
+                continue
+            startable[user_id].append(job_type)
+        if not startable:
+            db.commit()
+            return None
+
+        tenant = scheduler.next_tenant({user_id: policies[user_id].weight for user_id in startable})
+        job = _claim_tenant_job(db, worker_id, tenant, startable[tenant], policies[tenant], now)
+        if job:
+            return job
+        scheduler.refund(tenant)
+    return None
+
+def execute_job(db: Session, job: Job, worker_id: Optional[str] = None):
+    """Run a claimed job with its registered handler
+
+    The outcome is only recorded while `worker_id` (the claiming worker)
+    still holds the job's lease.
+    """
+    handler = JOB_HANDLERS.get(job.type)
+    if handler is None:
+        fail_job(db, job, f"No handler registered for job type '{job.type}'", worker_id)
+        return
+
+    try:
+        result = handler(db, job)
+    except Exception as e:
+        db.rollback()
+        retry_or_fail_job(db, job, f"{type(e).__name__}: {e}", worker_id)
+        return
+    if not complete_job(db, job, result, worker_id):
+        print(f"Job {job.id} finished after worker {worker_id} lost its lease; result discarded")
+
+def requeue_stale_jobs(db: Session, lease_timeout: timedelta = JOB_LEASE_TIMEOUT) -> int:
+    """Return jobs held by workers that died mid-run to the queue"""
+    stale = db.query(Job).filter(
+        Job.status == JobStatus.RUNNING,
+        Job.locked_by.isnot(None),
+        Job.locked_at < datetime.utcnow() - lease_timeout
+    ).all()
+    for job in stale:
+        # Conditional on the stale holder, in case it finishes the job meanwhile
+        worker_id = job.locked_by
+        retry_or_fail_job(db, job, f"Worker {worker_id} lost its lease", worker_id)
+    return len(stale)
+
+def _percentile(values: List[float], q: float) -> Optional[float]:
+    """Percentile of a list of durations, or None if empty"""
+    if not values:
+        return None
+    return round(float(np.percentile(values, q)), 3)
+
+def job_queue_metrics(
+    db: Session,
+    window: timedelta = timedelta(hours=1),
+    bucket: Optional[timedelta] = None,
+    job_types: Optional[List[str]] = None
+) -> Dict[str, Any]:
+    """Queue depth per job type, and lag/throughput of jobs finished within the window
+
+    With `bucket`, each type also gets a timeline of finished jobs and wait
+    (queue lag) per bucket, oldest first.
+    """
+    now = datetime.utcnow()
+    since = now - window
+    metrics = defaultdict(dict)
+    bucket_seconds = bucket.total_seconds() if bucket else None
+    bucket_count = int(window.total_seconds() // bucket_seconds) + 1 if bucket_seconds else 0
+    timelines = defaultdict(lambda: [{"completed": 0, "failed": 0, "waits": []} for _ in range(bucket_count)])
+
+    is_ready = Job.run_at <= now
+    states = db.query(
+        Job.type,
+        Job.status,
+        func.count(Job.id),
+        func.sum(case((is_ready, 1), else_=0)),
+        func.min(case((is_ready, Job.run_at)))
+    ).filter(
+        Job.status.in_([JobStatus.QUEUED, JobStatus.RUNNING]),
+        *([Job.type.in_(job_types)] if job_types else [])
+    ).group_by(Job.type, Job.status).all()
+    for job_type, status, count, ready, oldest_ready in states:
+        entry = metrics[job_type]
+        if status == JobStatus.RUNNING:
+            entry["running"] = count
+            continue
+        entry["queued"] = count
+        entry["ready"] = int(ready or 0)
+        entry["delayed"] = count - entry["ready"]
+        if oldest_ready:
+            entry["oldest_ready_seconds"] = round((now - oldest_ready).total_seconds(), 3)
+
+    waits = defaultdict(list)
+    runs = defaultdict(list)
+    finished = db.query(Job.type, Job.status, Job.run_at, Job.started_at, Job.completed_at).filter(
+        Job.status.in_([JobStatus.COMPLETED, JobStatus.FAILED]),
+        Job.completed_at >= since,
+        *([Job.type.in_(job_types)] if job_types else [])
+    ).all()
+    for job_type, status, run_at, started_at, completed_at in finished:
+        entry = metrics[job_type]
+        key = "completed" if status == JobStatus.COMPLETED else "failed"
+        entry[key] = entry.get(key, 0) + 1
+        wait = None
+        if started_at:
+            # Wait is measured from when the (last) attempt became runnable
+            if run_at:
+                wait = max((started_at - run_at).total_seconds(), 0.0)
+                waits[job_type].append(wait)
+            runs[job_type].append((completed_at - started_at).total_seconds())
+        if bucket_seconds:
+            point = timelines[job_type][min(int((completed_at - since).total_seconds() // bucket_seconds), bucket_count - 1)]
+            point[key] += 1
+            if wait is not None:
+                point["waits"].append(wait)
+
+    return {
+        "generated_at": now,
+        "window_seconds": int(window.total_seconds()),
+        "types": [
+            {
+                "type": job_type,
+                **entry,
+                "wait_p50_seconds": _percentile(waits[job_type], 50),
+                "wait_p95_seconds": _percentile(waits[job_type], 95),
+                "run_p50_seconds": _percentile(runs[job_type], 50),
+                "run_p95_seconds": _percentile(runs[job_type], 95),
+                "throughput_per_minute": round(
+                    (entry.get("completed", 0) + entry.get("failed", 0)) / (window.total_seconds() / 60), 3
+                ),
+                "timeline": [
+                    {
+                        "start": since + timedelta(seconds=index * bucket_seconds),
+                        "completed": point["completed"],
+                        "failed": point["failed"],
+                        "wait_p50_seconds": _percentile(point["waits"], 50),
+                        "wait_p95_seconds": _percentile(point["waits"], 95)
+                    }
+                    for index, point in enumerate(timelines[job_type])
+                ] if bucket_seconds else None
+            }
+            for job_type, entry in sorted(metrics.items())
+        ]
+    }
+
+def tenant_queue_metrics(
+    db: Session,
+    window: timedelta = timedelta(hours=1),
+    job_types: Optional[List[str]] = None,
+    limit: int = 100
+) -> Dict[str, Any]:
+    """Backlog, running jobs, quota use and queue wait per tenant, longest-waiting first
+
+    A tenant whose oldest ready job keeps aging while jobs are started for
+    others is being starved; one at its quota is waiting on itself.
+    """
+    now = datetime.utcnow()
+    since = now - window
+    type_filter = [Job.type.in_(job_types)] if job_types else []
+    tenants = defaultdict(dict)
+
+    is_ready = Job.run_at <= now
+    states = db.query(
+        Job.user_id,
+        Job.status,
+        func.count(Job.id),
+        func.sum(case((is_ready, 1), else_=0)),
+        func.min(case((is_ready, Job.run_at)))
+    ).filter(
+        Job.status.in_([JobStatus.QUEUED, JobStatus.RUNNING]),
+        *type_filter
+    ).group_by(Job.user_id, Job.status).all()
+    for user_id, status, count, ready, oldest_ready in states:
+        entry = tenants[user_id]
+        if status == JobStatus.RUNNING:
+            entry["running"] = count
+            continue
+        entry["queued"] = count
+        entry["ready"] = int(ready or 0)
+        if oldest_ready:
+            entry["oldest_ready_seconds"] = round((now - oldest_ready).total_seconds(), 3)
+
+    # Wait of every attempt started within the window, measured from when it became runnable
+    waits = defaultdict(list)
+    started = db.query(Job.user_id, Job.run_at, Job.started_at).filter(Job.started_at >= since, *type_filter).all()
+    for user_id, run_at, started_at in started:
+        tenants.setdefault(user_id, {})
+        if run_at:
+            waits[user_id].append(max((started_at - run_at).total_seconds(), 0.0))
+
+    policies = tenant_policies(db, tenants)
+    usage = _quota_usage(db, [user_id for user_id in tenants if user_id is not None])
+    rows = []
+    for user_id, entry in tenants.items():
+        policy = policies[user_id]
+        rows.append({
+            "user_id": user_id,
+            "plan": policy.plan.value if policy.plan else None,
+            "weight": policy.weight,
+            "max_concurrent_executions": policy.max_concurrent_executions,
+            "running_executions": usage.get(user_id, 0),
+            "at_quota": user_id is not None and _at_quota(policy, usage.get(user_id, 0)),
+            "running": entry.get("running", 0),
+            "queued": entry.get("queued", 0),
+            "ready": entry.get("ready", 0),
+            "oldest_ready_seconds": entry.get("oldest_ready_seconds"),
+            "started": len(waits[user_id]),
+            "wait_p50_seconds": _percentile(waits[user_id], 50),
+            "wait_p95_seconds": _percentile(waits[user_id], 95),
+            "wait_max_seconds": round(max(waits[user_id]), 3) if waits[user_id] else None
+        })
+    rows.sort(key=lambda row: (row["oldest_ready_seconds"] or 0, row["wait_p95_seconds"] or 0), reverse=True)
+
+    return {
+        "generated_at": now,
+        "window_seconds": int(window.total_seconds()),
+        "tenants": rows[:limit]
+    }
@@ -0,0 +1,249 @@
+import csv
+import io
+import json
+import os
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import pandas as pd
+from pydantic import ValidationError
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from models import Job
+from schemas import LeadCreate
+from jobs import create_job, job_handler, update_job_progress
+from dedupe import dedupe_lead_rows, count_existing_hashes, lead_upsert_statement, lead_upsert_sql
+from utils import score_leads, log_analytics, get_file_extension
+from worker import WORKER_PROCESSES, imap_cpu_bound
+
+LEAD_IMPORT_JOB = "lead_import"
+
+# Import configuration (IMPORT_DIR must be shared with the job workers)
+IMPORT_DIR = os.path.join(os.getenv("UPLOAD_DIR", "/tmp/uploads"), "imports")
+IMPORT_CHUNK_SIZE = 10000
+UPLOAD_READ_SIZE = 1024 * 1024
+MAX_REPORTED_ERRORS = 100
+
+CSV_MIME_TYPES = {'text/csv', 'application/csv', 'application/vnd.ms-excel'}
+XLSX_MIME_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+LEAD_IMPORT_FIELDS = list(LeadCreate.model_fields)
+LEAD_COPY_COLUMNS = [
+    'name', 'email', 'company', 'phone', 'source', 'owner_id', 'status', 'score',
+    'predicted_value', 'ai_insights', 'last_activity', 'dedupe_hash', 'created_at', 'updated_at'
+]
+
+def detect_import_format(filename: str, content_type: Optional[str]) -> Optional[str]:
+    """Detect whether an upload is a CSV or XLSX lead file"""
+    extension = get_file_extension(filename or '')
+    if content_type == XLSX_MIME_TYPE or extension == 'xlsx':
+        return 'xlsx'
+    if content_type in CSV_MIME_TYPES or extension == 'csv':
+        return 'csv'
+    return None
+
+def _normalize_header(value: Any) -> str:
+    """Normalize a spreadsheet header to a LeadCreate field name"""
+    return str(value or '').strip().lower().replace(' ', '_')
+
+def count_import_rows(file_path: str, import_format: str) -> Optional[int]:
+    """Estimate the number of data rows in an import file"""
+    if import_format == 'xlsx':
+        from openpyxl import load_workbook
+        workbook = load_workbook(file_path, read_only=True)
+        try:
+            max_row = workbook.active.max_row
+            return max_row - 1 if max_row else None
+        finally:
+            workbook.close()
+
+    lines = 0
+    last_block = b""
+    with open(file_path, "rb") as f:
+        while block := f.read(UPLOAD_READ_SIZE):
+            lines += block.count(b"\n")
+            last_block = block
+    if last_block and not last_block.endswith(b"\n"):
+        lines += 1
+    return max(lines - 1, 0)
+
+def iter_lead_chunks(file_path: str, import_format: str, chunk_size: int = IMPORT_CHUNK_SIZE) -> Iterator[List[Dict[str, Any]]]:
+    """Stream raw lead rows from a CSV or XLSX file in fixed-size chunks"""
+    if import_format == 'xlsx':
+        yield from _iter_xlsx_chunks(file_path, chunk_size)
+        return
+
+    for frame in pd.read_csv(file_path, dtype=str, keep_default_na=False, chunksize=chunk_size):
+        frame.columns = [_normalize_header(column) for column in frame.columns]
+        yield frame.to_dict('records')
+
+def _iter_xlsx_chunks(file_path: str, chunk_size: int) -> Iterator[List[Dict[str, Any]]]:
+    """Stream rows from the first worksheet of an XLSX file"""
+    from openpyxl import load_workbook
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [_normalize_header(value) for value in next(rows, ())]
+        chunk = []
+        for values in rows:
+            chunk.append(dict(zip(header, values)))
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+    finally:
+        workbook.close()
+
+def validate_lead_rows(rows: List[Dict[str, Any]], first_row: int) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Validate raw rows with LeadCreate, returning valid leads and row errors"""
+    leads = []
+    errors = []
+    for offset, row in enumerate(rows):
+        cleaned = {}
+        for field in LEAD_IMPORT_FIELDS:
+            value = row.get(field)
+            if value is None:
+                continue
+            value = str(value).strip()
+            if value:
+                cleaned[field] = value
+        try:
+            leads.append(LeadCreate(**cleaned).model_dump())
+        except ValidationError as e:
+            errors.append({
+                "row": first_row + offset,
+                "error": "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+            })
+    return leads, errors
+
+def prepare_lead_chunk(rows: List[Dict[str, Any]], first_row: int) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], int]:
+    """Validate and score one chunk of raw rows (runs in the worker's process pool)"""
+    leads, errors = validate_lead_rows(rows, first_row)
+    scored = [{**lead, **scores} for lead, scores in zip(leads, score_leads(leads))]
+    return scored, errors, len(rows)
+
+def iter_prepared_chunks(
+    file_path: str,
+    import_format: str,
+    skip_rows: int = 0
+) -> Iterator[Tuple[List[Dict[str, Any]], List[Dict[str, Any]], int]]:
+    """Validate and score chunks in the worker's process pool, yielding results in file order
+
+    At most two chunks per pool process are in flight so memory stays
+    bounded while the caller inserts earlier chunks. Whole chunks within
+    the first `skip_rows` rows are read but not prepared or yielded.
+    """
+    def calls():
+        # Row numbers are 1-based and the header is row 1
+        next_row = 2
+        for chunk in iter_lead_chunks(file_path, import_format):
+            if next_row - 2 + len(chunk) > skip_rows:
+                yield chunk, next_row
+            next_row += len(chunk)
+
+    yield from imap_cpu_bound(prepare_lead_chunk, calls(), WORKER_PROCESSES * 2)
+
+def bulk_upsert_leads(db: Session, owner_id: int, rows: List[Dict[str, Any]]) -> Tuple[int, int]:
+    """Upsert one owner's scored lead rows, returning (inserted, merged) counts
+
+    Rows whose normalized email already exists for the owner are merged into
+    the existing lead instead of creating a duplicate.
+    """
+    unique_rows = dedupe_lead_rows(rows)
+    existing = count_existing_hashes(db, owner_id, [row['dedupe_hash'] for row in unique_rows])
+    if db.get_bind().dialect.name == 'postgresql':
+        _copy_upsert_leads(db, unique_rows)
+    else:
+        db.execute(lead_upsert_statement(db), unique_rows)
+    inserted = len(unique_rows) - existing
+    return inserted, len(rows) - inserted
+
+def _copy_upsert_leads(db: Session, rows: List[Dict[str, Any]]):
+    """COPY lead rows into a staging table, then upsert them into leads"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([
+            json.dumps(row[column]) if column == 'ai_insights'
+            else row[column].name if column == 'status'
+            else row[column]
+            for column in LEAD_COPY_COLUMNS
+        ])
+    buffer.seek(0)
+
+    db.execute(text("CREATE TEMP TABLE lead_import_staging (LIKE leads INCLUDING DEFAULTS) ON COMMIT DROP"))
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY lead_import_staging ({', '.join(LEAD_COPY_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+            buffer
+        )
+    finally:
+        cursor.close()
+    db.execute(text(lead_upsert_sql(LEAD_COPY_COLUMNS, "lead_import_staging")))
+
+def enqueue_lead_import(db: Session, user_id: int, file_path: str, import_format: str, filename: Optional[str]) -> Job:
+    """Queue the import of a saved lead file for the job workers"""
+    return create_job(db, user_id, LEAD_IMPORT_JOB, {
+        "file_path": file_path,
+        "format": import_format,
+        "filename": filename
+    })
+
+def discard_import_file(db: Session, job: Job, error: str):
+    """Delete the file of an import that failed for good"""
+    file_path = job.payload.get("file_path")
+    if file_path and os.path.exists(file_path):
+        os.remove(file_path)
+
+@job_handler(LEAD_IMPORT_JOB, on_failure=discard_import_file)
+def run_lead_import(db: Session, job: Job) -> Dict[str, Any]:
+    """Queue handler: import an uploaded lead file chunk by chunk
+
+    Each chunk's upserts commit with the job's progress and running totals,
+    so a retried or requeued import resumes after the last committed chunk.
+    """
+    file_path = job.payload["file_path"]
+    import_format = job.payload["format"]
+
+    if job.total is None:
+        update_job_progress(db, job, job.progress or 0, total=count_import_rows(file_path, import_format))
+
+    processed = job.progress or 0
+    totals = job.result or {}
+    imported = totals.get("imported", 0)
+    merged = totals.get("merged", 0)
+    errors = totals.get("errors", [])
+    error_count = totals.get("failed", 0)
+
+    for leads, chunk_errors, row_count in iter_prepared_chunks(file_path, import_format, skip_rows=processed):
+        error_count += len(chunk_errors)
+        errors = errors + chunk_errors[:MAX_REPORTED_ERRORS - len(errors)]
+
+        if leads:
+            now = datetime.utcnow()
+            for lead in leads:
+                lead.update(
+                    owner_id=job.user_id,
+                    last_activity=now,
+                    created_at=now,
+                    updated_at=now
+                )
+            inserted, merged_rows = bulk_upsert_leads(db, job.user_id, leads)
+            imported += inserted
+            merged += merged_rows
+
+        processed += row_count
+        job.result = {"imported": imported, "merged": merged, "failed": error_count, "errors": errors}
+        # Commits the chunk's inserts together with its progress
+        update_job_progress(db, job, processed)
+
+    log_analytics(db, job.user_id, "leads_imported", float(imported), {"job_id": job.id})
+    if os.path.exists(file_path):
+        os.remove(file_path)
+    return {
+        "imported": imported,
+        "merged": merged,
+        "failed": error_count,
+        "errors": errors
+    }
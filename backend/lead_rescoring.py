@@ -0,0 +1,151 @@
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+import pandas as pd
+from sqlalchemy import and_, or_, update
+from sqlalchemy.orm import Session
+from models import Job, JobStatus, Lead
+from jobs import create_job, job_handler, start_job, update_job_progress, complete_job, fail_job
+from scoring import (
+    ACTIVITY_BUCKET_DAYS, lead_features, scores_from_features, values_from_features,
+    insight_flags_from_features, lead_statuses, insight_messages
+)
+
+RESCORE_JOB_TYPE = "lead_rescore"
+RESCORE_BATCH_SIZE = 5000
+# Seconds between re-scoring runs enqueued by the scheduler (0 disables them)
+RESCORE_INTERVAL = int(os.getenv("LEAD_RESCORE_INTERVAL", "3600"))
+
+RESCORE_COLUMNS = [Lead.id, Lead.company, Lead.email, Lead.phone, Lead.source, Lead.last_activity]
+
+def last_rescore_time(db: Session) -> Optional[datetime]:
+    """Get the reference time of the last completed re-scoring run"""
+    job = db.query(Job).filter(
+        Job.type == RESCORE_JOB_TYPE,
+        Job.status == JobStatus.COMPLETED
+    ).order_by(Job.completed_at.desc()).first()
+
+    if not job:
+        return None
+    return datetime.fromisoformat(job.payload["as_of"])
+
+def bucket_change_filter(since: Optional[datetime], as_of: datetime):
+    """Filter leads whose activity bucket can have changed between two runs
+
+    A lead is within k days of activity while last_activity > now - (k + 1)
+    days, so it crosses threshold k between `since` and `as_of` exactly when
+    last_activity falls in (since - (k + 1) days, as_of - (k + 1) days].
+    Each window is a range scan on the last_activity index.
+    """
+    if since is None:
+        return Lead.last_activity.isnot(None)
+
+    windows = []
+    for days in ACTIVITY_BUCKET_DAYS:
+        boundary = timedelta(days=days + 1)
+        windows.append(and_(
+            Lead.last_activity > since - boundary,
+            Lead.last_activity <= as_of - boundary
+        ))
+    return or_(*windows)
+
+def rescore_lead_rows(rows: List[Any], as_of: datetime) -> List[Dict[str, Any]]:
+    """Re-score a batch of lead rows, returning bulk UPDATE parameters"""
+    frame = pd.DataFrame(rows, columns=[column.key for column in RESCORE_COLUMNS])
+    features = lead_features(frame, as_of)
+    scores = scores_from_features(features)
+    values = values_from_features(features, scores)
+    flags = insight_flags_from_features(features, scores)
+
+    return [
+        {
+            "id": lead_id,
+            "score": int(score),
+            "status": status,
+            "predicted_value": float(value),
+            "ai_insights": insight_messages(int(flag))
+        }
+        for lead_id, score, status, value, flag in zip(frame["id"], scores, lead_statuses(scores), values, flags)
+    ]
+
+def _rescore_window(db: Session, job: Job, full: bool, as_of: Optional[datetime] = None):
+    """Fix the job's (since, as_of] window in its payload, keeping one chosen by an earlier attempt"""
+    if "as_of" not in (job.payload or {}):
+        as_of = as_of or datetime.utcnow()
+        since = None if full else last_rescore_time(db)
+        job.payload = {
+            **(job.payload or {}),
+            "since": since.isoformat() if since else None,
+            "as_of": as_of.isoformat()
+        }
+        db.commit()
+    since = job.payload["since"]
+    return datetime.fromisoformat(since) if since else None, datetime.fromisoformat(job.payload["as_of"])
+
+def _rescore_batches(db: Session, job: Job, since: Optional[datetime], as_of: datetime, batch_size: int) -> int:
+    """Re-score the candidates of a window in batched UPDATEs, returning how many leads changed"""
+    candidates = bucket_change_filter(since, as_of)
+    last_id = 0
+    updated = 0
+
+    while True:
+        rows = db.query(*RESCORE_COLUMNS).filter(
+            candidates,
+            Lead.id > last_id
+        ).order_by(Lead.id).limit(batch_size).all()
+
+        if not rows:
+            break
+
+        params = rescore_lead_rows(rows, as_of)
+        db.execute(update(Lead), params)
+        updated += len(params)
+        last_id = rows[-1].id
+        # Commits the batch's UPDATE together with its progress
+        update_job_progress(db, job, updated)
+    return updated
+
+def rescore_leads(
+    db: Session,
+    as_of: Optional[datetime] = None,
+    batch_size: int = RESCORE_BATCH_SIZE,
+    full: bool = False
+) -> Job:
+    """Re-score leads whose activity bucket changed since the last run (every lead with activity if `full`)
+
+    Runs in the calling process; the scheduler enqueues the same work for
+    the job workers instead (enqueue_lead_rescore).
+    """
+    job = create_job(db, None, RESCORE_JOB_TYPE, {"full": full})
+    start_job(db, job)
+
+    try:
+        since, as_of = _rescore_window(db, job, full, as_of)
+        updated = _rescore_batches(db, job, since, as_of, batch_size)
+        complete_job(db, job, {"updated": updated})
+    except Exception as e:
+        db.rollback()
+        fail_job(db, job, str(e))
+        raise
+
+    return job
+
+def enqueue_lead_rescore(db: Session, key: Optional[str] = None, full: bool = False) -> Job:
+    """Queue a re-scoring run for the job workers, unless one is already queued or running"""
+    pending = db.query(Job).filter(
+        Job.type == RESCORE_JOB_TYPE,
+        Job.status.in_([JobStatus.QUEUED, JobStatus.RUNNING])
+    ).first()
+    if pending:
+        return pending
+    return create_job(db, None, RESCORE_JOB_TYPE, {"full": full}, key=key)
+
+@job_handler(RESCORE_JOB_TYPE)
+def run_lead_rescore(db: Session, job: Job) -> Dict[str, Any]:
+    """Queue handler: re-score the leads whose activity bucket changed since the last run
+
+    A retried attempt keeps the window of the first one, and re-running
+    its UPDATEs is harmless.
+    """
+    since, as_of = _rescore_window(db, job, job.payload.get("full", False))
+    return {"updated": _rescore_batches(db, job, since, as_of, RESCORE_BATCH_SIZE)}
@@ -0,0 +1,154 @@
+import json
+import math
+import os
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, Optional
+import numpy as np
+
+# Model file (loaded once per worker process; restart workers after retraining)
+LEAD_VALUE_MODEL_PATH = os.getenv(
+    "LEAD_VALUE_MODEL_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "lead_value_model.json")
+)
+LEAD_VALUE_MODEL_VERSION = 1
+
+# Realized deal value recorded on won leads, used as the training target
+VALUE_TARGET_FIELD = "deal_value"
+
+# Sources with their own coefficient; anything else uses the intercept only
+VALUE_MODEL_SOURCES = ['referral', 'linkedin', 'website', 'email campaign', 'cold call']
+
+FEATURE_NAMES = (
+    ['intercept', 'has_company', 'business_email', 'has_phone'] +
+    [f'source:{source}' for source in VALUE_MODEL_SOURCES]
+)
+
+# Prior coefficients: the hand-tuned multipliers the model replaced, in log space
+# (base value 1000, x1.5 with a company, x2.0 referral, x1.5 LinkedIn, ...)
+DEFAULT_COEFFICIENTS = {
+    'intercept': math.log(1000.0),
+    'has_company': math.log(1.5),
+    'business_email': 0.0,
+    'has_phone': 0.0,
+    'source:referral': math.log(2.0),
+    'source:linkedin': math.log(1.5),
+    'source:website': math.log(1.3),
+    'source:email campaign': math.log(1.2),
+    'source:cold call': 0.0
+}
+
+class LeadValueModel:
+    """Log-linear lead value model: value = exp(X @ w) * score / 100
+
+    The score enters as a fixed offset so a lead's value stays proportional
+    to its score, as with the original multipliers.
+    """
+
+    def __init__(self, coefficients: Dict[str, float], metadata: Optional[Dict[str, Any]] = None):
+        self.coefficients = {name: float(coefficients.get(name, 0.0)) for name in FEATURE_NAMES}
+        self.weights = np.array([self.coefficients[name] for name in FEATURE_NAMES])
+        self.metadata = metadata or {}
+
+    @classmethod
+    def default(cls) -> "LeadValueModel":
+        """Model using the prior coefficients"""
+        return cls(DEFAULT_COEFFICIENTS, {"trained": False})
+
+    @classmethod
+    def load(cls, path: str) -> "LeadValueModel":
+        """Load a model from a coefficient file"""
+        with open(path) as f:
+            data = json.load(f)
+        if data.get("version") != LEAD_VALUE_MODEL_VERSION:
+            raise ValueError(f"Unsupported lead value model version: {data.get('version')}")
+        return cls(dict(zip(data["features"], data["coefficients"])), data.get("metadata"))
+
+    def save(self, path: str):
+        """Write the coefficient file atomically"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({
+                "version": LEAD_VALUE_MODEL_VERSION,
+                "features": FEATURE_NAMES,
+                "coefficients": [round(w, 8) for w in self.weights.tolist()],
+                "metadata": self.metadata
+            }, f, indent=2)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def design_matrix(features: Dict[str, np.ndarray]) -> np.ndarray:
+        """Build the model's feature matrix from scoring features"""
+        rows = len(features['has_company'])
+        source_code = features['source_code']
+        columns = [
+            np.ones(rows),
+            features['has_company'],
+            features['has_email'] & ~features['free_email'],
+            features['has_phone']
+        ] + [source_code == index for index in range(len(VALUE_MODEL_SOURCES))]
+        return np.column_stack(columns).astype(float) if rows else np.empty((0, len(FEATURE_NAMES)))
+
+    def predict(self, features: Dict[str, np.ndarray], scores: np.ndarray) -> np.ndarray:
+        """Predict lead values for a batch of leads"""
+        log_value = self.design_matrix(features) @ self.weights
+        return np.round(np.exp(log_value) * np.asarray(scores, dtype=float) / 100, 2)
+
+def train_lead_value_model(
+    features: Dict[str, np.ndarray],
+    scores: np.ndarray,
+    targets: np.ndarray,
+    alpha: float = 1.0
+) -> LeadValueModel:
+    """Fit coefficients by ridge regression in log space, shrunk towards the prior
+
+    Solves min ||X w - y||^2 + alpha ||w - w0||^2 where y is the log of the
+    realized value with the score offset removed and w0 the prior coefficients,
+    so sparse history only nudges the hand-tuned multipliers.
+    """
+    scores = np.asarray(scores, dtype=float)
+    targets = np.asarray(targets, dtype=float)
+    usable = (scores > 0) & (targets > 0)
+
+    X = LeadValueModel.design_matrix(features)[usable]
+    y = np.log(targets[usable]) - np.log(scores[usable] / 100)
+    prior = LeadValueModel.default().weights
+
+    weights = np.linalg.solve(
+        X.T @ X + alpha * np.eye(len(FEATURE_NAMES)),
+        X.T @ y + alpha * prior
+    )
+    residuals = X @ weights - y if len(y) else np.array([0.0])
+
+    return LeadValueModel(dict(zip(FEATURE_NAMES, weights)), {
+        "trained": True,
+        "trained_at": datetime.utcnow().isoformat(),
+        "samples": int(usable.sum()),
+        "alpha": alpha,
+        "log_rmse": float(np.sqrt(np.mean(residuals ** 2)))
+    })
+
+def fit_lead_value_model_from_db(db, alpha: float = 1.0, batch_size: int = 10000) -> LeadValueModel:
+    """Train the model on historical leads with a recorded deal value"""
+    import pandas as pd
+    from models import Lead
+    from scoring import lead_features
+
+    columns = [Lead.company, Lead.email, Lead.phone, Lead.source, Lead.score, Lead.custom_fields]
+    rows = []
+    query = db.query(*columns).filter(Lead.custom_fields.isnot(None), Lead.score > 0)
+    for row in query.yield_per(batch_size):
+        target = (row.custom_fields or {}).get(VALUE_TARGET_FIELD)
+        if isinstance(target, (int, float)) and target > 0:
+            rows.append((row.company, row.email, row.phone, row.source, row.score, float(target)))
+
+    frame = pd.DataFrame(rows, columns=['company', 'email', 'phone', 'source', 'score', 'target'])
+    frame['last_activity'] = None
+    return train_lead_value_model(lead_features(frame), frame['score'].to_numpy(), frame['target'].to_numpy(), alpha)
+
+@lru_cache(maxsize=None)
+def load_lead_value_model(path: str = LEAD_VALUE_MODEL_PATH) -> LeadValueModel:
+    """Load the lead value model once per process, falling back to the prior"""
+    if not os.path.exists(path):
+        return LeadValueModel.default()
+    return LeadValueModel.load(path)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, Float, ForeignKey, JSON, Enum
+from sqlalchemy import Column, Integer, BigInteger, String, Date, DateTime, Boolean, Text, Float, ForeignKey, JSON, Enum, Index, and_
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -52,6 +52,12 @@ class SubscriptionPlan(str, enum.Enum):
     PRO = "pro"
     ENTERPRISE = "enterprise"
 
+class JobStatus(str, enum.Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
 # Models
 class User(Base):
     __tablename__ = "users"
@@ -65,6 +71,7 @@ class User(Base):
     hashed_password = Column(String, nullable=False)
     role = Column(Enum(UserRole), default=UserRole.USER)
     is_active = Column(Boolean, default=True)
+    max_concurrent_executions = Column(Integer)  # overrides the plan's execution concurrency quota
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
     
@@ -129,9 +136,51 @@ class WorkflowExecution(Base):
     error_message = Column(Text)
     tokens_used = Column(Integer)
     ai_model_used = Column(String)
+    cache_hits = Column(Integer, default=0)
+    cache_misses = Column(Integer, default=0)
+    archive_key = Column(String)  # blob holding input/output data once compacted
+    archived_at = Column(DateTime)
     
     # Relationships
     workflow = relationship("Workflow", back_populates="executions_log")
+    
+    __table_args__ = (
+        Index("ix_workflow_executions_workflow_started", "workflow_id", "started_at", "id"),
+    )
+
+class WorkflowStepCheckpoint(Base):
+    __tablename__ = "workflow_step_checkpoints"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    execution_id = Column(Integer, ForeignKey("workflow_executions.id"), nullable=False)
+    step_id = Column(String, nullable=False)
+    output = Column(JSON)
+    tokens_used = Column(Integer, default=0)
+    duration = Column(Float)
+    created_at = Column(DateTime, default=func.now())
+    
+    __table_args__ = (
+        Index("ux_workflow_step_checkpoints_step", "execution_id", "step_id", unique=True),
+    )
+
+class StepResultCache(Base):
+    __tablename__ = "step_result_cache"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    key = Column(String(64), nullable=False)  # sha256 of step definition, inputs and model
+    owner_id = Column(Integer, ForeignKey("users.id"))  # NULL when shared between users
+    step_type = Column(String, nullable=False)
+    output = Column(JSON)
+    tokens_used = Column(Integer, default=0)
+    size = Column(Integer, default=0)
+    hits = Column(Integer, default=0, nullable=False)
+    last_hit_at = Column(DateTime)
+    expires_at = Column(DateTime, nullable=False)
+    created_at = Column(DateTime, default=func.now())
+    
+    __table_args__ = (
+        Index("ux_step_result_cache_key", "key", unique=True),
+    )
 
 class Document(Base):
     __tablename__ = "documents"
@@ -144,6 +193,7 @@ class Document(Base):
     file_path = Column(String)
     file_size = Column(Integer)
     mime_type = Column(String)
+    content_hash = Column(String(64), index=True)  # sha256 of the file bytes
     extracted_data = Column(JSON)
     confidence = Column(Float)
     processed_at = Column(DateTime)
@@ -154,6 +204,49 @@ class Document(Base):
     # Relationships
     owner = relationship("User", back_populates="documents")
 
+class Blob(Base):
+    __tablename__ = "blobs"
+    
+    sha256 = Column(String(64), primary_key=True)
+    size = Column(Integer, nullable=False)
+    mime_type = Column(String)
+    ref_count = Column(Integer, default=0, nullable=False)
+    created_at = Column(DateTime, default=func.now())
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now(), index=True)
+
+class UploadSession(Base):
+    __tablename__ = "upload_sessions"
+    
+    id = Column(String(36), primary_key=True)
+    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    filename = Column(String, nullable=False)
+    content_type = Column(String, nullable=False)
+    total_size = Column(BigInteger, nullable=False)
+    offset = Column(BigInteger, default=0, nullable=False)  # bytes received so far
+    sha256 = Column(String(64))  # checksum announced by the client, if any
+    part_path = Column(String, nullable=False)
+    claim_token = Column(String(32))  # chunk write or completion in flight, if any
+    claimed_until = Column(DateTime)  # when that claim lapses if its request died
+    created_at = Column(DateTime, default=func.now())
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now(), index=True)
+
+class ExtractionCache(Base):
+    __tablename__ = "extraction_cache"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    content_hash = Column(String(64), nullable=False)
+    document_type = Column(String, nullable=False)
+    extractor_version = Column(String, nullable=False)
+    extracted_data = Column(JSON)
+    confidence = Column(Float)
+    hits = Column(Integer, default=0, nullable=False)
+    last_hit_at = Column(DateTime)
+    created_at = Column(DateTime, default=func.now())
+    
+    __table_args__ = (
+        Index("ux_extraction_cache_key", "content_hash", "document_type", "extractor_version", unique=True),
+    )
+
 class Lead(Base):
     __tablename__ = "leads"
     
@@ -167,15 +260,20 @@ class Lead(Base):
     status = Column(Enum(LeadStatus), default=LeadStatus.COLD)
     score = Column(Integer, default=0)
     predicted_value = Column(Float)
-    last_activity = Column(DateTime)
+    last_activity = Column(DateTime, index=True)
     ai_insights = Column(JSON)
     tags = Column(JSON)
     custom_fields = Column(JSON)
+    dedupe_hash = Column(String(64))  # sha256 of the normalized email (or phone)
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
     
     # Relationships
     owner = relationship("User", back_populates="leads")
+    
+    __table_args__ = (
+        Index("ux_leads_owner_dedupe_hash", "owner_id", "dedupe_hash", unique=True),
+    )
 
 class EmailCampaign(Base):
     __tablename__ = "email_campaigns"
@@ -295,4 +393,85 @@ class Analytics(Base):
     created_at = Column(DateTime, default=func.now())
     
     # Relationships
-    user = relationship("User")
\ No newline at end of file
+    user = relationship("User")
+
+class UsageEntry(Base):
+    __tablename__ = "usage_ledger"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    execution_id = Column(Integer)  # workflow execution that made the call, if any
+    step_id = Column(String)
+    model = Column(String, nullable=False)
+    tokens = Column(Integer, nullable=False, default=0)
+    cost = Column(Float, nullable=False, default=0.0)  # tokens * the model's price_per_token at call time
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        Index("ix_usage_ledger_user_created", "user_id", "created_at"),
+    )
+
+class UsageRollup(Base):
+    __tablename__ = "usage_rollups"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    day = Column(Date, nullable=False)  # UTC
+    model = Column(String, nullable=False)
+    calls = Column(Integer, nullable=False, default=0)
+    tokens = Column(BigInteger, nullable=False, default=0)
+    cost = Column(Float, nullable=False, default=0.0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        Index("ux_usage_rollups_user_day_model", "user_id", "day", "model", unique=True),
+    )
+
+class UsageBudget(Base):
+    __tablename__ = "usage_budgets"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), unique=True, nullable=False)
+    monthly_tokens = Column(BigInteger)  # no limit when NULL
+    monthly_cost = Column(Float)
+    alert_thresholds = Column(JSON)  # fractions of a limit that raise an alert, e.g. [0.5, 0.8, 1.0]
+    created_at = Column(DateTime, default=func.now())
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+
+class Job(Base):
+    __tablename__ = "jobs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)  # null for system jobs
+    parent_id = Column(Integer, ForeignKey("jobs.id"), index=True)  # batch job this job belongs to
+    type = Column(String, nullable=False, index=True)
+    key = Column(String, index=True)  # identifies the job's work, to avoid enqueueing it twice
+    status = Column(Enum(JobStatus), default=JobStatus.QUEUED, index=True)
+    progress = Column(Integer, default=0)
+    total = Column(Integer)
+    payload = Column(JSON)
+    result = Column(JSON)
+    error_message = Column(Text)
+    attempts = Column(Integer, default=0)
+    max_attempts = Column(Integer, default=3)
+    run_at = Column(DateTime, default=datetime.utcnow)  # not claimed before this time (retry backoff)
+    locked_by = Column(String)  # worker currently running the job
+    locked_at = Column(DateTime)
+    started_at = Column(DateTime)
+    completed_at = Column(DateTime)
+    created_at = Column(DateTime, default=func.now())
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+    
+    # Relationships
+    user = relationship("User")
+    
+    __table_args__ = (
+        Index("ix_jobs_status_run_at", "status", "run_at"),
+        Index("ix_jobs_status_user_type", "status", "user_id", "type"),
+        # At most one queued or running job per (type, key): enqueueing the same work twice is a no-op
+        Index(
+            "ux_jobs_active_key", "type", "key", unique=True,
+            postgresql_where=and_(key.isnot(None), status.in_([JobStatus.QUEUED, JobStatus.RUNNING])),
+            sqlite_where=and_(key.isnot(None), status.in_([JobStatus.QUEUED, JobStatus.RUNNING]))
+        ),
+    )
@@ -0,0 +1,107 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+from sqlalchemy.orm import Session
+from models import Document, Job, JobStatus
+from jobs import create_job_once, job_handler, latest_job_for_key
+from document_processing import document_file
+from storage import INCOMING_DIR, get_blob_store, preview_key
+from worker import run_cpu_bound
+
+DOCUMENT_PREVIEW_JOB = "document_preview"
+
+PREVIEW_MEDIA_TYPE = "image/jpeg"
+PREVIEW_QUALITY = 85
+
+# Previews are keyed by content hash, so clients may cache them forever
+PREVIEW_CACHE_CONTROL = "private, max-age=31536000, immutable"
+
+# A failed render is not retried on request for this long
+PREVIEW_FAILURE_TTL = timedelta(hours=1)
+
+IMAGE_MIME_TYPES = ['image/jpeg', 'image/png']
+PDF_MIME_TYPE = 'application/pdf'
+
+def can_preview(mime_type: Optional[str]) -> bool:
+    """Whether previews can be rendered for this type with the installed tools"""
+    try:
+        import PIL  # noqa: F401
+    except ImportError:
+        return False
+    if mime_type in IMAGE_MIME_TYPES:
+        return True
+    return mime_type == PDF_MIME_TYPE and shutil.which("pdftoppm") is not None
+
+def render_preview(source_path: str, mime_type: str, width: int, output_path: str):
+    """Render the first page (or the image) at most `width` pixels wide as JPEG (CPU-bound)"""
+    from PIL import Image, ImageOps
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if mime_type == PDF_MIME_TYPE:
+            # Rasterize only page 1, already at the target width
+            prefix = os.path.join(tmp, "page")
+            subprocess.run(
+                ["pdftoppm", "-f", "1", "-l", "1", "-singlefile", "-png",
+                 "-scale-to-x", str(width), "-scale-to-y", "-1", source_path, prefix],
+                check=True, capture_output=True, timeout=120
+            )
+            source_path = f"{prefix}.png"
+
+        with Image.open(source_path) as image:
+            # JPEG sources decode directly at a reduced scale
+            image.draft("RGB", (width, width * 4))
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail((width, width * 4), Image.LANCZOS)
+            if image.mode != "RGB":
+                background = Image.new("RGB", image.size, "white")
+                background.paste(image, mask=image.convert("RGBA").getchannel("A"))
+                image = background
+            image.save(output_path, "JPEG", quality=PREVIEW_QUALITY, optimize=True)
+
+def preview_job(db: Session, document: Document, width: int) -> Optional[Job]:
+    """Pending or recently failed render of a document preview, if any"""
+    job = latest_job_for_key(db, DOCUMENT_PREVIEW_JOB, preview_key(document.content_hash, width))
+    if not job:
+        return None
+    if job.status in (JobStatus.QUEUED, JobStatus.RUNNING):
+        return job
+    if job.status == JobStatus.FAILED and job.completed_at and job.completed_at > datetime.utcnow() - PREVIEW_FAILURE_TTL:
+        return job
+    return None
+
+def enqueue_preview(db: Session, document: Document, width: int) -> Job:
+    """Queue rendering of a document preview, or return the render already pending"""
+    return create_job_once(
+        db, document.owner_id, DOCUMENT_PREVIEW_JOB,
+        preview_key(document.content_hash, width),
+        {"document_id": document.id, "width": width}
+    )
+
+@job_handler(DOCUMENT_PREVIEW_JOB)
+def generate_preview_job(db: Session, job: Job) -> Dict[str, Any]:
+    """Queue handler: render a document preview into the blob store"""
+    document = db.get(Document, job.payload["document_id"])
+    if not document or not document.content_hash:
+        return {"skipped": "document deleted"}
+
+    width = job.payload["width"]
+    key = preview_key(document.content_hash, width)
+    store = get_blob_store()
+    if store.exists(key):
+        return {"preview_key": key, "cached": True}
+
+    os.makedirs(INCOMING_DIR, exist_ok=True)
+    output_path = os.path.join(INCOMING_DIR, f"{uuid.uuid4()}.jpg")
+    try:
+        with document_file(document) as path:
+            run_cpu_bound(render_preview, path, document.mime_type, width, output_path)
+        size = os.path.getsize(output_path)
+        store.put_file(key, output_path)
+    finally:
+        if os.path.exists(output_path):
+            os.remove(output_path)
+    return {"preview_key": key, "size": size, "cached": False}
@@ -0,0 +1,60 @@
+import os
+from typing import Dict, Iterable, Optional
+from sqlalchemy.orm import Session
+from models import Subscription, SubscriptionPlan, User
+
+# Workflow executions a user may have running at once, per subscription plan
+# (users without an active plan get starter; User.max_concurrent_executions overrides)
+PLAN_EXECUTION_CONCURRENCY = {
+    SubscriptionPlan.STARTER: int(os.getenv("STARTER_EXECUTION_CONCURRENCY", "2")),
+    SubscriptionPlan.PRO: int(os.getenv("PRO_EXECUTION_CONCURRENCY", "8")),
+    SubscriptionPlan.ENTERPRISE: int(os.getenv("ENTERPRISE_EXECUTION_CONCURRENCY", "32"))
+}
+
+# Relative share of worker capacity when tenants compete for it
+PLAN_SCHEDULING_WEIGHTS = {
+    SubscriptionPlan.STARTER: 1.0,
+    SubscriptionPlan.PRO: 2.0,
+    SubscriptionPlan.ENTERPRISE: 4.0
+}
+
+# System jobs (no owning user) are scheduled as one more tenant
+SYSTEM_SCHEDULING_WEIGHT = 1.0
+
+class TenantPolicy:
+    """Scheduling weight and execution concurrency quota of one tenant"""
+
+    def __init__(self, plan: Optional[SubscriptionPlan], weight: float, max_concurrent_executions: Optional[int]):
+        self.plan = plan
+        self.weight = weight
+        self.max_concurrent_executions = max_concurrent_executions
+
+SYSTEM_POLICY = TenantPolicy(None, SYSTEM_SCHEDULING_WEIGHT, None)
+
+def tenant_policies(db: Session, user_ids: Iterable[Optional[int]]) -> Dict[Optional[int], TenantPolicy]:
+    """Policies of the given tenants; None stands for system jobs, which have no quota"""
+    user_ids = set(user_ids)
+    policies = {None: SYSTEM_POLICY} if None in user_ids else {}
+    user_ids.discard(None)
+    if not user_ids:
+        return policies
+
+    rows = db.query(User.id, User.max_concurrent_executions, Subscription.plan, Subscription.status).outerjoin(
+        Subscription, Subscription.user_id == User.id
+    ).filter(User.id.in_(user_ids)).all()
+    for user_id, override, plan, status in rows:
+        if status != "active" or plan is None:
+            if user_id in policies:
+                # A user's inactive subscription does not shadow an active one
+                continue
+            plan = SubscriptionPlan.STARTER
+        policies[user_id] = TenantPolicy(
+            plan,
+            PLAN_SCHEDULING_WEIGHTS[plan],
+            override if override is not None else PLAN_EXECUTION_CONCURRENCY[plan]
+        )
+    # Jobs of deleted users still drain, at the smallest share
+    for user_id in user_ids - set(policies):
+        plan = SubscriptionPlan.STARTER
+        policies[user_id] = TenantPolicy(plan, PLAN_SCHEDULING_WEIGHTS[plan], PLAN_EXECUTION_CONCURRENCY[plan])
+    return policies
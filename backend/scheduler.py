@@ -0,0 +1,453 @@
+import heapq
+import os
+import signal
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from database import SessionLocal, engine
+from models import Job, Workflow, WorkflowStatus
+from jobs import latest_job_for_key
+from lead_rescoring import RESCORE_INTERVAL, RESCORE_JOB_TYPE, enqueue_lead_rescore
+from workflow_queue import WORKFLOW_RUN_JOB, enqueue_workflow_run
+
+# Scheduler configuration
+SCHEDULER_SYNC_INTERVAL = float(os.getenv("SCHEDULER_SYNC_INTERVAL", "15"))
+SCHEDULER_FULL_SYNC_INTERVAL = float(os.getenv("SCHEDULER_FULL_SYNC_INTERVAL", "600"))
+SCHEDULER_MIN_INTERVAL = 60
+
+# Advisory lock key held by the leading scheduler ("LZSCHED")
+SCHEDULER_LOCK_KEY = 0x4C5A5343484544
+
+# Job keys of scheduled runs start with this, so a fire is enqueued at most once
+SCHEDULE_KEY_PREFIX = "schedule:"
+
+# Maintenance jobs the leading scheduler enqueues: (job type, interval in
+# seconds or 0 to disable, fn(db, key) queueing one run)
+PERIODIC_JOBS: List[Tuple[str, float, Callable[[Session, str], Optional[Job]]]] = [
+    (RESCORE_JOB_TYPE, RESCORE_INTERVAL, lambda db, key: enqueue_lead_rescore(db, key=key)),
+]
+
+CRON_ALIASES = {
+    "@hourly": "0 * * * *",
+    "@daily": "0 0 * * *",
+    "@weekly": "0 0 * * 0",
+    "@monthly": "0 0 1 * *",
+    "@yearly": "0 0 1 1 *"
+}
+
+class TriggerError(ValueError):
+    """Raised for an invalid trigger definition"""
+
+class CronSchedule:
+    """Five-field cron expression (minute hour day-of-month month day-of-week), in UTC"""
+
+    FIELDS = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]
+
+    def __init__(self, expression: str):
+        self.expression = expression
+        fields = CRON_ALIASES.get(expression.strip(), expression).split()
+        if len(fields) != 5:
+            raise TriggerError(f"Cron expression '{expression}' must have 5 fields")
+        self.minutes, self.hours, self.days, self.months, weekdays = (
+            self._parse(field, low, high) for field, (low, high) in zip(fields, self.FIELDS)
+        )
+        # 7 is Sunday too; Python counts Monday as 0
+        self.weekdays = {(day - 1) % 7 for day in weekdays}
+        # Standard cron: when both day fields are restricted, either may match
+        self.any_day = fields[2] == "*"
+        self.any_weekday = fields[4] == "*"
+        self.sorted_hours = sorted(self.hours)
+        self.sorted_minutes = sorted(self.minutes)
+
+    def _parse(self, field: str, low: int, high: int) -> set:
+        values = set()
+        for part in field.split(","):
+            value_range, _, step = part.partition("/")
+            try:
+                step = int(step) if step else 1
+                if value_range == "*":
+                    start, end = low, high
+                elif "-" in value_range:
+                    start, end = (int(bound) for bound in value_range.split("-", 1))
+                else:
+                    start = int(value_range)
+                    end = high if step > 1 else start
+            except ValueError:
+                raise TriggerError(f"Invalid cron field '{field}' in '{self.expression}'")
+            if step < 1 or start < low or end > high or start > end:
+                raise TriggerError(f"Cron field '{field}' out of range {low}-{high} in '{self.expression}'")
+            values.update(range(start, end + 1, step))
+        return values
+
+    def _day_matches(self, moment: datetime) -> bool:
+        day_ok = moment.day in self.days
+        weekday_ok = moment.weekday() in self.weekdays
+        if self.any_day or self.any_weekday:
+            return day_ok and weekday_ok
+        return day_ok or weekday_ok
+
+    def next_after(self, moment: datetime) -> datetime:
+        """First matching minute strictly after `moment`"""
+        candidate = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = candidate + timedelta(days=366 * 5)
+        while candidate < limit:
+            if candidate.month not in self.months:
+                year, month = divmod(candidate.month, 12)
+                candidate = candidate.replace(year=candidate.year + year, month=month + 1, day=1, hour=0, minute=0)
+            elif not self._day_matches(candidate):
+                candidate = candidate.replace(hour=0, minute=0) + timedelta(days=1)
+            elif candidate.hour not in self.hours:
+                hour = next((h for h in self.sorted_hours if h > candidate.hour), None)
+                if hour is None:
+                    candidate = candidate.replace(hour=0, minute=0) + timedelta(days=1)
+                else:
+                    candidate = candidate.replace(hour=hour, minute=self.sorted_minutes[0])
+            elif candidate.minute not in self.minutes:
+                minute = next((m for m in self.sorted_minutes if m > candidate.minute), None)
+                if minute is None:
+                    candidate = candidate.replace(minute=0) + timedelta(hours=1)
+                else:
+                    candidate = candidate.replace(minute=minute)
+            else:
+                return candidate
+        raise TriggerError(f"Cron expression '{self.expression}' never fires")
+
+class IntervalSchedule:
+    """Fires every `seconds`, aligned to `anchor` so every scheduler computes the same times"""
+
+    def __init__(self, seconds: float, anchor: datetime = datetime(1970, 1, 1)):
+        if seconds < SCHEDULER_MIN_INTERVAL:
+            raise TriggerError(f"Interval must be at least {SCHEDULER_MIN_INTERVAL} seconds")
+        self.seconds = seconds
+        self.anchor = anchor
+
+    def next_after(self, moment: datetime) -> datetime:
+        """First fire time strictly after `moment`"""
+        elapsed = (moment - self.anchor).total_seconds()
+        periods = max(int(elapsed // self.seconds) + 1, 0)
+        return self.anchor + timedelta(seconds=periods * self.seconds)
+
+class Trigger:
+    """A parsed entry of `Workflow.config["triggers"]`"""
+
+    def __init__(self, definition: Dict[str, Any]):
+        if not isinstance(definition, dict):
+            raise TriggerError("Each trigger must be an object")
+        self.definition = definition
+        self.type = definition.get("type")
+        self.input_data = definition.get("input_data") or {}
+        if self.type == "cron":
+            self.schedule = CronSchedule(str(definition.get("cron", "")))
+        elif self.type == "interval":
+            try:
+                seconds = float(definition.get("seconds") or 0) + 60 * float(definition.get("minutes") or 0)
+                anchor = datetime.fromisoformat(definition["start_at"]) if definition.get("start_at") else datetime(1970, 1, 1)
+            except (TypeError, ValueError):
+                raise TriggerError("Interval triggers take numeric 'seconds'/'minutes' and an ISO 'start_at'")
+            self.schedule = IntervalSchedule(seconds, anchor.replace(tzinfo=None))
+        else:
+            raise TriggerError(f"Unknown trigger type '{self.type}'")
+
+    def next_after(self, moment: datetime) -> datetime:
+        return self.schedule.next_after(moment)
+
+def parse_triggers(config: Optional[Dict[str, Any]]) -> List[Trigger]:
+    """Parse a workflow's trigger definitions, raising TriggerError if any is invalid"""
+    definitions = (config or {}).get("triggers") or []
+    if not isinstance(definitions, list):
+        raise TriggerError("'triggers' must be a list")
+    return [Trigger(definition) for definition in definitions]
+
+def schedule_key(workflow_id: int, index: int, fire_at: datetime) -> str:
+    """Job key of a scheduled run, unique per workflow, trigger and fire time"""
+    return f"{SCHEDULE_KEY_PREFIX}{workflow_id}:{index}:{fire_at:%Y%m%dT%H%M%S}"
+
+class SchedulerLock:
+    """Single-leader election through a session-level Postgres advisory lock
+
+    The lock lives as long as a dedicated connection, so a leader that
+    dies or loses its connection releases it automatically. Other
+    databases have no advisory locks: run a single scheduler there.
+    """
+
+    def __init__(self, key: int = SCHEDULER_LOCK_KEY):
+        self.key = key
+        self.connection = None
+        self.enabled = engine.dialect.name == 'postgresql'
+
+    def acquire(self) -> bool:
+        """Try to become leader without blocking"""
+        if not self.enabled:
+            return True
+        if self.connection is None:
+            self.connection = engine.connect()
+        try:
+            acquired = self.connection.execute(select(func.pg_try_advisory_lock(self.key))).scalar()
+            self.connection.commit()
+        except Exception:
+            self.release()
+            raise
+        return bool(acquired)
+
+    def held(self) -> bool:
+        """Whether the lock's connection (and so the lock) is still alive"""
+        if not self.enabled:
+            return True
+        try:
+            self.connection.execute(select(1))
+            self.connection.commit()
+            return True
+        except Exception:
+            self.release()
+            return False
+
+    def release(self):
+        if self.connection is not None:
+            try:
+                self.connection.close()
+            finally:
+                self.connection = None
+
+class WorkflowScheduler:
+    """Enqueues workflow runs when their cron/interval triggers fire
+
+    Next fire times live in a heap, so each wake-up costs O(log n) per due
+    trigger rather than a scan of all workflows. The table is only read
+    incrementally (workflows updated since the last sync), plus a periodic
+    full sync to drop deleted workflows. Heap entries of a rescheduled
+    workflow are invalidated lazily through a per-workflow version.
+    """
+
+    def __init__(self, sync_interval: float = SCHEDULER_SYNC_INTERVAL, full_sync_interval: float = SCHEDULER_FULL_SYNC_INTERVAL):
+        self.sync_interval = sync_interval
+        self.full_sync_interval = full_sync_interval
+        self.heap: List[Tuple[datetime, int, int, int]] = []
+        self.schedules: Dict[int, Tuple[int, List[Dict[str, Any]], List[Trigger]]] = {}
+        self.versions = 0
+        self.synced_at: Optional[datetime] = None
+        self.full_synced_at: Optional[float] = None
+        self.fired = 0
+        self.jitter = deque(maxlen=10000)
+
+    def schedule(self, workflow_id: int, config: Optional[Dict[str, Any]], now: datetime):
+        """(Re)schedule a workflow's triggers; an empty or invalid config unschedules it"""
+        definitions = (config or {}).get("triggers") or []
+        current = self.schedules.get(workflow_id)
+        if current and current[1] == definitions:
+            return
+        try:
+            triggers = parse_triggers(config)
+        except TriggerError as e:
+            print(f"Scheduler skipping workflow {workflow_id}: {e}")
+            triggers = []
+        if not triggers:
+            self.schedules.pop(workflow_id, None)
+            return
+
+        self.versions += 1
+        self.schedules[workflow_id] = (self.versions, definitions, triggers)
+        for index, trigger in enumerate(triggers):
+            heapq.heappush(self.heap, (trigger.next_after(now), workflow_id, index, self.versions))
+        if len(self.heap) > 2 * len(self.schedules) + 1000:
+            self.compact()
+
+    def compact(self):
+        """Drop heap entries invalidated by rescheduling"""
+        self.heap = [
+            entry for entry in self.heap
+            if entry[1] in self.schedules and self.schedules[entry[1]][0] == entry[3]
+        ]
+        heapq.heapify(self.heap)
+
+    def sync(self, db: Session, now: datetime):
+        """Load trigger changes from the database"""
+        full = self.full_synced_at is None or time.monotonic() - self.full_synced_at >= self.full_sync_interval
+        query = db.query(Workflow.id, Workflow.status, Workflow.config)
+        if full:
+            query = query.filter(Workflow.status == WorkflowStatus.ACTIVE)
+        else:
+            # Overlap the previous sync to tolerate clock skew between app and database
+            query = query.filter(Workflow.updated_at >= self.synced_at - timedelta(seconds=2 * self.sync_interval))
+        seen = set()
+        for workflow_id, status, config in query.yield_per(1000):
+            seen.add(workflow_id)
+            self.schedule(workflow_id, config if status == WorkflowStatus.ACTIVE else None, now)
+        if full:
+            for workflow_id in set(self.schedules) - seen:
+                del self.schedules[workflow_id]
+            self.full_synced_at = time.monotonic()
+        self.synced_at = now
+        db.commit()
+
+    def fire(self, db: Session, workflow_id: int, index: int, fire_at: datetime) -> Optional[Job]:
+        """Enqueue one scheduled run unless it was already enqueued"""
+        workflow = db.get(Workflow, workflow_id)
+        if not workflow or workflow.status != WorkflowStatus.ACTIVE:
+            self.schedules.pop(workflow_id, None)
+            return None
+        key = schedule_key(workflow_id, index, fire_at)
+        if latest_job_for_key(db, WORKFLOW_RUN_JOB, key):
+            return None
+
+        trigger = self.schedules[workflow_id][2][index]
+        jitter = (datetime.utcnow() - fire_at).total_seconds()
+        job = enqueue_workflow_run(db, workflow, trigger.input_data, key=key, trigger={
+            "index": index,
+            "type": trigger.type,
+            "scheduled_at": fire_at.isoformat(),
+            "jitter_seconds": round(jitter, 4)
+        })
+        self.fired += 1
+        self.jitter.append(jitter)
+        return job
+
+    def run_due(self, db: Session, now: datetime) -> int:
+        """Fire every trigger due by `now`, returning how many runs were enqueued"""
+        fired = 0
+        while self.heap and self.heap[0][0] <= now:
+            fire_at, workflow_id, index, version = heapq.heappop(self.heap)
+            schedule = self.schedules.get(workflow_id)
+            if not schedule or schedule[0] != version:
+                continue
+            try:
+                if self.fire(db, workflow_id, index, fire_at):
+                    fired += 1
+            except Exception as e:
+                db.rollback()
+                print(f"Scheduler failed to enqueue workflow {workflow_id}: {e}")
+            if workflow_id in self.schedules:
+                # Runs missed while the scheduler was down are coalesced into the one just fired
+                trigger = self.schedules[workflow_id][2][index]
+                heapq.heappush(self.heap, (trigger.next_after(max(fire_at, now)), workflow_id, index, version))
+        return fired
+
+    def next_wake(self, now: datetime) -> float:
+        """Seconds to sleep until the next fire or sync"""
+        wake = self.sync_interval
+        if self.heap:
+            wake = min(wake, (self.heap[0][0] - now).total_seconds())
+        return max(wake, 0.0)
+
+    def jitter_summary(self) -> Dict[str, Any]:
+        """Lateness of recent enqueues relative to their fire time"""
+        if not self.jitter:
+            return {"fired": self.fired}
+        values = np.array(self.jitter)
+        return {
+            "fired": self.fired,
+            "jitter_p50_seconds": round(float(np.percentile(values, 50)), 4),
+            "jitter_p99_seconds": round(float(np.percentile(values, 99)), 4),
+            "jitter_max_seconds": round(float(values.max()), 4)
+        }
+
+class PeriodicJobs:
+    """Enqueues the PERIODIC_JOBS maintenance jobs for the job workers
+
+    Fire times are aligned like interval triggers and embedded in the job
+    key, so a new leader does not enqueue a run its predecessor already
+    did. Runs missed while no scheduler was up are coalesced into one.
+    """
+
+    def __init__(self, jobs: Optional[List[Tuple[str, float, Callable[[Session, str], Optional[Job]]]]] = None):
+        self.jobs = [
+            (job_type, IntervalSchedule(interval), enqueue)
+            for job_type, interval, enqueue in (PERIODIC_JOBS if jobs is None else jobs) if interval
+        ]
+        self.next_fire: Dict[str, datetime] = {}
+
+    def run_due(self, db: Session, now: datetime) -> int:
+        """Enqueue each job whose fire time has come, returning how many were enqueued"""
+        fired = 0
+        for job_type, schedule, enqueue in self.jobs:
+            fire_at = self.next_fire.get(job_type)
+            if fire_at is None:
+                # Start with the fire time just passed, in case it was missed
+                fire_at = schedule.next_after(now - timedelta(seconds=schedule.seconds))
+            if fire_at > now:
+                continue
+            key = f"{SCHEDULE_KEY_PREFIX}{job_type}:{fire_at:%Y%m%dT%H%M%S}"
+            try:
+                if not latest_job_for_key(db, job_type, key):
+                    enqueue(db, key)
+                    fired += 1
+            except Exception as e:
+                db.rollback()
+                print(f"Scheduler failed to enqueue {job_type}: {e}")
+            self.next_fire[job_type] = schedule.next_after(now)
+        return fired
+
+    def next_wake(self, now: datetime) -> float:
+        """Seconds until the next periodic job is due"""
+        if not self.next_fire:
+            return 0.0 if self.jobs else float("inf")
+        return max(min((fire_at - now).total_seconds() for fire_at in self.next_fire.values()), 0.0)
+
+def scheduler_metrics(db: Session, window: timedelta = timedelta(hours=1)) -> Dict[str, Any]:
+    """Scheduled runs enqueued within the window and how late they were"""
+    since = datetime.utcnow() - window
+    payloads = db.query(Job.payload).filter(
+        Job.type == WORKFLOW_RUN_JOB,
+        Job.key.like(f"{SCHEDULE_KEY_PREFIX}%"),
+        Job.created_at >= since
+    ).all()
+    jitters = [payload["trigger"]["jitter_seconds"] for payload, in payloads if payload and payload.get("trigger")]
+    metrics = {"generated_at": datetime.utcnow(), "window_seconds": int(window.total_seconds()), "fired": len(jitters)}
+    if jitters:
+        metrics.update({
+            "jitter_p50_seconds": round(float(np.percentile(jitters, 50)), 4),
+            "jitter_p95_seconds": round(float(np.percentile(jitters, 95)), 4),
+            "jitter_p99_seconds": round(float(np.percentile(jitters, 99)), 4),
+            "jitter_max_seconds": round(float(max(jitters)), 4)
+        })
+    return metrics
+
+def run_scheduler(standby_interval: float = 5.0, stop: Optional[threading.Event] = None):
+    """Run the scheduler until SIGINT/SIGTERM, as leader or standing by for the lock"""
+    if stop is None:
+        stop = threading.Event()
+        signal.signal(signal.SIGINT, lambda *_: stop.set())
+        signal.signal(signal.SIGTERM, lambda *_: stop.set())
+
+    lock = SchedulerLock()
+    scheduler = None
+    last_report = time.monotonic()
+    try:
+        while not stop.is_set():
+            if scheduler is None:
+                if not lock.acquire():
+                    stop.wait(standby_interval)
+                    continue
+                print("Scheduler acquired leadership")
+                scheduler = WorkflowScheduler()
+                periodic = PeriodicJobs()
+                next_sync = 0.0
+            elif not lock.held():
+                print("Scheduler lost leadership")
+                scheduler = None
+                continue
+
+            db = SessionLocal()
+            try:
+                if time.monotonic() >= next_sync:
+                    scheduler.sync(db, datetime.utcnow())
+                    next_sync = time.monotonic() + scheduler.sync_interval
+                scheduler.run_due(db, datetime.utcnow())
+                periodic.run_due(db, datetime.utcnow())
+            except Exception as e:
+                db.rollback()
+                print(f"Scheduler error: {e}")
+            finally:
+                db.close()
+
+            if time.monotonic() - last_report >= 60:
+                print(f"Scheduler: {len(scheduler.schedules)} workflows, {scheduler.jitter_summary()}")
+                last_report = time.monotonic()
+            now = datetime.utcnow()
+            stop.wait(min(scheduler.next_wake(now), periodic.next_wake(now), max(next_sync - time.monotonic(), 0.0)))
+    finally:
+        lock.release()
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field, EmailStr
 from typing import Optional, List, Dict, Any
-from datetime import datetime
+from datetime import date, datetime
 from enum import Enum
 
 # Enums
@@ -48,6 +48,12 @@ class SubscriptionPlanEnum(str, Enum):
     PRO = "pro"
     ENTERPRISE = "enterprise"
 
+class JobStatusEnum(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
 # Base Schemas
 class BaseSchema(BaseModel):
     class Config:
@@ -155,6 +161,50 @@ class WorkflowExecutionResponse(WorkflowExecutionBase):
     started_at: datetime
     completed_at: Optional[datetime] = None
     duration: Optional[float] = None
+    cache_hits: Optional[int] = None
+    cache_misses: Optional[int] = None
+
+class WorkflowExecutionSummary(BaseSchema):
+    id: int
+    workflow_id: int
+    status: str
+    started_at: datetime
+    completed_at: Optional[datetime] = None
+    duration: Optional[float] = None
+    tokens_used: Optional[int] = None
+    ai_model_used: Optional[str] = None
+    error_message: Optional[str] = None
+    cache_hits: Optional[int] = None
+    cache_misses: Optional[int] = None
+    archived_at: Optional[datetime] = None
+
+class ExecutionPage(BaseSchema):
+    executions: List[WorkflowExecutionSummary]
+    next_cursor: Optional[str] = None
+
+class ExecutionStats(BaseModel):
+    executions: int
+    completed: int
+    failed: int
+    in_progress: int
+    success_rate: float
+    duration_p50_seconds: Optional[float] = None
+    duration_p95_seconds: Optional[float] = None
+    tokens_used: int
+    avg_tokens: float
+    cache_hits: int
+
+class StepCacheStats(BaseModel):
+    entries: int
+    live_entries: int
+    size_bytes: int
+    hits: int
+    misses: int
+    hit_rate: float
+    tokens_saved: int
+
+class WorkflowRunRequest(BaseModel):
+    input_data: Dict[str, Any] = {}
 
 # Document Schemas
 class DocumentBase(BaseSchema):
@@ -175,10 +225,15 @@ class DocumentUpdate(BaseModel):
     processed_at: Optional[datetime] = None
     error_message: Optional[str] = None
 
+class DocumentBatchRequest(BaseModel):
+    document_ids: Optional[List[int]] = None
+    all_processing: bool = False
+
 class DocumentResponse(DocumentBase):
     id: int
     owner_id: int
     status: DocumentStatusEnum
+    content_hash: Optional[str] = None
     extracted_data: Optional[Dict[str, Any]] = None
     confidence: Optional[float] = None
     processed_at: Optional[datetime] = None
@@ -413,6 +468,174 @@ class FileUploadResponse(BaseSchema):
     mime_type: str
     file_path: str
     upload_id: str
+    content_hash: Optional[str] = None
+
+class UploadSessionCreate(BaseModel):
+    filename: str
+    content_type: str
+    total_size: int = Field(..., gt=0)
+    sha256: Optional[str] = Field(None, pattern="^[0-9a-fA-F]{64}$")
+
+class UploadSessionComplete(BaseModel):
+    sha256: Optional[str] = Field(None, pattern="^[0-9a-fA-F]{64}$")
+
+class UploadSessionResponse(BaseSchema):
+    id: str
+    filename: str
+    content_type: str
+    total_size: int
+    offset: int
+    chunk_size: int
+    max_chunk_size: int
+    expires_at: datetime
+
+# Job Schemas
+class JobResponse(BaseSchema):
+    id: int
+    user_id: Optional[int] = None
+    parent_id: Optional[int] = None
+    type: str
+    status: JobStatusEnum
+    progress: int
+    total: Optional[int] = None
+    result: Optional[Dict[str, Any]] = None
+    error_message: Optional[str] = None
+    attempts: int
+    max_attempts: Optional[int] = None
+    run_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+    created_at: datetime
+    updated_at: datetime
+
+class WorkflowRunResponse(BaseModel):
+    execution_id: int
+    job: JobResponse
+
+class JobMetricsBucket(BaseModel):
+    start: datetime
+    completed: int = 0
+    failed: int = 0
+    wait_p50_seconds: Optional[float] = None
+    wait_p95_seconds: Optional[float] = None
+
+class JobTypeMetrics(BaseModel):
+    type: str
+    queued: int = 0
+    ready: int = 0
+    delayed: int = 0
+    running: int = 0
+    completed: int = 0
+    failed: int = 0
+    oldest_ready_seconds: Optional[float] = None
+    wait_p50_seconds: Optional[float] = None
+    wait_p95_seconds: Optional[float] = None
+    run_p50_seconds: Optional[float] = None
+    run_p95_seconds: Optional[float] = None
+    throughput_per_minute: float = 0.0
+    timeline: Optional[List[JobMetricsBucket]] = None
+
+class JobQueueMetrics(BaseModel):
+    generated_at: datetime
+    window_seconds: int
+    types: List[JobTypeMetrics]
+
+class TenantQueueStats(BaseModel):
+    user_id: Optional[int] = None
+    plan: Optional[str] = None
+    weight: float
+    max_concurrent_executions: Optional[int] = None
+    running_executions: int
+    at_quota: bool
+    running: int
+    queued: int
+    ready: int
+    oldest_ready_seconds: Optional[float] = None
+    started: int
+    wait_p50_seconds: Optional[float] = None
+    wait_p95_seconds: Optional[float] = None
+    wait_max_seconds: Optional[float] = None
+
+class TenantQueueMetrics(BaseModel):
+    generated_at: datetime
+    window_seconds: int
+    tenants: List[TenantQueueStats]
+
+class SchedulerMetrics(BaseModel):
+    generated_at: datetime
+    window_seconds: int
+    fired: int
+    jitter_p50_seconds: Optional[float] = None
+    jitter_p95_seconds: Optional[float] = None
+    jitter_p99_seconds: Optional[float] = None
+    jitter_max_seconds: Optional[float] = None
+
+class ExtractionCacheStats(BaseModel):
+    extractor_version: str
+    current: bool
+    entries: int
+    hits: int
+    misses: int
+    hit_rate: float
+
+# Search Schemas
+class SearchResult(BaseSchema):
+    entity_type: str
+    entity_id: int
+    title: str
+    snippet: Optional[str] = None
+    rank: float
+
+class SearchResponse(BaseSchema):
+    results: List[SearchResult]
+    next_cursor: Optional[str] = None
+
+# Usage Schemas
+class UsageBudgetUpdate(BaseModel):
+    monthly_tokens: Optional[int] = Field(None, ge=1)
+    monthly_cost: Optional[float] = Field(None, gt=0)
+    alert_thresholds: Optional[List[float]] = None
+
+class UsageBudgetResponse(BaseSchema):
+    monthly_tokens: Optional[int] = None
+    monthly_cost: Optional[float] = None
+    alert_thresholds: Optional[List[float]] = None
+    updated_at: Optional[datetime] = None
+
+class UsageAlert(BaseModel):
+    metric: str
+    level: str
+    threshold: float
+    used: float
+    limit: float
+    message: str
+
+class UsageModelTotal(BaseModel):
+    model: str
+    calls: int
+    tokens: int
+    cost: float
+
+class UsageDayTotal(BaseModel):
+    day: date
+    calls: int
+    tokens: int
+    cost: float
+
+class UsageSummary(BaseSchema):
+    period_start: date
+    period_end: date
+    calls: int
+    tokens: int
+    cost: float
+    by_model: List[UsageModelTotal]
+    by_day: List[UsageDayTotal]
+    month_tokens: int
+    month_cost: float
+    projected_month_tokens: int
+    projected_month_cost: float
+    budget: Optional[UsageBudgetResponse] = None
+    alerts: List[UsageAlert]
 
 # Dashboard Schemas
 class DashboardStats(BaseSchema):
@@ -430,5 +653,5 @@ class DashboardStats(BaseSchema):
 class DashboardResponse(BaseSchema):
     stats: DashboardStats
     recent_workflows: List[WorkflowResponse]
-    recent_executions: List[WorkflowExecutionResponse]
+    recent_executions: List[WorkflowExecutionSummary]
     predictions: Dict[str, Any]
\ No newline at end of file
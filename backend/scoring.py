@@ -0,0 +1,268 @@
+import warnings
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence, Union
+import numpy as np
+import pandas as pd
+from models import LeadStatus
+from lead_value_model import VALUE_MODEL_SOURCES, LeadValueModel, load_lead_value_model
+
+# Scoring tables (built once, shared by the scalar and batch paths)
+FREE_EMAIL_DOMAINS = ['gmail.com', 'yahoo.com', 'outlook.com']
+
+SOURCE_SCORES = {
+    'referral': 30,
+    'linkedin': 25,
+    'website': 20,
+    'email campaign': 15,
+    'cold call': 10
+}
+DEFAULT_SOURCE_SCORE = 10
+
+# Days since last activity at which the activity bonus or insight changes:
+# recent (<= 3), this week (<= 7), this month (<= 30), inactive (> 30)
+RECENT_ACTIVITY_DAYS = 3
+WEEK_ACTIVITY_DAYS = 7
+MONTH_ACTIVITY_DAYS = 30
+ACTIVITY_BUCKET_DAYS = (RECENT_ACTIVITY_DAYS, WEEK_ACTIVITY_DAYS, MONTH_ACTIVITY_DAYS)
+
+# Minimum scores for hot/warm leads (same cut-offs as the conversion insights)
+HOT_LEAD_SCORE = 80
+WARM_LEAD_SCORE = 60
+
+# Insight codes, in the order insights are reported. Each code is a bit in
+# the `insight_flags` column returned by lead_insight_flags.
+INSIGHT_MESSAGES = {
+    'high_conversion': "Forte probabilité de conversion (85%)",
+    'moderate_conversion': "Probabilité modérée de conversion (60%)",
+    'needs_nurturing': "Nécessite du nurturing avant conversion",
+    'enterprise_prospect': "Prospect d'entreprise - potentiel élevé",
+    'referral': "Recommandé par un client - très qualifié",
+    'linkedin': "Contact professionnel actif",
+    'website': "Intérêt démontré par visite du site",
+    'recent_activity': "Activité récente - contacter rapidement",
+    'active_this_week': "Activité cette semaine - bon timing",
+    'inactive': "Inactif depuis longtemps - relance nécessaire"
+}
+INSIGHT_CODES = list(INSIGHT_MESSAGES)
+INSIGHT_BITS = {code: 1 << index for index, code in enumerate(INSIGHT_CODES)}
+
+# Per-source lookups shared by the batch and single-lead feature extraction
+SOURCE_CODES = {source: index for index, source in enumerate(VALUE_MODEL_SOURCES)}
+SOURCE_INSIGHT_BITS = {code: INSIGHT_BITS[code] for code in ['referral', 'linkedin', 'website']}
+
+LeadRecords = Union[pd.DataFrame, Sequence[Dict[str, Any]]]
+LeadFeatures = Dict[str, np.ndarray]
+
+def lead_frame(leads: LeadRecords) -> pd.DataFrame:
+    """Build a scoring frame from lead dicts or an existing DataFrame"""
+    frame = leads if isinstance(leads, pd.DataFrame) else pd.DataFrame(list(leads))
+    for column in ['company', 'email', 'phone', 'source', 'last_activity']:
+        if column not in frame:
+            frame = frame.assign(**{column: None})
+    return frame
+
+def _is_truthy(column: pd.Series) -> np.ndarray:
+    """Vectorized Python truthiness for optional columns (NaN counts as missing)"""
+    values = column.to_numpy()
+    if values.dtype != object:
+        return ~pd.isna(values)
+    # NaN is truthy but never equal to itself; both passes stay in C, unlike pd.isna on objects
+    return values.astype(bool) & (values == values)
+
+def _is_free_email(column: pd.Series, has_email: np.ndarray) -> np.ndarray:
+    """Whether the domain (text after the first `@`, any case) is a free mail provider
+
+    Domains are factorized, so the free-mail test runs once per distinct domain.
+    """
+    emails = column.to_numpy()
+    domains = np.full(len(emails), '', dtype=object)
+    domains[has_email] = [email.partition('@')[2] for email in emails[has_email]]
+    codes, uniques = pd.factorize(domains)
+    # A second `@` ends the domain; cutting it on the uniques keeps the per-row work to one partition
+    domains = [domain.partition('@')[0].lower() for domain in uniques]
+    return _source_lookup(codes, domains, dict.fromkeys(FREE_EMAIL_DOMAINS, True), False)
+
+def _parse_activity(column: pd.Series, has_activity: np.ndarray) -> np.ndarray:
+    """last_activity as naive UTC datetime64 (NaT when absent)
+
+    Naive ISO strings and datetimes are parsed by NumPy in C; anything
+    carrying a timezone (NumPy warns about those) goes through pandas'
+    ISO8601 parser, which accepts a trailing 'Z' as well as explicit offsets.
+    """
+    values = column.to_numpy()
+    if values.dtype.kind == 'M':
+        return values.astype('datetime64[us]')
+    activity = np.full(len(values), np.datetime64('NaT'), dtype='datetime64[us]')
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            activity[has_activity] = np.array(values[has_activity], dtype='datetime64[us]')
+        return activity
+    except (ValueError, TypeError, Warning):
+        parsed = pd.to_datetime(column.where(has_activity), utc=True, format='ISO8601').dt.tz_localize(None)
+        return parsed.to_numpy(dtype='datetime64[us]')
+
+def _days_since_activity(column: pd.Series, has_activity: np.ndarray, now: Optional[datetime]) -> np.ndarray:
+    """Whole days since last_activity (NaN when absent), like timedelta.days
+
+    Naive timestamps are UTC, matching how last_activity is stored.
+    """
+    elapsed = np.datetime64(now or datetime.utcnow(), 'us') - _parse_activity(column, has_activity)
+    return np.floor(elapsed / np.timedelta64(1, 'D'))
+
+def _source_lookup(codes: np.ndarray, sources: List[str], table: Dict[str, Any], default: Any) -> np.ndarray:
+    """Map factorized sources through a lookup table without touching every row in Python"""
+    values = np.array([table.get(source, default) for source in sources] + [default])
+    # pd.factorize marks missing values with -1, which indexes the trailing default
+    return values[codes]
+
+def lead_features(frame: pd.DataFrame, now: Optional[datetime] = None) -> LeadFeatures:
+    """Extract the scoring features of a frame once, as NumPy columns"""
+    has_email = _is_truthy(frame['email'])
+    # Missing sources get code -1, which _source_lookup maps to the default
+    codes, uniques = pd.factorize(frame['source'].to_numpy())
+    sources = [str(source).lower() for source in uniques]
+    return {
+        'has_company': _is_truthy(frame['company']),
+        'has_email': has_email,
+        'free_email': _is_free_email(frame['email'], has_email),
+        'has_phone': _is_truthy(frame['phone']),
+        'source_score': _source_lookup(codes, sources, SOURCE_SCORES, DEFAULT_SOURCE_SCORE),
+        'source_code': _source_lookup(codes, sources, SOURCE_CODES, -1),
+        'source_insight': _source_lookup(codes, sources, SOURCE_INSIGHT_BITS, 0),
+        'days_since_activity': _days_since_activity(frame['last_activity'], _is_truthy(frame['last_activity']), now)
+    }
+
+def _is_set(value: Any) -> bool:
+    """Python truthiness of one optional value (NaN counts as missing), as _is_truthy"""
+    return value is not None and value == value and bool(value)
+
+def _record_days_since_activity(value: Any, now: Optional[datetime]) -> float:
+    """Whole days since one last_activity value (NaN when absent), as _days_since_activity"""
+    if not _is_set(value):
+        return np.nan
+    activity = datetime.fromisoformat(value.replace('Z', '+00:00')) if isinstance(value, str) else value
+    if activity.tzinfo is not None:
+        activity = activity.astimezone(timezone.utc).replace(tzinfo=None)
+    return float(((now or datetime.utcnow()) - activity).days)
+
+def record_features(lead: Dict[str, Any], now: Optional[datetime] = None) -> LeadFeatures:
+    """Extract the scoring features of a single lead dict, as one-element columns
+
+    Same features as lead_features, without building a one-row DataFrame.
+    """
+    email = lead.get('email')
+    has_email = _is_set(email)
+    domain = email.partition('@')[2].partition('@')[0].lower() if has_email else ''
+    source = lead.get('source')
+    source = str(source).lower() if _is_set(source) else ''
+    return {
+        'has_company': np.array([_is_set(lead.get('company'))]),
+        'has_email': np.array([has_email]),
+        'free_email': np.array([domain in FREE_EMAIL_DOMAINS]),
+        'has_phone': np.array([_is_set(lead.get('phone'))]),
+        'source_score': np.array([SOURCE_SCORES.get(source, DEFAULT_SOURCE_SCORE)]),
+        'source_code': np.array([SOURCE_CODES.get(source, -1)]),
+        'source_insight': np.array([SOURCE_INSIGHT_BITS.get(source, 0)]),
+        'days_since_activity': np.array([_record_days_since_activity(lead.get('last_activity'), now)])
+    }
+
+def record_input_score(lead: Dict[str, Any], default: int) -> float:
+    """A lead dict's existing `score`, or `default` when missing (as _input_scores)"""
+    score = lead.get('score')
+    return float(default) if score is None or score != score else float(score)
+
+def _input_scores(frame: pd.DataFrame, default: int) -> np.ndarray:
+    """Existing `score` column, or the scalar path's default when absent"""
+    if 'score' not in frame:
+        return np.full(len(frame), float(default))
+    return frame['score'].fillna(default).to_numpy(dtype=float)
+
+def scores_from_features(features: LeadFeatures) -> np.ndarray:
+    """Calculate lead scores from extracted features"""
+    score = np.where(features['has_company'], 20, 0)
+    score += np.where(features['has_email'], np.where(features['free_email'], 10, 25), 0)
+    score += np.where(features['has_phone'], 15, 0)
+    score += features['source_score'].astype(int)
+
+    days = features['days_since_activity']
+    score += np.select([days <= WEEK_ACTIVITY_DAYS, days <= MONTH_ACTIVITY_DAYS], [20, 10], 0)
+
+    return np.minimum(score, 100)
+
+def values_from_features(features: LeadFeatures, scores: np.ndarray, model: Optional[LeadValueModel] = None) -> np.ndarray:
+    """Predict lead values from extracted features and scores"""
+    return (model or load_lead_value_model()).predict(features, scores)
+
+def insight_flags_from_features(features: LeadFeatures, scores: np.ndarray) -> np.ndarray:
+    """Compute insight bit flags from extracted features and scores"""
+    scores = np.asarray(scores, dtype=float)
+    bits = INSIGHT_BITS
+
+    flags = np.select(
+        [scores >= HOT_LEAD_SCORE, scores >= WARM_LEAD_SCORE],
+        [bits['high_conversion'], bits['moderate_conversion']],
+        bits['needs_nurturing']
+    )
+    flags |= np.where(features['has_company'], bits['enterprise_prospect'], 0)
+    flags |= features['source_insight'].astype(int)
+
+    days = features['days_since_activity']
+    flags |= np.select(
+        [days <= RECENT_ACTIVITY_DAYS, days <= WEEK_ACTIVITY_DAYS, days > MONTH_ACTIVITY_DAYS],
+        [bits['recent_activity'], bits['active_this_week'], bits['inactive']],
+        0
+    )
+    return flags
+
+def lead_statuses(scores: np.ndarray) -> np.ndarray:
+    """Classify scores into hot/warm/cold lead statuses"""
+    scores = np.asarray(scores, dtype=float)
+    statuses = np.array([LeadStatus.COLD, LeadStatus.WARM, LeadStatus.HOT], dtype=object)
+    return statuses[np.select([scores >= HOT_LEAD_SCORE, scores >= WARM_LEAD_SCORE], [2, 1], 0)]
+
+def lead_scores(frame: pd.DataFrame, now: Optional[datetime] = None) -> np.ndarray:
+    """Calculate lead scores for a frame of leads"""
+    return scores_from_features(lead_features(frame, now))
+
+def lead_values(frame: pd.DataFrame, scores: Optional[np.ndarray] = None) -> np.ndarray:
+    """Predict lead values for a frame of leads
+
+    `scores` defaults to the frame's `score` column (50 when missing).
+    """
+    if scores is None:
+        scores = _input_scores(frame, 50)
+    return values_from_features(lead_features(frame), scores)
+
+def lead_insight_flags(frame: pd.DataFrame, scores: Optional[np.ndarray] = None, now: Optional[datetime] = None) -> np.ndarray:
+    """Compute insight bit flags for a frame of leads
+
+    `scores` defaults to the frame's `score` column (0 when missing).
+    """
+    if scores is None:
+        scores = _input_scores(frame, 0)
+    return insight_flags_from_features(lead_features(frame, now), scores)
+
+def insight_codes(flags: int) -> List[str]:
+    """Decode insight bit flags into codes, in reporting order"""
+    return [code for code in INSIGHT_CODES if flags & INSIGHT_BITS[code]]
+
+def insight_messages(flags: int) -> List[str]:
+    """Decode insight bit flags into the messages shown to users"""
+    return [INSIGHT_MESSAGES[code] for code in insight_codes(flags)]
+
+def score_lead_frame(leads: LeadRecords, now: Optional[datetime] = None) -> pd.DataFrame:
+    """Score a batch of leads with vectorized operations
+
+    Returns `score`, `predicted_value` and `insight_flags` columns (both
+    from the computed score), matching calculate_lead_score, predict_lead_value
+    and generate_ai_insights applied to each lead dict.
+    """
+    frame = lead_frame(leads)
+    features = lead_features(frame, now)
+    scores = scores_from_features(features)
+    return pd.DataFrame({
+        'score': scores,
+        'predicted_value': values_from_features(features, scores),
+        'insight_flags': insight_flags_from_features(features, scores)
+    }, index=frame.index)
@@ -0,0 +1,304 @@
+import base64
+import json
+import re
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import cast, func, or_, text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Query, Session
+from models import Lead
+
+# Text search configuration (content is mixed French/English, so no stemming)
+TS_CONFIG = "simple"
+
+# Searchable entities: table, owner column, title column and the columns
+# concatenated into the indexed document. `kind` keeps FTS5 rowids unique
+# across tables (rowid = id * len(SEARCH_SOURCES) + kind).
+SEARCH_SOURCES = {
+    "lead": {
+        "kind": 0,
+        "table": "leads",
+        "owner_column": "owner_id",
+        "title": "name",
+        "snippet": "company",
+        "columns": ["name", "company", "email"],
+    },
+    "ticket": {
+        "kind": 1,
+        "table": "support_tickets",
+        "owner_column": "customer_id",
+        "title": "subject",
+        "snippet": "description",
+        "columns": ["subject", "description"],
+    },
+    "document": {
+        "kind": 2,
+        "table": "documents",
+        "owner_column": "owner_id",
+        "title": "name",
+        "snippet": "type",
+        "columns": ["name", "extracted_data"],
+    },
+    "workflow": {
+        "kind": 3,
+        "table": "workflows",
+        "owner_column": "owner_id",
+        "title": "name",
+        "snippet": "description",
+        "columns": ["name", "description"],
+    },
+}
+
+SNIPPET_LENGTH = 160
+FTS_TABLE = "search_index"
+
+# Lead columns covered by pg_trgm fuzzy lookup
+LEAD_TRIGRAM_COLUMNS = ["name", "company", "email"]
+
+class SearchUnavailable(Exception):
+    """Raised when full-text search has no implementation for the database backend"""
+
+def _pg_document_expression(source: Dict[str, Any]) -> str:
+    """Build the tsvector expression shared by the GIN index and the query"""
+    parts = []
+    for column in source["columns"]:
+        if column == "extracted_data":
+            parts.append(f"coalesce({column}::text, '')")
+        else:
+            parts.append(f"coalesce({column}, '')")
+    document = " || ' ' || ".join(parts)
+    return f"to_tsvector('{TS_CONFIG}'::regconfig, {document})"
+
+def _sqlite_body_expression(source: Dict[str, Any], row: str) -> str:
+    """Build the FTS5 body expression for a trigger or backfill row alias"""
+    parts = [f"coalesce({row}.{column}, '')" for column in source["columns"]]
+    return " || ' ' || ".join(parts)
+
+def create_search_indexes(engine: Engine):
+    """Create the full-text search indexes for the current database backend"""
+    if engine.dialect.name == "postgresql":
+        _create_postgres_indexes(engine)
+    elif engine.dialect.name == "sqlite":
+        _create_sqlite_fts(engine)
+
+def _create_postgres_indexes(engine: Engine):
+    """Create expression GIN indexes over each searchable table"""
+    with engine.begin() as conn:
+        for entity_type, source in SEARCH_SOURCES.items():
+            conn.execute(text(
+                f"CREATE INDEX IF NOT EXISTS ix_{source['table']}_search "
+                f"ON {source['table']} USING GIN ({_pg_document_expression(source)})"
+            ))
+
+        # Fuzzy lookup on lead identity columns and containment on JSON attributes
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        for column in LEAD_TRIGRAM_COLUMNS:
+            conn.execute(text(
+                f"CREATE INDEX IF NOT EXISTS ix_leads_{column}_trgm "
+                f"ON leads USING GIN ({column} gin_trgm_ops)"
+            ))
+        for column in ["tags", "custom_fields"]:
+            conn.execute(text(
+                f"CREATE INDEX IF NOT EXISTS ix_leads_{column}_jsonb "
+                f"ON leads USING GIN ((CAST({column} AS JSONB)) jsonb_path_ops)"
+            ))
+
+def _create_sqlite_fts(engine: Engine):
+    """Create the FTS5 shadow index and the triggers keeping it in sync"""
+    stride = len(SEARCH_SOURCES)
+    with engine.begin() as conn:
+        exists = conn.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"
+        ), {"name": FTS_TABLE}).first()
+        if not exists:
+            conn.execute(text(
+                f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+                "title, body, entity_type UNINDEXED, entity_id UNINDEXED, owner_id UNINDEXED)"
+            ))
+
+        for entity_type, source in SEARCH_SOURCES.items():
+            table = source["table"]
+            kind = source["kind"]
+
+            def insert_row(row: str) -> str:
+                return (
+                    f"INSERT INTO {FTS_TABLE}(rowid, title, body, entity_type, entity_id, owner_id) "
+                    f"VALUES ({row}.id * {stride} + {kind}, {row}.{source['title']}, "
+                    f"{_sqlite_body_expression(source, row)}, '{entity_type}', {row}.id, "
+                    f"{row}.{source['owner_column']});"
+                )
+
+            delete_row = f"DELETE FROM {FTS_TABLE} WHERE rowid = old.id * {stride} + {kind};"
+
+            conn.execute(text(
+                f"CREATE TRIGGER IF NOT EXISTS {table}_search_ai AFTER INSERT ON {table} "
+                f"BEGIN {insert_row('new')} END"
+            ))
+            conn.execute(text(
+                f"CREATE TRIGGER IF NOT EXISTS {table}_search_au AFTER UPDATE ON {table} "
+                f"BEGIN {delete_row} {insert_row('new')} END"
+            ))
+            conn.execute(text(
+                f"CREATE TRIGGER IF NOT EXISTS {table}_search_ad AFTER DELETE ON {table} "
+                f"BEGIN {delete_row} END"
+            ))
+
+            if not exists:
+                # Backfill rows written before the index existed
+                conn.execute(text(
+                    f"INSERT INTO {FTS_TABLE}(rowid, title, body, entity_type, entity_id, owner_id) "
+                    f"SELECT src.id * {stride} + {kind}, src.{source['title']}, "
+                    f"{_sqlite_body_expression(source, 'src')}, '{entity_type}', src.id, "
+                    f"src.{source['owner_column']} FROM {table} AS src"
+                ))
+
+def parse_custom_field_filters(filters: Optional[List[str]]) -> Dict[str, Any]:
+    """Parse `key:value` query parameters into a custom field filter dict"""
+    parsed = {}
+    for item in filters or []:
+        key, sep, raw_value = item.partition(":")
+        if not sep or not key:
+            raise ValueError(f"Invalid custom field filter: {item}")
+        try:
+            parsed[key] = json.loads(raw_value)
+        except ValueError:
+            parsed[key] = raw_value
+    return parsed
+
+def _escape_like(value: str) -> str:
+    """Escape LIKE wildcards so user input only matches literally (escape character: backslash)"""
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+def filter_leads(
+    query: Query,
+    db: Session,
+    q: Optional[str] = None,
+    tags: Optional[List[str]] = None,
+    custom_fields: Optional[Dict[str, Any]] = None,
+) -> Query:
+    """Apply fuzzy lookup and tag/custom field containment filters to a Lead query"""
+    dialect = db.get_bind().dialect.name
+    columns = [getattr(Lead, column) for column in LEAD_TRIGRAM_COLUMNS]
+
+    if q:
+        if dialect == "postgresql":
+            # `col %> q` is pg_trgm's word similarity operator, served by the GIN indexes
+            query = query.filter(or_(*[column.op("%>")(q) for column in columns]))
+            query = query.order_by(
+                func.greatest(*[func.word_similarity(q, column) for column in columns]).desc(),
+                Lead.id
+            )
+        else:
+            pattern = f"%{_escape_like(q)}%"
+            query = query.filter(or_(*[column.ilike(pattern, escape="\\") for column in columns]))
+
+    if tags:
+        if dialect == "postgresql":
+            query = query.filter(cast(Lead.tags, JSONB).contains(tags))
+        else:
+            for index, tag in enumerate(tags):
+                query = query.filter(text(
+                    f"EXISTS (SELECT 1 FROM json_each(leads.tags) WHERE json_each.value = :tag_{index})"
+                ).bindparams(**{f"tag_{index}": tag}))
+
+    if custom_fields:
+        if dialect == "postgresql":
+            query = query.filter(cast(Lead.custom_fields, JSONB).contains(custom_fields))
+        else:
+            for key, value in custom_fields.items():
+                query = query.filter(
+                    func.json_extract(Lead.custom_fields, f'$."{key}"') == value
+                )
+
+    return query
+
+def encode_search_cursor(rank: float, entity_type: str, entity_id: int) -> str:
+    """Encode the position of the last returned hit as an opaque cursor"""
+    raw = json.dumps([rank, entity_type, entity_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+def decode_search_cursor(cursor: str) -> Tuple[float, str, int]:
+    """Decode a cursor produced by encode_search_cursor"""
+    try:
+        rank, entity_type, entity_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return float(rank), str(entity_type), int(entity_id)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid search cursor")
+
+def _fts5_match_query(query: str) -> str:
+    """Turn free text into an FTS5 prefix query, quoting every term"""
+    terms = re.findall(r"\w+", query, flags=re.UNICODE)
+    return " ".join('"%s"*' % term.replace('"', '""') for term in terms)
+
+def _cursor_clause(cursor: Optional[str], params: Dict[str, Any]) -> str:
+    """Build the keyset condition resuming after the cursor position"""
+    if not cursor:
+        return ""
+    rank, entity_type, entity_id = decode_search_cursor(cursor)
+    params.update(cursor_rank=rank, cursor_type=entity_type, cursor_id=entity_id)
+    return (
+        "WHERE rank < :cursor_rank OR (rank = :cursor_rank AND "
+        "(entity_type > :cursor_type OR (entity_type = :cursor_type AND entity_id > :cursor_id)))"
+    )
+
+def search_entities(
+    db: Session,
+    owner_id: int,
+    query: str,
+    entity_types: Optional[List[str]] = None,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Run a ranked full-text search over the owner's entities"""
+    types = [t for t in (entity_types or SEARCH_SOURCES.keys()) if t in SEARCH_SOURCES]
+    if not query.strip() or not types:
+        return {"results": [], "next_cursor": None}
+
+    params: Dict[str, Any] = {"owner_id": owner_id, "limit": limit + 1}
+    dialect = db.get_bind().dialect.name
+
+    if dialect == "postgresql":
+        params["query"] = query
+        selects = []
+        for entity_type in types:
+            source = SEARCH_SOURCES[entity_type]
+            document = _pg_document_expression(source)
+            selects.append(
+                f"SELECT '{entity_type}' AS entity_type, id AS entity_id, "
+                f"{source['title']} AS title, "
+                f"left(coalesce({source['snippet']}, ''), {SNIPPET_LENGTH}) AS snippet, "
+                f"ts_rank({document}, q)::float8 AS rank "
+                f"FROM {source['table']}, websearch_to_tsquery('{TS_CONFIG}'::regconfig, :query) AS q "
+                f"WHERE {source['owner_column']} = :owner_id AND {document} @@ q"
+            )
+        hits = " UNION ALL ".join(selects)
+    elif dialect == "sqlite":
+        match = _fts5_match_query(query)
+        if not match:
+            return {"results": [], "next_cursor": None}
+        params["query"] = match
+        type_params = {f"type_{i}": t for i, t in enumerate(types)}
+        params.update(type_params)
+        hits = (
+            f"SELECT entity_type, entity_id, title, "
+            f"snippet({FTS_TABLE}, 1, '', '', '…', 16) AS snippet, "
+            f"-bm25({FTS_TABLE}) AS rank "
+            f"FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :query AND owner_id = :owner_id "
+            f"AND entity_type IN ({', '.join(':' + name for name in type_params)})"
+        )
+    else:
+        raise SearchUnavailable(f"Search is not supported on {dialect}")
+
+    sql = (
+        f"SELECT * FROM ({hits}) AS hits {_cursor_clause(cursor, params)} "
+        "ORDER BY rank DESC, entity_type, entity_id LIMIT :limit"
+    )
+    rows = db.execute(text(sql), params).mappings().all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_search_cursor(last["rank"], last["entity_type"], last["entity_id"])
+
+    return {"results": [dict(row) for row in rows], "next_cursor": next_cursor}
@@ -1,24 +1,32 @@
-from fastapi import FastAPI, APIRouter, Depends, HTTPException, status, File, UploadFile, Form
+from fastapi import (
+    FastAPI, APIRouter, Depends, HTTPException, status, Query, Request,
+    WebSocket, WebSocketDisconnect
+)
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.security import HTTPBearer
 from sqlalchemy.orm import Session
 from typing import List, Optional, Dict, Any
 from datetime import datetime, timedelta
+import asyncio
 import os
 import uuid
 import json
 from pathlib import Path
 
 # Internal imports
-from database import get_db, init_db, check_db_health
+from database import SessionLocal, get_db, init_db, check_db_health
 from models import (
-    User, Workflow, Document, Lead, EmailCampaign, 
-    SupportTicket, ApiKey, Integration, AiModel, Analytics
+    User, Workflow, WorkflowExecution, Document, Lead, EmailCampaign, 
+    SupportTicket, ApiKey, Integration, AiModel, Analytics, DocumentStatus, JobStatus
 )
 from schemas import (
     UserCreate, UserResponse, UserLogin, Token, UserUpdate,
     WorkflowCreate, WorkflowResponse, WorkflowUpdate,
-    DocumentCreate, DocumentResponse, DocumentUpdate,
+    WorkflowExecutionResponse, WorkflowRunRequest, WorkflowRunResponse, StepCacheStats,
+    ExecutionPage, ExecutionStats,
+    DocumentCreate, DocumentResponse, DocumentUpdate, DocumentBatchRequest,
     LeadCreate, LeadResponse, LeadUpdate,
     EmailCampaignCreate, EmailCampaignResponse, EmailCampaignUpdate,
     SupportTicketCreate, SupportTicketResponse, SupportTicketUpdate,
@@ -27,18 +35,46 @@ from schemas import (
     AiModelResponse,
     ChatMessage, ChatResponse,
     DashboardResponse, DashboardStats,
-    FileUploadResponse
+    UsageSummary, UsageBudgetUpdate, UsageBudgetResponse,
+    FileUploadResponse, UploadSessionCreate, UploadSessionComplete, UploadSessionResponse,
+    SearchResponse,
+    JobResponse, JobQueueMetrics, TenantQueueMetrics, SchedulerMetrics, ExtractionCacheStats
 )
 from auth import (
     authenticate_user, create_access_token, get_current_active_user,
-    get_current_admin_user, create_user, get_password_hash
+    get_current_admin_user, create_user, get_password_hash, get_user_from_token
 )
 from utils import (
     generate_api_key, calculate_lead_score, predict_lead_value,
-    generate_ai_insights, analyze_document_content, calculate_confidence_score,
+    generate_ai_insights, classify_lead_status,
     log_analytics, get_user_analytics, generate_workflow_suggestion,
     format_ai_response, sanitize_filename, paginate_query
 )
+from jobs import get_user_job, job_queue_metrics, tenant_queue_metrics
+from document_processing import enqueue_document_processing, enqueue_document_batch, extraction_cache_stats
+from lead_import import IMPORT_DIR, detect_import_format, enqueue_lead_import
+from storage import (
+    ALLOWED_DOCUMENT_TYPES, UPLOAD_CHUNK_SIZE, UploadError, UploadTooLarge, StoredUpload,
+    PREVIEW_WIDTHS, max_upload_size, stream_upload, store_upload, release_blob, content_response,
+    get_blob_store, preview_key
+)
+from previews import PREVIEW_CACHE_CONTROL, PREVIEW_MEDIA_TYPE, can_preview, enqueue_preview, preview_job
+from upload_sessions import (
+    UploadOffsetMismatch, UploadChecksumMismatch, UploadChunkTooLarge, UploadInProgress, create_upload_session,
+    get_user_upload_session, append_upload_chunk, complete_upload_session, abort_upload_session,
+    release_upload_claim, session_expires_at, UPLOAD_MAX_CHUNK_SIZE
+)
+from dedupe import upsert_lead, lead_dedupe_hash, find_lead_by_hash
+from workflow_engine import EXECUTION_FINISHED, WorkflowDefinitionError, compile_workflow, plan_cache
+from workflow_queue import enqueue_workflow_run, get_user_execution
+from execution_events import broker as execution_events, sse_message
+from step_cache import step_cache_stats
+from execution_history import (
+    delete_workflow_executions, execution_stats, list_executions, load_execution_data, recent_executions
+)
+from scheduler import TriggerError, parse_triggers, scheduler_metrics
+from usage import set_usage_budget, total_tokens_used, usage_summary
+from search import SEARCH_SOURCES, SearchUnavailable, search_entities, filter_leads, parse_custom_field_filters
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -159,16 +195,17 @@ async def get_dashboard(
     total_workflows = len(workflows)
     active_workflows = len([w for w in workflows if w.status == "active"])
     total_executions = sum(w.executions for w in workflows)
+    execution_summary = execution_stats(db, owner_id=current_user.id)
     
     # Mock calculations for demo
     stats = DashboardStats(
         total_workflows=total_workflows,
         active_workflows=active_workflows,
         total_executions=total_executions,
-        success_rate=94.2,
+        success_rate=execution_summary["success_rate"],
         time_saved=156,
         cost_saved=12450.0,
-        ai_tokens_used=2450000,
+        ai_tokens_used=total_tokens_used(db, current_user.id),
         documents_processed=1580,
         leads_generated=234,
         emails_sent=15670
@@ -182,7 +219,7 @@ async def get_dashboard(
     return DashboardResponse(
         stats=stats,
         recent_workflows=recent_workflows,
-        recent_executions=[],
+        recent_executions=recent_executions(db, current_user.id),
         predictions={
             "next_month_executions": 1850,
             "predicted_roi": 340,
@@ -191,6 +228,27 @@ async def get_dashboard(
         }
     )
 
+# Search endpoints
+@api_router.get("/search", response_model=SearchResponse)
+async def search(
+    q: str,
+    types: Optional[List[str]] = Query(None),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Full-text search over the user's leads, tickets, documents and workflows"""
+    if types and any(t not in SEARCH_SOURCES for t in types):
+        raise HTTPException(status_code=400, detail="Unsupported search type")
+    
+    try:
+        return search_entities(db, current_user.id, q, entity_types=types, limit=limit, cursor=cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid search cursor")
+    except SearchUnavailable as e:
+        raise HTTPException(status_code=501, detail=str(e))
+
 # Workflow endpoints
 @api_router.post("/workflows", response_model=WorkflowResponse)
 async def create_workflow(
@@ -229,6 +287,14 @@ async def get_workflows(
     workflows = query.offset(skip).limit(limit).all()
     return workflows
 
+@api_router.get("/workflows/step-cache/stats", response_model=StepCacheStats)
+async def get_step_cache_stats(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_admin_user)
+):
+    """Memoized step results: entries, size, hit rate and tokens saved"""
+    return step_cache_stats(db)
+
 @api_router.get("/workflows/{workflow_id}", response_model=WorkflowResponse)
 async def get_workflow(
     workflow_id: int,
@@ -262,17 +328,193 @@ async def update_workflow(
     if not workflow:
         raise HTTPException(status_code=404, detail="Workflow not found")
     
-    for field, value in workflow_update.dict(exclude_unset=True).items():
+    updates = workflow_update.dict(exclude_unset=True)
+    if "config" in updates:
+        try:
+            workflow.triggers = len(parse_triggers(updates["config"]))
+        except TriggerError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    if "steps" in updates or "ai_model" in updates:
+        # Reject definitions that cannot run now rather than in a worker
+        try:
+            compile_workflow(updates.get("steps", workflow.steps), updates.get("ai_model", workflow.ai_model))
+        except WorkflowDefinitionError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    
+    for field, value in updates.items():
         setattr(workflow, field, value)
     
     db.commit()
     db.refresh(workflow)
+    plan_cache.invalidate(workflow_id)
     
     # Log workflow update
     log_analytics(db, current_user.id, "workflow_updated", 1.0, {"workflow_id": workflow_id})
     
     return workflow
 
+@api_router.post("/workflows/{workflow_id}/run", response_model=WorkflowRunResponse, status_code=202)
+async def run_workflow(
+    workflow_id: int,
+    run: WorkflowRunRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Queue a workflow execution for the workers"""
+    workflow = db.query(Workflow).filter(
+        Workflow.id == workflow_id,
+        Workflow.owner_id == current_user.id
+    ).first()
+    
+    if not workflow:
+        raise HTTPException(status_code=404, detail="Workflow not found")
+    if workflow.status in ("paused", "archived"):
+        raise HTTPException(status_code=409, detail=f"Workflow is {workflow.status}")
+    
+    try:
+        job = enqueue_workflow_run(db, workflow, run.input_data)
+    except WorkflowDefinitionError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return {"execution_id": job.payload["execution_id"], "job": job}
+
+@api_router.get("/workflows/{workflow_id}/executions", response_model=ExecutionPage)
+async def get_workflow_executions(
+    workflow_id: int,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    status: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Page through a workflow's execution history, newest first"""
+    workflow = db.query(Workflow).filter(
+        Workflow.id == workflow_id,
+        Workflow.owner_id == current_user.id
+    ).first()
+    
+    if not workflow:
+        raise HTTPException(status_code=404, detail="Workflow not found")
+    
+    try:
+        executions, next_cursor = list_executions(db, workflow_id, limit, cursor, status)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return {"executions": executions, "next_cursor": next_cursor}
+
+@api_router.get("/workflows/{workflow_id}/executions/stats", response_model=ExecutionStats)
+async def get_workflow_execution_stats(
+    workflow_id: int,
+    days: Optional[int] = Query(None, ge=1),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Success rate, duration percentiles and tokens of a workflow's executions"""
+    workflow = db.query(Workflow).filter(
+        Workflow.id == workflow_id,
+        Workflow.owner_id == current_user.id
+    ).first()
+    
+    if not workflow:
+        raise HTTPException(status_code=404, detail="Workflow not found")
+    
+    since = datetime.utcnow() - timedelta(days=days) if days else None
+    return execution_stats(db, workflow_id=workflow_id, since=since)
+
+@api_router.get("/workflows/{workflow_id}/executions/{execution_id}", response_model=WorkflowExecutionResponse)
+async def get_workflow_execution(
+    workflow_id: int,
+    execution_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get the status and output of a workflow execution"""
+    execution = get_user_execution(db, workflow_id, execution_id, current_user.id)
+    
+    if not execution:
+        raise HTTPException(status_code=404, detail="Execution not found")
+    
+    if execution.archive_key:
+        # Compacted: input and output live in cold storage
+        response = WorkflowExecutionResponse.model_validate(execution)
+        response.input_data, response.output_data = load_execution_data(execution)
+        return response
+    
+    return execution
+
+def _execution_snapshot(execution: WorkflowExecution) -> Dict[str, Any]:
+    """First event of a progress stream: the execution as stored when the client subscribed"""
+    return jsonable_encoder({
+        "type": "snapshot",
+        "execution_id": execution.id,
+        "status": execution.status,
+        "steps": (execution.output_data or {}).get("steps"),
+        "tokens_used": execution.tokens_used
+    })
+
+@api_router.get("/workflows/{workflow_id}/executions/{execution_id}/events")
+async def stream_execution_events(
+    workflow_id: int,
+    execution_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Stream an execution's step and token events as server-sent events"""
+    execution = get_user_execution(db, workflow_id, execution_id, current_user.id)
+    
+    if not execution:
+        raise HTTPException(status_code=404, detail="Execution not found")
+    
+    # Subscribe before reading the status, so no event falls between the two
+    subscription = execution_events.subscribe(execution_id)
+    db.refresh(execution)
+    snapshot = _execution_snapshot(execution)
+    db.commit()
+    
+    async def stream():
+        try:
+            yield sse_message(snapshot)
+            if snapshot["status"] in EXECUTION_FINISHED:
+                return
+            async for event in subscription.events():
+                yield ": keepalive\n\n" if event is None else sse_message(event)
+        finally:
+            subscription.close()
+    
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+
+@api_router.websocket("/workflows/{workflow_id}/executions/{execution_id}/ws")
+async def execution_events_socket(websocket: WebSocket, workflow_id: int, execution_id: int, token: str = Query(...)):
+    """Stream an execution's step and token events over a WebSocket (auth by ?token=)"""
+    db = SessionLocal()
+    try:
+        user = get_user_from_token(db, token)
+        execution = get_user_execution(db, workflow_id, execution_id, user.id) if user else None
+        if not execution:
+            await websocket.close(code=1008)
+            return
+        subscription = execution_events.subscribe(execution_id)
+        db.refresh(execution)
+        snapshot = _execution_snapshot(execution)
+    finally:
+        db.close()
+    
+    await websocket.accept()
+    try:
+        await websocket.send_json(snapshot)
+        if snapshot["status"] not in EXECUTION_FINISHED:
+            async for event in subscription.events():
+                await websocket.send_json({"type": "keepalive"} if event is None else event)
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        subscription.close()
+
 @api_router.delete("/workflows/{workflow_id}")
 async def delete_workflow(
     workflow_id: int,
@@ -288,61 +530,203 @@ async def delete_workflow(
     if not workflow:
         raise HTTPException(status_code=404, detail="Workflow not found")
     
+    # Executions go with the workflow; their compacted data is released for blob GC
+    delete_workflow_executions(db, workflow_id)
     db.delete(workflow)
     db.commit()
+    plan_cache.invalidate(workflow_id)
     
     # Log workflow deletion
     log_analytics(db, current_user.id, "workflow_deleted", 1.0, {"workflow_id": workflow_id})
     
     return {"message": "Workflow deleted successfully"}
 
-# Document processing endpoints
-@api_router.post("/documents/upload", response_model=FileUploadResponse)
-async def upload_document(
-    file: UploadFile = File(...),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
-):
-    """Upload document for processing"""
-    # Validate file type
-    allowed_types = ['application/pdf', 'image/jpeg', 'image/png', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet']
-    if file.content_type not in allowed_types:
-        raise HTTPException(status_code=400, detail="Unsupported file type")
-    
-    # Generate unique filename
-    file_extension = Path(file.filename).suffix
-    unique_filename = f"{uuid.uuid4()}{file_extension}"
-    file_path = f"/tmp/{unique_filename}"
-    
-    # Save file
-    with open(file_path, "wb") as buffer:
-        content = await file.read()
-        buffer.write(content)
+async def _create_uploaded_document(db: Session, user: User, upload: StoredUpload, resumable: bool = False) -> FileUploadResponse:
+    """Store an upload's bytes and create its document record"""
+    # Identical bytes are stored once in the content-addressed blob store;
+    # the move (an S3 upload with that backend) runs off the event loop
+    file_path = await asyncio.to_thread(store_upload, db, upload)
     
     # Create document record
     document = Document(
-        name=file.filename,
-        owner_id=current_user.id,
-        type=file.content_type,
+        name=upload.filename,
+        owner_id=user.id,
+        type=upload.content_type,
         file_path=file_path,
-        file_size=len(content),
-        mime_type=file.content_type
+        file_size=upload.size,
+        mime_type=upload.content_type,
+        content_hash=upload.sha256
     )
     db.add(document)
     db.commit()
     db.refresh(document)
     
     # Log document upload
-    log_analytics(db, current_user.id, "document_uploaded", 1.0, {"document_id": document.id})
+    log_analytics(db, user.id, "document_uploaded", 1.0, {"document_id": document.id, "resumable": resumable})
     
     return FileUploadResponse(
-        filename=file.filename,
-        file_size=len(content),
-        mime_type=file.content_type,
+        filename=upload.filename,
+        file_size=upload.size,
+        mime_type=upload.content_type,
         file_path=file_path,
-        upload_id=str(document.id)
+        upload_id=str(document.id),
+        content_hash=upload.sha256
+    )
+
+def _upload_session_response(session) -> UploadSessionResponse:
+    """Client view of a resumable upload session"""
+    return UploadSessionResponse(
+        id=session.id,
+        filename=session.filename,
+        content_type=session.content_type,
+        total_size=session.total_size,
+        offset=session.offset,
+        chunk_size=UPLOAD_CHUNK_SIZE,
+        max_chunk_size=UPLOAD_MAX_CHUNK_SIZE,
+        expires_at=session_expires_at(session)
     )
 
+# Document processing endpoints
+@api_router.post(
+    "/documents/upload",
+    response_model=FileUploadResponse,
+    openapi_extra={"requestBody": {"content": {"multipart/form-data": {"schema": {
+        "type": "object",
+        "properties": {"file": {"type": "string", "format": "binary"}},
+        "required": ["file"]
+    }}}, "required": True}}
+)
+async def upload_document(
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Upload document for processing"""
+    # Stream the file to storage, enforcing the plan's size limit as it arrives
+    try:
+        upload = await stream_upload(
+            request,
+            max_upload_size(current_user),
+            allowed_types=ALLOWED_DOCUMENT_TYPES
+        )
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except UploadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return await _create_uploaded_document(db, current_user, upload)
+
+@api_router.post("/documents/uploads", response_model=UploadSessionResponse, status_code=201)
+async def create_document_upload(
+    upload: UploadSessionCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Start a resumable upload; chunks are then PUT at increasing offsets"""
+    try:
+        session = create_upload_session(
+            db, current_user, sanitize_filename(upload.filename), upload.content_type,
+            upload.total_size, upload.sha256, allowed_types=ALLOWED_DOCUMENT_TYPES
+        )
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except UploadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return _upload_session_response(session)
+
+@api_router.get("/documents/uploads/{session_id}", response_model=UploadSessionResponse)
+async def get_document_upload(
+    session_id: str,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get a resumable upload's progress (the offset to resume from)"""
+    session = get_user_upload_session(db, session_id, current_user.id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    return _upload_session_response(session)
+
+@api_router.put(
+    "/documents/uploads/{session_id}",
+    response_model=UploadSessionResponse,
+    openapi_extra={"requestBody": {"content": {"application/octet-stream": {"schema": {
+        "type": "string", "format": "binary"
+    }}}, "required": True}}
+)
+async def upload_document_chunk(
+    session_id: str,
+    request: Request,
+    offset: int = Query(..., ge=0),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Append the request body to a resumable upload at `offset`
+
+    An optional X-Chunk-SHA256 header is checked against the chunk's bytes.
+    A wrong offset returns 409 with the offset to resume from; so does a
+    chunk sent while another request writes to the upload.
+    """
+    session = get_user_upload_session(db, session_id, current_user.id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    
+    try:
+        await append_upload_chunk(db, session, offset, request, request.headers.get("x-chunk-sha256"))
+    except UploadOffsetMismatch as e:
+        raise HTTPException(status_code=409, detail={"message": str(e), "offset": e.offset})
+    except UploadInProgress as e:
+        raise HTTPException(status_code=409, detail={"message": str(e), "offset": session.offset})
+    except UploadChunkTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except UploadTooLarge:
+        raise HTTPException(status_code=413, detail="Chunk runs past the declared upload size")
+    except UploadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return _upload_session_response(session)
+
+@api_router.post("/documents/uploads/{session_id}/complete", response_model=FileUploadResponse)
+async def complete_document_upload(
+    session_id: str,
+    completion: Optional[UploadSessionComplete] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Finish a resumable upload: verify its checksum and create the document"""
+    session = get_user_upload_session(db, session_id, current_user.id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    
+    try:
+        upload, claim = await complete_upload_session(db, session, completion.sha256 if completion else None)
+    except UploadChecksumMismatch as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except UploadError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    
+    # The part file moves into the blob store; the session is no longer needed
+    try:
+        response = await _create_uploaded_document(db, current_user, upload, resumable=True)
+    except Exception:
+        db.rollback()
+        release_upload_claim(db, session, claim)
+        raise
+    db.delete(session)
+    db.commit()
+    return response
+
+@api_router.delete("/documents/uploads/{session_id}")
+async def abort_document_upload(
+    session_id: str,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Abandon a resumable upload and discard its received bytes"""
+    session = get_user_upload_session(db, session_id, current_user.id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    abort_upload_session(db, session)
+    return {"message": "Upload aborted"}
+
 @api_router.get("/documents", response_model=List[DocumentResponse])
 async def get_documents(
     skip: int = 0,
@@ -360,6 +744,14 @@ async def get_documents(
     documents = query.offset(skip).limit(limit).all()
     return documents
 
+@api_router.get("/documents/extraction-cache/stats", response_model=List[ExtractionCacheStats])
+async def get_extraction_cache_stats(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_admin_user)
+):
+    """Extraction cache entries and hit rate per extractor version"""
+    return extraction_cache_stats(db)
+
 @api_router.get("/documents/{document_id}", response_model=DocumentResponse)
 async def get_document(
     document_id: int,
@@ -377,13 +769,14 @@ async def get_document(
     
     return document
 
-@api_router.post("/documents/{document_id}/process")
-async def process_document(
+@api_router.get("/documents/{document_id}/content")
+async def get_document_content(
     document_id: int,
+    request: Request,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """Process document with OCR and AI"""
+    """Download a document's bytes (supports Range and If-None-Match)"""
     document = db.query(Document).filter(
         Document.id == document_id,
         Document.owner_id == current_user.id
@@ -392,19 +785,143 @@ async def process_document(
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
     
-    # Mock document processing
-    document.status = "processed"
-    document.processed_at = datetime.utcnow()
-    document.extracted_data = analyze_document_content("", document.type)
-    document.confidence = calculate_confidence_score(document.extracted_data)
+    # Blob bytes never change for a hash, so it doubles as a strong ETag
+    if document.content_hash and get_blob_store().exists(document.content_hash):
+        size = document.file_size
+        path = None
+    elif document.file_path and os.path.isfile(document.file_path):
+        size = os.path.getsize(document.file_path)
+        path = document.file_path
+    else:
+        raise HTTPException(status_code=404, detail="Document content not found")
+    
+    return content_response(
+        request,
+        size=size,
+        media_type=document.mime_type or "application/octet-stream",
+        filename=document.name,
+        etag=f'"{document.content_hash}"' if path is None else None,
+        sha256=document.content_hash if path is None else None,
+        path=path
+    )
+
+@api_router.get("/documents/{document_id}/preview")
+async def get_document_preview(
+    document_id: int,
+    request: Request,
+    width: int = Query(PREVIEW_WIDTHS[0]),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get a document's first-page preview, rendering it in the background on first request
+
+    Returns the JPEG once stored; until then 202 with the rendering job.
+    """
+    document = db.query(Document).filter(
+        Document.id == document_id,
+        Document.owner_id == current_user.id
+    ).first()
     
+    if not document:
+        raise HTTPException(status_code=404, detail="Document not found")
+    if width not in PREVIEW_WIDTHS:
+        raise HTTPException(status_code=400, detail=f"width must be one of {', '.join(map(str, PREVIEW_WIDTHS))}")
+    if not document.content_hash or not can_preview(document.mime_type):
+        raise HTTPException(status_code=415, detail="No preview available for this document type")
+    
+    key = preview_key(document.content_hash, width)
+    size = get_blob_store().size(key)
+    if size is not None:
+        return content_response(
+            request,
+            size=size,
+            media_type=PREVIEW_MEDIA_TYPE,
+            filename=f"{Path(document.name).stem}-{width}.jpg",
+            etag=f'"{document.content_hash}-{width}"',
+            sha256=key,
+            cache_control=PREVIEW_CACHE_CONTROL
+        )
+    
+    job = preview_job(db, document, width)
+    if job and job.status == JobStatus.FAILED:
+        raise HTTPException(status_code=422, detail="Preview could not be generated for this document")
+    if not job:
+        job = enqueue_preview(db, document, width)
+    return JSONResponse(
+        status_code=202,
+        content=jsonable_encoder(JobResponse.model_validate(job)),
+        headers={"Retry-After": "2"}
+    )
+
+@api_router.delete("/documents/{document_id}")
+async def delete_document(
+    document_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Delete document"""
+    document = db.query(Document).filter(
+        Document.id == document_id,
+        Document.owner_id == current_user.id
+    ).first()
+    
+    if not document:
+        raise HTTPException(status_code=404, detail="Document not found")
+    
+    # Blob bytes are shared between identical uploads; drop this reference only
+    if document.content_hash:
+        release_blob(db, document.content_hash)
+    db.delete(document)
     db.commit()
-    db.refresh(document)
     
-    # Log document processing
-    log_analytics(db, current_user.id, "document_processed", 1.0, {"document_id": document_id})
+    # Log document deletion
+    log_analytics(db, current_user.id, "document_deleted", 1.0, {"document_id": document_id})
     
-    return {"message": "Document processed successfully", "document": document}
+    return {"message": "Document deleted successfully"}
+
+@api_router.post("/documents/process-batch", response_model=JobResponse, status_code=202)
+async def process_document_batch(
+    batch: DocumentBatchRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Queue many documents for processing as a single batch job"""
+    query = db.query(Document.id).filter(Document.owner_id == current_user.id)
+    if batch.all_processing:
+        query = query.filter(Document.status == DocumentStatus.PROCESSING)
+    elif batch.document_ids:
+        query = query.filter(Document.id.in_(batch.document_ids))
+    else:
+        raise HTTPException(status_code=400, detail="Provide document_ids or all_processing")
+    
+    document_ids = [document_id for (document_id,) in query.order_by(Document.id)]
+    if not document_ids:
+        raise HTTPException(status_code=404, detail="No documents to process")
+    
+    job = enqueue_document_batch(db, current_user.id, document_ids)
+    
+    # Log batch submission
+    log_analytics(db, current_user.id, "document_batch_queued", float(len(document_ids)), {"job_id": job.id})
+    
+    return job
+
+@api_router.post("/documents/{document_id}/process", response_model=JobResponse, status_code=202)
+async def process_document(
+    document_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Queue document for OCR and AI processing"""
+    document = db.query(Document).filter(
+        Document.id == document_id,
+        Document.owner_id == current_user.id
+    ).first()
+    
+    if not document:
+        raise HTTPException(status_code=404, detail="Document not found")
+    
+    # Processed by the job worker (`python cli.py worker`)
+    return enqueue_document_processing(db, document)
 
 # Lead generation endpoints
 @api_router.post("/leads", response_model=LeadResponse)
@@ -418,40 +935,89 @@ async def create_lead(
     
     # Calculate AI-powered lead score and insights
     score = calculate_lead_score(lead_data)
-    predicted_value = predict_lead_value(lead_data)
-    ai_insights = generate_ai_insights(lead_data)
+    predicted_value = predict_lead_value({**lead_data, 'score': score})
+    ai_insights = generate_ai_insights({**lead_data, 'score': score})
     
-    db_lead = Lead(
+    now = datetime.utcnow()
+    
+    # Merge into the existing lead when this email is already known
+    lead_id = upsert_lead(db, {
         **lead_data,
-        owner_id=current_user.id,
-        score=score,
-        predicted_value=predicted_value,
-        ai_insights=ai_insights,
-        last_activity=datetime.utcnow()
-    )
-    db.add(db_lead)
+        "owner_id": current_user.id,
+        "score": score,
+        "status": classify_lead_status(score),
+        "predicted_value": predicted_value,
+        "ai_insights": ai_insights,
+        "last_activity": now,
+        "created_at": now,
+        "updated_at": now
+    })
     db.commit()
-    db.refresh(db_lead)
+    db_lead = db.get(Lead, lead_id)
     
     # Log lead creation
     log_analytics(db, current_user.id, "lead_created", 1.0, {"lead_id": db_lead.id, "score": score})
     
     return db_lead
 
+@api_router.post(
+    "/leads/import",
+    response_model=JobResponse,
+    status_code=202,
+    openapi_extra={"requestBody": {"content": {"multipart/form-data": {"schema": {
+        "type": "object",
+        "properties": {"file": {"type": "string", "format": "binary"}},
+        "required": ["file"]
+    }}}, "required": True}}
+)
+async def import_leads(
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Import leads from a CSV or XLSX file as a queued job"""
+    # Stream the file straight into the import directory, within the plan's size limit
+    try:
+        upload = await stream_upload(request, max_upload_size(current_user), dest_dir=IMPORT_DIR)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except UploadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    import_format = detect_import_format(upload.filename, upload.content_type)
+    if not import_format:
+        os.remove(upload.path)
+        raise HTTPException(status_code=400, detail="Unsupported file type")
+    
+    job = enqueue_lead_import(db, current_user.id, upload.path, import_format, upload.filename)
+    
+    return job
+
 @api_router.get("/leads", response_model=List[LeadResponse])
 async def get_leads(
     skip: int = 0,
     limit: int = 100,
     status: Optional[str] = None,
+    q: Optional[str] = None,
+    tags: Optional[List[str]] = Query(None),
+    custom_field: Optional[List[str]] = Query(None),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """Get user's leads"""
+    """Get user's leads, optionally fuzzy-matched on name/company/email and filtered by tags
+    and custom fields (`custom_field=key:value`)"""
     query = db.query(Lead).filter(Lead.owner_id == current_user.id)
     
     if status:
         query = query.filter(Lead.status == status)
     
+    try:
+        custom_fields = parse_custom_field_filters(custom_field)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    query = filter_leads(query, db, q=q, tags=tags, custom_fields=custom_fields)
+    
     leads = query.offset(skip).limit(limit).all()
     return leads
 
@@ -491,6 +1057,12 @@ async def update_lead(
     for field, value in lead_update.dict(exclude_unset=True).items():
         setattr(lead, field, value)
     
+    dedupe_hash = lead_dedupe_hash(lead.email, lead.phone)
+    if dedupe_hash != lead.dedupe_hash:
+        if dedupe_hash and find_lead_by_hash(db, current_user.id, dedupe_hash, exclude_id=lead.id):
+            raise HTTPException(status_code=409, detail="Another lead already uses this email")
+        lead.dedupe_hash = dedupe_hash
+    
     db.commit()
     db.refresh(lead)
     
@@ -499,6 +1071,55 @@ async def update_lead(
     
     return lead
 
+# Job endpoints
+@api_router.get("/jobs/metrics", response_model=JobQueueMetrics)
+async def get_job_metrics(
+    window_minutes: int = Query(60, ge=1, le=7 * 24 * 60),
+    bucket_minutes: Optional[int] = Query(None, ge=1, le=24 * 60),
+    type: Optional[List[str]] = Query(None),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_admin_user)
+):
+    """Job queue depth, lag and throughput per job type, optionally as a timeline"""
+    if bucket_minutes and window_minutes // bucket_minutes > 500:
+        raise HTTPException(status_code=400, detail="Too many buckets; use a larger bucket_minutes")
+    bucket = timedelta(minutes=bucket_minutes) if bucket_minutes else None
+    return job_queue_metrics(db, timedelta(minutes=window_minutes), bucket, type)
+
+@api_router.get("/jobs/metrics/tenants", response_model=TenantQueueMetrics)
+async def get_tenant_job_metrics(
+    window_minutes: int = Query(60, ge=1, le=7 * 24 * 60),
+    type: Optional[List[str]] = Query(None),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_admin_user)
+):
+    """Per-tenant backlog, quota use and queue wait, longest-waiting tenants first"""
+    return tenant_queue_metrics(db, timedelta(minutes=window_minutes), type, limit)
+
+@api_router.get("/scheduler/metrics", response_model=SchedulerMetrics)
+async def get_scheduler_metrics(
+    window_minutes: int = Query(60, ge=1, le=7 * 24 * 60),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_admin_user)
+):
+    """Scheduled workflow runs and how late they were enqueued"""
+    return scheduler_metrics(db, timedelta(minutes=window_minutes))
+
+@api_router.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get background job status and progress"""
+    job = get_user_job(db, job_id, current_user.id)
+    
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    return job
+
 # Chat endpoints
 @api_router.post("/chat", response_model=ChatResponse)
 async def chat_with_ai(
@@ -535,6 +1156,28 @@ async def chat_with_ai(
         model=message.model or "GPT-4"
     )
 
+# Usage endpoints
+@api_router.get("/usage", response_model=UsageSummary)
+async def get_usage(
+    days: int = Query(30, ge=1, le=366),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """AI tokens and cost per model and day, month-to-date use against the budget, and budget alerts"""
+    return usage_summary(db, current_user.id, days)
+
+@api_router.put("/usage/budget", response_model=UsageBudgetResponse)
+async def update_usage_budget(
+    budget: UsageBudgetUpdate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Set the monthly token and cost budget and the fractions of it that raise alerts"""
+    if budget.alert_thresholds and any(not 0 < threshold <= 10 for threshold in budget.alert_thresholds):
+        raise HTTPException(status_code=400, detail="Alert thresholds must be fractions of the budget between 0 and 10")
+    
+    return set_usage_budget(db, current_user.id, budget.monthly_tokens, budget.monthly_cost, budget.alert_thresholds)
+
 # Analytics endpoints
 @api_router.get("/analytics")
 async def get_analytics(
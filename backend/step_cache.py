@@ -0,0 +1,185 @@
+import asyncio
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+from sqlalchemy import case, func
+from sqlalchemy.orm import Session
+from models import StepResultCache
+
+# Memoized step results: default lifetime, and bounds on entry size and table size
+STEP_CACHE_TTL = timedelta(seconds=int(os.getenv("STEP_CACHE_TTL", str(24 * 3600))))
+STEP_CACHE_MAX_TTL = timedelta(days=30)
+STEP_CACHE_MAX_ENTRY_BYTES = int(os.getenv("STEP_CACHE_MAX_ENTRY_BYTES", str(256 * 1024)))
+STEP_CACHE_MAX_ENTRIES = int(os.getenv("STEP_CACHE_MAX_ENTRIES", "100000"))
+
+def step_cache_key(
+    step_type: str,
+    name: str,
+    config: Dict[str, Any],
+    model: str,
+    input_data: Dict[str, Any],
+    upstream: Dict[str, Any],
+    owner_id: Optional[int]
+) -> str:
+    """sha256 identifying one step's work: its definition, everything it reads and its model
+
+    The name is part of the definition: AI steps without a config prompt
+    use it as their prompt. Per-user entries include the owner, so they
+    never match another user's lookup; shared entries use owner None.
+    """
+    material = json.dumps(
+        {
+            "type": step_type, "name": name, "config": config, "model": model,
+            "input": input_data, "upstream": upstream, "owner": owner_id
+        },
+        sort_keys=True, default=str, ensure_ascii=False, separators=(",", ":")
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+def lookup_step_result(db: Session, key: str) -> Optional[Dict[str, Any]]:
+    """Unexpired memoized output for a key, counting the hit"""
+    now = datetime.utcnow()
+    entry = db.query(StepResultCache.id, StepResultCache.output, StepResultCache.tokens_used).filter(
+        StepResultCache.key == key,
+        StepResultCache.expires_at > now
+    ).first()
+    if not entry:
+        return None
+
+    db.query(StepResultCache).filter(StepResultCache.id == entry.id).update(
+        {StepResultCache.hits: StepResultCache.hits + 1, StepResultCache.last_hit_at: now},
+        synchronize_session=False
+    )
+    db.commit()
+    return {"output": entry.output, "tokens": entry.tokens_used or 0}
+
+def store_step_result(
+    db: Session,
+    key: str,
+    owner_id: Optional[int],
+    step_type: str,
+    output: Any,
+    tokens: int,
+    ttl: Optional[timedelta] = None
+) -> bool:
+    """Memoize a step output, replacing an expired entry; oversized outputs are not stored"""
+    size = len(json.dumps(output, default=str).encode("utf-8"))
+    if size > STEP_CACHE_MAX_ENTRY_BYTES:
+        return False
+    if db.get_bind().dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+
+    now = datetime.utcnow()
+    expires_at = now + min(ttl or STEP_CACHE_TTL, STEP_CACHE_MAX_TTL)
+    statement = insert(StepResultCache).values(
+        key=key,
+        owner_id=owner_id,
+        step_type=step_type,
+        output=output,
+        tokens_used=tokens,
+        size=size,
+        hits=0,
+        expires_at=expires_at,
+        created_at=now
+    )
+    # A live entry wins (concurrent executions computed the same result); an expired one is replaced
+    db.execute(statement.on_conflict_do_update(
+        index_elements=['key'],
+        set_={
+            "output": statement.excluded.output,
+            "tokens_used": statement.excluded.tokens_used,
+            "size": statement.excluded.size,
+            "hits": 0,
+            "last_hit_at": None,
+            "expires_at": statement.excluded.expires_at,
+            "created_at": statement.excluded.created_at
+        },
+        where=StepResultCache.expires_at <= now
+    ))
+    db.commit()
+    return True
+
+class StepResultMemo:
+    """Memoization for execute_plan, backed by the step_result_cache table
+
+    Only steps marked `deterministic` are memoized. Entries are private to
+    the workflow owner unless the step sets `cache_scope: "global"`.
+    Lookups and stores run in a worker thread with a session of their
+    own, off the event loop. Cache errors never fail a step: they count
+    as misses.
+    """
+
+    def __init__(self, db: Session, owner_id: int):
+        self.bind = db.get_bind()
+        self.owner_id = owner_id
+
+    def key(self, step, ctx) -> str:
+        owner_id = None if step.cache_scope == "global" else self.owner_id
+        model = step.config.get("model", ctx.ai_model)
+        return step_cache_key(step.type, step.name, step.config, model, ctx.input_data, ctx.upstream, owner_id)
+
+    async def lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self._lookup, key)
+
+    async def store(self, key: str, step, output: Any, tokens: int):
+        await asyncio.to_thread(self._store, key, step, output, tokens)
+
+    def _lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        with Session(self.bind) as db:
+            try:
+                return lookup_step_result(db, key)
+            except Exception as e:
+                db.rollback()
+                print(f"Step cache lookup failed: {e}")
+                return None
+
+    def _store(self, key: str, step, output: Any, tokens: int):
+        with Session(self.bind) as db:
+            try:
+                ttl = timedelta(seconds=step.cache_ttl) if step.cache_ttl else None
+                owner_id = None if step.cache_scope == "global" else self.owner_id
+                store_step_result(db, key, owner_id, step.type, output, tokens, ttl)
+            except Exception as e:
+                db.rollback()
+                print(f"Step cache store failed: {e}")
+
+def purge_step_cache(db: Session, max_entries: int = STEP_CACHE_MAX_ENTRIES) -> int:
+    """Delete expired step results, then the least recently used beyond `max_entries`"""
+    deleted = db.query(StepResultCache).filter(
+        StepResultCache.expires_at <= datetime.utcnow()
+    ).delete(synchronize_session=False)
+
+    excess = db.query(func.count(StepResultCache.id)).scalar() - max_entries
+    if excess > 0:
+        last_used = func.coalesce(StepResultCache.last_hit_at, StepResultCache.created_at)
+        oldest = db.query(StepResultCache.id).order_by(last_used, StepResultCache.id).limit(excess).subquery()
+        deleted += db.query(StepResultCache).filter(
+            StepResultCache.id.in_(db.query(oldest.c.id))
+        ).delete(synchronize_session=False)
+    db.commit()
+    return deleted
+
+def step_cache_stats(db: Session) -> Dict[str, Any]:
+    """Entries, size, hits and tokens saved by memoized step results"""
+    now = datetime.utcnow()
+    entries, live, size, hits, tokens_saved = db.query(
+        func.count(StepResultCache.id),
+        func.coalesce(func.sum(case((StepResultCache.expires_at > now, 1), else_=0)), 0),
+        func.coalesce(func.sum(StepResultCache.size), 0),
+        func.coalesce(func.sum(StepResultCache.hits), 0),
+        func.coalesce(func.sum(StepResultCache.hits * StepResultCache.tokens_used), 0)
+    ).one()
+    # Every entry stands for one miss (the run that created it)
+    return {
+        "entries": entries,
+        "live_entries": int(live),
+        "size_bytes": int(size),
+        "hits": int(hits),
+        "misses": entries,
+        "hit_rate": round(int(hits) / (int(hits) + entries), 4) if entries else 0.0,
+        "tokens_saved": int(tokens_saved)
+    }
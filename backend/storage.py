@@ -0,0 +1,569 @@
+import asyncio
+import hashlib
+import os
+import shutil
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from functools import lru_cache
+from pathlib import Path
+from typing import BinaryIO, Iterable, Iterator, Optional, Tuple
+from urllib.parse import quote
+from fastapi import Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from multipart.multipart import MultipartParser, parse_options_header
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from models import Blob, User, SubscriptionPlan
+
+# Storage configuration
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "/tmp/uploads")
+INCOMING_DIR = os.path.join(UPLOAD_DIR, "incoming")
+BLOB_DIR = os.path.join(UPLOAD_DIR, "blobs")
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+MAX_FILE_SIZE = int(os.getenv("MAX_FILE_SIZE", str(10 * 1024 * 1024)))
+
+# Largest accepted upload per subscription plan (users without a plan get starter)
+PLAN_MAX_FILE_SIZES = {
+    SubscriptionPlan.STARTER: MAX_FILE_SIZE,
+    SubscriptionPlan.PRO: MAX_FILE_SIZE * 10,
+    SubscriptionPlan.ENTERPRISE: 2 * 1024 * 1024 * 1024
+}
+
+# Blob storage backend: "local" or "s3"
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local")
+S3_BUCKET = os.getenv("S3_BUCKET", "")
+S3_PREFIX = os.getenv("S3_PREFIX", "blobs/")
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL") or None
+
+# Unreferenced blobs are kept this long before garbage collection
+BLOB_GC_GRACE = timedelta(hours=1)
+
+# Preview widths rendered for documents, stored next to their blob
+PREVIEW_WIDTHS = (256, 1024)
+
+# Slack for multipart boundaries and part headers in the early Content-Length check
+MULTIPART_OVERHEAD = 64 * 1024
+
+ALLOWED_DOCUMENT_TYPES = [
+    'application/pdf',
+    'image/jpeg',
+    'image/png',
+    'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+]
+
+class UploadError(Exception):
+    """Raised for malformed or unsupported uploads"""
+
+class UploadTooLarge(UploadError):
+    """Raised when an upload exceeds the allowed size"""
+
+    def __init__(self, max_size: int):
+        super().__init__(f"File exceeds the {max_size} byte upload limit")
+        self.max_size = max_size
+
+class RangeNotSatisfiable(Exception):
+    """Raised when a Range header selects no bytes of the file"""
+
+class StoredUpload:
+    """An uploaded file written to storage"""
+
+    def __init__(self, filename: str, content_type: str, path: str, size: int, sha256: str):
+        self.filename = filename
+        self.content_type = content_type
+        self.path = path
+        self.size = size
+        self.sha256 = sha256
+
+def max_upload_size(user: User) -> int:
+    """Largest upload accepted for the user's subscription plan"""
+    subscription = user.subscription
+    if subscription and subscription.status == "active":
+        return PLAN_MAX_FILE_SIZES.get(subscription.plan, MAX_FILE_SIZE)
+    return PLAN_MAX_FILE_SIZES[SubscriptionPlan.STARTER]
+
+class _FilePartParser:
+    """Multipart callbacks capturing the bytes of a single file field"""
+
+    def __init__(self, field_name: str):
+        self.field_name = field_name
+        self.headers = {}
+        self.header_name = b""
+        self.header_value = b""
+        self.in_file = False
+        self.filename = None
+        self.content_type = None
+        self.finished = False
+        self.pending = bytearray()
+
+    def on_part_begin(self):
+        self.headers = {}
+
+    def on_header_field(self, data: bytes, start: int, end: int):
+        self.header_name += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int):
+        self.header_value += data[start:end]
+
+    def on_header_end(self):
+        self.headers[self.header_name.lower()] = self.header_value
+        self.header_name = b""
+        self.header_value = b""
+
+    def on_headers_finished(self):
+        _, options = parse_options_header(self.headers.get(b"content-disposition", b""))
+        name = options.get(b"name", b"").decode("utf-8", "replace")
+        self.in_file = (
+            name == self.field_name and b"filename" in options and
+            self.filename is None and not self.finished
+        )
+        if self.in_file:
+            self.filename = options[b"filename"].decode("utf-8", "replace")
+            self.content_type = self.headers.get(b"content-type", b"application/octet-stream").decode("latin-1")
+
+    def on_part_data(self, data: bytes, start: int, end: int):
+        if self.in_file:
+            self.pending += data[start:end]
+
+    def on_part_end(self):
+        if self.in_file:
+            self.in_file = False
+            self.finished = True
+
+async def stream_upload(
+    request: Request,
+    max_size: int,
+    field_name: str = "file",
+    allowed_types: Optional[list] = None,
+    dest_dir: str = INCOMING_DIR
+) -> StoredUpload:
+    """Stream a multipart file field to disk, hashing and size-checking as it arrives
+
+    The request body is parsed incrementally and the file is written in
+    UPLOAD_CHUNK_SIZE blocks off the event loop, so memory use does not grow
+    with the upload. Oversized uploads are rejected from Content-Length
+    before reading, or as soon as the limit is crossed.
+    """
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_size + MULTIPART_OVERHEAD:
+        raise UploadTooLarge(max_size)
+
+    _, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if not boundary:
+        raise UploadError("Expected a multipart/form-data upload")
+
+    part = _FilePartParser(field_name)
+    parser = MultipartParser(boundary, {
+        "on_part_begin": part.on_part_begin,
+        "on_part_data": part.on_part_data,
+        "on_part_end": part.on_part_end,
+        "on_header_field": part.on_header_field,
+        "on_header_value": part.on_header_value,
+        "on_header_end": part.on_header_end,
+        "on_headers_finished": part.on_headers_finished
+    })
+
+    os.makedirs(dest_dir, exist_ok=True)
+    sha256 = hashlib.sha256()
+    size = 0
+    path = None
+    output = None
+
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+
+            if part.filename is not None and output is None:
+                if allowed_types is not None and part.content_type not in allowed_types:
+                    raise UploadError("Unsupported file type")
+                path = os.path.join(dest_dir, f"{uuid.uuid4()}{Path(part.filename).suffix}")
+                output = await asyncio.to_thread(open, path, "wb")
+
+            if len(part.pending) >= UPLOAD_CHUNK_SIZE or (part.finished and part.pending):
+                data = bytes(part.pending)
+                part.pending.clear()
+                size += len(data)
+                if size > max_size:
+                    raise UploadTooLarge(max_size)
+                sha256.update(data)
+                await asyncio.to_thread(output.write, data)
+        parser.finalize()
+
+        if output is None:
+            raise UploadError(f"Missing file field '{field_name}'")
+        if not part.finished:
+            raise UploadError("Incomplete multipart upload")
+        await asyncio.to_thread(output.close)
+    except BaseException:
+        if output is not None:
+            output.close()
+        if path and os.path.exists(path):
+            os.remove(path)
+        raise
+
+    return StoredUpload(part.filename, part.content_type, path, size, sha256.hexdigest())
+
+def blob_key(sha256: str) -> str:
+    """Sharded relative key for a blob: ab/cd/abcd..."""
+    return f"{sha256[:2]}/{sha256[2:4]}/{sha256}"
+
+def preview_key(sha256: str, width: int) -> str:
+    """Store key of a blob's preview; it shares the blob's shard (ab/cd/abcd....preview-256.jpg)"""
+    return f"{sha256}.preview-{width}.jpg"
+
+def archive_key(sha256: str) -> str:
+    """Store key of compacted execution data, ref-counted by its sha256 like any blob"""
+    return f"{sha256}.execution.json.gz"
+
+class BlobStore(ABC):
+    """Content-addressed storage for uploaded file bytes"""
+
+    @abstractmethod
+    def exists(self, sha256: str) -> bool:
+        """Whether a blob is stored"""
+
+    @abstractmethod
+    def put_file(self, sha256: str, path: str, overwrite: bool = False):
+        """Store a local file under its hash, consuming the local copy"""
+
+    @abstractmethod
+    def open(self, sha256: str) -> BinaryIO:
+        """Open a blob for streaming reads"""
+
+    @abstractmethod
+    def delete(self, sha256: str):
+        """Delete a blob (no error if it is not stored)"""
+
+    @abstractmethod
+    def location(self, sha256: str) -> str:
+        """Path or URL recorded on documents"""
+
+    @abstractmethod
+    def size(self, sha256: str) -> Optional[int]:
+        """Size of a blob in bytes, or None if it is not stored"""
+
+    def file_path(self, sha256: str) -> Optional[str]:
+        """Local path of the blob when it can be served straight from disk"""
+        return None
+
+    @abstractmethod
+    def iter_range(self, sha256: str, start: int, end: int) -> Iterator[bytes]:
+        """Stream bytes start..end (inclusive) of a blob in bounded chunks"""
+
+    @contextmanager
+    def local_path(self, sha256: str) -> Iterator[str]:
+        """Local file holding the blob's bytes, copied to a temporary file if remote"""
+        os.makedirs(INCOMING_DIR, exist_ok=True)
+        path = os.path.join(INCOMING_DIR, f"{uuid.uuid4()}.blob")
+        try:
+            with self.open(sha256) as source, open(path, "wb") as target:
+                shutil.copyfileobj(source, target, UPLOAD_CHUNK_SIZE)
+            yield path
+        finally:
+            if os.path.exists(path):
+                os.remove(path)
+
+class LocalBlobStore(BlobStore):
+    """Blob store on the local filesystem, sharded by hash prefix"""
+
+    def __init__(self, root: str = BLOB_DIR):
+        self.root = root
+
+    def path(self, sha256: str) -> str:
+        return os.path.join(self.root, blob_key(sha256))
+
+    def exists(self, sha256: str) -> bool:
+        return os.path.exists(self.path(sha256))
+
+    def put_file(self, sha256: str, path: str, overwrite: bool = False):
+        if not overwrite and self.exists(sha256):
+            os.remove(path)
+            return
+        destination = self.path(sha256)
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        # Incoming files live on the same filesystem, so this is an atomic rename
+        os.replace(path, destination)
+
+    def open(self, sha256: str) -> BinaryIO:
+        return open(self.path(sha256), "rb")
+
+    def delete(self, sha256: str):
+        try:
+            os.remove(self.path(sha256))
+        except FileNotFoundError:
+            pass
+
+    def location(self, sha256: str) -> str:
+        return self.path(sha256)
+
+    def size(self, sha256: str) -> Optional[int]:
+        try:
+            return os.path.getsize(self.path(sha256))
+        except FileNotFoundError:
+            return None
+
+    def file_path(self, sha256: str) -> Optional[str]:
+        return self.path(sha256)
+
+    def iter_range(self, sha256: str, start: int, end: int) -> Iterator[bytes]:
+        return iter_file_range(self.path(sha256), start, end)
+
+    @contextmanager
+    def local_path(self, sha256: str) -> Iterator[str]:
+        yield self.path(sha256)
+
+class S3BlobStore(BlobStore):
+    """Blob store in an S3 bucket (or an S3-compatible endpoint)"""
+
+    def __init__(self, bucket: str = S3_BUCKET, prefix: str = S3_PREFIX, endpoint_url: Optional[str] = S3_ENDPOINT_URL, client=None):
+        if client is None:
+            import boto3
+            client = boto3.client("s3", endpoint_url=endpoint_url)
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix
+
+    def key(self, sha256: str) -> str:
+        return f"{self.prefix}{blob_key(sha256)}"
+
+    def exists(self, sha256: str) -> bool:
+        return self.size(sha256) is not None
+
+    def size(self, sha256: str) -> Optional[int]:
+        from botocore.exceptions import ClientError
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=self.key(sha256))["ContentLength"]
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+
+    def put_file(self, sha256: str, path: str, overwrite: bool = False):
+        try:
+            if overwrite or not self.exists(sha256):
+                # Managed transfer: large files go up as multipart uploads
+                self.client.upload_file(path, self.bucket, self.key(sha256))
+        finally:
+            os.remove(path)
+
+    def open(self, sha256: str) -> BinaryIO:
+        return self.client.get_object(Bucket=self.bucket, Key=self.key(sha256))["Body"]
+
+    def delete(self, sha256: str):
+        self.client.delete_object(Bucket=self.bucket, Key=self.key(sha256))
+
+    def location(self, sha256: str) -> str:
+        return f"s3://{self.bucket}/{self.key(sha256)}"
+
+    def iter_range(self, sha256: str, start: int, end: int) -> Iterator[bytes]:
+        body = self.client.get_object(
+            Bucket=self.bucket, Key=self.key(sha256), Range=f"bytes={start}-{end}"
+        )["Body"]
+        try:
+            yield from body.iter_chunks(UPLOAD_CHUNK_SIZE)
+        finally:
+            body.close()
+
+    @contextmanager
+    def local_path(self, sha256: str) -> Iterator[str]:
+        os.makedirs(INCOMING_DIR, exist_ok=True)
+        path = os.path.join(INCOMING_DIR, f"{uuid.uuid4()}.blob")
+        try:
+            self.client.download_file(self.bucket, self.key(sha256), path)
+            yield path
+        finally:
+            if os.path.exists(path):
+                os.remove(path)
+
+def iter_file_range(path: str, start: int, end: int) -> Iterator[bytes]:
+    """Stream bytes start..end (inclusive) of a local file in UPLOAD_CHUNK_SIZE reads"""
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            block = f.read(min(UPLOAD_CHUNK_SIZE, remaining))
+            if not block:
+                break
+            remaining -= len(block)
+            yield block
+
+def parse_byte_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Inclusive (start, end) selected by a Range header, or None to send the whole file
+
+    Only single byte ranges are honoured; multi-range, malformed and
+    inverted (bytes=5-3) headers are answered with the whole file, as
+    RFC 9110 allows.
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    first, _, last = header[len("bytes="):].strip().partition("-")
+    try:
+        if not first:
+            length = int(last)
+            if length <= 0:
+                raise RangeNotSatisfiable()
+            start, end = max(size - length, 0), size - 1
+        else:
+            start = int(first)
+            if last and int(last) < start:
+                # An inverted range is invalid, not unsatisfiable: ignore it
+                return None
+            end = min(int(last), size - 1) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable()
+    return start, end
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header matches the given ETag (weak comparison)"""
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return etag.removeprefix("W/") in (value.strip().removeprefix("W/") for value in header.split(","))
+
+def inline_disposition(filename: str) -> str:
+    """Content-Disposition header showing a file inline under its name"""
+    quoted = quote(filename)
+    if quoted != filename:
+        return f"inline; filename*=utf-8''{quoted}"
+    return f'inline; filename="{filename}"'
+
+def content_response(
+    request: Request,
+    size: int,
+    media_type: str,
+    filename: str,
+    etag: Optional[str] = None,
+    sha256: Optional[str] = None,
+    path: Optional[str] = None,
+    cache_control: str = "private, max-age=3600"
+) -> Response:
+    """Serve stored bytes with conditional and range request support
+
+    Bytes come from the blob store (`sha256`) or a legacy local `path`.
+    Whole local files go through FileResponse, which hands the file to
+    servers supporting the pathsend extension; ranges and remote blobs are
+    streamed in bounded chunks, so no response is buffered in memory.
+    """
+    headers = {"Accept-Ranges": "bytes", "Cache-Control": cache_control}
+    if etag:
+        headers["ETag"] = etag
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+
+    store = get_blob_store()
+    local_path = store.file_path(sha256) if sha256 else path
+    iter_bytes = (lambda start, end: store.iter_range(sha256, start, end)) if sha256 else (
+        lambda start, end: iter_file_range(path, start, end)
+    )
+    headers["Content-Disposition"] = inline_disposition(filename)
+
+    # If-Range: only honour the range if the client's copy is still current
+    if_range = request.headers.get("if-range")
+    byte_range = None
+    if not if_range or (etag and if_range.strip() == etag):
+        try:
+            byte_range = parse_byte_range(request.headers.get("range"), size)
+        except RangeNotSatisfiable:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+
+    if byte_range is None:
+        if local_path:
+            return FileResponse(local_path, media_type=media_type, headers=headers)
+        headers["Content-Length"] = str(size)
+        return StreamingResponse(iter_bytes(0, size - 1) if size else iter(()), media_type=media_type, headers=headers)
+
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(iter_bytes(start, end), status_code=206, media_type=media_type, headers=headers)
+
+@lru_cache(maxsize=None)
+def get_blob_store() -> BlobStore:
+    """Blob store configured by STORAGE_BACKEND"""
+    if STORAGE_BACKEND == "s3":
+        return S3BlobStore()
+    return LocalBlobStore()
+
+def acquire_blob(db: Session, sha256: str, size: int, mime_type: Optional[str]) -> bool:
+    """Add a reference to a blob, returning True if the blob row is new"""
+    if db.get_bind().dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+
+    stmt = insert(Blob).values(sha256=sha256, size=size, mime_type=mime_type, ref_count=1)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Blob.sha256],
+        set_={"ref_count": Blob.ref_count + 1, "updated_at": func.now()}
+    ).returning(Blob.ref_count)
+    return db.execute(stmt).scalar_one() == 1
+
+def release_blob(db: Session, sha256: str):
+    """Drop a reference to a blob; unreferenced blobs are removed by collect_blob_garbage"""
+    db.query(Blob).filter(Blob.sha256 == sha256, Blob.ref_count > 0).update(
+        {Blob.ref_count: Blob.ref_count - 1, Blob.updated_at: func.now()},
+        synchronize_session=False
+    )
+
+def hold_blobs(db: Session, sha256s: Iterable[str]):
+    """Keep existing blob rows away from collect_blob_garbage for another grace period
+
+    Commits at once, so bytes can then be put without holding any row lock
+    and the reference taken afterwards (see store_upload).
+    """
+    sha256s = list(sha256s)
+    if sha256s:
+        db.query(Blob).filter(Blob.sha256.in_(sha256s)).update(
+            {Blob.updated_at: func.now()}, synchronize_session=False
+        )
+    db.commit()
+
+def store_upload(db: Session, upload: StoredUpload) -> str:
+    """Move a streamed upload into the blob store, returning its location
+
+    Identical bytes are stored once: when the blob already exists the
+    incoming copy is discarded and only the reference count changes. The
+    bytes are put before the reference is taken (uncommitted), so the blob
+    row is not locked during an S3 upload; hold_blobs keeps garbage
+    collection from deleting existing bytes in between.
+    """
+    hold_blobs(db, [upload.sha256])
+    store = get_blob_store()
+    store.put_file(upload.sha256, upload.path)
+    acquire_blob(db, upload.sha256, upload.size, upload.content_type)
+    return store.location(upload.sha256)
+
+def collect_blob_garbage(db: Session, grace: timedelta = BLOB_GC_GRACE) -> int:
+    """Delete blobs that have been unreferenced for longer than the grace period"""
+    cutoff = datetime.utcnow() - grace
+    candidates = [
+        sha256 for (sha256,) in db.query(Blob.sha256).filter(
+            Blob.ref_count <= 0,
+            Blob.updated_at < cutoff
+        ).all()
+    ]
+
+    store = get_blob_store()
+    deleted = 0
+    for sha256 in candidates:
+        # Deleting the row first locks it until the bytes are gone: an upload
+        # of the same bytes (hold_blobs) waits, then stores them again. One
+        # held or referenced meanwhile no longer matches and is kept.
+        removed = db.query(Blob).filter(
+            Blob.sha256 == sha256,
+            Blob.ref_count <= 0,
+            Blob.updated_at < cutoff
+        ).delete(synchronize_session=False)
+        if removed:
+            store.delete(sha256)
+            for width in PREVIEW_WIDTHS:
+                store.delete(preview_key(sha256, width))
+            store.delete(archive_key(sha256))
+            deleted += 1
+        db.commit()
+    return deleted
@@ -0,0 +1,253 @@
+import asyncio
+import hashlib
+import os
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+from fastapi import Request
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+from models import UploadSession, User
+from storage import (
+    INCOMING_DIR, UPLOAD_CHUNK_SIZE, UploadError, UploadTooLarge, StoredUpload, max_upload_size
+)
+
+UPLOAD_SESSION_DIR = os.path.join(INCOMING_DIR, "sessions")
+
+# Sessions without a chunk for this long are abandoned and garbage collected
+UPLOAD_SESSION_TTL = timedelta(hours=24)
+
+# Largest chunk one PUT may carry, and how long its claim on the session lasts
+UPLOAD_MAX_CHUNK_SIZE = int(os.getenv("UPLOAD_MAX_CHUNK_SIZE", str(64 * 1024 * 1024)))
+UPLOAD_CLAIM_TTL = timedelta(minutes=10)
+
+class UploadOffsetMismatch(UploadError):
+    """Raised when a chunk does not start where the session left off"""
+
+    def __init__(self, offset: int):
+        super().__init__(f"Chunk must start at offset {offset}")
+        self.offset = offset
+
+class UploadChecksumMismatch(UploadError):
+    """Raised when received bytes do not match the client's checksum"""
+
+class UploadInProgress(UploadError):
+    """Raised when another request is writing to or completing the session"""
+
+class UploadChunkTooLarge(UploadTooLarge):
+    """Raised when a single chunk exceeds UPLOAD_MAX_CHUNK_SIZE"""
+
+    def __init__(self, max_size: int):
+        UploadError.__init__(self, f"Chunks are limited to {max_size} bytes")
+        self.max_size = max_size
+
+def file_sha256(path: str) -> str:
+    """sha256 of a file, read in UPLOAD_CHUNK_SIZE blocks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(UPLOAD_CHUNK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def session_expires_at(session: UploadSession) -> datetime:
+    """When an idle session becomes eligible for garbage collection"""
+    return (session.updated_at or session.created_at or datetime.utcnow()) + UPLOAD_SESSION_TTL
+
+def create_upload_session(
+    db: Session,
+    user: User,
+    filename: str,
+    content_type: str,
+    total_size: int,
+    sha256: Optional[str] = None,
+    allowed_types: Optional[list] = None
+) -> UploadSession:
+    """Open a resumable upload, reserving an empty part file for its chunks"""
+    if allowed_types is not None and content_type not in allowed_types:
+        raise UploadError("Unsupported file type")
+    max_size = max_upload_size(user)
+    if total_size > max_size:
+        raise UploadTooLarge(max_size)
+
+    os.makedirs(UPLOAD_SESSION_DIR, exist_ok=True)
+    session_id = str(uuid.uuid4())
+    part_path = os.path.join(UPLOAD_SESSION_DIR, f"{session_id}.part")
+    open(part_path, "wb").close()
+
+    session = UploadSession(
+        id=session_id,
+        owner_id=user.id,
+        filename=filename,
+        content_type=content_type,
+        total_size=total_size,
+        offset=0,
+        sha256=sha256.lower() if sha256 else None,
+        part_path=part_path
+    )
+    db.add(session)
+    db.commit()
+    db.refresh(session)
+    return session
+
+def get_user_upload_session(db: Session, session_id: str, user_id: int) -> Optional[UploadSession]:
+    """Get an upload session owned by the given user"""
+    return db.query(UploadSession).filter(
+        UploadSession.id == session_id,
+        UploadSession.owner_id == user_id
+    ).first()
+
+def _claim(db: Session, session: UploadSession, *conditions) -> Optional[str]:
+    """Claim the session for one chunk write or completion, returning the claim token
+
+    The claim is a conditional UPDATE committed right away, so no row lock
+    or transaction is held while bytes move. Claims of requests that died
+    lapse after UPLOAD_CLAIM_TTL.
+    """
+    token = uuid.uuid4().hex
+    now = datetime.utcnow()
+    claimed = db.query(UploadSession).filter(
+        UploadSession.id == session.id,
+        or_(UploadSession.claim_token.is_(None), UploadSession.claimed_until < now),
+        *conditions
+    ).update({
+        UploadSession.claim_token: token,
+        UploadSession.claimed_until: now + UPLOAD_CLAIM_TTL
+    }, synchronize_session=False)
+    db.commit()
+    return token if claimed else None
+
+def release_upload_claim(db: Session, session: UploadSession, token: str):
+    """Give up a claim taken by _claim (no-op if it lapsed and was taken over)"""
+    db.query(UploadSession).filter(
+        UploadSession.id == session.id,
+        UploadSession.claim_token == token
+    ).update({UploadSession.claim_token: None, UploadSession.claimed_until: None}, synchronize_session=False)
+    db.commit()
+
+def _refused(db: Session, session: UploadSession) -> UploadError:
+    """Why a claim was refused: the offset moved on, or another request holds the session"""
+    db.refresh(session)
+    if session.claim_token:
+        return UploadInProgress("Another request is writing or completing this upload")
+    return UploadOffsetMismatch(session.offset)
+
+def _truncate(path: str, size: int):
+    with open(path, "r+b") as f:
+        f.truncate(size)
+
+def _chunk_too_large(session: UploadSession, offset: int) -> UploadTooLarge:
+    if session.total_size - offset <= UPLOAD_MAX_CHUNK_SIZE:
+        return UploadTooLarge(session.total_size)
+    return UploadChunkTooLarge(UPLOAD_MAX_CHUNK_SIZE)
+
+async def append_upload_chunk(
+    db: Session,
+    session: UploadSession,
+    offset: int,
+    request: Request,
+    chunk_sha256: Optional[str] = None
+) -> int:
+    """Write a request body into the session's part file at `offset`, returning the new offset
+
+    The chunk first claims the session at that offset, so only one request
+    writes to the part file at a time; the body then streams straight into
+    the part file and the offset advances with the claim's release. A
+    failed chunk releases the claim and cuts the part file back to the
+    offset. Chunks are limited to UPLOAD_MAX_CHUNK_SIZE bytes.
+    """
+    if offset != session.offset:
+        raise UploadOffsetMismatch(session.offset)
+    limit = min(session.total_size - offset, UPLOAD_MAX_CHUNK_SIZE)
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > limit:
+        raise _chunk_too_large(session, offset)
+
+    token = _claim(db, session, UploadSession.offset == offset)
+    if not token:
+        raise _refused(db, session)
+
+    digest = hashlib.sha256()
+    written = 0
+    try:
+        output = await asyncio.to_thread(open, session.part_path, "r+b")
+        try:
+            await asyncio.to_thread(output.seek, offset)
+            async for block in request.stream():
+                if not block:
+                    continue
+                written += len(block)
+                if written > limit:
+                    raise _chunk_too_large(session, offset)
+                digest.update(block)
+                await asyncio.to_thread(output.write, block)
+            # Drop bytes past the chunk left by an earlier failed attempt
+            await asyncio.to_thread(output.truncate, offset + written)
+        finally:
+            await asyncio.to_thread(output.close)
+        if chunk_sha256 and digest.hexdigest() != chunk_sha256.lower():
+            raise UploadChecksumMismatch("Chunk checksum does not match the received bytes")
+    except BaseException:
+        await asyncio.to_thread(_truncate, session.part_path, offset)
+        release_upload_claim(db, session, token)
+        raise
+
+    advanced = db.query(UploadSession).filter(
+        UploadSession.id == session.id,
+        UploadSession.claim_token == token
+    ).update({
+        UploadSession.offset: offset + written,
+        UploadSession.claim_token: None,
+        UploadSession.claimed_until: None,
+        UploadSession.updated_at: datetime.utcnow()
+    }, synchronize_session=False)
+    db.commit()
+    db.refresh(session)
+    if not advanced:
+        # The claim lapsed and another request took the session over
+        raise UploadInProgress("The chunk took too long and was superseded")
+    return session.offset
+
+async def complete_upload_session(db: Session, session: UploadSession, sha256: Optional[str] = None) -> Tuple[StoredUpload, str]:
+    """Verify a fully received upload and hand its part file over as a StoredUpload
+
+    Completion claims the session first, so a concurrent complete (or a
+    late chunk) is refused with UploadInProgress instead of racing for the
+    part file. The whole file is hashed server-side and checked against
+    the checksum given now or when the session was created; a mismatch
+    discards the session. Returns the upload and the claim token: the
+    caller stores the upload and deletes the session row, or releases the
+    claim (release_upload_claim) if storing fails.
+    """
+    if session.offset != session.total_size:
+        raise UploadError(f"Upload incomplete: {session.offset} of {session.total_size} bytes received")
+    token = _claim(db, session, UploadSession.offset == session.total_size)
+    if not token:
+        raise UploadInProgress("This upload is already being completed")
+
+    try:
+        actual = await asyncio.to_thread(file_sha256, session.part_path)
+    except BaseException:
+        release_upload_claim(db, session, token)
+        raise
+    expected = (sha256 or session.sha256 or "").lower()
+    if expected and actual != expected:
+        abort_upload_session(db, session)
+        raise UploadChecksumMismatch("Upload checksum does not match the received bytes")
+
+    return StoredUpload(session.filename, session.content_type, session.part_path, session.total_size, actual), token
+
+def abort_upload_session(db: Session, session: UploadSession):
+    """Delete an upload session and its part file"""
+    if os.path.exists(session.part_path):
+        os.remove(session.part_path)
+    db.delete(session)
+    db.commit()
+
+def collect_abandoned_uploads(db: Session, ttl: timedelta = UPLOAD_SESSION_TTL) -> int:
+    """Delete upload sessions that have received no chunk within the TTL"""
+    stale = db.query(UploadSession).filter(
+        UploadSession.updated_at < datetime.utcnow() - ttl
+    ).all()
+    for session in stale:
+        abort_upload_session(db, session)
+    return len(stale)
@@ -0,0 +1,262 @@
+import calendar
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from models import AiModel, UsageBudget, UsageEntry, UsageRollup
+
+# Ledger entries are kept this long; the daily rollups are kept for good
+USAGE_LEDGER_RETENTION_DAYS = int(os.getenv("USAGE_LEDGER_RETENTION_DAYS", "90"))
+
+# Seconds a loaded price list is reused before AiModel prices are read again
+MODEL_PRICE_TTL = 60.0
+
+# Fractions of a budget limit that raise an alert, unless the budget sets its own
+DEFAULT_ALERT_THRESHOLDS = [0.5, 0.8, 1.0]
+
+class ModelPrices:
+    """price_per_token of the active AI models, reloaded every MODEL_PRICE_TTL seconds
+
+    Executions name models loosely ("GPT-4"), so a name matches a model by
+    exact name or model_id (case-insensitive), then by name prefix.
+    """
+
+    def __init__(self, ttl: float = MODEL_PRICE_TTL):
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.loaded_at = 0.0
+        self.models: List[Tuple[str, str, float]] = []
+        self.resolved: Dict[str, Optional[float]] = {}
+
+    def price(self, db: Session, model: str) -> Optional[float]:
+        """Price per token of a model, None if it is unknown or unpriced"""
+        with self.lock:
+            if time.monotonic() - self.loaded_at > self.ttl:
+                self.models = [
+                    (name.lower(), model_id.lower(), price)
+                    for name, model_id, price in db.query(AiModel.name, AiModel.model_id, AiModel.price_per_token).filter(
+                        AiModel.status == "active"
+                    ).all()
+                ]
+                self.resolved = {}
+                self.loaded_at = time.monotonic()
+            if model not in self.resolved:
+                self.resolved[model] = self._resolve(model.lower())
+            return self.resolved[model]
+
+    def _resolve(self, model: str) -> Optional[float]:
+        for name, model_id, price in self.models:
+            if model in (name, model_id):
+                return price
+        for name, model_id, price in self.models:
+            if name.startswith(model + " "):
+                return price
+        return None
+
+model_prices = ModelPrices()
+
+def _add_usage(
+    db: Session,
+    user_id: int,
+    model: str,
+    tokens: int,
+    execution_id: Optional[int] = None,
+    step_id: Optional[str] = None
+) -> UsageEntry:
+    """Add an AI call to the usage ledger and to its user/model/day rollup, without committing"""
+    if db.get_bind().dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+
+    now = datetime.utcnow()
+    cost = tokens * (model_prices.price(db, model) or 0.0)
+    entry = UsageEntry(
+        user_id=user_id, execution_id=execution_id, step_id=step_id, model=model, tokens=tokens, cost=cost, created_at=now
+    )
+    db.add(entry)
+    statement = insert(UsageRollup).values(
+        user_id=user_id, day=now.date(), model=model, calls=1, tokens=tokens, cost=cost, updated_at=now
+    )
+    db.execute(statement.on_conflict_do_update(
+        index_elements=['user_id', 'day', 'model'],
+        set_={
+            "calls": UsageRollup.calls + statement.excluded.calls,
+            "tokens": UsageRollup.tokens + statement.excluded.tokens,
+            "cost": UsageRollup.cost + statement.excluded.cost,
+            "updated_at": statement.excluded.updated_at
+        }
+    ))
+    return entry
+
+def record_usage(
+    db: Session,
+    user_id: int,
+    model: str,
+    tokens: int,
+    execution_id: Optional[int] = None,
+    step_id: Optional[str] = None
+) -> UsageEntry:
+    """Add an AI call to the usage ledger and to its user/model/day rollup, in one transaction"""
+    entry = _add_usage(db, user_id, model, tokens, execution_id, step_id)
+    db.commit()
+    return entry
+
+class UsageRecorder:
+    """Usage accounting for execute_plan: records each AI call of an execution
+
+    Calls are buffered on the event loop and written by `flush`, which the
+    engine runs in a worker thread with a session of its own. Accounting
+    errors never fail a step; the calls are logged and dropped.
+    """
+
+    def __init__(self, user_id: int, execution_id: Optional[int] = None):
+        self.user_id = user_id
+        self.execution_id = execution_id
+        self.pending: List[Tuple[str, str, int]] = []
+
+    def record(self, step_id: str, model: str, tokens: int):
+        self.pending.append((step_id, model, tokens))
+
+    def flush(self, db: Session, commit: bool = True):
+        """Write the buffered calls in one transaction, or into the caller's with commit=False"""
+        calls, self.pending = self.pending, []
+        if not calls:
+            return
+        try:
+            for step_id, model, tokens in calls:
+                _add_usage(db, self.user_id, model, tokens, self.execution_id, step_id)
+            if commit:
+                db.commit()
+            else:
+                db.flush()
+        except Exception as e:
+            db.rollback()
+            print(f"Usage recording failed: {e}")
+
+def total_tokens_used(db: Session, user_id: int) -> int:
+    """All AI tokens a user has used, from the rollups"""
+    return int(db.query(func.coalesce(func.sum(UsageRollup.tokens), 0)).filter(UsageRollup.user_id == user_id).scalar())
+
+def get_usage_budget(db: Session, user_id: int) -> Optional[UsageBudget]:
+    return db.query(UsageBudget).filter(UsageBudget.user_id == user_id).first()
+
+def set_usage_budget(
+    db: Session,
+    user_id: int,
+    monthly_tokens: Optional[int],
+    monthly_cost: Optional[float],
+    alert_thresholds: Optional[List[float]] = None
+) -> UsageBudget:
+    """Create or replace a user's monthly budget"""
+    budget = get_usage_budget(db, user_id) or UsageBudget(user_id=user_id)
+    budget.monthly_tokens = monthly_tokens
+    budget.monthly_cost = monthly_cost
+    budget.alert_thresholds = sorted(set(alert_thresholds)) if alert_thresholds else None
+    db.add(budget)
+    db.commit()
+    db.refresh(budget)
+    return budget
+
+def _budget_alerts(
+    metric: str,
+    used: float,
+    projected: float,
+    limit: Optional[float],
+    thresholds: List[float]
+) -> List[Dict[str, Any]]:
+    """Alert for the highest threshold crossed by month-to-date use, or for a projected overrun"""
+    if not limit:
+        return []
+    crossed = [threshold for threshold in thresholds if used >= limit * threshold]
+    if crossed:
+        threshold = crossed[-1]
+        return [{
+            "metric": metric,
+            "level": "exceeded" if used >= limit else "warning",
+            "threshold": threshold,
+            "used": used,
+            "limit": limit,
+            "message": f"{metric} at {used / limit:.0%} of the monthly budget"
+        }]
+    if projected > limit:
+        return [{
+            "metric": metric,
+            "level": "projected",
+            "threshold": 1.0,
+            "used": used,
+            "limit": limit,
+            "message": f"{metric} projected at {projected / limit:.0%} of the monthly budget by month end"
+        }]
+    return []
+
+def usage_summary(db: Session, user_id: int, days: int = 30) -> Dict[str, Any]:
+    """Tokens and cost per model and per day, month-to-date totals against the budget, and alerts
+
+    Everything is read from the daily rollups, so the cost of this does
+    not grow with the number of calls.
+    """
+    today = datetime.utcnow().date()
+    period_start = today - timedelta(days=days - 1)
+    month_start = today.replace(day=1)
+    rows = db.query(UsageRollup.day, UsageRollup.model, UsageRollup.calls, UsageRollup.tokens, UsageRollup.cost).filter(
+        UsageRollup.user_id == user_id,
+        UsageRollup.day >= min(period_start, month_start)
+    ).all()
+
+    totals = {"calls": 0, "tokens": 0, "cost": 0.0}
+    by_model = defaultdict(lambda: {"calls": 0, "tokens": 0, "cost": 0.0})
+    by_day = defaultdict(lambda: {"calls": 0, "tokens": 0, "cost": 0.0})
+    month_tokens, month_cost = 0, 0.0
+    for day, model, calls, tokens, cost in rows:
+        if day >= month_start:
+            month_tokens += tokens
+            month_cost += cost
+        if day < period_start:
+            continue
+        for bucket in (totals, by_model[model], by_day[day]):
+            bucket["calls"] += calls
+            bucket["tokens"] += tokens
+            bucket["cost"] += cost
+
+    # Linear projection of this month's use from the days elapsed so far
+    days_in_month = calendar.monthrange(today.year, today.month)[1]
+    elapsed = (today - month_start).days + 1
+    projected_tokens = month_tokens * days_in_month / elapsed
+    projected_cost = month_cost * days_in_month / elapsed
+
+    budget = get_usage_budget(db, user_id)
+    alerts = []
+    if budget:
+        thresholds = budget.alert_thresholds or DEFAULT_ALERT_THRESHOLDS
+        alerts += _budget_alerts("tokens", month_tokens, projected_tokens, budget.monthly_tokens, thresholds)
+        alerts += _budget_alerts("cost", round(month_cost, 6), projected_cost, budget.monthly_cost, thresholds)
+
+    return {
+        "period_start": period_start,
+        "period_end": today,
+        **{key: round(value, 6) if key == "cost" else value for key, value in totals.items()},
+        "by_model": [
+            {"model": model, **entry, "cost": round(entry["cost"], 6)}
+            for model, entry in sorted(by_model.items(), key=lambda item: item[1]["cost"], reverse=True)
+        ],
+        "by_day": [{"day": day, **entry, "cost": round(entry["cost"], 6)} for day, entry in sorted(by_day.items())],
+        "month_tokens": month_tokens,
+        "month_cost": round(month_cost, 6),
+        "projected_month_tokens": int(projected_tokens),
+        "projected_month_cost": round(projected_cost, 6),
+        "budget": budget,
+        "alerts": alerts
+    }
+
+def purge_usage_ledger(db: Session, older_than: timedelta = timedelta(days=USAGE_LEDGER_RETENTION_DAYS)) -> int:
+    """Delete ledger entries past retention; their rollups are unaffected"""
+    deleted = db.query(UsageEntry).filter(
+        UsageEntry.created_at < datetime.utcnow() - older_than
+    ).delete(synchronize_session=False)
+    db.commit()
+    return deleted
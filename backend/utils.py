@@ -6,7 +6,11 @@ from typing import Optional, Dict, Any, List
 import json
 import asyncio
 from sqlalchemy.orm import Session
-from models import User, Analytics
+from models import User, Analytics, LeadStatus
+from scoring import (
+    record_features, record_input_score, scores_from_features, values_from_features,
+    insight_flags_from_features, lead_statuses, score_lead_frame, insight_messages
+)
 
 def generate_api_key(length: int = 32) -> str:
     """Generate a random API key"""
@@ -69,113 +73,36 @@ def paginate_query(query, page: int = 1, per_page: int = 10):
 
 def calculate_lead_score(lead_data: Dict[str, Any]) -> int:
     """Calculate lead score based on various factors"""
-    score = 0
-    
-    # Company size factor
-    if lead_data.get('company'):
-        score += 20
-    
-    # Email domain factor
-    email = lead_data.get('email', '')
-    if email:
-        domain = email.split('@')[1] if '@' in email else ''
-        if domain in ['gmail.com', 'yahoo.com', 'outlook.com']:
-            score += 10
-        else:
-            score += 25  # Business email
-    
-    # Phone number factor
-    if lead_data.get('phone'):
-        score += 15
-    
-    # Source factor
-    source = lead_data.get('source', '').lower()
-    source_scores = {
-        'referral': 30,
-        'linkedin': 25,
-        'website': 20,
-        'email campaign': 15,
-        'cold call': 10
-    }
-    score += source_scores.get(source, 10)
-    
-    # Activity factor
-    if lead_data.get('last_activity'):
-        last_activity = datetime.fromisoformat(lead_data['last_activity'].replace('Z', '+00:00'))
-        days_since_activity = (datetime.now() - last_activity).days
-        if days_since_activity <= 7:
-            score += 20
-        elif days_since_activity <= 30:
-            score += 10
-    
-    return min(score, 100)  # Cap at 100
+    return int(scores_from_features(record_features(lead_data))[0])
 
 def predict_lead_value(lead_data: Dict[str, Any]) -> float:
     """Predict lead value based on historical data and factors"""
-    base_value = 1000.0
-    
-    # Company size multiplier
-    if lead_data.get('company'):
-        base_value *= 1.5
-    
-    # Source multiplier
-    source = lead_data.get('source', '').lower()
-    source_multipliers = {
-        'referral': 2.0,
-        'linkedin': 1.5,
-        'website': 1.3,
-        'email campaign': 1.2,
-        'cold call': 1.0
-    }
-    base_value *= source_multipliers.get(source, 1.0)
-    
-    # Score factor
-    score = lead_data.get('score', 50)
-    base_value *= (score / 100)
-    
-    # Add random factor for variation
-    import random
-    base_value *= random.uniform(0.8, 1.2)
-    
-    return round(base_value, 2)
+    scores = [record_input_score(lead_data, 50)]
+    return float(values_from_features(record_features(lead_data), scores)[0])
 
 def generate_ai_insights(lead_data: Dict[str, Any]) -> List[str]:
     """Generate AI insights for a lead"""
-    insights = []
-    
-    score = lead_data.get('score', 0)
-    if score >= 80:
-        insights.append("Forte probabilité de conversion (85%)")
-    elif score >= 60:
-        insights.append("Probabilité modérée de conversion (60%)")
-    else:
-        insights.append("Nécessite du nurturing avant conversion")
-    
-    # Company insights
-    if lead_data.get('company'):
-        insights.append("Prospect d'entreprise - potentiel élevé")
-    
-    # Source insights
-    source = lead_data.get('source', '').lower()
-    if source == 'referral':
-        insights.append("Recommandé par un client - très qualifié")
-    elif source == 'linkedin':
-        insights.append("Contact professionnel actif")
-    elif source == 'website':
-        insights.append("Intérêt démontré par visite du site")
-    
-    # Activity insights
-    if lead_data.get('last_activity'):
-        last_activity = datetime.fromisoformat(lead_data['last_activity'].replace('Z', '+00:00'))
-        days_since_activity = (datetime.now() - last_activity).days
-        if days_since_activity <= 3:
-            insights.append("Activité récente - contacter rapidement")
-        elif days_since_activity <= 7:
-            insights.append("Activité cette semaine - bon timing")
-        elif days_since_activity > 30:
-            insights.append("Inactif depuis longtemps - relance nécessaire")
-    
-    return insights
+    scores = [record_input_score(lead_data, 0)]
+    return insight_messages(int(insight_flags_from_features(record_features(lead_data), scores)[0]))
+
+def classify_lead_status(score: int) -> LeadStatus:
+    """Classify a lead score as hot, warm or cold"""
+    return lead_statuses([score])[0]
+
+def score_leads(leads: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Score a batch of leads, returning score, status, predicted_value and ai_insights for each"""
+    scored = score_lead_frame(leads)
+    return [
+        {
+            'score': int(score),
+            'status': status,
+            'predicted_value': float(value),
+            'ai_insights': insight_messages(int(flags))
+        }
+        for score, status, value, flags in zip(
+            scored['score'], lead_statuses(scored['score']), scored['predicted_value'], scored['insight_flags']
+        )
+    ]
 
 def analyze_document_content(content: str, document_type: str) -> Dict[str, Any]:
     """Analyze document content and extract relevant data"""
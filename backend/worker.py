@@ -0,0 +1,167 @@
+import importlib
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Sequence
+from database import SessionLocal
+from jobs import (
+    JOB_HANDLERS, JOB_HEARTBEAT_INTERVAL, JOB_LEASE_TIMEOUT, claim_job, execute_job, heartbeat_job,
+    requeue_stale_jobs
+)
+
+# Worker configuration
+WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", "4"))
+WORKER_PROCESSES = int(os.getenv("WORKER_PROCESSES", str(os.cpu_count() or 1)))
+WORKER_POLL_INTERVAL = 1.0
+
+# Modules whose @job_handler registrations the worker serves
+JOB_HANDLER_MODULES = ["document_processing", "previews", "workflow_queue", "lead_import", "lead_rescoring"]
+
+# Process pool for CPU-heavy job steps, set while run_worker is running
+_cpu_pool: Optional[ProcessPoolExecutor] = None
+
+@contextmanager
+def cpu_pool(processes: int = WORKER_PROCESSES) -> Iterator[ProcessPoolExecutor]:
+    """Install a process pool for run_cpu_bound/map_cpu_bound for the duration of the block"""
+    global _cpu_pool
+    _cpu_pool = ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context("spawn"))
+    try:
+        yield _cpu_pool
+    finally:
+        _cpu_pool.shutdown()
+        _cpu_pool = None
+
+def run_cpu_bound(fn: Callable[..., Any], *args) -> Any:
+    """Run a CPU-heavy function in the worker's process pool (inline outside a worker)"""
+    if _cpu_pool is None:
+        return fn(*args)
+    return _cpu_pool.submit(fn, *args).result()
+
+def map_cpu_bound(fn: Callable[..., Any], calls: Iterable[Sequence[Any]]) -> List[Any]:
+    """Run fn once per argument tuple across the process pool, results in call order"""
+    if _cpu_pool is None:
+        return [fn(*args) for args in calls]
+    futures = [_cpu_pool.submit(fn, *args) for args in calls]
+    return [future.result() for future in futures]
+
+def imap_cpu_bound(fn: Callable[..., Any], calls: Iterable[Sequence[Any]], window: int) -> Iterator[Any]:
+    """Lazy map_cpu_bound: at most `window` calls in flight, results yielded in call order"""
+    if _cpu_pool is None:
+        for args in calls:
+            yield fn(*args)
+        return
+    pending = deque()
+    for args in calls:
+        pending.append(_cpu_pool.submit(fn, *args))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+def load_job_handlers():
+    """Import the modules registering queue handlers"""
+    for module in JOB_HANDLER_MODULES:
+        importlib.import_module(module)
+
+def _heartbeat(job_id: int, worker_id: str, done: threading.Event):
+    """Keep extending a running job's lease until it finishes"""
+    while not done.wait(JOB_HEARTBEAT_INTERVAL):
+        db = SessionLocal()
+        try:
+            if not heartbeat_job(db, job_id, worker_id):
+                return
+        except Exception as e:
+            print(f"Worker {worker_id} heartbeat error: {e}")
+        finally:
+            db.close()
+
+def _poll_jobs(worker_id: str, job_types: List[str], poll_interval: float, stop: threading.Event):
+    """Claim and run jobs until asked to stop, sleeping while the queue is empty"""
+    while not stop.is_set():
+        job = None
+        db = SessionLocal()
+        try:
+            job = claim_job(db, worker_id, job_types)
+            if job:
+                done = threading.Event()
+                threading.Thread(target=_heartbeat, args=(job.id, worker_id, done), daemon=True).start()
+                try:
+                    execute_job(db, job, worker_id)
+                finally:
+                    done.set()
+        except Exception as e:
+            print(f"Worker {worker_id} error: {e}")
+        finally:
+            db.close()
+        if job is None:
+            stop.wait(poll_interval)
+
+def run_worker(
+    concurrency: int = WORKER_CONCURRENCY,
+    processes: int = WORKER_PROCESSES,
+    poll_interval: float = WORKER_POLL_INTERVAL,
+    job_types: Optional[List[str]] = None
+):
+    """Run queue consumers until SIGINT/SIGTERM
+
+    `concurrency` threads claim jobs and handle their I/O; CPU-heavy steps
+    go through run_cpu_bound/map_cpu_bound to a pool of `processes` worker processes.
+    The main thread periodically requeues jobs whose worker died.
+    """
+    load_job_handlers()
+    job_types = job_types or list(JOB_HANDLERS)
+    name = f"{socket.gethostname()}:{os.getpid()}"
+
+    stop = threading.Event()
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+
+    with cpu_pool(processes):
+        threads = [
+            threading.Thread(target=_poll_jobs, args=(f"{name}:{i}", job_types, poll_interval, stop), daemon=True)
+            for i in range(concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        print(f"Worker {name} running {concurrency} consumers, {processes} processes for: {', '.join(job_types)}")
+
+        try:
+            while not stop.is_set():
+                db = SessionLocal()
+                try:
+                    requeued = requeue_stale_jobs(db)
+                    if requeued:
+                        print(f"Requeued {requeued} jobs with expired leases")
+                finally:
+                    db.close()
+                stop.wait(min(JOB_LEASE_TIMEOUT.total_seconds() / 2, 60))
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+
+def run_worker_replicas(replicas: int, **options):
+    """Run `replicas` independent worker processes until SIGINT/SIGTERM
+
+    Workers share nothing but the database: SKIP LOCKED claims and leases
+    let any number of them, on any number of machines, consume one queue.
+    """
+    context = multiprocessing.get_context("spawn")
+    children = [context.Process(target=run_worker, kwargs=options, name=f"worker-{i}") for i in range(replicas)]
+    for child in children:
+        child.start()
+
+    def forward(signum, _frame):
+        for child in children:
+            if child.is_alive():
+                os.kill(child.pid, signum)
+
+    signal.signal(signal.SIGINT, forward)
+    signal.signal(signal.SIGTERM, forward)
+    for child in children:
+        child.join()
@@ -0,0 +1,630 @@
+import asyncio
+import copy
+import hashlib
+import inspect
+import json
+import os
+import threading
+import time
+import weakref
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from sqlalchemy.orm import Session
+from models import Workflow, WorkflowExecution
+from utils import log_analytics
+from step_cache import StepResultMemo
+from usage import UsageRecorder
+from execution_events import FINISHED_EVENT, publish_execution_event
+
+# Engine configuration
+WORKFLOW_STEP_TIMEOUT = float(os.getenv("WORKFLOW_STEP_TIMEOUT", "30"))
+WORKFLOW_MAX_PARALLEL_STEPS = int(os.getenv("WORKFLOW_MAX_PARALLEL_STEPS", "8"))
+WORKFLOW_PLAN_CACHE_SIZE = int(os.getenv("WORKFLOW_PLAN_CACHE_SIZE", "1024"))
+DEFAULT_AI_MODEL = "GPT-4"
+
+# Who may reuse a deterministic step's memoized output
+CACHE_SCOPES = ("user", "global")
+
+# AI provider: "mock" (local, simulated latency) or "openai" (any OpenAI-compatible endpoint)
+AI_PROVIDER = os.getenv("AI_PROVIDER", "mock")
+AI_PROVIDER_URL = os.getenv("AI_PROVIDER_URL", "https://api.openai.com/v1")
+MOCK_AI_LATENCY = float(os.getenv("MOCK_AI_LATENCY", "0.05"))
+
+# Workflow ai_model labels -> provider model ids
+AI_MODEL_IDS = {
+    "GPT-4": "gpt-4o",
+    "Claude": "claude-3-5-sonnet-latest",
+    "Mistral": "mistral-large-latest"
+}
+
+# Execution statuses after which an execution is never run or recorded again
+EXECUTION_FINISHED = ("completed", "failed")
+
+class WorkflowDefinitionError(ValueError):
+    """Raised when workflow steps do not form a runnable DAG"""
+
+class StepFailed(Exception):
+    """Raised when a step errors or times out"""
+
+    def __init__(self, step_id: str, message: str):
+        super().__init__(f"Step {step_id}: {message}")
+        self.step_id = step_id
+
+class AIResult:
+    """Text and token usage of one AI completion"""
+
+    def __init__(self, text: str, tokens: int):
+        self.text = text
+        self.tokens = tokens
+
+class AIProvider(ABC):
+    """Completion backend used by AI steps"""
+
+    @abstractmethod
+    async def complete(self, model: str, prompt: str) -> AIResult:
+        """Complete a prompt with a model"""
+
+class MockAIProvider(AIProvider):
+    """Local provider with simulated latency and deterministic output"""
+
+    def __init__(self, latency: float = MOCK_AI_LATENCY):
+        self.latency = latency
+
+    async def complete(self, model: str, prompt: str) -> AIResult:
+        await asyncio.sleep(self.latency)
+        digest = hashlib.sha256(f"{model}:{prompt}".encode()).hexdigest()
+        completion_tokens = 20 + int(digest[:2], 16) % 100
+        return AIResult(f"[{model}] {digest[:16]}", len(prompt) // 4 + completion_tokens)
+
+class OpenAICompatibleProvider(AIProvider):
+    """Chat completions over HTTP against an OpenAI-compatible API"""
+
+    def __init__(self, base_url: str = AI_PROVIDER_URL, api_key: Optional[str] = None, timeout: float = 60.0):
+        self.base_url = base_url
+        self.api_key = api_key or os.getenv("OPENAI_API_KEY", "")
+        self.timeout = timeout
+        # Connection pools are bound to an event loop; worker threads each run their own
+        self.clients = weakref.WeakKeyDictionary()
+
+    def client(self):
+        loop = asyncio.get_running_loop()
+        if loop not in self.clients:
+            import httpx
+            self.clients[loop] = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={"Authorization": f"Bearer {self.api_key}"},
+                timeout=self.timeout
+            )
+        return self.clients[loop]
+
+    async def complete(self, model: str, prompt: str) -> AIResult:
+        response = await self.client().post("/chat/completions", json={
+            "model": AI_MODEL_IDS.get(model, model),
+            "messages": [{"role": "user", "content": prompt}]
+        })
+        response.raise_for_status()
+        body = response.json()
+        return AIResult(body["choices"][0]["message"]["content"], body.get("usage", {}).get("total_tokens", 0))
+
+@lru_cache(maxsize=None)
+def get_ai_provider() -> AIProvider:
+    """AI provider configured by AI_PROVIDER"""
+    if AI_PROVIDER == "openai":
+        return OpenAICompatibleProvider()
+    return MockAIProvider()
+
+class WorkflowStep:
+    """One compiled step: what runs and what it waits for"""
+
+    def __init__(
+        self,
+        id: str,
+        name: str,
+        type: str,
+        depends_on: List[str],
+        timeout: float,
+        config: Dict[str, Any],
+        deterministic: bool = False,
+        cache_ttl: Optional[float] = None,
+        cache_scope: str = "user"
+    ):
+        self.id = id
+        self.name = name
+        self.type = type
+        self.depends_on = tuple(depends_on)
+        self.timeout = timeout
+        self.config = config
+        # Deterministic steps may reuse a memoized output of identical work
+        self.deterministic = deterministic
+        self.cache_ttl = cache_ttl
+        self.cache_scope = cache_scope
+
+class WorkflowPlan:
+    """Steps of a workflow compiled into a DAG
+
+    Plans are shared between executions through the plan cache, so they
+    are never modified after compile_workflow returns.
+    """
+
+    def __init__(self, steps: List[WorkflowStep], ai_model: Optional[str] = None):
+        self.steps = {step.id: step for step in steps}
+        dependents = {step.id: [] for step in steps}
+        for step in steps:
+            for dependency in step.depends_on:
+                dependents[dependency].append(step.id)
+        self.dependents = {step_id: tuple(ids) for step_id, ids in dependents.items()}
+        self.roots = tuple(step.id for step in steps if not step.depends_on)
+        self.sinks = tuple(step.id for step in steps if not self.dependents[step.id])
+        self.ai_model = ai_model or DEFAULT_AI_MODEL
+        # Topological order, filled in once the DAG is validated
+        self.order: tuple = ()
+
+class StepContext:
+    """What a step handler sees: its step, the execution input and upstream outputs"""
+
+    def __init__(self, step: WorkflowStep, input_data: Dict[str, Any], upstream: Dict[str, Any], provider: AIProvider, ai_model: str):
+        self.step = step
+        self.input_data = input_data
+        self.upstream = upstream
+        self.provider = provider
+        self.ai_model = ai_model
+        self.tokens = 0
+        self.started = time.perf_counter()
+        self.cache_key: Optional[str] = None
+        self.emit: Optional[Callable[..., None]] = None
+        self.on_usage: Optional[Callable[[str, str, int], None]] = None
+
+    async def complete(self, prompt: str) -> str:
+        """Run an AI completion, counting its tokens towards the step"""
+        model = self.step.config.get("model", self.ai_model)
+        result = await self.provider.complete(model, prompt)
+        self.tokens += result.tokens
+        if self.on_usage:
+            self.on_usage(self.step.id, model, result.tokens)
+        if self.emit:
+            self.emit("tokens", step_id=self.step.id, tokens=result.tokens, step_tokens=self.tokens)
+        return result.text
+
+# Step handlers: step type -> async fn(ctx) returning the step output
+STEP_HANDLERS: Dict[str, Callable[[StepContext], Awaitable[Dict[str, Any]]]] = {}
+
+def step_handler(*step_types: str):
+    """Register a coroutine as the handler for one or more step types"""
+    def register(fn):
+        for step_type in step_types:
+            STEP_HANDLERS[step_type] = fn
+        return fn
+    return register
+
+@step_handler("trigger", "data_collection")
+async def trigger_step(ctx: StepContext) -> Dict[str, Any]:
+    """Entry step: hands the execution input to the rest of the workflow"""
+    return {"input": ctx.input_data}
+
+@step_handler(
+    "ai_analysis", "ai_response", "sentiment", "ocr", "extraction",
+    "segmentation", "personalization", "prediction"
+)
+async def ai_step(ctx: StepContext) -> Dict[str, Any]:
+    """Ask the AI provider, with the step's prompt and upstream outputs as context"""
+    prompt = ctx.step.config.get("prompt") or ctx.step.name
+    context = json.dumps({"input": ctx.input_data, "upstream": ctx.upstream}, default=str, ensure_ascii=False)
+    text = await ctx.complete(f"{prompt}\n\nContext:\n{context[:4000]}")
+    return {"text": text}
+
+@step_handler("scoring", "validation", "notification", "escalation", "send", "visualization", "report")
+async def passthrough_step(ctx: StepContext) -> Dict[str, Any]:
+    """Steps without an integration yet: record which upstream results they received"""
+    return {"received": sorted(ctx.upstream)}
+
+@step_handler("wait")
+async def wait_step(ctx: StepContext) -> Dict[str, Any]:
+    """Pause for config.seconds"""
+    await asyncio.sleep(float(ctx.step.config.get("seconds", 0)))
+    return {}
+
+def compile_workflow(steps: Optional[List[Dict[str, Any]]], ai_model: Optional[str] = None) -> WorkflowPlan:
+    """Validate workflow steps and compile them into a DAG
+
+    A step runs after the steps listed in its `depends_on`; without that
+    key it runs after the previous step, so plain step lists stay
+    sequential. Unknown types, unknown dependencies and cycles are
+    rejected up front. Steps with `deterministic: true` are memoized for
+    `cache_ttl` seconds, per user or, with `cache_scope: "global"`, shared.
+    """
+    compiled = []
+    seen = set()
+    previous = None
+    for index, raw in enumerate(steps or []):
+        step_id = str(raw.get("id", index + 1))
+        if step_id in seen:
+            raise WorkflowDefinitionError(f"Duplicate step id '{step_id}'")
+        step_type = raw.get("type")
+        if step_type not in STEP_HANDLERS:
+            raise WorkflowDefinitionError(f"Step '{step_id}' has unknown type '{step_type}'")
+        if "depends_on" in raw:
+            depends_on = [str(dependency) for dependency in raw["depends_on"] or []]
+        else:
+            depends_on = [previous] if previous is not None else []
+        cache_scope = raw.get("cache_scope", "user")
+        if cache_scope not in CACHE_SCOPES:
+            raise WorkflowDefinitionError(f"Step '{step_id}' has unknown cache_scope '{cache_scope}'")
+        compiled.append(WorkflowStep(
+            id=step_id,
+            name=raw.get("name", step_id),
+            type=step_type,
+            depends_on=depends_on,
+            timeout=float(raw.get("timeout", WORKFLOW_STEP_TIMEOUT)),
+            config=copy.deepcopy(raw.get("config") or {}),
+            deterministic=bool(raw.get("deterministic")),
+            cache_ttl=float(raw["cache_ttl"]) if raw.get("cache_ttl") else None,
+            cache_scope=cache_scope
+        ))
+        seen.add(step_id)
+        previous = step_id
+
+    for step in compiled:
+        for dependency in step.depends_on:
+            if dependency not in seen:
+                raise WorkflowDefinitionError(f"Step '{step.id}' depends on unknown step '{dependency}'")
+
+    plan = WorkflowPlan(compiled, ai_model)
+
+    # Kahn's algorithm: every step must become ready for the graph to be acyclic
+    pending = {step_id: len(step.depends_on) for step_id, step in plan.steps.items()}
+    ready = list(plan.roots)
+    order = []
+    while ready:
+        step_id = ready.pop(0)
+        order.append(step_id)
+        for dependent in plan.dependents[step_id]:
+            pending[dependent] -= 1
+            if pending[dependent] == 0:
+                ready.append(dependent)
+    if len(order) != len(plan.steps):
+        raise WorkflowDefinitionError("Workflow steps contain a dependency cycle")
+    plan.order = tuple(order)
+    return plan
+
+class PlanCache:
+    """LRU of compiled plans, one per workflow, valid for one definition
+
+    Each entry keeps the steps and AI model it was compiled from; comparing
+    them is far cheaper than compiling, and unlike updated_at (one-second
+    resolution on SQLite) it catches every edit, even in processes that did
+    not see it. PUT /workflows also invalidates this process's entry.
+    """
+
+    def __init__(self, maxsize: int = WORKFLOW_PLAN_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.entries: "OrderedDict[int, tuple]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, workflow: Workflow) -> WorkflowPlan:
+        """Compiled plan of a workflow, compiling it on a miss"""
+        version = (workflow.steps, workflow.ai_model)
+        with self.lock:
+            entry = self.entries.get(workflow.id)
+            if entry and entry[0] == version:
+                self.entries.move_to_end(workflow.id)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        plan = compile_workflow(workflow.steps, workflow.ai_model)
+        with self.lock:
+            # A copy, so in-place edits of the loaded steps still miss
+            self.entries[workflow.id] = (copy.deepcopy(version), plan)
+            self.entries.move_to_end(workflow.id)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+        return plan
+
+    def invalidate(self, workflow_id: int):
+        with self.lock:
+            self.entries.pop(workflow_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+plan_cache = PlanCache()
+
+def get_workflow_plan(workflow: Workflow) -> WorkflowPlan:
+    """Compiled plan of a workflow, from the plan cache when its definition is unchanged"""
+    return plan_cache.get(workflow)
+
+class ExecutionResult:
+    """Outcome of running a plan"""
+
+    def __init__(self):
+        self.status = "completed"
+        self.error = None
+        self.outputs: Dict[str, Any] = {}
+        self.steps: Dict[str, Dict[str, Any]] = {}
+        self.tokens_used = 0
+        self.duration = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def output_data(self, plan: WorkflowPlan) -> Dict[str, Any]:
+        """Sink outputs plus per-step status, as stored on the execution"""
+        return {
+            "result": {step_id: self.outputs[step_id] for step_id in plan.sinks if step_id in self.outputs},
+            "steps": self.steps
+        }
+
+async def _run_step(step: WorkflowStep, ctx: StepContext) -> Dict[str, Any]:
+    """Run one step's handler under its timeout"""
+    try:
+        return await asyncio.wait_for(STEP_HANDLERS[step.type](ctx), timeout=step.timeout)
+    except asyncio.TimeoutError:
+        raise StepFailed(step.id, f"timed out after {step.timeout:g}s")
+    except StepFailed:
+        raise
+    except Exception as e:
+        raise StepFailed(step.id, f"{type(e).__name__}: {e}")
+
+async def execute_plan(
+    plan: WorkflowPlan,
+    input_data: Optional[Dict[str, Any]] = None,
+    provider: Optional[AIProvider] = None,
+    ai_model: Optional[str] = None,
+    max_parallel: int = WORKFLOW_MAX_PARALLEL_STEPS,
+    checkpoints: Optional[Dict[str, Dict[str, Any]]] = None,
+    on_step: Optional[Callable[[str, Dict[str, Any]], Any]] = None,
+    memo=None,
+    on_event: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+    on_usage: Optional[Callable[[str, str, int], None]] = None
+) -> ExecutionResult:
+    """Run a compiled workflow, starting each step as soon as its dependencies finish
+
+    Independent steps run concurrently (at most `max_parallel` at once).
+    The first failing step cancels the steps still running and fails the
+    execution. Steps found in `checkpoints` (from an earlier attempt) are
+    not run again: their recorded output is reused. `on_step` is called
+    with each step that completes, to checkpoint it, and awaited if it
+    returns an awaitable. With a `memo`
+    (see step_cache.StepResultMemo), deterministic steps reuse memoized
+    outputs and memoize the ones they compute. `on_event` receives
+    progress events: step_started, tokens and step_finished. `on_usage` is
+    called with (step_id, model, tokens) after every AI call.
+    """
+    checkpoints = checkpoints or {}
+    provider = provider or get_ai_provider()
+    input_data = input_data or {}
+    result = ExecutionResult()
+    pending = {step_id: len(step.depends_on) for step_id, step in plan.steps.items()}
+    ready = list(plan.roots)
+    running: Dict[asyncio.Task, StepContext] = {}
+    started = time.perf_counter()
+
+    def emit(event_type: str, **fields):
+        if on_event:
+            on_event(event_type, fields)
+
+    async def step_completed(step_id: str, record: Dict[str, Any]):
+        if on_step:
+            completed = on_step(step_id, record)
+            if inspect.isawaitable(completed):
+                await completed
+
+    def release(step_id: str):
+        for dependent in plan.dependents[step_id]:
+            pending[dependent] -= 1
+            if pending[dependent] == 0:
+                ready.append(dependent)
+
+    try:
+        while ready or running:
+            while ready and len(running) < max_parallel:
+                step = plan.steps[ready.pop(0)]
+                if step.id in checkpoints:
+                    checkpoint = checkpoints[step.id]
+                    result.tokens_used += checkpoint.get("tokens") or 0
+                    result.steps[step.id] = {
+                        "status": "completed",
+                        "duration": checkpoint.get("duration"),
+                        "tokens": checkpoint.get("tokens") or 0,
+                        "checkpointed": True
+                    }
+                    result.outputs[step.id] = checkpoint.get("output")
+                    emit("step_finished", step_id=step.id, **result.steps[step.id])
+                    release(step.id)
+                    continue
+                ctx = StepContext(
+                    step, input_data,
+                    {dependency: result.outputs[dependency] for dependency in step.depends_on},
+                    provider, ai_model or plan.ai_model
+                )
+                if memo and step.deterministic:
+                    ctx.cache_key = memo.key(step, ctx)
+                    cached = await memo.lookup(ctx.cache_key)
+                    if cached is not None:
+                        result.cache_hits += 1
+                        record = {"status": "completed", "duration": 0.0, "tokens": 0, "cached": True}
+                        result.steps[step.id] = record
+                        result.outputs[step.id] = cached["output"]
+                        await step_completed(step.id, {**record, "output": cached["output"]})
+                        emit("step_finished", step_id=step.id, **record)
+                        release(step.id)
+                        continue
+                    result.cache_misses += 1
+                ctx.emit = emit if on_event else None
+                ctx.on_usage = on_usage
+                emit("step_started", step_id=step.id, step_type=step.type)
+                running[asyncio.ensure_future(_run_step(step, ctx))] = ctx
+            if not running:
+                continue
+
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            failure = None
+            for task in done:
+                ctx = running.pop(task)
+                step_id = ctx.step.id
+                result.tokens_used += ctx.tokens
+                record = {
+                    "status": "completed",
+                    "duration": round(time.perf_counter() - ctx.started, 4),
+                    "tokens": ctx.tokens
+                }
+                result.steps[step_id] = record
+                if task.exception() is not None:
+                    record["status"] = "failed"
+                    record["error"] = str(task.exception())
+                    failure = failure or task.exception()
+                    emit("step_finished", step_id=step_id, **record)
+                    continue
+
+                result.outputs[step_id] = task.result()
+                await step_completed(step_id, {**record, "output": result.outputs[step_id]})
+                if ctx.cache_key:
+                    await memo.store(ctx.cache_key, ctx.step, result.outputs[step_id], ctx.tokens)
+                emit("step_finished", step_id=step_id, **record)
+                release(step_id)
+            if failure:
+                raise failure
+    except StepFailed as e:
+        result.status = "failed"
+        result.error = str(e)
+        for ctx in running.values():
+            result.steps[ctx.step.id] = {"status": "cancelled", "tokens": ctx.tokens}
+            emit("step_finished", step_id=ctx.step.id, **result.steps[ctx.step.id])
+    finally:
+        for task in running:
+            task.cancel()
+        await asyncio.gather(*running, return_exceptions=True)
+        result.duration = time.perf_counter() - started
+    return result
+
+def record_execution_result(db: Session, execution_id: int, workflow_id: int, plan: WorkflowPlan, result: ExecutionResult) -> bool:
+    """Store an execution's outcome and count the run on its workflow
+
+    Only an unfinished execution is updated, so a redelivered run cannot
+    count twice, and the counter is incremented in SQL, so concurrent
+    executions of the same workflow never lose an update. Returns whether
+    this call recorded the outcome.
+    """
+    now = datetime.utcnow()
+    recorded = db.query(WorkflowExecution).filter(
+        WorkflowExecution.id == execution_id,
+        WorkflowExecution.status.notin_(EXECUTION_FINISHED)
+    ).update({
+        WorkflowExecution.status: result.status,
+        WorkflowExecution.completed_at: now,
+        WorkflowExecution.duration: round(result.duration, 4),
+        WorkflowExecution.output_data: result.output_data(plan),
+        WorkflowExecution.tokens_used: result.tokens_used,
+        WorkflowExecution.cache_hits: result.cache_hits,
+        WorkflowExecution.cache_misses: result.cache_misses,
+        WorkflowExecution.error_message: result.error
+    }, synchronize_session=False)
+    if recorded:
+        db.query(Workflow).filter(Workflow.id == workflow_id).update({
+            Workflow.executions: Workflow.executions + 1,
+            Workflow.last_run: now,
+            # Run counters are not edits: keep updated_at so the scheduler does not resync the workflow
+            Workflow.updated_at: Workflow.updated_at
+        }, synchronize_session=False)
+    db.commit()
+    return bool(recorded)
+
+def create_execution(db: Session, workflow: Workflow, input_data: Optional[Dict[str, Any]] = None, status: str = "running") -> int:
+    """Record a new execution of a workflow, returning its id"""
+    execution = WorkflowExecution(
+        workflow_id=workflow.id,
+        status=status,
+        started_at=datetime.utcnow(),
+        input_data=input_data or {},
+        ai_model_used=workflow.ai_model
+    )
+    db.add(execution)
+    db.flush()
+    execution_id = execution.id
+    db.commit()
+    return execution_id
+
+async def run_execution(
+    db: Session,
+    workflow: Workflow,
+    execution_id: int,
+    input_data: Optional[Dict[str, Any]] = None,
+    provider: Optional[AIProvider] = None,
+    max_parallel: int = WORKFLOW_MAX_PARALLEL_STEPS,
+    checkpoints: Optional[Dict[str, Dict[str, Any]]] = None,
+    on_step: Optional[Callable[[Session, str, Dict[str, Any]], None]] = None
+) -> ExecutionResult:
+    """Run a recorded execution of a workflow and store its outcome
+
+    The session is committed before any step runs, so no database
+    connection is held while the execution awaits its steps. Database
+    writes run in worker threads with sessions of their own, so the event
+    loop never waits on a commit: `on_step` is called there with that
+    session, and AI usage is buffered and written with each checkpoint,
+    or else with the outcome. Progress is published as execution events
+    (see execution_events).
+    """
+    plan = get_workflow_plan(workflow)
+    workflow_id = workflow.id
+    owner_id = workflow.owner_id
+    bind = db.get_bind()
+    db.commit()
+
+    def on_event(event_type: str, fields: Dict[str, Any]):
+        publish_execution_event(execution_id, event_type, fields)
+
+    on_event("execution_started", {"workflow_id": workflow_id, "steps": list(plan.order)})
+    memo = StepResultMemo(db, owner_id)
+    usage = UsageRecorder(owner_id, execution_id)
+
+    def write_step(step_id: str, record: Dict[str, Any]):
+        with Session(bind) as session:
+            usage.flush(session)
+            on_step(session, step_id, record)
+
+    async def step_completed(step_id: str, record: Dict[str, Any]):
+        await asyncio.to_thread(write_step, step_id, record)
+
+    def write_result(result: ExecutionResult):
+        with Session(bind) as session:
+            usage.flush(session, commit=False)
+            if record_execution_result(session, execution_id, workflow_id, plan, result):
+                log_analytics(session, owner_id, "workflow_executed", 1.0, {
+                    "workflow_id": workflow_id, "execution_id": execution_id, "status": result.status
+                })
+
+    result = await execute_plan(
+        plan, input_data, provider, None, max_parallel, checkpoints,
+        step_completed if on_step else None, memo, on_event, usage.record
+    )
+    await asyncio.to_thread(write_result, result)
+    on_event(FINISHED_EVENT, {
+        "status": result.status,
+        "duration": round(result.duration, 4),
+        "tokens_used": result.tokens_used,
+        "error": result.error
+    })
+    return result
+
+async def execute_workflow(
+    db: Session,
+    workflow: Workflow,
+    input_data: Optional[Dict[str, Any]] = None,
+    provider: Optional[AIProvider] = None,
+    max_parallel: int = WORKFLOW_MAX_PARALLEL_STEPS
+) -> WorkflowExecution:
+    """Run a workflow in-process and record it as a WorkflowExecution"""
+    get_workflow_plan(workflow)
+    execution_id = await asyncio.to_thread(create_execution, db, workflow, input_data)
+    await run_execution(db, workflow, execution_id, input_data, provider, max_parallel)
+    return await asyncio.to_thread(db.get, WorkflowExecution, execution_id)
@@ -0,0 +1,121 @@
+import asyncio
+from datetime import datetime
+from typing import Any, Dict, Optional
+from sqlalchemy.orm import Session
+from models import Job, Workflow, WorkflowExecution, WorkflowStepCheckpoint
+from jobs import create_job, job_handler
+from execution_events import FINISHED_EVENT, publish_execution_event
+from workflow_engine import (
+    EXECUTION_FINISHED, WorkflowDefinitionError, create_execution, get_workflow_plan, run_execution
+)
+
+WORKFLOW_RUN_JOB = "workflow_run"
+
+def enqueue_workflow_run(
+    db: Session,
+    workflow: Workflow,
+    input_data: Optional[Dict[str, Any]] = None,
+    key: Optional[str] = None,
+    trigger: Optional[Dict[str, Any]] = None
+) -> Job:
+    """Record a queued execution of a workflow and queue it for the workers
+
+    The workflow is compiled first, so an invalid definition is rejected
+    here rather than failing in a worker. `trigger` describes the schedule
+    that fired the run, if any.
+    """
+    get_workflow_plan(workflow)
+    execution_id = create_execution(db, workflow, input_data, status="queued")
+    payload = {"workflow_id": workflow.id, "execution_id": execution_id, "input_data": input_data or {}}
+    if trigger:
+        payload["trigger"] = trigger
+    return create_job(db, workflow.owner_id, WORKFLOW_RUN_JOB, payload, key=key)
+
+def get_user_execution(db: Session, workflow_id: int, execution_id: int, user_id: int) -> Optional[WorkflowExecution]:
+    """Get an execution of a workflow owned by the given user"""
+    return db.query(WorkflowExecution).join(Workflow).filter(
+        WorkflowExecution.id == execution_id,
+        WorkflowExecution.workflow_id == workflow_id,
+        Workflow.owner_id == user_id
+    ).first()
+
+def load_checkpoints(db: Session, execution_id: int) -> Dict[str, Dict[str, Any]]:
+    """Steps already completed by earlier attempts of an execution"""
+    rows = db.query(WorkflowStepCheckpoint).filter(WorkflowStepCheckpoint.execution_id == execution_id).all()
+    return {
+        row.step_id: {"output": row.output, "tokens": row.tokens_used or 0, "duration": row.duration}
+        for row in rows
+    }
+
+def save_checkpoint(db: Session, execution_id: int, step_id: str, record: Dict[str, Any]):
+    """Persist a completed step (first attempt to finish it wins)"""
+    if db.get_bind().dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+
+    db.execute(insert(WorkflowStepCheckpoint).values(
+        execution_id=execution_id,
+        step_id=step_id,
+        output=record.get("output"),
+        tokens_used=record.get("tokens") or 0,
+        duration=record.get("duration")
+    ).on_conflict_do_nothing(index_elements=['execution_id', 'step_id']))
+    db.commit()
+
+def _fail_execution(db: Session, execution_id: int, error: str):
+    """Mark an unfinished execution failed"""
+    failed = db.query(WorkflowExecution).filter(
+        WorkflowExecution.id == execution_id,
+        WorkflowExecution.status.notin_(EXECUTION_FINISHED)
+    ).update({
+        WorkflowExecution.status: "failed",
+        WorkflowExecution.completed_at: datetime.utcnow(),
+        WorkflowExecution.error_message: error
+    }, synchronize_session=False)
+    db.commit()
+    if failed:
+        publish_execution_event(execution_id, FINISHED_EVENT, {"status": "failed", "error": error})
+
+def mark_execution_failed(db: Session, job: Job, error: str):
+    """Record an execution whose job ran out of attempts"""
+    _fail_execution(db, job.payload["execution_id"], error)
+
+@job_handler(WORKFLOW_RUN_JOB, on_failure=mark_execution_failed, quota=True)
+def run_workflow_job(db: Session, job: Job) -> Dict[str, Any]:
+    """Queue handler: run a queued workflow execution
+
+    Delivery is at-least-once: a job redelivered after its worker died
+    skips the steps checkpointed by the earlier attempt, and an execution
+    that already finished is not run or counted again.
+    """
+    execution_id = job.payload["execution_id"]
+    execution = db.get(WorkflowExecution, execution_id)
+    if not execution:
+        return {"skipped": "execution deleted"}
+    if execution.status in EXECUTION_FINISHED:
+        return {"execution_id": execution_id, "status": execution.status, "duplicate": True}
+    workflow = db.get(Workflow, execution.workflow_id)
+    if not workflow:
+        _fail_execution(db, execution_id, "Workflow deleted")
+        return {"skipped": "workflow deleted"}
+
+    execution.status = "running"
+    db.commit()
+    checkpoints = load_checkpoints(db, execution_id)
+    try:
+        result = asyncio.run(run_execution(
+            db, workflow, execution_id, job.payload.get("input_data"),
+            checkpoints=checkpoints,
+            on_step=lambda session, step_id, record: save_checkpoint(session, execution_id, step_id, record)
+        ))
+    except WorkflowDefinitionError as e:
+        # The definition changed since it was queued; retrying will not help
+        _fail_execution(db, execution_id, str(e))
+        return {"execution_id": execution_id, "status": "failed", "error": str(e)}
+    return {
+        "execution_id": execution_id,
+        "status": result.status,
+        "tokens_used": result.tokens_used,
+        "restored_steps": len(checkpoints)
+    }
@@ -89,6 +89,55 @@ export const workflowsAPI = {
   deleteWorkflow: async (id) => {
     const response = await api.delete(`/api/workflows/${id}`);
     return response.data;
+  },
+  
+  // Queues the run; poll getExecution with the returned execution_id
+  runWorkflow: async (id, inputData = {}) => {
+    const response = await api.post(`/api/workflows/${id}/run`, { input_data: inputData });
+    return response.data;
+  },
+  
+  getExecution: async (id, executionId) => {
+    const response = await api.get(`/api/workflows/${id}/executions/${executionId}`);
+    return response.data;
+  },
+  
+  // Pass the returned next_cursor back as params.cursor for the next page
+  getExecutions: async (id, params = {}) => {
+    const response = await api.get(`/api/workflows/${id}/executions`, { params });
+    return response.data;
+  },
+  
+  getExecutionStats: async (id, params = {}) => {
+    const response = await api.get(`/api/workflows/${id}/executions/stats`, { params });
+    return response.data;
+  },
+  
+  // Calls onEvent with each progress event until the execution finishes; returns a function that stops streaming
+  streamExecution: (id, executionId, onEvent) => {
+    const controller = new AbortController();
+    fetch(`${API_BASE_URL}/api/workflows/${id}/executions/${executionId}/events`, {
+      headers: { Authorization: `Bearer ${localStorage.getItem('authToken')}` },
+      signal: controller.signal,
+    }).then(async (response) => {
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      for (;;) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const messages = buffer.split('\n\n');
+        buffer = messages.pop();
+        messages.forEach((message) => {
+          const data = message.split('\n').find((line) => line.startsWith('data: '));
+          if (data) onEvent(JSON.parse(data.slice(6)));
+        });
+      }
+    }).catch((error) => {
+      if (error.name !== 'AbortError') onEvent({ type: 'error', message: error.message });
+    });
+    return () => controller.abort();
   }
 };
 
@@ -115,9 +164,58 @@ export const documentsAPI = {
     return response.data;
   },
   
+  // Resumable upload: pass the session id returned earlier to resume after a failure
+  uploadDocumentResumable: async (file, sessionId = null, onProgress = null) => {
+    let session = sessionId
+      ? (await api.get(`/api/documents/uploads/${sessionId}`)).data
+      : (await api.post('/api/documents/uploads', {
+          filename: file.name,
+          content_type: file.type,
+          total_size: file.size,
+        })).data;
+    while (session.offset < session.total_size) {
+      const chunk = file.slice(session.offset, session.offset + session.chunk_size);
+      try {
+        session = (await api.put(`/api/documents/uploads/${session.id}`, chunk, {
+          params: { offset: session.offset },
+          headers: { 'Content-Type': 'application/octet-stream' }
+        })).data;
+      } catch (error) {
+        // Another attempt already moved the offset: continue from the server's
+        if (error.response?.status !== 409) throw Object.assign(error, { uploadSessionId: session.id });
+        session = (await api.get(`/api/documents/uploads/${session.id}`)).data;
+      }
+      if (onProgress) onProgress(session.offset / session.total_size);
+    }
+    const response = await api.post(`/api/documents/uploads/${session.id}/complete`, {});
+    return response.data;
+  },
+  
   processDocument: async (id) => {
     const response = await api.post(`/api/documents/${id}/process`);
     return response.data;
+  },
+  
+  processDocumentBatch: async (documentIds = null) => {
+    const body = documentIds ? { document_ids: documentIds } : { all_processing: true };
+    const response = await api.post('/api/documents/process-batch', body);
+    return response.data;
+  },
+  
+  // Resolves to null while the preview is still being rendered (202)
+  getDocumentPreview: async (id, width = 256) => {
+    const response = await api.get(`/api/documents/${id}/preview`, { params: { width }, responseType: 'blob' });
+    return response.status === 202 ? null : response.data;
+  },
+  
+  downloadDocument: async (id) => {
+    const response = await api.get(`/api/documents/${id}/content`, { responseType: 'blob' });
+    return response.data;
+  },
+  
+  deleteDocument: async (id) => {
+    const response = await api.delete(`/api/documents/${id}`);
+    return response.data;
   }
 };
 
@@ -141,6 +239,35 @@ export const leadsAPI = {
   updateLead: async (id, leadData) => {
     const response = await api.put(`/api/leads/${id}`, leadData);
     return response.data;
+  },
+  
+  importLeads: async (file) => {
+    const formData = new FormData();
+    formData.append('file', file);
+    const response = await api.post('/api/leads/import', formData, {
+      headers: {
+        'Content-Type': 'multipart/form-data',
+      }
+    });
+    return response.data;
+  }
+};
+
+// Jobs API
+export const jobsAPI = {
+  getJob: async (id) => {
+    const response = await api.get(`/api/jobs/${id}`);
+    return response.data;
+  },
+  
+  getQueueMetrics: async (params = {}) => {
+    const response = await api.get('/api/jobs/metrics', { params });
+    return response.data;
+  },
+  
+  getTenantMetrics: async (params = {}) => {
+    const response = await api.get('/api/jobs/metrics/tenants', { params });
+    return response.data;
   }
 };
 
@@ -191,6 +318,19 @@ export const analyticsAPI = {
   }
 };
 
+// Usage API
+export const usageAPI = {
+  getUsage: async (days = 30) => {
+    const response = await api.get('/api/usage', { params: { days } });
+    return response.data;
+  },
+  
+  updateBudget: async (budget) => {
+    const response = await api.put('/api/usage/budget', budget);
+    return response.data;
+  }
+};
+
 // API Keys API
 export const apiKeysAPI = {
   getApiKeys: async () => {
@@ -220,4 +360,11 @@ export const aiModelsAPI = {
   }
 };
 
-export default api;
\ No newline at end of file
+export default api;
+// Search API
+export const searchAPI = {
+  search: async (q, params = {}) => {
+    const response = await api.get('/api/search', { params: { q, ...params } });
+    return response.data;
+  }
+};
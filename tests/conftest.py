@@ -0,0 +1,28 @@
+import os
+import sys
+import tempfile
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+# Backend modules import each other by bare name (from models import ...)
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend")
+sys.path.insert(0, BACKEND_DIR)
+
+# database.py builds its engine at import; keep it off any real server
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.gettempdir(), 'lezelote_tests.db')}")
+os.environ.setdefault("MOCK_AI_LATENCY", "0")
+
+@pytest.fixture
+def db(tmp_path):
+    """Session on a fresh SQLite database with every table created"""
+    from models import Base
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    Base.metadata.create_all(engine)
+    session = Session(engine)
+    try:
+        yield session
+    finally:
+        session.close()
+        engine.dispose()
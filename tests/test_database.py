@@ -0,0 +1,22 @@
+from sqlalchemy import create_engine, inspect, text
+from database import upgrade_schema
+from models import Base
+
+def old_leads_table(tmp_path):
+    """A leads table as created by the baseline release: no last_activity index"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE leads (id INTEGER PRIMARY KEY, name VARCHAR NOT NULL, email VARCHAR NOT NULL, "
+            "company VARCHAR, phone VARCHAR, source VARCHAR, status VARCHAR, score INTEGER, "
+            "predicted_value FLOAT, ai_insights JSON, owner_id INTEGER NOT NULL, last_activity DATETIME, "
+            "tags JSON, custom_fields JSON, created_at DATETIME, updated_at DATETIME)"
+        ))
+    return engine
+
+def test_upgrade_creates_missing_indexes_on_existing_tables(tmp_path):
+    engine = old_leads_table(tmp_path)
+    Base.metadata.create_all(engine)
+    upgrade_schema(Base.metadata, engine)
+    upgrade_schema(Base.metadata, engine)
+    assert "ix_leads_last_activity" in {index["name"] for index in inspect(engine).get_indexes("leads")}
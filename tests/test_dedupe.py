@@ -0,0 +1,48 @@
+from dedupe import dedupe_lead_rows, lead_dedupe_hash, upsert_lead
+from models import Lead, LeadStatus, User
+
+def make_users(db, count=2):
+    users = [User(name=f"u{i}", email=f"u{i}@example.com", hashed_password="!") for i in range(count)]
+    db.add_all(users)
+    db.commit()
+    return [user.id for user in users]
+
+def lead(owner_id, **values):
+    return {"owner_id": owner_id, "name": "Marie Curie", "email": "marie@lab.fr", "status": LeadStatus.COLD, "score": 10, **values}
+
+def test_dedupe_hash_normalizes_email_then_phone():
+    assert lead_dedupe_hash(" Marie+news@Lab.FR ") == lead_dedupe_hash("marie@lab.fr")
+    assert lead_dedupe_hash("", "+33 6 12 34 56 78") == lead_dedupe_hash(None, "06.12.34.56.78")
+    assert lead_dedupe_hash("", "12") is None
+
+def test_upsert_merges_into_the_existing_lead(db):
+    owner, = make_users(db, 1)
+    first = upsert_lead(db, lead(owner, company="Institut Radium", phone="0612345678"))
+    second = upsert_lead(db, lead(owner, email="Marie+2@LAB.fr", name="M. Curie", score=80, company=None, phone=""))
+    db.commit()
+
+    assert second == first
+    merged = db.get(Lead, first)
+    # Replaced columns take the incoming value...
+    assert (merged.name, merged.email, merged.score) == ("M. Curie", "Marie+2@LAB.fr", 80)
+    # ...coalesced ones keep the stored value when the incoming one is empty
+    assert merged.company == "Institut Radium"
+    assert merged.phone == ""
+    assert db.query(Lead).count() == 1
+
+def test_upsert_keeps_owners_apart(db):
+    alice, bob = make_users(db)
+    assert upsert_lead(db, lead(alice)) != upsert_lead(db, lead(bob))
+    db.commit()
+    assert db.query(Lead).count() == 2
+
+def test_batch_rows_collapse_later_rows_winning():
+    rows = dedupe_lead_rows([
+        lead(1, name="first"),
+        lead(1, email="MARIE@lab.fr", name="second"),
+        lead(2, name="other owner"),
+        lead(1, email="", name="no identity"),
+        lead(1, email="", name="no identity either")
+    ])
+    assert [row["name"] for row in rows] == ["second", "other owner", "no identity", "no identity either"]
+    assert rows[0]["dedupe_hash"] == lead_dedupe_hash("marie@lab.fr")
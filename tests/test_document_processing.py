@@ -0,0 +1,70 @@
+import pytest
+import document_processing
+from document_processing import (
+    DOCUMENT_PROCESS_JOB, enqueue_document_processing, extraction_cache_stats, purge_stale_extractions
+)
+from jobs import claim_job, execute_job
+from models import Document, DocumentStatus, ExtractionCache, Job, User
+from storage import LocalBlobStore
+
+PDF = "application/pdf"
+
+@pytest.fixture
+def extractions(monkeypatch, tmp_path):
+    """Paths the extractor ran on, in order"""
+    calls = []
+
+    def extract_document(path, document_type):
+        calls.append(path)
+        return {"extracted_data": {"words": 3, "path": path}, "confidence": 0.9}
+
+    monkeypatch.setattr(document_processing, "extract_document", extract_document)
+    monkeypatch.setattr(document_processing, "get_blob_store", lambda: LocalBlobStore(str(tmp_path / "blobs")))
+    return calls
+
+@pytest.fixture
+def user(db):
+    user = User(name="u", email="u@example.com", hashed_password="!")
+    db.add(user)
+    db.commit()
+    return user
+
+def process(db, user, name, content_hash="a" * 64, document_type=PDF):
+    document = Document(name=name, owner_id=user.id, type=document_type, file_path=f"/docs/{name}", content_hash=content_hash)
+    db.add(document)
+    db.commit()
+    job = enqueue_document_processing(db, document)
+    execute_job(db, claim_job(db, "test", [DOCUMENT_PROCESS_JOB]), "test")
+    db.expire_all()
+    return db.get(Document, document.id), db.get(Job, job.id)
+
+def test_identical_bytes_are_extracted_once(db, user, extractions):
+    first, first_job = process(db, user, "a.pdf")
+    second, second_job = process(db, user, "copy.pdf")
+    assert extractions == ["/docs/a.pdf"]
+    assert (first_job.result["cache_hit"], second_job.result["cache_hit"]) == (False, True)
+    assert second.status == DocumentStatus.PROCESSED
+    assert second.extracted_data == first.extracted_data and second.confidence == 0.9
+    assert db.query(ExtractionCache).one().hits == 1
+
+def test_cache_is_keyed_by_type_and_skipped_without_a_hash(db, user, extractions):
+    process(db, user, "a.pdf")
+    process(db, user, "a.png", document_type="image/png")
+    process(db, user, "b.pdf", content_hash=None)
+    process(db, user, "c.pdf", content_hash=None)
+    assert extractions == ["/docs/a.pdf", "/docs/a.png", "/docs/b.pdf", "/docs/c.pdf"]
+
+def test_new_extractor_version_misses_and_purges_old_entries(db, user, extractions, monkeypatch):
+    process(db, user, "a.pdf")
+    process(db, user, "b.pdf")
+    old_version = document_processing.EXTRACTOR_VERSION
+    monkeypatch.setattr(document_processing, "EXTRACTOR_VERSION", "next")
+    _, job = process(db, user, "c.pdf")
+    assert job.result["cache_hit"] is False and len(extractions) == 2
+
+    stats = {row["extractor_version"]: row for row in extraction_cache_stats(db)}
+    assert stats["next"] == {"extractor_version": "next", "current": True, "entries": 1, "hits": 0, "misses": 1, "hit_rate": 0.0}
+    assert stats[old_version]["current"] is False and stats[old_version]["hit_rate"] == 0.5
+
+    assert purge_stale_extractions(db) == 1
+    assert [entry.extractor_version for entry in db.query(ExtractionCache)] == ["next"]
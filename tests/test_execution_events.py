@@ -0,0 +1,71 @@
+import asyncio
+import json
+import pytest
+import execution_events
+from execution_events import FINISHED_EVENT, ExecutionEventBroker, ExecutionEventPublisher, Subscription, sse_message
+
+@pytest.fixture
+def broker(monkeypatch):
+    broker = ExecutionEventBroker()
+    monkeypatch.setattr(execution_events, "broker", broker)
+    return broker
+
+def event(event_type, execution_id=1, **fields):
+    return {"type": event_type, "execution_id": execution_id, **fields}
+
+def received(broker, publish, execution_id=1):
+    """Events a subscriber of the execution gets while `publish` runs, up to the finished event"""
+    async def collect():
+        subscription = broker.subscribe(execution_id)
+        publish()
+        try:
+            return [e async for e in subscription.events(keepalive=5) if e is not None]
+        finally:
+            subscription.close()
+    return asyncio.run(collect())
+
+def test_tokens_are_merged_and_superseded_by_their_finished_step(broker):
+    publisher = ExecutionEventPublisher(interval=60)
+
+    def publish():
+        for step_id in ["a", "b", "a", "b", "a"]:
+            publisher.publish(event("tokens", step_id=step_id, tokens=10))
+        publisher.publish(event("tokens", execution_id=2, step_id="a", tokens=10))
+        publisher.publish(event("step_finished", step_id="a", tokens=30))
+        publisher.publish(event(FINISHED_EVENT))
+
+    events = received(broker, publish)
+    assert [(e["type"], e.get("step_id"), e.get("tokens")) for e in events] == [
+        ("tokens", "b", 20), ("step_finished", "a", 30), (FINISHED_EVENT, None, None)
+    ]
+    assert not broker.subscribers
+
+def test_pending_tokens_go_out_after_the_interval(broker):
+    publisher = ExecutionEventPublisher(interval=0.05)
+
+    async def collect():
+        subscription = broker.subscribe(1)
+        publisher.publish(event("tokens", step_id="a", tokens=3))
+        publisher.publish(event("tokens", step_id="a", tokens=4))
+        first = await asyncio.wait_for(subscription.queue.get(), 2)
+        subscription.close()
+        return first
+
+    assert asyncio.run(collect())["tokens"] == 7
+
+def test_slow_subscribers_lose_the_oldest_events():
+    async def collect():
+        subscription = Subscription(ExecutionEventBroker(), 1, maxsize=2)
+        for step in range(4):
+            subscription.offer(event("step_started", step_id=str(step)))
+        subscription.offer(event(FINISHED_EVENT))
+        return [e async for e in subscription.events()]
+
+    events = asyncio.run(collect())
+    assert events[0] == {"type": "events_dropped", "execution_id": 1, "count": 3}
+    assert [e["type"] for e in events[1:]] == ["step_started", FINISHED_EVENT]
+
+def test_sse_message():
+    message = sse_message(event("step_started", step_id="é"))
+    assert message.startswith("event: step_started\ndata: ") and message.endswith("\n\n")
+    assert json.loads(message.split("data: ", 1)[1]) == event("step_started", step_id="é")
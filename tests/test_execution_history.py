@@ -0,0 +1,100 @@
+import os
+from datetime import datetime, timedelta
+import pytest
+import execution_history
+from execution_history import (
+    compact_executions, delete_workflow_executions, execution_stats, list_executions, load_execution_data
+)
+from models import Blob, JobStatus, User, Workflow, WorkflowExecution, WorkflowStepCheckpoint
+from storage import LocalBlobStore
+
+NOW = datetime.utcnow().replace(microsecond=0)
+
+@pytest.fixture
+def workflow(db):
+    user = User(name="u", email="u@example.com", hashed_password="!")
+    db.add(user)
+    db.commit()
+    workflow = Workflow(name="w", owner_id=user.id, steps=[])
+    db.add(workflow)
+    db.commit()
+    return workflow
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = LocalBlobStore(str(tmp_path / "blobs"))
+    monkeypatch.setattr(execution_history, "get_blob_store", lambda: store)
+    monkeypatch.setattr(execution_history, "INCOMING_DIR", str(tmp_path / "incoming"))
+    return store
+
+def add_executions(db, workflow, *specs):
+    """Executions from (status, started minutes ago, duration) tuples"""
+    executions = [
+        WorkflowExecution(
+            workflow_id=workflow.id, status=status, started_at=NOW - timedelta(minutes=minutes),
+            completed_at=NOW - timedelta(minutes=minutes) + timedelta(seconds=duration or 0) if status != "running" else None,
+            duration=duration, tokens_used=10, input_data={"lead": minutes}, output_data={"ok": status == "completed"}
+        )
+        for status, minutes, duration in specs
+    ]
+    db.add_all(executions)
+    db.commit()
+    return executions
+
+def test_pages_cover_every_execution_once_newest_first(db, workflow):
+    # Ties on started_at are broken by id
+    add_executions(db, workflow, *[("completed", minutes, 1.0) for minutes in [5, 3, 3, 3, 1, 9, 3]])
+    seen, cursor = [], None
+    while True:
+        rows, cursor = list_executions(db, workflow.id, limit=2, cursor=cursor)
+        seen += [(row.started_at, row.id) for row in rows]
+        if not cursor:
+            break
+    assert len(seen) == 7 and seen == sorted(seen, reverse=True)
+    with pytest.raises(ValueError):
+        list_executions(db, workflow.id, cursor="bogus")
+
+def test_status_filter_and_stats(db, workflow):
+    add_executions(db, workflow, ("completed", 1, 1.0), ("completed", 2, 2.0), ("completed", 3, 3.0),
+                   ("failed", 4, 10.0), ("running", 0, None))
+    assert [row.status for row in list_executions(db, workflow.id, status="failed")[0]] == ["failed"]
+    stats = execution_stats(db, workflow_id=workflow.id)
+    assert (stats["executions"], stats["completed"], stats["failed"], stats["in_progress"]) == (5, 3, 1, 1)
+    assert stats["success_rate"] == 75.0 and stats["tokens_used"] == 50
+    assert (stats["duration_p50_seconds"], stats["duration_p95_seconds"]) == (2.0, 3.0)
+    assert execution_stats(db, owner_id=workflow.owner_id + 1)["executions"] == 0
+    assert execution_stats(db, workflow_id=workflow.id, since=NOW - timedelta(minutes=2))["executions"] == 3
+
+def test_compaction_archives_old_finished_executions(db, workflow, store):
+    old, same, recent, running = add_executions(
+        db, workflow, ("completed", 60 * 24 * 40, 1.0), ("completed", 60 * 24 * 40, 1.0),
+        ("completed", 60, 1.0), ("running", 60 * 24 * 40, None)
+    )
+    same.input_data = old.input_data
+    db.add(WorkflowStepCheckpoint(execution_id=old.id, step_id="t", output={}))
+    db.commit()
+
+    job = compact_executions(db, older_than=timedelta(days=30), batch_size=1)
+    assert job.status == JobStatus.COMPLETED and job.result == {"compacted": 2}
+    db.expire_all()
+    assert old.input_data is None and old.archive_key and old.archived_at
+    assert recent.archive_key is None and running.archive_key is None
+    assert load_execution_data(old) == ({"lead": 60 * 24 * 40}, {"ok": True})
+    assert load_execution_data(recent) == ({"lead": 60}, {"ok": True})
+    # Identical data shares one archive
+    assert same.archive_key == old.archive_key
+    sha256 = old.archive_key.split(".", 1)[0]
+    assert db.get(Blob, sha256).ref_count == 2
+    assert db.query(WorkflowStepCheckpoint).count() == 0
+    assert os.listdir(execution_history.INCOMING_DIR) == []
+    # Already compacted rows are not archived again
+    assert compact_executions(db, older_than=timedelta(days=30)).result == {"compacted": 0}
+
+def test_deleting_a_workflows_executions_releases_archives(db, workflow, store):
+    add_executions(db, workflow, ("completed", 60 * 24 * 40, 1.0), ("failed", 1, 1.0))
+    compact_executions(db, older_than=timedelta(days=30))
+    sha256 = db.query(WorkflowExecution.archive_key).filter(WorkflowExecution.archive_key.isnot(None)).scalar().split(".", 1)[0]
+    assert delete_workflow_executions(db, workflow.id) == 2
+    db.commit()
+    assert db.get(Blob, sha256).ref_count == 0
+    assert db.query(WorkflowExecution).count() == 0
@@ -0,0 +1,108 @@
+import zipfile
+import zlib
+import pytest
+import extraction
+from extraction import (
+    MAX_EXTRACTED_VALUES, PDF_MIME_TYPE, XLSX_MIME_TYPE, analyze_text, combine_analyses, extract_document,
+    mapped_file, page_text, plan_pdf_pages
+)
+from worker import cpu_pool
+
+def pdf(objects):
+    """A PDF file body from numbered object bodies (no xref table: the extractor scans for headers)"""
+    return b"%PDF-1.7\n" + b"".join(b"%d 0 obj\n%s\nendobj\n" % (number, body) for number, body in objects.items())
+
+def stream(data, compress=False):
+    if compress:
+        data = zlib.compress(data)
+        return b"<< /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream" % (len(data), data)
+    return b"<< /Length %d >>\nstream\n%s\nendstream" % (len(data), data)
+
+def three_page_pdf():
+    # Pages are listed out of file order in the page tree
+    return pdf({
+        1: b"<< /Type /Catalog /Pages 2 0 R >>",
+        2: b"<< /Type /Pages /Kids [5 0 R 3 0 R 7 0 R] /Count 3 >>",
+        3: b"<< /Type /Page /Parent 2 0 R /Contents 4 0 R >>",
+        4: stream(b"BT (Invoice 2024-01-31 total 1.250,00 EUR) Tj ET"),
+        5: b"<< /Type /Page /Parent 2 0 R /Contents [6 0 R] >>",
+        6: stream(b"BT (Dear\\040customer \\(first\\)) Tj <6a6f6540782e696f> Tj ET", compress=True),
+        7: b"<< /Type /Page /Parent 2 0 R /Contents 8 0 R >>",
+        8: stream(b"BT (page three) Tj ET"),
+    })
+
+def page_texts(data, tmp_path):
+    path = tmp_path / "doc.pdf"
+    path.write_bytes(data)
+    with mapped_file(str(path)) as mm:
+        return [
+            " ".join(page_text(extraction._stream_data(extraction._object_body(mm, offset))) for offset in offsets)
+            for offsets in plan_pdf_pages(mm)
+        ]
+
+def test_pages_follow_the_page_tree_and_decode_strings(tmp_path):
+    assert page_texts(three_page_pdf(), tmp_path) == [
+        "Dear customer (first) joe@x.io",
+        "Invoice 2024-01-31 total 1.250,00 EUR",
+        "page three",
+    ]
+
+def test_pages_packed_in_object_streams_are_found(tmp_path):
+    members = [(1, b"<< /Type /Catalog /Pages 2 0 R >>"), (2, b"<< /Type /Pages /Kids [3 0 R] >>"),
+               (3, b"<< /Type /Page /Contents 4 0 R >>")]
+    header, body = b"", b""
+    for number, member in members:
+        header += b"%d %d " % (number, len(body))
+        body += member + b" "
+    objstm = zlib.compress(header + body)
+    data = pdf({
+        9: b"<< /Type /ObjStm /N 3 /First %d /Filter /FlateDecode /Length %d >>\nstream\n%s\nendstream" % (
+            len(header), len(objstm), objstm),
+        4: stream(b"BT (packed) Tj ET"),
+    })
+    assert page_texts(data, tmp_path) == ["packed"]
+
+def test_analyses_of_parts_combine_like_the_whole_text():
+    first, second = "a@x.io 10.00 EUR 2024-02-01", "b@x.io 5,50 € 2024-01-01 a@x.io"
+    combined = combine_analyses(analyze_text(first), analyze_text(second))
+    whole = analyze_text(f"{first} {second}")
+    assert {**combined, "preview": ""} == {**whole, "preview": ""}
+    assert combined["total_amount"] == 15.5
+    many = analyze_text(" ".join(f"{i:02d}/01/2024" for i in range(1, MAX_EXTRACTED_VALUES + 10)))
+    assert len(many["dates"]) == MAX_EXTRACTED_VALUES
+
+@pytest.mark.parametrize("processes", [None, 1])
+def test_pdf_extraction_merges_pages_in_order(tmp_path, monkeypatch, processes):
+    monkeypatch.setattr(extraction, "PAGES_PER_TASK", 2)
+    path = tmp_path / "doc.pdf"
+    path.write_bytes(three_page_pdf())
+    if processes:
+        with cpu_pool(processes=processes):
+            data = extract_document(str(path), PDF_MIME_TYPE)["extracted_data"]
+    else:
+        data = extract_document(str(path), PDF_MIME_TYPE)["extracted_data"]
+    assert data["pages"] == 3 and data["words"] == 11
+    assert data["amounts"] == [1250.0] and data["dates"] == ["2024-01-31"] and data["emails"] == ["joe@x.io"]
+
+def test_xlsx_sheets_are_streamed_in_batches(tmp_path, monkeypatch):
+    monkeypatch.setattr(extraction, "XLSX_CELLS_PER_BATCH", 2)
+    ns = 'xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"'
+    path = tmp_path / "book.xlsx"
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("xl/sharedStrings.xml", f'<sst {ns}><si><t>ann@x.io</t></si><si><t>10.00 EUR</t></si></sst>')
+        archive.writestr("xl/worksheets/sheet1.xml", (
+            f'<worksheet {ns}><sheetData>'
+            '<row><c t="s"><v>0</v></c><c><v>2.5</v></c></row>'
+            '<row><c t="s"><v>1</v></c><c t="inlineStr"><is><t>2024-03-01</t></is></c><c><v>1</v></c></row>'
+            '<row><c t="str"><v>bob@x.io</v></c></row>'
+            '</sheetData></worksheet>'
+        ))
+        archive.writestr("xl/worksheets/sheet2.xml", f'<worksheet {ns}><sheetData/></worksheet>')
+    data = extract_document(str(path), XLSX_MIME_TYPE)["extracted_data"]
+    assert (data["sheets"], data["rows"], data["numeric_total"]) == (2, 3, 3.5)
+    assert data["emails"] == ["ann@x.io", "bob@x.io"] and data["dates"] == ["2024-03-01"] and data["total_amount"] == 10.0
+
+def test_missing_and_empty_files_extract_nothing(tmp_path):
+    (tmp_path / "empty.pdf").write_bytes(b"")
+    for path in [str(tmp_path / "empty.pdf"), str(tmp_path / "gone.pdf"), None]:
+        assert "pages" not in extract_document(path, PDF_MIME_TYPE)["extracted_data"]
@@ -0,0 +1,57 @@
+from collections import Counter
+from jobs import DeficitRoundRobin, JOB_FAILURE_HANDLERS, claim_job, create_job, retry_or_fail_job
+from models import JobStatus
+
+def serve(scheduler, weights, turns):
+    return Counter(scheduler.next_tenant(weights) for _ in range(turns))
+
+def test_tenants_are_served_in_proportion_to_their_weight():
+    served = serve(DeficitRoundRobin(), {1: 1.0, 2: 2.0, None: 1.0}, 400)
+    assert served == {1: 100, 2: 200, None: 100}
+
+def test_fractional_weights_accumulate_credit():
+    served = serve(DeficitRoundRobin(), {1: 0.5, 2: 1.0}, 300)
+    assert served == {1: 100, 2: 200}
+
+def test_idle_tenants_lose_their_credit():
+    scheduler = DeficitRoundRobin()
+    serve(scheduler, {1: 4.0, 2: 1.0}, 3)
+    # Tenant 1 has nothing to start for a while, then returns
+    serve(scheduler, {2: 1.0}, 10)
+    assert scheduler.deficits == {2: 0.0}
+    served = serve(scheduler, {1: 4.0, 2: 1.0}, 50)
+    assert served == {1: 40, 2: 10}
+
+def test_refund_returns_an_unused_turn():
+    scheduler = DeficitRoundRobin()
+    tenant = scheduler.next_tenant({1: 1.0, 2: 1.0})
+    scheduler.refund(tenant)
+    assert scheduler.next_tenant({1: 1.0, 2: 1.0}) == tenant
+    scheduler.refund(99)
+    assert 99 not in scheduler.deficits
+
+def test_no_startable_tenants():
+    assert DeficitRoundRobin().next_tenant({}) is None
+
+def claimed(db, job_type="test_retry", max_attempts=3):
+    create_job(db, None, job_type, max_attempts=max_attempts)
+    return claim_job(db, "w1", [job_type])
+
+def test_failed_attempt_is_requeued_with_backoff(db):
+    job = claimed(db)
+    assert retry_or_fail_job(db, job, "boom", "w1")
+    assert job.status == JobStatus.QUEUED and job.locked_by is None and job.error_message == "boom"
+    assert job.run_at > job.locked_at
+
+def test_retry_by_a_worker_that_lost_the_job_changes_nothing(db):
+    job = claimed(db)
+    assert not retry_or_fail_job(db, job, "boom", "w2")
+    assert job.status == JobStatus.RUNNING and job.locked_by == "w1"
+
+def test_last_attempt_fails_the_job_and_runs_its_failure_handler(db, monkeypatch):
+    failures = []
+    monkeypatch.setitem(JOB_FAILURE_HANDLERS, "test_retry", lambda db, job, error: failures.append(error))
+    job = claimed(db, max_attempts=1)
+    assert not retry_or_fail_job(db, job, "boom", "w1")
+    assert job.status == JobStatus.FAILED
+    assert failures == ["boom"]
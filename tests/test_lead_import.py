@@ -0,0 +1,91 @@
+import os
+import lead_import
+from jobs import claim_job, create_job, execute_job
+from lead_import import LEAD_IMPORT_JOB, iter_lead_chunks, iter_prepared_chunks, prepare_lead_chunk
+from models import Job, JobStatus, Lead, User
+from worker import cpu_pool
+
+ROWS = [
+    "Name,Email,Company,Phone,Source",
+    "Ada,ada@corp.io,Corp,,referral",
+    "Bob,bob@gmail.com,,0102030405,linkedin",
+    "Bad,not-an-email,,,",
+    "Ada again,ADA@corp.io,Corp,,website",
+    "Cy,cy@corp.io,Corp,,",
+]
+
+def write_csv(tmp_path, rows=ROWS):
+    path = tmp_path / "leads.csv"
+    path.write_text("\n".join(rows) + "\n")
+    return str(path)
+
+def small_chunks(monkeypatch, size=2):
+    monkeypatch.setattr(lead_import, "iter_lead_chunks", lambda path, fmt: iter_lead_chunks(path, fmt, size))
+
+def test_csv_rows_stream_in_chunks_with_normalized_headers(tmp_path):
+    chunks = list(iter_lead_chunks(write_csv(tmp_path), "csv", chunk_size=2))
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+    assert chunks[0][0] == {"name": "Ada", "email": "ada@corp.io", "company": "Corp", "phone": "", "source": "referral"}
+
+def test_prepared_chunk_scores_leads_and_numbers_errors_by_file_row():
+    rows = [{"name": "Ada", "email": "ada@corp.io"}, {"name": "Bad", "email": "nope"}]
+    leads, errors, count = prepare_lead_chunk(rows, 2)
+    assert count == 2
+    assert [lead["email"] for lead in leads] == ["ada@corp.io"]
+    assert 0 <= leads[0]["score"] <= 100 and "ai_insights" in leads[0]
+    assert [error["row"] for error in errors] == [3]
+
+def test_prepared_chunks_skip_rows_already_imported(tmp_path, monkeypatch):
+    small_chunks(monkeypatch)
+    path = write_csv(tmp_path)
+    assert [count for _, _, count in iter_prepared_chunks(path, "csv")] == [2, 2, 1]
+    resumed = list(iter_prepared_chunks(path, "csv", skip_rows=2))
+    assert [count for _, _, count in resumed] == [2, 1]
+    # Row numbers stay those of the file
+    assert resumed[0][1][0]["row"] == 4
+
+def test_prepared_chunks_run_in_the_worker_pool_in_file_order(tmp_path, monkeypatch):
+    small_chunks(monkeypatch, size=1)
+    path = write_csv(tmp_path)
+    with cpu_pool(processes=1):
+        emails = [lead["email"] for leads, _, _ in iter_prepared_chunks(path, "csv") for lead in leads]
+    assert emails == ["ada@corp.io", "bob@gmail.com", "ADA@corp.io", "cy@corp.io"]
+
+def run_import(db, user, path, **job_fields):
+    job = create_job(db, user.id, LEAD_IMPORT_JOB, {"file_path": path, "format": "csv", "filename": "leads.csv"})
+    for field, value in job_fields.items():
+        setattr(job, field, value)
+    db.commit()
+    execute_job(db, claim_job(db, "test", [LEAD_IMPORT_JOB]), "test")
+    db.expire_all()
+    return db.get(Job, job.id)
+
+def add_user(db):
+    user = User(name="u", email="u@example.com", hashed_password="!")
+    db.add(user)
+    db.commit()
+    return user
+
+def test_import_job_upserts_leads_and_reports_errors(db, tmp_path, monkeypatch):
+    small_chunks(monkeypatch)
+    user = add_user(db)
+    path = write_csv(tmp_path)
+    job = run_import(db, user, path)
+    assert job.status == JobStatus.COMPLETED
+    assert job.total == 5 and job.progress == 5
+    assert job.result["imported"] == 3 and job.result["merged"] == 1 and job.result["failed"] == 1
+    assert job.result["errors"][0]["row"] == 4
+    assert sorted(lead.email.lower() for lead in db.query(Lead).filter(Lead.owner_id == user.id)) == [
+        "ada@corp.io", "bob@gmail.com", "cy@corp.io"
+    ]
+    assert not os.path.exists(path)
+
+def test_requeued_import_resumes_after_committed_rows(db, tmp_path, monkeypatch):
+    small_chunks(monkeypatch)
+    user = add_user(db)
+    job = run_import(db, user, write_csv(tmp_path), progress=2, total=5,
+                     result={"imported": 2, "merged": 0, "failed": 0, "errors": []})
+    assert job.status == JobStatus.COMPLETED
+    assert job.result["imported"] == 4 and job.result["failed"] == 1
+    # Only rows after the first chunk were inserted by this run
+    assert sorted(lead.name for lead in db.query(Lead).filter(Lead.owner_id == user.id)) == ["Ada again", "Cy"]
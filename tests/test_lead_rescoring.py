@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta
+from jobs import claim_job, execute_job
+from lead_rescoring import RESCORE_JOB_TYPE, enqueue_lead_rescore, rescore_leads
+from models import Job, JobStatus, Lead, User
+from scheduler import PeriodicJobs
+
+AS_OF = datetime(2026, 3, 1, 12, 0)
+
+def add_leads(db, **days_ago):
+    user = User(name="u", email="u@example.com", hashed_password="!")
+    db.add(user)
+    db.commit()
+    leads = {
+        name: Lead(name=name, email=f"{name}@corp.io", company="Corp", source="cold call",
+                   owner_id=user.id, score=0, last_activity=AS_OF - timedelta(days=days))
+        for name, days in days_ago.items()
+    }
+    db.add_all(leads.values())
+    db.commit()
+    return leads
+
+def test_first_run_scores_every_lead_with_activity(db):
+    leads = add_leads(db, fresh=1, stale=100)
+    job = rescore_leads(db, as_of=AS_OF)
+    assert job.status == JobStatus.COMPLETED and job.result == {"updated": 2}
+    db.refresh(leads["fresh"])
+    db.refresh(leads["stale"])
+    assert leads["fresh"].score > leads["stale"].score > 0
+    assert leads["fresh"].ai_insights
+
+def test_later_runs_only_touch_leads_whose_bucket_changed(db):
+    leads = add_leads(db, crossing=6, steady=10, old=100)
+    rescore_leads(db, as_of=AS_OF)
+    score = leads["crossing"].score
+    # Two days on, only the 6-day-old lead crosses a threshold (7 days)
+    job = rescore_leads(db, as_of=AS_OF + timedelta(days=2))
+    assert job.result == {"updated": 1}
+    assert job.payload["since"] == AS_OF.isoformat()
+    db.refresh(leads["crossing"])
+    assert leads["crossing"].score < score
+
+def test_queued_rescore_runs_in_a_worker_and_is_not_duplicated(db):
+    add_leads(db, fresh=1)
+    job = enqueue_lead_rescore(db, key="k1")
+    assert enqueue_lead_rescore(db, key="k2").id == job.id
+    execute_job(db, claim_job(db, "w1", [RESCORE_JOB_TYPE]), "w1")
+    db.refresh(job)
+    assert job.status == JobStatus.COMPLETED and job.result == {"updated": 1}
+    assert "as_of" in job.payload
+    assert enqueue_lead_rescore(db).id != job.id
+
+def test_periodic_jobs_fire_once_per_interval_across_leaders(db):
+    periodic_jobs = [(RESCORE_JOB_TYPE, 3600, lambda db, key: enqueue_lead_rescore(db, key=key))]
+    now = datetime(2026, 3, 1, 12, 30)
+    periodic = PeriodicJobs(periodic_jobs)
+    # The fire time just passed (12:00) is caught up at start
+    assert periodic.run_due(db, now) == 1
+    assert periodic.run_due(db, now) == 0
+    assert periodic.next_wake(now) == 1800
+    # A new leader in the same interval finds the run already enqueued
+    db.query(Job).update({Job.status: JobStatus.COMPLETED})
+    db.commit()
+    assert PeriodicJobs(periodic_jobs).run_due(db, now) == 0
+    assert periodic.run_due(db, now + timedelta(minutes=30)) == 1
+    assert db.query(Job).filter(Job.type == RESCORE_JOB_TYPE).count() == 2
+
+def test_disabled_periodic_jobs_never_fire(db):
+    periodic = PeriodicJobs([(RESCORE_JOB_TYPE, 0, lambda db, key: enqueue_lead_rescore(db, key=key))])
+    assert periodic.run_due(db, datetime.utcnow()) == 0
+    assert periodic.next_wake(datetime.utcnow()) == float("inf")
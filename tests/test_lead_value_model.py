@@ -0,0 +1,65 @@
+import math
+import numpy as np
+import pytest
+from lead_value_model import (
+    DEFAULT_COEFFICIENTS, LEAD_VALUE_MODEL_VERSION, LeadValueModel, fit_lead_value_model_from_db,
+    train_lead_value_model
+)
+from models import Lead, User
+from scoring import lead_features, lead_frame
+
+LEADS = [
+    {"company": "Corp", "email": "a@corp.io", "source": "referral"},
+    {"company": "", "email": "b@gmail.com", "source": "linkedin"},
+    {"company": "Corp", "email": "c@corp.io", "phone": "0102", "source": "website"},
+    {"company": None, "email": "d@corp.io", "source": "trade show"},
+]
+
+def features(leads=LEADS):
+    return lead_features(lead_frame(leads))
+
+def test_default_model_keeps_the_hand_tuned_multipliers():
+    values = LeadValueModel.default().predict(features(), np.array([100, 50, 100, 100]))
+    assert values.tolist() == [3000.0, 750.0, 1950.0, 1000.0]
+
+def test_training_is_deterministic_and_shrinks_towards_the_prior():
+    feats, scores = features(), np.full(4, 80.0)
+    targets = np.array([5000.0, 600.0, 2500.0, 0.0])
+    first = train_lead_value_model(feats, scores, targets)
+    second = train_lead_value_model(feats, scores, targets)
+    np.testing.assert_array_equal(first.weights, second.weights)
+    assert first.metadata["samples"] == 3
+    # Unobserved features keep their prior coefficient
+    assert first.coefficients["source:cold call"] == pytest.approx(DEFAULT_COEFFICIENTS["source:cold call"])
+    assert first.coefficients["source:referral"] > DEFAULT_COEFFICIENTS["source:referral"]
+    # A huge alpha ignores the data
+    stiff = train_lead_value_model(feats, scores, targets, alpha=1e9)
+    assert stiff.coefficients["intercept"] == pytest.approx(math.log(1000.0))
+
+def test_saved_model_round_trips(tmp_path):
+    model = train_lead_value_model(features(), np.full(4, 80.0), np.array([5000.0, 600.0, 2500.0, 900.0]))
+    path = str(tmp_path / "model.json")
+    model.save(path)
+    loaded = LeadValueModel.load(path)
+    np.testing.assert_allclose(loaded.weights, model.weights, atol=1e-8)
+    assert loaded.metadata["samples"] == 4
+
+def test_unknown_model_version_is_refused(tmp_path):
+    path = tmp_path / "model.json"
+    path.write_text(f'{{"version": {LEAD_VALUE_MODEL_VERSION + 1}, "features": [], "coefficients": []}}')
+    with pytest.raises(ValueError):
+        LeadValueModel.load(str(path))
+
+def test_fit_from_db_uses_leads_with_a_recorded_deal_value(db):
+    user = User(name="u", email="u@example.com", hashed_password="!")
+    db.add(user)
+    db.commit()
+    db.add_all([
+        Lead(name="A", email="a@corp.io", company="Corp", source="referral", score=80, owner_id=user.id,
+             custom_fields={"deal_value": 4000}),
+        Lead(name="B", email="b@corp.io", score=60, owner_id=user.id, custom_fields={"deal_value": "n/a"}),
+        Lead(name="C", email="c@corp.io", score=0, owner_id=user.id, custom_fields={"deal_value": 100}),
+        Lead(name="D", email="d@corp.io", score=70, owner_id=user.id),
+    ])
+    db.commit()
+    assert fit_lead_value_model_from_db(db).metadata["samples"] == 1
@@ -0,0 +1,74 @@
+import hashlib
+import os
+from datetime import datetime, timedelta
+import pytest
+from PIL import Image
+import document_processing
+import previews
+from jobs import claim_job, execute_job
+from models import Document, Job, JobStatus, User
+from previews import DOCUMENT_PREVIEW_JOB, PREVIEW_FAILURE_TTL, enqueue_preview, preview_job, render_preview
+from storage import LocalBlobStore, preview_key
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = LocalBlobStore(str(tmp_path / "blobs"))
+    monkeypatch.setattr(previews, "get_blob_store", lambda: store)
+    monkeypatch.setattr(document_processing, "get_blob_store", lambda: store)
+    monkeypatch.setattr(previews, "INCOMING_DIR", str(tmp_path / "incoming"))
+    return store
+
+@pytest.fixture
+def document(db, tmp_path):
+    path = tmp_path / "photo.png"
+    Image.new("RGBA", (600, 300), (255, 0, 0, 128)).save(path)
+    user = User(name="u", email="u@example.com", hashed_password="!")
+    db.add(user)
+    db.commit()
+    document = Document(name="photo.png", owner_id=user.id, type="image/png", mime_type="image/png", file_path=str(path),
+                        content_hash=hashlib.sha256(path.read_bytes()).hexdigest())
+    db.add(document)
+    db.commit()
+    return document
+
+def run_preview_job(db):
+    job = claim_job(db, "test", [DOCUMENT_PREVIEW_JOB])
+    execute_job(db, job, "test")
+    db.refresh(job)
+    return job
+
+def test_render_preview_fits_the_width_and_flattens_transparency(document, tmp_path):
+    output = tmp_path / "preview.jpg"
+    render_preview(document.file_path, "image/png", 256, str(output))
+    with Image.open(output) as image:
+        assert (image.format, image.mode, image.size) == ("JPEG", "RGB", (256, 128))
+
+def test_pending_render_is_shared_per_document_bytes_and_width(db, document, store):
+    job = enqueue_preview(db, document, 256)
+    assert enqueue_preview(db, document, 256).id == job.id
+    assert preview_job(db, document, 256).id == job.id
+    assert enqueue_preview(db, document, 1024).id != job.id
+
+def test_preview_job_stores_the_render_once(db, document, store):
+    enqueue_preview(db, document, 256)
+    job = run_preview_job(db)
+    key = preview_key(document.content_hash, 256)
+    assert job.status == JobStatus.COMPLETED and job.result["cached"] is False
+    assert store.size(key) == job.result["size"]
+    assert preview_job(db, document, 256) is None
+    # A later render of the same bytes finds the stored preview
+    enqueue_preview(db, document, 256)
+    assert run_preview_job(db).result == {"preview_key": key, "cached": True}
+    assert os.listdir(previews.INCOMING_DIR) == []
+
+def test_failed_render_is_not_retried_until_the_ttl_passes(db, document, store):
+    job = enqueue_preview(db, document, 256)
+    job.status = JobStatus.FAILED
+    job.completed_at = datetime.utcnow()
+    db.commit()
+    assert preview_job(db, document, 256).id == job.id
+    job.completed_at = datetime.utcnow() - PREVIEW_FAILURE_TTL - timedelta(minutes=1)
+    db.commit()
+    assert preview_job(db, document, 256) is None
+    assert enqueue_preview(db, document, 256).id != job.id
+    assert db.query(Job).count() == 2
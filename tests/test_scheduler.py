@@ -0,0 +1,36 @@
+from datetime import datetime
+import pytest
+from scheduler import CronSchedule, IntervalSchedule, TriggerError
+
+@pytest.mark.parametrize("expression, after, expected", [
+    ("*/15 * * * *", datetime(2024, 3, 1, 10, 7, 30), datetime(2024, 3, 1, 10, 15)),
+    # Strictly after: a matching minute is not returned again
+    ("30 10 * * *", datetime(2024, 3, 1, 10, 30), datetime(2024, 3, 2, 10, 30)),
+    # Weekdays only, from a Friday after the run
+    ("0 9 * * 1-5", datetime(2024, 3, 1, 10, 0), datetime(2024, 3, 4, 9, 0)),
+    # 7 is Sunday as well as 0
+    ("0 12 * * 7", datetime(2024, 3, 1), datetime(2024, 3, 3, 12, 0)),
+    # Year rollover
+    ("0 0 1 1 *", datetime(2024, 12, 31, 23, 59), datetime(2025, 1, 1, 0, 0)),
+    # Leap day
+    ("0 0 29 2 *", datetime(2024, 3, 1), datetime(2028, 2, 29, 0, 0)),
+    # Both day fields restricted: either may match (Friday the 6th comes before the 13th)
+    ("0 0 13 * 5", datetime(2024, 9, 1), datetime(2024, 9, 6, 0, 0)),
+    ("@hourly", datetime(2024, 3, 1, 10, 59, 59), datetime(2024, 3, 1, 11, 0)),
+])
+def test_cron_next_after(expression, after, expected):
+    assert CronSchedule(expression).next_after(after) == expected
+
+def test_cron_rejects_invalid_expressions():
+    for expression in ("* * * *", "61 * * * *", "*/0 * * * *", "a * * * *", "5-1 * * * *"):
+        with pytest.raises(TriggerError):
+            CronSchedule(expression)
+
+def test_cron_that_never_fires():
+    with pytest.raises(TriggerError, match="never fires"):
+        CronSchedule("0 0 31 2 *").next_after(datetime(2024, 1, 1))
+
+def test_interval_is_aligned_to_its_anchor():
+    schedule = IntervalSchedule(300, anchor=datetime(2024, 1, 1))
+    assert schedule.next_after(datetime(2024, 1, 1, 0, 7)) == datetime(2024, 1, 1, 0, 10)
+    assert schedule.next_after(datetime(2024, 1, 1, 0, 10)) == datetime(2024, 1, 1, 0, 15)
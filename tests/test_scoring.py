@@ -0,0 +1,27 @@
+from datetime import datetime, timedelta, timezone
+import numpy as np
+import pandas as pd
+from scoring import lead_features, lead_frame, record_features
+
+NOW = datetime(2026, 3, 1, 12, 0)
+
+LEADS = [
+    {"email": "a@Gmail.com", "company": "Corp", "source": "Referral", "last_activity": "2026-02-27T08:00:00"},
+    {"email": "b@corp.io@gmail.com", "company": "", "phone": None, "last_activity": "2026-02-20T12:00:00Z"},
+    {"email": None, "company": np.nan, "phone": 0, "last_activity": "2026-02-28T23:30:00+02:00"},
+    {"email": "", "company": 1.5, "phone": "0102", "last_activity": NOW - timedelta(days=3, hours=1)},
+    {"email": "c@corp.io", "source": np.nan, "last_activity": datetime(2026, 2, 1, tzinfo=timezone.utc)},
+    {"email": "d@corp.io", "last_activity": None},
+]
+
+def test_batch_features_match_the_single_lead_path():
+    batch = lead_features(lead_frame(LEADS), NOW)
+    for i, lead in enumerate(LEADS):
+        single = record_features(lead, NOW)
+        for name, column in batch.items():
+            np.testing.assert_array_equal(column[i:i + 1], single[name], err_msg=f"{name} of lead {i}")
+
+def test_native_datetime_columns_take_the_same_path():
+    activity = [NOW - timedelta(days=2), None]
+    frame = lead_frame(pd.DataFrame({"last_activity": pd.to_datetime(activity)}))
+    np.testing.assert_array_equal(lead_features(frame, NOW)["days_since_activity"], [2.0, np.nan])
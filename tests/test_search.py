@@ -0,0 +1,104 @@
+import pytest
+from models import Lead, User, Workflow
+from search import (
+    SearchUnavailable, create_search_indexes, decode_search_cursor, filter_leads, parse_custom_field_filters,
+    search_entities
+)
+
+@pytest.fixture
+def owners(db):
+    create_search_indexes(db.get_bind())
+    users = [User(name=f"u{i}", email=f"u{i}@example.com", hashed_password="!") for i in range(2)]
+    db.add_all(users)
+    db.commit()
+    return users
+
+def test_hits_are_ranked_and_scoped_to_the_owner(db, owners):
+    user, other = owners
+    db.add_all([
+        Lead(name="Acme", company="Acme Acme", email="a@acme.io", owner_id=user.id),
+        Lead(name="Jane", company="Globex", email="jane@acme.io", owner_id=user.id),
+        Lead(name="Acme", company="Acme", email="b@acme.io", owner_id=other.id),
+        Workflow(name="Acme onboarding", description="Welcome sequence", owner_id=user.id),
+        Lead(name="Nobody", company="Initech", email="n@initech.io", owner_id=user.id),
+    ])
+    db.commit()
+
+    results = search_entities(db, user.id, "acme")["results"]
+    assert [(hit["entity_type"], hit["title"]) for hit in results][0] == ("lead", "Acme")
+    assert {hit["title"] for hit in results} == {"Acme", "Jane", "Acme onboarding"}
+    assert [hit["rank"] for hit in results] == sorted((hit["rank"] for hit in results), reverse=True)
+    assert [hit["entity_type"] for hit in search_entities(db, user.id, "acme", entity_types=["workflow"])["results"]] == ["workflow"]
+    # Prefix matching, and queries without searchable terms
+    assert search_entities(db, user.id, "glob")["results"][0]["title"] == "Jane"
+    assert search_entities(db, user.id, "  ")["results"] == []
+    assert search_entities(db, user.id, "**")["results"] == []
+
+def test_cursor_pages_through_every_hit_once(db, owners):
+    user = owners[0]
+    db.add_all([Lead(name=f"Lead {i}", company="Acme", email=f"l{i}@example.com", owner_id=user.id) for i in range(7)])
+    db.commit()
+
+    seen, cursor = [], None
+    while True:
+        page = search_entities(db, user.id, "acme", limit=3, cursor=cursor)
+        seen += [hit["entity_id"] for hit in page["results"]]
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+        decode_search_cursor(cursor)
+    assert sorted(seen) == sorted(lead.id for lead in db.query(Lead))
+    assert len(seen) == 7
+
+def test_index_follows_updates_and_deletes(db, owners):
+    user = owners[0]
+    lead = Lead(name="Acme", email="a@example.com", owner_id=user.id)
+    db.add(lead)
+    db.commit()
+    lead.name = "Globex"
+    db.commit()
+    assert search_entities(db, user.id, "acme")["results"] == []
+    db.delete(lead)
+    db.commit()
+    assert search_entities(db, user.id, "globex")["results"] == []
+
+def test_invalid_cursor_is_a_value_error(db, owners):
+    with pytest.raises(ValueError):
+        search_entities(db, owners[0].id, "acme", cursor="not-a-cursor")
+
+def test_unsupported_backend_raises_a_search_error(db, owners, monkeypatch):
+    monkeypatch.setattr(db.get_bind().dialect, "name", "mysql")
+    with pytest.raises(SearchUnavailable):
+        search_entities(db, owners[0].id, "acme")
+
+def filtered(db, user, **filters):
+    return sorted(lead.name for lead in filter_leads(db.query(Lead).filter(Lead.owner_id == user.id), db, **filters))
+
+def test_lead_lookup_matches_wildcards_literally(db, owners):
+    user = owners[0]
+    db.add_all([
+        Lead(name="100% Organic", email="a@example.com", owner_id=user.id),
+        Lead(name="1000 Organic", email="b@example.com", owner_id=user.id),
+        Lead(name="snake_case", email="c@example.com", owner_id=user.id),
+        Lead(name="snakeXcase", email="d@example.com", owner_id=user.id),
+        Lead(name="back\\slash", email="e@example.com", owner_id=user.id),
+    ])
+    db.commit()
+    assert filtered(db, user, q="100%") == ["100% Organic"]
+    assert filtered(db, user, q="e_c") == ["snake_case"]
+    assert filtered(db, user, q="k\\s") == ["back\\slash"]
+    assert filtered(db, user, q="ORGANIC") == ["100% Organic", "1000 Organic"]
+
+def test_lead_tag_and_custom_field_filters(db, owners):
+    user = owners[0]
+    db.add_all([
+        Lead(name="A", email="a@example.com", owner_id=user.id, tags=["vip", "fr"], custom_fields={"tier": 1}),
+        Lead(name="B", email="b@example.com", owner_id=user.id, tags=["fr"], custom_fields={"tier": 2}),
+    ])
+    db.commit()
+    assert filtered(db, user, tags=["fr"]) == ["A", "B"]
+    assert filtered(db, user, tags=["fr", "vip"]) == ["A"]
+    assert filtered(db, user, custom_fields={"tier": 2}) == ["B"]
+    assert parse_custom_field_filters(["tier:2", "region:west"]) == {"tier": 2, "region": "west"}
+    with pytest.raises(ValueError):
+        parse_custom_field_filters(["no-separator"])
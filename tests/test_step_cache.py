@@ -0,0 +1,50 @@
+from datetime import timedelta
+from step_cache import (
+    STEP_CACHE_MAX_ENTRY_BYTES, lookup_step_result, purge_step_cache, step_cache_key, step_cache_stats,
+    store_step_result
+)
+
+def key(name="Summarise", owner_id=1, **changes):
+    values = {"step_type": "ai_analysis", "name": name, "config": {}, "model": "GPT-4",
+              "input_data": {"x": 1}, "upstream": {}, "owner_id": owner_id, **changes}
+    return step_cache_key(**values)
+
+def test_key_covers_the_step_definition_and_owner():
+    assert key() == key()
+    assert key("Summarise the contract") != key("Translate to English")
+    assert key(owner_id=1) != key(owner_id=2)
+    assert key(config={"prompt": "a"}) != key(config={"prompt": "b"})
+    assert key(input_data={"x": 2}) != key()
+
+def test_store_then_lookup_counts_hits(db):
+    assert store_step_result(db, "k", 1, "ai_analysis", {"text": "hi"}, 42)
+    assert lookup_step_result(db, "k") == {"output": {"text": "hi"}, "tokens": 42}
+    lookup_step_result(db, "k")
+    assert step_cache_stats(db)["hits"] == 2
+    assert step_cache_stats(db)["tokens_saved"] == 84
+    assert lookup_step_result(db, "missing") is None
+
+def test_expired_entries_miss_and_are_replaced(db):
+    store_step_result(db, "k", 1, "ai_analysis", {"text": "old"}, 1, ttl=timedelta(seconds=-1))
+    assert lookup_step_result(db, "k") is None
+    store_step_result(db, "k", 1, "ai_analysis", {"text": "new"}, 1)
+    assert lookup_step_result(db, "k")["output"] == {"text": "new"}
+
+def test_live_entry_wins_over_a_concurrent_store(db):
+    store_step_result(db, "k", 1, "ai_analysis", {"text": "first"}, 1)
+    store_step_result(db, "k", 1, "ai_analysis", {"text": "second"}, 1)
+    assert lookup_step_result(db, "k")["output"] == {"text": "first"}
+
+def test_oversized_outputs_are_not_stored(db):
+    assert not store_step_result(db, "k", 1, "ai_analysis", {"text": "x" * STEP_CACHE_MAX_ENTRY_BYTES}, 1)
+    assert lookup_step_result(db, "k") is None
+
+def test_purge_drops_expired_then_least_recently_used(db):
+    store_step_result(db, "expired", 1, "ai_analysis", {}, 1, ttl=timedelta(seconds=-1))
+    for name in ("a", "b", "c"):
+        store_step_result(db, name, 1, "ai_analysis", {}, 1)
+    lookup_step_result(db, "a")
+    assert purge_step_cache(db, max_entries=2) == 2
+    assert lookup_step_result(db, "a") is not None
+    assert lookup_step_result(db, "c") is not None
+    assert lookup_step_result(db, "b") is None
@@ -0,0 +1,174 @@
+import hashlib
+from datetime import datetime, timedelta
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+import storage
+from models import Blob
+from storage import (
+    LocalBlobStore, RangeNotSatisfiable, StoredUpload, collect_blob_garbage, content_response, hold_blobs,
+    parse_byte_range, release_blob, store_upload
+)
+
+@pytest.mark.parametrize("header, expected", [
+    (None, None),
+    ("bytes=0-4", (0, 4)),
+    ("bytes=5-", (5, 9)),
+    ("bytes=-3", (7, 9)),
+    ("bytes=-30", (0, 9)),
+    ("bytes=8-100", (8, 9)),
+    # Ignored: whole file
+    ("bytes=5-3", None),
+    ("bytes=0-1,4-5", None),
+    ("items=0-4", None),
+    ("bytes=a-b", None),
+])
+def test_parse_byte_range(header, expected):
+    assert parse_byte_range(header, 10) == expected
+
+@pytest.mark.parametrize("header", ["bytes=10-", "bytes=20-30", "bytes=-0"])
+def test_unsatisfiable_byte_range(header):
+    with pytest.raises(RangeNotSatisfiable):
+        parse_byte_range(header, 10)
+
+@pytest.fixture
+def client(tmp_path):
+    path = tmp_path / "file.txt"
+    path.write_bytes(b"0123456789")
+    app = FastAPI()
+
+    @app.get("/file")
+    def serve(request: Request):
+        return content_response(request, 10, "text/plain", "file.txt", etag='"v1"', path=str(path))
+
+    return TestClient(app)
+
+def test_content_response_whole_file(client):
+    response = client.get("/file")
+    assert response.status_code == 200
+    assert response.content == b"0123456789"
+    assert response.headers["accept-ranges"] == "bytes"
+    assert response.headers["etag"] == '"v1"'
+
+def test_content_response_range(client):
+    response = client.get("/file", headers={"Range": "bytes=2-5"})
+    assert response.status_code == 206
+    assert response.content == b"2345"
+    assert response.headers["content-range"] == "bytes 2-5/10"
+    assert response.headers["content-length"] == "4"
+
+def test_content_response_inverted_range_sends_whole_file(client):
+    response = client.get("/file", headers={"Range": "bytes=5-3"})
+    assert response.status_code == 200
+    assert response.content == b"0123456789"
+
+def test_content_response_unsatisfiable_range(client):
+    response = client.get("/file", headers={"Range": "bytes=10-"})
+    assert response.status_code == 416
+    assert response.headers["content-range"] == "bytes */10"
+
+def test_content_response_conditional_requests(client):
+    assert client.get("/file", headers={"If-None-Match": '"v1"'}).status_code == 304
+    assert client.get("/file", headers={"If-None-Match": 'W/"v1", "v0"'}).status_code == 304
+    # A stale If-Range gets the whole current file instead of a range of it
+    stale = client.get("/file", headers={"Range": "bytes=0-1", "If-Range": '"v0"'})
+    assert stale.status_code == 200 and stale.content == b"0123456789"
+    current = client.get("/file", headers={"Range": "bytes=0-1", "If-Range": '"v1"'})
+    assert current.status_code == 206 and current.content == b"01"
+
+@pytest.fixture
+def blob_store(tmp_path, monkeypatch):
+    store = LocalBlobStore(str(tmp_path / "blobs"))
+    monkeypatch.setattr(storage, "get_blob_store", lambda: store)
+    return store
+
+def incoming(tmp_path, name, data=b"invoice"):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return StoredUpload(name, "application/pdf", str(path), len(data), hashlib.sha256(data).hexdigest())
+
+def age_blob(db, sha256, hours=2):
+    db.query(Blob).filter(Blob.sha256 == sha256).update({Blob.updated_at: datetime.utcnow() - timedelta(hours=hours)})
+    db.commit()
+
+def test_identical_uploads_share_one_blob(db, tmp_path, blob_store):
+    first, second = incoming(tmp_path, "a.pdf"), incoming(tmp_path, "b.pdf")
+    assert store_upload(db, first) == store_upload(db, second) == blob_store.path(first.sha256)
+    db.commit()
+    assert db.get(Blob, first.sha256).ref_count == 2
+    assert blob_store.size(first.sha256) == len(b"invoice")
+    assert not (tmp_path / "a.pdf").exists() and not (tmp_path / "b.pdf").exists()
+
+def test_garbage_collection_waits_for_the_grace_period(db, tmp_path, blob_store):
+    upload = incoming(tmp_path, "a.pdf")
+    store_upload(db, upload)
+    release_blob(db, upload.sha256)
+    db.commit()
+    assert collect_blob_garbage(db) == 0
+    age_blob(db, upload.sha256)
+    assert collect_blob_garbage(db) == 1
+    assert db.get(Blob, upload.sha256) is None and not blob_store.exists(upload.sha256)
+
+def test_held_blob_survives_garbage_collection(db, tmp_path, blob_store):
+    upload = incoming(tmp_path, "a.pdf")
+    store_upload(db, upload)
+    release_blob(db, upload.sha256)
+    age_blob(db, upload.sha256)
+    # A new upload of the same bytes holds the row before putting them
+    hold_blobs(db, [upload.sha256])
+    assert collect_blob_garbage(db, timedelta(minutes=5)) == 0
+    assert blob_store.exists(upload.sha256)
+
+def test_upload_after_collection_stores_the_bytes_again(db, tmp_path, blob_store):
+    upload = incoming(tmp_path, "a.pdf")
+    store_upload(db, upload)
+    release_blob(db, upload.sha256)
+    age_blob(db, upload.sha256)
+    collect_blob_garbage(db)
+    store_upload(db, incoming(tmp_path, "b.pdf"))
+    db.commit()
+    assert db.get(Blob, upload.sha256).ref_count == 1 and blob_store.exists(upload.sha256)
+
+@pytest.fixture
+def upload_client(tmp_path):
+    app = FastAPI()
+
+    @app.post("/upload")
+    async def upload(request: Request, max_size: int = 1024):
+        try:
+            stored = await storage.stream_upload(
+                request, max_size, allowed_types=["application/pdf"], dest_dir=str(tmp_path / "incoming")
+            )
+        except storage.UploadTooLarge as e:
+            return {"error": "too large", "max_size": e.max_size}
+        except storage.UploadError as e:
+            return {"error": str(e)}
+        with open(stored.path, "rb") as f:
+            data = f.read()
+        return {"filename": stored.filename, "size": stored.size, "sha256": stored.sha256, "stored": data == UPLOAD}
+
+    return TestClient(app)
+
+UPLOAD = b"%PDF" + b"x" * 700
+
+def incoming_files(tmp_path):
+    return list((tmp_path / "incoming").iterdir())
+
+def test_stream_upload_hashes_and_stores_the_file_field(upload_client, tmp_path):
+    response = upload_client.post("/upload", data={"note": "hi"}, files={"file": ("a.pdf", UPLOAD, "application/pdf")})
+    assert response.json() == {"filename": "a.pdf", "size": len(UPLOAD), "sha256": hashlib.sha256(UPLOAD).hexdigest(), "stored": True}
+    assert [path.suffix for path in incoming_files(tmp_path)] == [".pdf"]
+
+def test_stream_upload_stops_at_the_size_limit(upload_client, tmp_path):
+    response = upload_client.post("/upload?max_size=100", files={"file": ("a.pdf", UPLOAD, "application/pdf")})
+    assert response.json() == {"error": "too large", "max_size": 100}
+    assert incoming_files(tmp_path) == []
+    # Refused from Content-Length, before reading the body
+    big = b"x" * (storage.MULTIPART_OVERHEAD + 200)
+    assert upload_client.post("/upload?max_size=100", files={"file": ("a.pdf", big, "application/pdf")}).json()["error"] == "too large"
+
+def test_stream_upload_refuses_bad_requests(upload_client, tmp_path):
+    assert upload_client.post("/upload", files={"file": ("a.exe", UPLOAD, "application/x-msdownload")}).json() == {"error": "Unsupported file type"}
+    assert upload_client.post("/upload", files={"other": ("a.pdf", UPLOAD, "application/pdf")}).json() == {"error": "Missing file field 'file'"}
+    assert upload_client.post("/upload", content=UPLOAD, headers={"content-type": "application/pdf"}).json() == {"error": "Expected a multipart/form-data upload"}
+    assert incoming_files(tmp_path) == []
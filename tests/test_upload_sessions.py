@@ -0,0 +1,94 @@
+import asyncio
+import hashlib
+import pytest
+import upload_sessions
+from models import User
+from upload_sessions import (
+    UploadChecksumMismatch, UploadChunkTooLarge, UploadError, UploadInProgress, UploadOffsetMismatch,
+    UploadTooLarge, append_upload_chunk, complete_upload_session, create_upload_session, release_upload_claim
+)
+
+DATA = b"0123456789" * 10
+
+class FakeRequest:
+    """Just what append_upload_chunk reads from a request: headers and a body stream"""
+
+    def __init__(self, body: bytes, block_size: int = 7, fail_after: int = None):
+        self.headers = {"content-length": str(len(body))}
+        self.body = body
+        self.block_size = block_size
+        self.fail_after = fail_after
+
+    async def stream(self):
+        for start in range(0, len(self.body), self.block_size):
+            if self.fail_after is not None and start >= self.fail_after:
+                raise ConnectionError("client went away")
+            yield self.body[start:start + self.block_size]
+
+@pytest.fixture
+def session(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(upload_sessions, "UPLOAD_SESSION_DIR", str(tmp_path / "sessions"))
+    user = User(name="u", email="u@example.com", hashed_password="!")
+    db.add(user)
+    db.commit()
+    return create_upload_session(db, user, "a.pdf", "application/pdf", len(DATA), hashlib.sha256(DATA).hexdigest())
+
+def append(db, session, offset, body, **kwargs):
+    return asyncio.run(append_upload_chunk(db, session, offset, FakeRequest(body, **kwargs)))
+
+def part(session):
+    with open(session.part_path, "rb") as f:
+        return f.read()
+
+def test_chunks_append_at_the_session_offset(db, session):
+    assert append(db, session, 0, DATA[:40]) == 40
+    with pytest.raises(UploadOffsetMismatch) as e:
+        append(db, session, 10, DATA[10:20])
+    assert e.value.offset == 40
+    assert append(db, session, 40, DATA[40:]) == len(DATA)
+    assert part(session) == DATA
+    assert session.claim_token is None
+
+def test_chunk_past_the_declared_size_is_refused(db, session):
+    with pytest.raises(UploadTooLarge):
+        append(db, session, 0, DATA + b"x")
+    assert session.offset == 0
+
+def test_chunks_are_capped(db, session, monkeypatch):
+    monkeypatch.setattr(upload_sessions, "UPLOAD_MAX_CHUNK_SIZE", 30)
+    with pytest.raises(UploadChunkTooLarge):
+        append(db, session, 0, DATA[:31])
+    assert append(db, session, 0, DATA[:30]) == 30
+
+def test_failed_chunk_releases_the_claim_and_truncates(db, session):
+    append(db, session, 0, DATA[:20])
+    with pytest.raises(ConnectionError):
+        append(db, session, 20, DATA[20:60], fail_after=21)
+    db.refresh(session)
+    assert session.offset == 20 and session.claim_token is None
+    assert part(session) == DATA[:20]
+    with pytest.raises(UploadChecksumMismatch):
+        asyncio.run(append_upload_chunk(db, session, 20, FakeRequest(DATA[20:]), chunk_sha256="0" * 64))
+    assert part(session) == DATA[:20]
+    assert append(db, session, 20, DATA[20:]) == len(DATA)
+
+def test_chunk_is_refused_while_another_request_holds_the_session(db, session):
+    token = upload_sessions._claim(db, session)
+    with pytest.raises(UploadInProgress):
+        append(db, session, 0, DATA)
+    release_upload_claim(db, session, token)
+    assert append(db, session, 0, DATA) == len(DATA)
+
+def test_only_one_complete_wins(db, session):
+    with pytest.raises(UploadError):
+        asyncio.run(complete_upload_session(db, session))
+    append(db, session, 0, DATA)
+    upload, token = asyncio.run(complete_upload_session(db, session))
+    assert upload.sha256 == hashlib.sha256(DATA).hexdigest()
+    with pytest.raises(UploadInProgress):
+        asyncio.run(complete_upload_session(db, session))
+    with pytest.raises(UploadInProgress):
+        append(db, session, len(DATA), b"")
+    # A failed store gives the session back for a retry
+    release_upload_claim(db, session, token)
+    assert asyncio.run(complete_upload_session(db, session))[0].size == len(DATA)
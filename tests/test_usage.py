@@ -0,0 +1,53 @@
+from usage import UsageRecorder, _budget_alerts, record_usage, set_usage_budget, usage_summary
+
+USER_ID = 1
+
+def test_summary_without_budget_has_no_alerts(db):
+    record_usage(db, USER_ID, "GPT-4", 400)
+    summary = usage_summary(db, USER_ID)
+    assert summary["tokens"] == 400 and summary["calls"] == 1
+    assert summary["month_tokens"] == 400
+    assert summary["budget"] is None and summary["alerts"] == []
+
+def test_summary_alerts_at_the_highest_threshold_crossed(db):
+    set_usage_budget(db, USER_ID, monthly_tokens=1000, monthly_cost=None, alert_thresholds=[0.9, 0.5])
+    record_usage(db, USER_ID, "GPT-4", 600)
+    alerts = usage_summary(db, USER_ID)["alerts"]
+    assert [(alert["metric"], alert["level"], alert["threshold"]) for alert in alerts] == [("tokens", "warning", 0.5)]
+
+    record_usage(db, USER_ID, "Claude", 300)
+    assert [alert["threshold"] for alert in usage_summary(db, USER_ID)["alerts"]] == [0.9]
+
+    record_usage(db, USER_ID, "Claude", 100)
+    alert, = usage_summary(db, USER_ID)["alerts"]
+    assert alert["level"] == "exceeded"
+    assert alert["used"] == 1000 and alert["limit"] == 1000
+
+def test_summary_groups_by_model(db):
+    for model, tokens in (("GPT-4", 100), ("Claude", 50), ("GPT-4", 25)):
+        record_usage(db, USER_ID, model, tokens)
+    record_usage(db, USER_ID + 1, "GPT-4", 999)
+    summary = usage_summary(db, USER_ID)
+    assert {entry["model"]: (entry["calls"], entry["tokens"]) for entry in summary["by_model"]} == {
+        "GPT-4": (2, 125), "Claude": (1, 50)
+    }
+    assert summary["by_day"][0]["tokens"] == 175
+
+def test_projected_overrun_alert():
+    # A crossed threshold takes precedence over the projection
+    alert, = _budget_alerts("cost", 6.0, 12.0, 10.0, [0.5, 0.8, 1.0])
+    assert (alert["level"], alert["threshold"]) == ("warning", 0.5)
+    alert, = _budget_alerts("cost", 2.0, 12.0, 10.0, [0.5, 0.8, 1.0])
+    assert alert["level"] == "projected"
+    assert _budget_alerts("cost", 2.0, 8.0, 10.0, [0.5]) == []
+    assert _budget_alerts("cost", 50.0, 80.0, None, [0.5]) == []
+
+def test_recorder_buffers_until_flushed(db):
+    recorder = UsageRecorder(USER_ID, execution_id=7)
+    recorder.record("a", "GPT-4", 10)
+    recorder.record("b", "GPT-4", 5)
+    assert usage_summary(db, USER_ID)["calls"] == 0
+    recorder.flush(db)
+    summary = usage_summary(db, USER_ID)
+    assert (summary["calls"], summary["tokens"]) == (2, 15)
+    assert recorder.pending == []
@@ -0,0 +1,155 @@
+import asyncio
+import copy
+import pytest
+from models import Workflow
+from workflow_engine import (
+    AIProvider, AIResult, MockAIProvider, PlanCache, WorkflowDefinitionError, compile_workflow, execute_plan
+)
+
+class RecordingProvider(AIProvider):
+    """Provider that records prompts and how many completions ran at once"""
+
+    def __init__(self, latency: float = 0.01, fail_on: str = None):
+        self.latency = latency
+        self.fail_on = fail_on
+        self.prompts = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def complete(self, model: str, prompt: str) -> AIResult:
+        self.prompts.append(prompt)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+            if self.fail_on and prompt.startswith(self.fail_on):
+                raise RuntimeError("provider down")
+            return AIResult("ok", 10)
+        finally:
+            self.in_flight -= 1
+
+def run(plan, **kwargs):
+    return asyncio.run(execute_plan(plan, {"lead": 1}, **kwargs))
+
+def test_compile_rejects_cycles():
+    steps = [
+        {"id": "a", "type": "trigger"},
+        {"id": "b", "type": "ai_analysis", "depends_on": ["a", "c"]},
+        {"id": "c", "type": "ai_analysis", "depends_on": ["b"]}
+    ]
+    with pytest.raises(WorkflowDefinitionError, match="cycle"):
+        compile_workflow(steps)
+
+def test_compile_rejects_unknown_dependencies_and_types():
+    with pytest.raises(WorkflowDefinitionError, match="unknown step 'missing'"):
+        compile_workflow([{"id": "a", "type": "trigger", "depends_on": ["missing"]}])
+    with pytest.raises(WorkflowDefinitionError, match="unknown type"):
+        compile_workflow([{"id": "a", "type": "teleport"}])
+    with pytest.raises(WorkflowDefinitionError, match="Duplicate"):
+        compile_workflow([{"id": "a", "type": "trigger"}, {"id": "a", "type": "trigger"}])
+
+def test_compile_defaults_to_sequential_steps():
+    plan = compile_workflow([{"type": "trigger"}, {"type": "ai_analysis"}, {"type": "report"}])
+    assert plan.order == ("1", "2", "3")
+    assert plan.steps["3"].depends_on == ("2",)
+    assert plan.roots == ("1",) and plan.sinks == ("3",)
+
+def test_execute_plan_fans_out_and_in():
+    plan = compile_workflow([
+        {"id": "t", "type": "trigger"},
+        {"id": "a", "type": "ai_analysis", "depends_on": ["t"]},
+        {"id": "b", "type": "sentiment", "depends_on": ["t"]},
+        {"id": "m", "type": "report", "depends_on": ["a", "b"]}
+    ])
+    provider = RecordingProvider()
+    result = run(plan, provider=provider)
+
+    assert result.status == "completed"
+    assert provider.max_in_flight == 2
+    assert result.outputs["m"] == {"received": ["a", "b"]}
+    assert result.tokens_used == 20
+    assert result.output_data(plan)["result"] == {"m": {"received": ["a", "b"]}}
+
+def test_execute_plan_times_out_steps():
+    plan = compile_workflow([{"id": "w", "type": "wait", "timeout": 0.05, "config": {"seconds": 5}}])
+    result = run(plan)
+
+    assert result.status == "failed"
+    assert "timed out" in result.error
+    assert result.steps["w"]["status"] == "failed"
+
+def test_failing_step_cancels_running_steps():
+    plan = compile_workflow([
+        {"id": "t", "type": "trigger"},
+        {"id": "boom", "name": "boom", "type": "ai_analysis", "depends_on": ["t"]},
+        {"id": "slow", "type": "wait", "depends_on": ["t"], "config": {"seconds": 5}},
+        {"id": "after", "type": "report", "depends_on": ["boom", "slow"]}
+    ])
+    result = run(plan, provider=RecordingProvider(fail_on="boom"))
+
+    assert result.status == "failed"
+    assert "Step boom" in result.error
+    assert result.steps["boom"]["status"] == "failed"
+    assert result.steps["slow"]["status"] == "cancelled"
+    assert "after" not in result.steps
+    assert result.duration < 5
+
+def test_checkpointed_steps_are_not_run_again():
+    plan = compile_workflow([
+        {"id": "t", "type": "trigger"},
+        {"id": "a", "name": "first", "type": "ai_analysis"},
+        {"id": "b", "name": "second", "type": "ai_analysis"}
+    ])
+    provider = RecordingProvider()
+    checkpointed = []
+    result = run(
+        plan, provider=provider,
+        checkpoints={"t": {"output": {"input": {}}, "tokens": 0}, "a": {"output": {"text": "saved"}, "tokens": 7}},
+        on_step=lambda step_id, record: checkpointed.append(step_id)
+    )
+
+    assert result.status == "completed"
+    assert [prompt.split("\n")[0] for prompt in provider.prompts] == ["second"]
+    assert result.outputs["a"] == {"text": "saved"}
+    assert result.steps["a"]["checkpointed"] is True
+    assert result.tokens_used == 17
+    assert checkpointed == ["b"]
+
+def test_execute_plan_awaits_async_step_callbacks():
+    plan = compile_workflow([{"id": "t", "type": "trigger"}, {"id": "r", "type": "report"}])
+    recorded = []
+
+    async def on_step(step_id, record):
+        await asyncio.sleep(0)
+        recorded.append(step_id)
+
+    result = run(plan, provider=MockAIProvider(0), on_step=on_step)
+    assert result.status == "completed"
+    assert recorded == ["t", "r"]
+
+def workflow(steps, **fields):
+    return Workflow(id=1, name="w", owner_id=1, steps=steps, **fields)
+
+def test_plan_cache_reuses_plans_until_the_definition_changes():
+    cache = PlanCache()
+    steps = [{"id": "t", "type": "trigger"}, {"id": "a", "type": "ai_analysis", "depends_on": ["t"]}]
+    plan = cache.get(workflow(steps))
+    # Reloaded rows carry equal but distinct JSON
+    assert cache.get(workflow(copy.deepcopy(steps))) is plan
+    # Edits are seen even when updated_at did not move
+    steps[1]["config"] = {"prompt": "summarise"}
+    assert cache.get(workflow(steps)) is not plan
+    assert cache.get(workflow(steps, ai_model="Claude")).ai_model == "Claude"
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 3
+
+def test_plan_cache_evicts_the_least_recently_used_workflow():
+    cache = PlanCache(maxsize=2)
+    steps = [{"id": "t", "type": "trigger"}]
+    first, second, third = (Workflow(id=i, name="w", owner_id=1, steps=steps) for i in (1, 2, 3))
+    cache.get(first)
+    cache.get(second)
+    cache.get(first)
+    cache.get(third)
+    assert list(cache.entries) == [1, 3]
+    cache.invalidate(1)
+    assert list(cache.entries) == [3]
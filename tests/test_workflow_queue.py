@@ -0,0 +1,73 @@
+import pytest
+from jobs import claim_job, execute_job
+from models import Job, JobStatus, User, Workflow, WorkflowExecution, WorkflowStepCheckpoint
+from workflow_engine import WorkflowDefinitionError
+from workflow_queue import WORKFLOW_RUN_JOB, enqueue_workflow_run, get_user_execution, load_checkpoints, save_checkpoint
+
+STEPS = [
+    {"id": "t", "type": "trigger"},
+    {"id": "a", "type": "ai_analysis", "depends_on": ["t"], "config": {"prompt": "summarise"}},
+    {"id": "r", "type": "report", "depends_on": ["a"]},
+]
+
+@pytest.fixture
+def workflow(db):
+    user = User(name="u", email="u@example.com", hashed_password="!")
+    db.add(user)
+    db.commit()
+    workflow = Workflow(name="w", owner_id=user.id, steps=STEPS)
+    db.add(workflow)
+    db.commit()
+    return workflow
+
+def run_next_job(db):
+    job = claim_job(db, "test", [WORKFLOW_RUN_JOB])
+    execute_job(db, job, "test")
+    db.expire_all()
+    return db.get(Job, job.id)
+
+def test_queued_run_executes_in_a_worker_and_checkpoints_each_step(db, workflow):
+    queued = enqueue_workflow_run(db, workflow, {"lead": 1}, trigger={"schedule_id": 7})
+    execution = db.get(WorkflowExecution, queued.payload["execution_id"])
+    assert execution.status == "queued" and queued.payload["trigger"] == {"schedule_id": 7}
+
+    job = run_next_job(db)
+    assert job.status == JobStatus.COMPLETED
+    assert job.result["status"] == "completed" and job.result["restored_steps"] == 0
+    assert db.get(WorkflowExecution, execution.id).status == "completed"
+    assert set(load_checkpoints(db, execution.id)) == {"t", "a", "r"}
+    assert get_user_execution(db, workflow.id, execution.id, workflow.owner_id).id == execution.id
+    assert get_user_execution(db, workflow.id, execution.id, workflow.owner_id + 1) is None
+
+def test_redelivered_run_restores_checkpoints(db, workflow):
+    queued = enqueue_workflow_run(db, workflow)
+    execution_id = queued.payload["execution_id"]
+    # An earlier attempt finished the first two steps before its worker died
+    save_checkpoint(db, execution_id, "t", {"output": {"started": True}})
+    save_checkpoint(db, execution_id, "a", {"output": {"analysis": "earlier"}, "tokens": 5, "duration": 0.1})
+    save_checkpoint(db, execution_id, "a", {"output": {"analysis": "later"}, "tokens": 9})
+    assert load_checkpoints(db, execution_id)["a"] == {"output": {"analysis": "earlier"}, "tokens": 5, "duration": 0.1}
+
+    job = run_next_job(db)
+    assert job.result["status"] == "completed" and job.result["restored_steps"] == 2
+    assert db.query(WorkflowStepCheckpoint).filter(WorkflowStepCheckpoint.execution_id == execution_id).count() == 3
+
+def test_finished_execution_is_not_run_again(db, workflow):
+    queued = enqueue_workflow_run(db, workflow)
+    run_next_job(db)
+    execution_id = queued.payload["execution_id"]
+    duplicate = enqueue_workflow_run(db, workflow)
+    duplicate.payload = {**duplicate.payload, "execution_id": execution_id}
+    db.commit()
+    assert run_next_job(db).result == {"execution_id": execution_id, "status": "completed", "duplicate": True}
+
+def test_invalid_definitions_fail_at_enqueue_or_in_the_worker(db, workflow):
+    queued = enqueue_workflow_run(db, workflow)
+    # Edited into an invalid definition while queued: failed without retries
+    workflow.steps = [{"id": "x", "type": "teleport"}]
+    db.commit()
+    job = run_next_job(db)
+    assert job.status == JobStatus.COMPLETED and job.result["status"] == "failed"
+    assert db.get(WorkflowExecution, queued.payload["execution_id"]).status == "failed"
+    with pytest.raises(WorkflowDefinitionError):
+        enqueue_workflow_run(db, workflow)